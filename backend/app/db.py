@@ -1,9 +1,13 @@
 # app/db.py
+import logging
+import os
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-# Configuração do banco de dados
-DATABASE_URL = "sqlite:///./aura.db"
+# Configuração do banco de dados (AURA_DATABASE_URL permite apontar para outro arquivo, ex.: benchmarks)
+DATABASE_URL = os.getenv("AURA_DATABASE_URL", "sqlite:///./aura.db")
 
 # Criar engine com configurações otimizadas para SQLite
 engine = create_engine(
@@ -26,6 +30,39 @@ SessionLocal = sessionmaker(
 # Base para modelos
 Base = declarative_base()
 
+# ============================================================
+# ACESSO ASSÍNCRONO (rotas de tempo real/analíticas e /ws)
+# ============================================================
+
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def _async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return _ASYNC_DRIVERS.get(scheme.split("+")[0], scheme) + sep + rest
+
+
+ASYNC_DATABASE_URL = os.getenv("AURA_ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+
+# Pool limitado: sob carga as requisições esperam (sem bloquear o event loop)
+# em vez de abrir conexões sem limite. O aiosqlite usaria NullPool por padrão.
+DB_POOL_SIZE = int(os.getenv("AURA_DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("AURA_DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("AURA_DB_POOL_TIMEOUT", "30"))
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_pre_ping=True,
+    connect_args={"timeout": 30} if ASYNC_DATABASE_URL.startswith("sqlite") else {},
+)
+
+# expire_on_commit=False: objetos continuam legíveis depois de fechar a sessão
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
 
 def get_db():
     """
@@ -39,11 +76,64 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """
+    Dependency assíncrona. Os serviços continuam síncronos (recebem Session):
+    usar com `await db.run_sync(servico, ...)`. A consulta roda na thread do
+    driver e o event loop fica livre enquanto isso.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def init_db():
     """
     Inicializa o banco de dados criando todas as tabelas.
     Chamar no startup da aplicação.
     """
-    from app.models import SensorReading, SensorFeature, Episode, DailyStats
+    from app.models import SensorReading, SensorFeature, Episode, DailyStats, FeatureRollup
     Base.metadata.create_all(bind=engine)
-    print("[DB] ✅ Tabelas criadas/verificadas")
\ No newline at end of file
+    logging.getLogger(__name__).info("Tabelas criadas/verificadas")
+
+
+def ensure_columns():
+    """
+    Adiciona colunas declaradas nos modelos que ainda não existem em tabelas
+    já criadas. Colunas anuláveis entram sem default; as não anuláveis só com
+    server_default (o valor preenche as linhas existentes). As demais exigem
+    recriar o banco. Roda antes de ensure_indexes: índices sobre colunas novas
+    (ex.: device_id) dependem delas.
+    """
+    from sqlalchemy import inspect
+    from sqlalchemy.schema import CreateColumn
+    from app import models  # noqa: F401 (registra as tabelas em Base.metadata)
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    logging.getLogger(__name__).warning(
+                        "Coluna %s.%s ausente e não anulável: recrie o banco", table.name, column.name
+                    )
+                    continue
+                column_spec = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column_spec}")
+                logging.getLogger(__name__).info("Coluna adicionada: %s.%s", table.name, column.name)
+
+
+def ensure_indexes():
+    """
+    Cria índices declarados nos modelos que ainda não existem no banco.
+    create_all só cria índices junto com tabelas novas; bancos existentes
+    recebem assim os índices adicionados depois.
+    """
+    from app import models  # noqa: F401 (registra as tabelas em Base.metadata)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
@@ -0,0 +1,155 @@
+# app/logging_config.py
+"""
+Logging do backend: níveis por módulo, limite de taxa por mensagem (token
+bucket), saída JSON ou texto e escrita fora das threads de ingestão/event loop.
+
+As threads que logam só enfileiram o registro (QueueHandler com fila limitada,
+sem bloquear); um QueueListener em background formata e escreve no stdout.
+
+Variáveis de ambiente:
+    AURA_LOG_LEVEL   nível raiz (padrão INFO)
+    AURA_LOG_LEVELS  níveis por módulo, ex.: "app.mqtt_client=DEBUG,app.services=WARNING"
+    AURA_LOG_FORMAT  "text" (padrão) ou "json"
+    AURA_LOG_RATE    mensagens/s permitidas por (logger, template) (padrão 5)
+    AURA_LOG_BURST   rajada máxima por (logger, template) (padrão 20)
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+LOG_QUEUE_SIZE = 10000
+
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket por (logger, template da mensagem). Mensagens repetitivas do
+    caminho quente passam a uma taxa fixa; as descartadas são contadas e
+    informadas no próximo registro emitido daquele template (campo `suppressed`).
+    """
+
+    def __init__(self, rate: float = 5.0, burst: float = 20.0):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[Tuple[str, str], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [self.burst, now, 0]  # tokens, último refill, suprimidas
+                self._buckets[key] = bucket
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1.0:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1.0
+            suppressed, bucket[2] = bucket[2], 0
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que descarta (e conta) registros quando a fila está cheia."""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """Um objeto JSON por linha, com os campos passados em `extra`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s [%(name)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", None)
+        if suppressed:
+            text += f" (+{suppressed} suprimidas)"
+        return text
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        if level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(level: Optional[str] = None, fmt: Optional[str] = None,
+                  module_levels: Optional[Dict[str, str]] = None):
+    """Configura o logging do processo (idempotente)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    level = (level or os.getenv("AURA_LOG_LEVEL", "INFO")).upper()
+    fmt = fmt or os.getenv("AURA_LOG_FORMAT", "text")
+    module_levels = module_levels or _parse_levels(os.getenv("AURA_LOG_LEVELS", ""))
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(RateLimitFilter(
+        rate=float(os.getenv("AURA_LOG_RATE", "5")),
+        burst=float(os.getenv("AURA_LOG_BURST", "20")),
+    ))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+    for name, module_level in module_levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Esvazia a fila e encerra o listener."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,18 +1,59 @@
 # app/main.py
 import asyncio
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+import logging
+import os
+import time
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from app.mqtt_client import start_mqtt
+from app.logging_config import setup_logging, shutdown_logging
+from app.mqtt_client import INGEST_LOCK_PATH, acquire_ingest_lock, start_mqtt, stop_mqtt
+from app.services.ingest_partition import PARTITIONING, owns_device
+from app.services.ingest_sources import INGEST_SOURCE
 from app.services.features_repository import get_latest_sensor_readings
 from app.routes.features_routes import router as features_router
 from app.routes.stats_routes import router as stats_router
 from app.routes.episodes_routes import router as episodes_router
 from app.routes.heatmap_routes import router as heatmap_router
 from app.routes.realtime_routes import router as realtime_router
-from app.db import engine, get_db
+from app.routes.retention_routes import router as retention_router
+from app.routes.query_routes import router as query_router
+from app.routes.export_routes import router as export_router
+from app.routes.ingest_routes import router as ingest_router
+from app.routes.metrics_routes import router as metrics_router
+from app.metrics import (
+    HTTP_REQUEST_SECONDS, HTTP_REQUESTS, WEBSOCKET_CLIENTS, WEBSOCKET_SEND_LAG_SECONDS,
+)
+from app.services.retention_service import start_retention_scheduler
+from app.services.cpu_executor import shutdown_cpu_executor
+from app.services.shm_ring import (
+    enable_shm_reader, get_shm_reader, record_message, start_shm_writer,
+    stop_shm_reader, stop_shm_writer,
+)
+from app.services.live_feed import (
+    latest_message, message_lag_seconds, reading_message, report_broadcast,
+    start_live_publisher, start_live_subscriber, stop_live_publisher, stop_live_subscriber,
+)
+from app.services.tracing_service import mark_broadcast
+from app.routes.tracing_routes import router as tracing_router
+from app.routes.admin_routes import router as admin_router
+from app.db import AsyncSessionLocal, async_engine, engine, ensure_columns, ensure_indexes
 
 from app.models import Base as ModelsBase
 
+setup_logging()
+logger = logging.getLogger("app")
+
+# Papel do processo (ver app/services/live_feed.py):
+#   all    - ingestão MQTT + API no mesmo processo (padrão)
+#   ingest - único dono do MQTT/escritas; publica leituras no canal local
+#   api    - só HTTP/WebSocket; leituras ao vivo chegam pelo canal
+AURA_ROLE = os.getenv("AURA_ROLE", "all")
+if AURA_ROLE not in ("all", "ingest", "api"):
+    raise ValueError(f"AURA_ROLE inválido: {AURA_ROLE} (use all, ingest ou api)")
+
+# True quando o /ws lê do canal em vez de consultar o banco
+_live_from_feed = False
+
 app = FastAPI(
     title="Aura Backend - Parkinson Tremor Monitor",
     description="API para monitoramento de tremores em pacientes com Parkinson",
@@ -29,15 +70,67 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def request_metrics(request: Request, call_next):
+    """Latência por rota (template do path, não a URL, para limitar a cardinalidade)."""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        HTTP_REQUEST_SECONDS.labels(method=request.method, route=path).observe(
+            time.perf_counter() - started
+        )
+        HTTP_REQUESTS.labels(method=request.method, route=path, status=status).inc()
+
+
 @app.on_event("startup")
 def startup_event():
-    print("[FastAPI] 🚀 Iniciando Aura Backend...")
-    print("[FastAPI] 📊 Criando tabelas (se necessário)...")
+    global _live_from_feed
+    logger.info("Iniciando Aura Backend...")
+    logger.info("Criando tabelas (se necessário)...")
     ModelsBase.metadata.create_all(bind=engine)
-    print("[FastAPI] ✅ Tabelas criadas/verificadas")
-    print("[FastAPI] 📡 Iniciando cliente MQTT...")
-    start_mqtt()
-    print("[FastAPI] ✅ Sistema pronto!")
+    ensure_columns()
+    ensure_indexes()
+    logger.info("Tabelas criadas/verificadas")
+    if AURA_ROLE == "api":
+        logger.info("Papel api: assinando canal de leituras ao vivo...")
+        start_live_subscriber()
+        enable_shm_reader()
+        _live_from_feed = True
+    elif PARTITIONING != "off" or acquire_ingest_lock():
+        # Com particionamento várias instâncias de ingestão coexistem de propósito
+        if AURA_ROLE == "ingest":
+            start_shm_writer()
+            start_live_publisher()
+        logger.info("Iniciando ingestão (fonte %s)...", INGEST_SOURCE)
+        start_mqtt()
+        logger.info("Iniciando job de retenção...")
+        # Particionado: a retenção fica com o dono (HRW) de uma chave fixa
+        start_retention_scheduler(should_run=lambda: owns_device("__retention__"))
+    elif AURA_ROLE == "ingest":
+        raise RuntimeError(f"Outro processo já faz a ingestão (lock {INGEST_LOCK_PATH})")
+    else:
+        # uvicorn --workers N com AURA_ROLE=all: só um worker consome MQTT
+        logger.warning("Outro processo já consome MQTT (lock %s); este worker só serve a API",
+                       INGEST_LOCK_PATH)
+    logger.info("Sistema pronto! (papel=%s)", AURA_ROLE)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    stop_mqtt()
+    stop_live_publisher()
+    stop_live_subscriber()
+    stop_shm_writer()
+    stop_shm_reader()
+    await async_engine.dispose()
+    shutdown_cpu_executor()
+    shutdown_logging()
 
 
 @app.get("/")
@@ -53,17 +146,34 @@ def root():
             "stats": "/stats/*",
             "episodes": "/episodes/*",
             "heatmap": "/heatmap/*",
-            "realtime": "/realtime/*"
+            "realtime": "/realtime/*",
+            "retention": "/retention/*",
+            "query": "/query/*",
+            "export": "/export/*",
+            "ingest_batch": "/ingest/batch",
+            "metrics": "/metrics",
+            "tracing": "/tracing/*",
+            "admin": "/admin/*"
         }
     }
 
 
 @app.get("/health")
-def health_check():
-    """Endpoint de health check para monitoramento."""
+async def health_check():
+    """Endpoint de health check para monitoramento (não depende do threadpool)."""
     return {"status": "healthy"}
 
 
+# RuntimeError do uvicorn ao enviar num websocket já fechado
+_SEND_AFTER_CLOSE = "Unexpected ASGI message 'websocket.send', after sending 'websocket.close'"
+
+
+async def _until_disconnect(websocket: WebSocket):
+    """Consome mensagens do cliente até o fechamento (o /ws só envia)."""
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """
@@ -71,42 +181,56 @@ async def websocket_endpoint(websocket: WebSocket):
     Envia última leitura do sensor a cada 100ms.
     """
     await websocket.accept()
+    WEBSOCKET_CLIENTS.inc()
     last_id = None
+    # Sem isto a desconexão só seria percebida no próximo envio, e sem
+    # leituras novas o loop (e o shutdown do servidor) ficaria preso
+    disconnected = asyncio.ensure_future(_until_disconnect(websocket))
     
     try:
-        while True:
+        while not disconnected.done():
             await asyncio.sleep(0.1)  # 100ms
             
-            db = next(get_db())
-            try:
-                latest = get_latest_sensor_readings(db, limit=1)
-                if not latest:
-                    continue
-                    
-                latest_item = latest[0]
-                
-                # Enviar apenas se for nova leitura
-                if last_id != latest_item.id:
-                    last_id = latest_item.id
-                    await websocket.send_json({
-                        "type": "sensor_reading",
-                        "id": latest_item.id,
-                        "timestamp": latest_item.timestamp.isoformat(),
-                        "acc_x": latest_item.acc_x,
-                        "acc_y": latest_item.acc_y,
-                        "acc_z": latest_item.acc_z,
-                        "gyro_x": latest_item.gyro_x,
-                        "gyro_y": latest_item.gyro_y,
-                        "gyro_z": latest_item.gyro_z,
-                        "temp": latest_item.temp
-                    })
-            finally:
-                db.close()
+            if _live_from_feed:
+                # Ring em memória compartilhada; canal de socket se não houver ring
+                ring = get_shm_reader()
+                record = ring.latest("raw") if ring is not None else None
+                message = record_message(record) if record else latest_message()
+            else:
+                # Sessão assíncrona só durante a consulta: a conexão volta ao pool
+                # antes do envio, então um cliente lento não a segura
+                async with AsyncSessionLocal() as db:
+                    latest = await db.run_sync(get_latest_sensor_readings, limit=1)
+                message = reading_message(latest[0]) if latest else None
+            
+            # Enviar apenas se for nova leitura
+            if message is None or message["id"] == last_id:
+                continue
+            await asyncio.sleep(0)  # deixa _until_disconnect processar um close pendente
+            if disconnected.done():
+                break  # cliente saiu durante a consulta: enviar falharia
+            last_id = message["id"]
+            await websocket.send_json(message)
+            WEBSOCKET_SEND_LAG_SECONDS.observe(message_lag_seconds(message))
+            if _live_from_feed:
+                report_broadcast(last_id)  # os traces estão no processo de ingestão
+            else:
+                mark_broadcast(last_id)
                 
     except WebSocketDisconnect:
-        print("[WebSocket] Cliente desconectado")
+        logger.debug("WebSocket: cliente desconectado")
+    except RuntimeError as e:
+        # Desconexão entre a checagem e o envio: o servidor ASGI (ou o
+        # Starlette) recusa o envio depois do close; é um fechamento normal
+        if disconnected.done() or _SEND_AFTER_CLOSE in str(e):
+            logger.debug("WebSocket: cliente desconectado durante o envio (%s)", e)
+        else:
+            logger.warning("WebSocket: erro %s", e)
     except Exception as e:
-        print(f"[WebSocket] Erro: {e}")
+        logger.warning("WebSocket: erro %s", e)
+    finally:
+        disconnected.cancel()
+        WEBSOCKET_CLIENTS.dec()
 
 
 # Registrar rotas
@@ -115,10 +239,28 @@ app.include_router(stats_router)
 app.include_router(episodes_router)
 app.include_router(heatmap_router)
 app.include_router(realtime_router)
+app.include_router(retention_router)
+app.include_router(query_router)
+app.include_router(export_router)
+app.include_router(ingest_router)
+app.include_router(metrics_router)
+app.include_router(tracing_router)
+app.include_router(admin_router)
 
-print("[FastAPI] 📡 Rotas registradas:")
-print("  - /features/* (Dados processados e features)")
-print("  - /stats/* (Estatísticas diárias/semanais/calendário)")
-print("  - /episodes/* (Detecção e análise de episódios)")
-print("  - /heatmap/* (Heatmaps e timelines)")
-print("  - /realtime/* (Dados em tempo real)")
\ No newline at end of file
+logger.info(
+    "Rotas registradas:\n%s",
+    "\n".join([
+        "  - /features/* (Dados processados e features)",
+        "  - /stats/* (Estatísticas diárias/semanais/calendário)",
+        "  - /episodes/* (Detecção e análise de episódios)",
+        "  - /heatmap/* (Heatmaps e timelines)",
+        "  - /realtime/* (Dados em tempo real)",
+        "  - /retention/* (Política de retenção e downsampling)",
+        "  - /query/* (Séries com resolução automática)",
+        "  - /export/* (Exportação em streaming NDJSON/CSV)",
+        "  - /ingest/batch (Envio em lote de leituras, NDJSON/colunar)",
+        "  - /metrics (Métricas Prometheus)",
+        "  - /tracing/* (Latência ponta a ponta por estágio)",
+        "  - /admin/* (Profiler sob demanda, requer AURA_ADMIN_TOKEN)",
+    ]),
+)
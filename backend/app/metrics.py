@@ -0,0 +1,262 @@
+# app/metrics.py
+"""
+Métricas no formato Prometheus com custo desprezível no caminho de 25 Hz.
+
+Cada thread acumula em sua própria célula (lista de floats), então incrementos
+não usam lock: só a thread dona escreve na célula e a leitura (/metrics) soma
+todas as células. Histogramas usam buckets fixos definidos na criação.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Buckets padrão (segundos) - de 0.1 ms a 10 s
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+_REGISTRY: List["_Metric"] = []
+
+
+class _ThreadCells:
+    """Um acumulador por thread; só a thread dona escreve na sua célula."""
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._cells: List[List[float]] = []
+
+    def cell(self) -> List[float]:
+        cell = getattr(self._local, "cell", None)
+        if cell is None:
+            cell = [0.0] * self._size
+            self._local.cell = cell
+            self._cells.append(cell)  # list.append é atômico no CPython
+        return cell
+
+    def snapshot(self) -> List[float]:
+        total = [0.0] * self._size
+        for cell in list(self._cells):
+            for i, value in enumerate(cell):
+                total[i] += value
+        return total
+
+
+class _Metric:
+    kind = "untyped"
+    # Sufixo do nome da família nas linhas HELP/TYPE (as amostras trazem o seu)
+    family_suffix = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+        if not self.labelnames:
+            self._init_value()
+        _REGISTRY.append(self)
+
+    def _init_value(self):
+        raise NotImplementedError
+
+    def _new_child(self) -> "_Metric":
+        child = object.__new__(type(self))
+        child.__dict__.update({k: v for k, v in self.__dict__.items() if k != "_children"})
+        child.labelnames = ()
+        child._children = {}
+        child._init_value()
+        return child
+
+    def labels(self, **labels: str) -> "_Metric":
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        family = self.name + self.family_suffix
+        lines = [f"# HELP {family} {self.documentation}", f"# TYPE {family} {self.kind}"]
+        if self.labelnames:
+            series = [(dict(zip(self.labelnames, key)), child)
+                      for key, child in list(self._children.items())]
+        else:
+            series = [({}, self)]
+        for base_labels, metric in series:
+            for suffix, extra, value in metric._samples():
+                labels = {**base_labels, **extra}
+                label_str = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                label_str = "{" + label_str + "}" if label_str else ""
+                lines.append(f"{self.name}{suffix}{label_str} {_format(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    # Amostras em <nome>_total; o formato texto do Prometheus (como o
+    # prometheus_client) declara a família com o mesmo nome
+    kind = "counter"
+    family_suffix = "_total"
+
+    def _init_value(self):
+        self._cells = _ThreadCells(1)
+
+    def inc(self, amount: float = 1.0):
+        self._cells.cell()[0] += amount
+
+    def value(self) -> float:
+        return self._cells.snapshot()[0]
+
+    def _samples(self):
+        return [("_total", {}, self.value())]
+
+
+class Gauge(_Metric):
+    """Valor instantâneo: set(), inc()/dec() por thread ou função avaliada na leitura."""
+    kind = "gauge"
+
+    def _init_value(self):
+        self._cells = _ThreadCells(1)
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self._value = float(value)
+
+    def inc(self, amount: float = 1.0):
+        self._cells.cell()[0] += amount
+
+    def dec(self, amount: float = 1.0):
+        self._cells.cell()[0] -= amount
+
+    def set_function(self, function: Callable[[], float]):
+        self._function = function
+
+    def value(self) -> float:
+        if self._function is not None:
+            return float(self._function())
+        return self._value + self._cells.snapshot()[0]
+
+    def _samples(self):
+        return [("", {}, self.value())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _init_value(self):
+        # [contagem por bucket..., +Inf, soma, contagem]
+        self._cells = _ThreadCells(len(self.buckets) + 3)
+
+    def observe(self, value: float):
+        cell = self._cells.cell()
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def snapshot(self) -> Dict[str, object]:
+        """Contagens cumulativas por limite, soma e total."""
+        data = self._cells.snapshot()
+        cumulative = []
+        running = 0.0
+        for i, bound in enumerate(self.buckets + (float("inf"),)):
+            running += data[i]
+            cumulative.append((bound, running))
+        return {"buckets": cumulative, "sum": data[-2], "count": data[-1]}
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimativa do quantil pelo limite superior do bucket (como histogram_quantile)."""
+        snap = self.snapshot()
+        if not snap["count"]:
+            return None
+        target = q * snap["count"]
+        for bound, running in snap["buckets"]:
+            if running >= target:
+                return bound
+        return None
+
+    def _samples(self):
+        snap = self.snapshot()
+        samples = [
+            ("_bucket", {"le": "+Inf" if bound == float("inf") else _format(bound)}, count)
+            for bound, count in snap["buckets"]
+        ]
+        samples.append(("_sum", {}, snap["sum"]))
+        samples.append(("_count", {}, snap["count"]))
+        return samples
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def render_prometheus() -> str:
+    """Texto no formato de exposição Prometheus 0.0.4."""
+    lines: List[str] = []
+    for metric in list(_REGISTRY):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ============================================================
+# MÉTRICAS DO AURA
+# ============================================================
+
+MQTT_MESSAGES_RECEIVED = Counter(
+    "aura_mqtt_messages_received", "Mensagens MQTT recebidas"
+)
+MQTT_MESSAGES_PARSED = Counter(
+    "aura_mqtt_messages_parsed", "Mensagens MQTT decodificadas e válidas"
+)
+MQTT_MESSAGES_DROPPED = Counter(
+    "aura_mqtt_messages_dropped", "Mensagens MQTT descartadas", ["reason"]
+)
+INGEST_QUEUE_DEPTH = Gauge(
+    "aura_ingest_queue_depth", "Mensagens aguardando persistência"
+)
+DB_COMMIT_SECONDS = Histogram(
+    "aura_db_commit_seconds", "Latência de commit no banco", ["table"]
+)
+FEATURE_COMPUTE_SECONDS = Histogram(
+    "aura_feature_compute_seconds", "Tempo de cálculo das features por amostra"
+)
+EPISODES_DETECTED = Counter(
+    "aura_episodes_detected", "Episódios de tremor detectados e salvos"
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "aura_http_request_seconds", "Latência das rotas HTTP", ["method", "route"]
+)
+HTTP_REQUESTS = Counter(
+    "aura_http_requests", "Requisições HTTP", ["method", "route", "status"]
+)
+WEBSOCKET_CLIENTS = Gauge(
+    "aura_websocket_clients", "Clientes WebSocket conectados"
+)
+WEBSOCKET_SEND_LAG_SECONDS = Histogram(
+    "aura_websocket_send_lag_seconds", "Atraso entre a leitura e o envio pelo WebSocket",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
@@ -1,14 +1,32 @@
 # app/models.py
-from sqlalchemy import Column, Integer, Float, DateTime, Date, String, ForeignKey
+from sqlalchemy import Column, Integer, Float, DateTime, Date, String, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from app.db import Base
 
+# Dispositivo assumido quando o payload/tópico não informa device_id
+DEFAULT_DEVICE_ID = "default"
+
+# Boot gravado pelos lotes de /ingest/batch enviados sem boot: NULL não entra
+# no índice único (NULLs são distintos), e o lote precisa dele para ser
+# idempotente. Os boots da ingestão ao vivo começam em 0.
+UNKNOWN_BOOT = -1
+
 
 class SensorReading(Base):
     """Leituras brutas do sensor MPU6050."""
     __tablename__ = "sensor_readings"
+    __table_args__ = (
+        # Filtro por dispositivo + intervalo/ordem por tempo (export, séries por device)
+        Index("ix_sensor_readings_device_timestamp", "device_id", "timestamp"),
+        # Barreira contra reentregas duplicadas (app/services/ingest_dedup.py e
+        # ingest_batch.py); linhas sem boot (cargas sintéticas, bancos antigos)
+        # não participam
+        Index("ux_sensor_readings_device_boot_ts", "device_id", "boot", "ts_ms", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
+    device_id = Column(String(64), nullable=False, default=DEFAULT_DEVICE_ID,
+                       server_default=DEFAULT_DEVICE_ID)
     timestamp = Column(DateTime, server_default=func.now(), index=True)  # SEM timezone=True
 
     # Acelerômetro (m/s²)
@@ -24,15 +42,26 @@ class SensorReading(Base):
     # Temperatura e timestamp do dispositivo
     temp = Column(Float, nullable=True)
     ts_ms = Column(Integer, nullable=True)
+    # Boot do dispositivo (incrementa quando ts_ms volta para trás); distingue
+    # ts_ms repetidos de boots diferentes
+    boot = Column(Integer, nullable=True)
 
 
 class SensorFeature(Base):
     """Features processadas a partir das leituras brutas."""
     __tablename__ = "sensor_features"
+    __table_args__ = (
+        Index("ix_sensor_features_device_timestamp", "device_id", "timestamp"),
+        # Cobre as agregações diárias/horárias (intervalo de tempo + intensity)
+        # sem ler a linha; também atende a toda busca só por timestamp
+        Index("ix_sensor_features_timestamp_intensity", "timestamp", "intensity"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     reading_id = Column(Integer, ForeignKey("sensor_readings.id"), nullable=False, index=True)
-    timestamp = Column(DateTime, server_default=func.now(), index=True)  # SEM timezone=True
+    device_id = Column(String(64), nullable=False, default=DEFAULT_DEVICE_ID,
+                       server_default=DEFAULT_DEVICE_ID)
+    timestamp = Column(DateTime, server_default=func.now())  # SEM timezone=True
 
     # Magnitudes vetoriais
     acc_magnitude = Column(Float, nullable=True)
@@ -55,6 +84,7 @@ class SensorFeature(Base):
     # Métricas derivadas
     intensity = Column(Float, nullable=True)  # 0-10
     freq_dominant = Column(Float, nullable=True)  # Hz
+    band_power = Column(Float, nullable=True)  # potência na banda de tremor (4-6 Hz)
     tremor_score = Column(Float, nullable=True)
 
 
@@ -88,4 +118,55 @@ class DailyStats(Base):
     max_intensity = Column(Float, nullable=True)
     episodes_count = Column(Integer, nullable=True)
     total_episode_time = Column(Float, nullable=True)  # minutos
-    strongest_freq = Column(Float, nullable=True)
\ No newline at end of file
+    strongest_freq = Column(Float, nullable=True)
+
+
+class FeatureRollup(Base):
+    """Features agregadas por janela fixa (downsampling para retenção longa)."""
+    __tablename__ = "feature_rollups"
+    __table_args__ = (
+        UniqueConstraint("device_id", "resolution_seconds", "bucket_start", name="uq_rollup_device_bucket"),
+        # Consultas de todos os dispositivos: resolução + intervalo
+        Index("ix_feature_rollups_resolution_bucket", "resolution_seconds", "bucket_start"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    device_id = Column(String(64), nullable=False, default=DEFAULT_DEVICE_ID,
+                       server_default=DEFAULT_DEVICE_ID)
+    resolution_seconds = Column(Integer, nullable=False)  # 1 = por segundo, 60 = por minuto
+    bucket_start = Column(DateTime, nullable=False)  # SEM timezone=True
+
+    # Quantidade de features originais no bucket (peso para médias)
+    samples = Column(Integer, nullable=False, default=0)
+
+    # Intensidade
+    avg_intensity = Column(Float, nullable=True)
+    min_intensity = Column(Float, nullable=True)
+    max_intensity = Column(Float, nullable=True)
+
+    # Magnitudes e amplitude
+    avg_acc_magnitude = Column(Float, nullable=True)
+    avg_gyro_magnitude = Column(Float, nullable=True)
+    avg_acc_amplitude = Column(Float, nullable=True)
+    max_acc_amplitude = Column(Float, nullable=True)
+
+    # Frequência dominante e potência na banda de tremor médias
+    avg_freq_dominant = Column(Float, nullable=True)
+    avg_band_power = Column(Float, nullable=True)
+
+    # Amostras acima do limiar de episódio (intensity > 6.0)
+    episode_candidates = Column(Integer, nullable=False, default=0)
+
+
+class FeatureBackfill(Base):
+    """
+    Intervalo de leituras processado com fidelidade reduzida (sobrecarga), cujas
+    features ainda precisam ser recalculadas por completo.
+    """
+    __tablename__ = "feature_backfills"
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner = Column(String(128), nullable=False)  # instância de ingestão que degradou
+    start_reading_id = Column(Integer, nullable=False)  # avança conforme o backfill progride
+    end_reading_id = Column(Integer, nullable=True)  # None enquanto ainda está degradado
+    created_at = Column(DateTime, server_default=func.now())  # SEM timezone=True
@@ -1,33 +1,79 @@
 # app/mqtt_client.py
 import json
+import logging
+import os
+import socket
 import threading
+import time
 import paho.mqtt.client as mqtt
 from datetime import datetime
+from functools import partial
+from typing import Callable, Optional
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app.db import SessionLocal
-from app.models import SensorReading
+from app.metrics import (
+    DB_COMMIT_SECONDS, MQTT_MESSAGES_DROPPED,
+    MQTT_MESSAGES_PARSED, MQTT_MESSAGES_RECEIVED,
+)
+from app.models import SensorReading, DEFAULT_DEVICE_ID
+from app.services import features_service
 from app.services.features_service import process_new_reading
+from app.services.device_clock import (
+    buffer_reading, drop_device_clocks, observe_device_clock, start_jitter_buffer,
+    stop_jitter_buffer,
+)
+from app.services.ingest_partition import (
+    MEMBERS_TOPIC, PARTITIONING, handle_membership_message, is_membership_topic,
+    INGEST_PARTITION_SKIPPED, owns_device, partitioning_enabled, start_partitioning,
+    stop_partitioning,
+)
+from app.services.ingest_dedup import accept_reading, count_index_duplicate, drop_device_sequences
+from app.services.ingest_queue import (
+    backlog_fraction, enqueue_reading, start_ingest_queue, stop_ingest_queue,
+)
+from app.services.ingest_sources import (
+    CAPTURE_DIR, INGEST_SOURCE, IngestSource, capture_message, replay_source_from_env,
+    start_capture, stop_capture,
+)
+from app.services.live_feed import publish_reading
+from app.services.overload_controller import (
+    observe_processing, start_overload_control, stop_overload_control,
+)
+from app.services.shm_ring import write_reading
+from app.services.tracing_service import attach_reading, begin_trace, now_ms
 
 # Configurações MQTT
-MQTT_BROKER = "localhost"
-MQTT_PORT = 1883
-MQTT_TOPIC = "parkinson/mpu6050"
+MQTT_BROKER = os.getenv("AURA_MQTT_HOST", "localhost")
+MQTT_PORT = int(os.getenv("AURA_MQTT_PORT", "1883"))
+MQTT_TOPIC = "parkinson/mpu6050"  # aceita também parkinson/mpu6050/<device_id>
 MQTT_QOS = 1  # Quality of Service
+# Arquivo de lock: garante um único processo consumindo MQTT por máquina
+INGEST_LOCK_PATH = os.getenv("AURA_INGEST_LOCK", "/tmp/aura-ingest.lock")
 
+logger = logging.getLogger(__name__)
 
-def save_reading_to_db(payload: dict):
+_source: Optional[IngestSource] = None
+
+
+def save_reading_to_db(payload: dict, trace: Optional[dict] = None,
+                       sampled_at: Optional[datetime] = None):
     """
     Salva leitura bruta no banco e processa features.
     
     Args:
         payload: Dicionário com dados do sensor
+        trace: Trace de latência da mensagem (somente mensagens amostradas)
+        sampled_at: Horário da amostra no relógio do servidor (a leitura pode
+            ter esperado no buffer de reordenação e na fila)
     """
     db: Session = SessionLocal()
     try:
         # Criar leitura bruta (SEM timezone)
         reading = SensorReading(
-            timestamp=datetime.now(),  # SEM timezone
+            device_id=payload.get("device_id") or DEFAULT_DEVICE_ID,
+            timestamp=sampled_at or datetime.now(),  # SEM timezone
             acc_x=payload.get("acc_x"),
             acc_y=payload.get("acc_y"),
             acc_z=payload.get("acc_z"),
@@ -36,80 +82,206 @@ def save_reading_to_db(payload: dict):
             gyro_z=payload.get("gyro_z"),
             temp=payload.get("temp"),
             ts_ms=payload.get("ts_ms"),
+            boot=payload.get("boot"),
         )
         
         db.add(reading)
+        started = time.perf_counter()
         db.commit()
+        DB_COMMIT_SECONDS.labels(table="sensor_readings").observe(time.perf_counter() - started)
         db.refresh(reading)
+        attach_reading(trace, reading.id)
+        write_reading(reading)
+        publish_reading(reading)
         
-        print(f"[MQTT] ✅ Leitura salva: id={reading.id} | "
-              f"acc=({reading.acc_x:.2f}, {reading.acc_y:.2f}, {reading.acc_z:.2f}) | "
-              f"gyro=({reading.gyro_x:.2f}, {reading.gyro_y:.2f}, {reading.gyro_z:.2f})")
+        logger.debug("Leitura salva: id=%s device=%s", reading.id, reading.device_id)
 
         # Processar e salvar features
         process_new_reading(db, reading)
 
+    except IntegrityError:
+        # Índice único (device_id, boot, ts_ms): reentrega que escapou da janela
+        db.rollback()
+        count_index_duplicate()
+        MQTT_MESSAGES_DROPPED.labels(reason="duplicate").inc()
     except Exception as e:
-        print(f"[MQTT] ❌ Erro ao salvar leitura: {e}")
+        logger.error("Erro ao salvar leitura: %s", e)
+        MQTT_MESSAGES_DROPPED.labels(reason="db_error").inc()
         db.rollback()
     finally:
         db.close()
 
 
+def _persist(item):
+    """Handler da fila de ingestão: grava e informa o custo ao controle de sobrecarga."""
+    started = time.perf_counter()
+    save_reading_to_db(*item)
+    observe_processing(time.perf_counter() - started)
+
+
 def on_connect(client, userdata, flags, rc):
     """Callback quando conecta ao broker MQTT."""
     if rc == 0:
-        print(f"[MQTT] ✅ Conectado ao broker (rc={rc})")
-        client.subscribe(MQTT_TOPIC, qos=MQTT_QOS)
-        print(f"[MQTT] 📡 Inscrito no tópico: {MQTT_TOPIC}")
+        logger.info("Conectado ao broker (rc=%s)", rc)
+        client.subscribe([(MQTT_TOPIC, MQTT_QOS), (f"{MQTT_TOPIC}/+", MQTT_QOS)])
+        logger.info("Inscrito no tópico: %s (e %s/<device_id>)", MQTT_TOPIC, MQTT_TOPIC)
+        if partitioning_enabled():
+            client.subscribe(f"{MEMBERS_TOPIC}/+", 0)
     else:
-        print(f"[MQTT] ❌ Falha na conexão (rc={rc})")
+        logger.error("Falha na conexão (rc=%s)", rc)
 
 
 def on_disconnect(client, userdata, rc):
     """Callback quando desconecta do broker MQTT."""
     if rc != 0:
-        print(f"[MQTT] ⚠️  Desconectado inesperadamente (rc={rc}). Tentando reconectar...")
+        logger.warning("Desconectado inesperadamente (rc=%s). Tentando reconectar...", rc)
 
 
 def on_message(client, userdata, msg):
     """Callback quando recebe mensagem MQTT."""
+    _dispatch(msg, handle_message)
+
+
+def _dispatch(msg, handle: Callable[[str, bytes, float], None]):
+    """Membros do grupo de ingestão para o particionamento; leituras para handle."""
+    if is_membership_topic(msg.topic):
+        handle_membership_message(msg.topic, msg.payload)
+        return
+    handle(msg.topic, msg.payload, now_ms())
+
+
+def handle_message(topic: str, raw: bytes, received_ms: float, live: bool = True):
+    """
+    Processa uma mensagem de leitura de qualquer fonte (app/services/ingest_sources.py).
+
+    Args:
+        topic: Tópico MQTT (parkinson/mpu6050 ou parkinson/mpu6050/<device_id>)
+        raw: Payload JSON
+        received_ms: Horário de chegada (epoch ms; o da gravação numa reprodução)
+        live: False na reprodução: sem gravação de captura nem trace de latência
+
+    A captura grava só o que esta instância aceitou pelo particionamento
+    (cada instância recebe tudo do broker), inclusive payloads inválidos,
+    para a reprodução passar pelos mesmos descartes.
+    """
+    MQTT_MESSAGES_RECEIVED.inc()
+    # Dispositivo no sufixo do tópico: descarta o que é de outra instância antes do JSON
+    topic_device = topic[len(MQTT_TOPIC) + 1:] if topic.startswith(f"{MQTT_TOPIC}/") else None
+    if topic_device is not None and not owns_device(topic_device):
+        INGEST_PARTITION_SKIPPED.inc()
+        return
+    if live and topic_device is not None:
+        capture_message(topic, raw, received_ms)
     try:
         # Decodificar payload JSON
-        payload = json.loads(msg.payload.decode("utf-8"))
+        payload = json.loads(raw.decode("utf-8"))
+        
+        # Dispositivo: sufixo do tópico ou campo do payload
+        if topic_device is None:
+            if not owns_device(payload.get("device_id") or DEFAULT_DEVICE_ID):
+                INGEST_PARTITION_SKIPPED.inc()
+                return
+            if live:
+                capture_message(topic, raw, received_ms)
+        elif "device_id" not in payload:
+            payload["device_id"] = topic_device
         
         # Validar campos obrigatórios
         required_fields = ["acc_x", "acc_y", "acc_z", "gyro_x", "gyro_y", "gyro_z"]
         if not all(field in payload for field in required_fields):
-            print(f"[MQTT] ⚠️  Payload incompleto: {payload}")
+            logger.warning("Payload incompleto: %s", payload)
+            MQTT_MESSAGES_DROPPED.labels(reason="incomplete").inc()
+            return
+        MQTT_MESSAGES_PARSED.inc()
+        
+        # Reentregas (QoS 1) saem aqui, antes da fila
+        device_id = payload.get("device_id") or DEFAULT_DEVICE_ID
+        if not accept_reading(payload, device_id):
+            MQTT_MESSAGES_DROPPED.labels(reason="duplicate").inc()
             return
         
-        # Salvar no banco
-        save_reading_to_db(payload)
+        # Horário da amostra pelo relógio do dispositivo, não o de chegada
+        ts_ms = payload.get("ts_ms") if isinstance(payload.get("ts_ms"), (int, float)) else None
+        sampled_ms = observe_device_clock(device_id, ts_ms, payload.get("boot"), received_ms)
+        trace = begin_trace(device_id, ts_ms, received_ms) if live else None
+        
+        # Reordenação por ts_ms e persistência na thread da fila: o callback
+        # não espera o banco
+        buffer_reading(device_id, payload, trace, datetime.fromtimestamp(sampled_ms / 1000.0),
+                       received_ms)
         
     except json.JSONDecodeError as e:
-        print(f"[MQTT] ❌ Erro ao decodificar JSON: {e}")
+        # Sem JSON não há dispositivo: grava quem é dono do dispositivo padrão
+        if live and topic_device is None and owns_device(DEFAULT_DEVICE_ID):
+            capture_message(topic, raw, received_ms)
+        logger.warning("Erro ao decodificar JSON: %s", e)
+        MQTT_MESSAGES_DROPPED.labels(reason="invalid_json").inc()
     except Exception as e:
-        print(f"[MQTT] ❌ Erro ao processar mensagem: {e}")
+        logger.exception("Erro ao processar mensagem: %s", e)
+        MQTT_MESSAGES_DROPPED.labels(reason="error").inc()
 
 
 def on_subscribe(client, userdata, mid, granted_qos):
     """Callback quando inscrição é confirmada."""
-    print(f"[MQTT] ✅ Inscrição confirmada (QoS={granted_qos})")
+    logger.info("Inscrição confirmada (QoS=%s)", granted_qos)
+
+
+_ingest_lock_file = None
 
 
-def start_mqtt():
+def acquire_ingest_lock(path: str = INGEST_LOCK_PATH) -> bool:
     """
-    Inicia cliente MQTT em thread separada.
+    Tenta obter o lock exclusivo de ingestão (flock, liberado quando o
+    processo termina). Com uvicorn --workers N em AURA_ROLE=all, só o worker
+    que obtiver o lock consome MQTT; os demais só servem a API.
     """
+    global _ingest_lock_file
     try:
-        # Criar cliente MQTT
-        client = mqtt.Client(client_id="aura_backend", clean_session=True)
+        import fcntl
+    except ImportError:
+        return True  # sem flock (Windows): um processo por máquina é responsabilidade do deploy
+    handle = open(path, "a")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    _ingest_lock_file = handle
+    return True
+
+
+def mqtt_client_id() -> str:
+    """
+    Client id único por processo (AURA_MQTT_CLIENT_ID fixa um valor). Com
+    particionamento é obrigatório: o id é também o membro do grupo e o dono
+    dos intervalos de backfill (app/services/overload_controller.py), que a
+    instância só retoma ao voltar com o mesmo id.
+    """
+    client_id = os.getenv("AURA_MQTT_CLIENT_ID")
+    if client_id:
+        return client_id
+    if PARTITIONING != "off":
+        raise ValueError("AURA_INGEST_PARTITIONING=hrw exige AURA_MQTT_CLIENT_ID fixo por instância")
+    return f"aura_backend-{socket.gethostname()}-{os.getpid()}"
+
+
+class MqttSource(IngestSource):
+    """Broker MQTT: paho em thread própria (mensagens → handle de start), com particionamento."""
+
+    name = "mqtt"
+
+    def __init__(self):
+        self.client_id = mqtt_client_id()
+        self.client: Optional[mqtt.Client] = None
+
+    def start(self, handle):
+        # Criar cliente MQTT (id fixo faria o broker derrubar a sessão anterior)
+        client = mqtt.Client(client_id=self.client_id, clean_session=True)
         
         # Configurar callbacks
         client.on_connect = on_connect
         client.on_disconnect = on_disconnect
-        client.on_message = on_message
+        client.on_message = lambda c, userdata, msg: _dispatch(msg, handle)
         client.on_subscribe = on_subscribe
         
         # Configurar Will (mensagem caso desconecte)
@@ -120,15 +292,69 @@ def start_mqtt():
             retain=True
         )
         
-        print(f"[MQTT] 🔌 Conectando ao broker {MQTT_BROKER}:{MQTT_PORT}...")
+        logger.info("Conectando ao broker %s:%s...", MQTT_BROKER, MQTT_PORT)
         client.connect(MQTT_BROKER, MQTT_PORT, keepalive=60)
         
+        if PARTITIONING == "hrw":
+            # Leituras de dispositivos que mudaram de dono recomeçam a janela pelo banco
+            features_service.seed_windows_from_db = True
+            def on_rebalance(group):
+                features_service.drop_device_windows(group.owns)
+                drop_device_sequences(group.owns)
+                drop_device_clocks(group.owns)
+
+            start_partitioning(client, self.client_id, on_rebalance=on_rebalance)
+        
         # Iniciar loop em thread separada
         thread = threading.Thread(target=client.loop_forever, daemon=True)
         thread.start()
+        self.client = client
+        logger.info("Cliente MQTT iniciado em background")
+
+    def stop(self):
+        """Avisa o grupo de ingestão da saída (com particionamento) e desconecta."""
+        if self.client is not None:
+            if partitioning_enabled():
+                stop_partitioning(self.client)
+            self.client.disconnect()
+
+
+def start_mqtt(source: Optional[IngestSource] = None):
+    """
+    Inicia a ingestão: fila de persistência, buffer de reordenação e a fonte
+    das mensagens (padrão: AURA_INGEST_SOURCE, o broker MQTT ou a reprodução
+    de arquivos de captura).
+    """
+    global _source
+    try:
+        if source is None:
+            source = replay_source_from_env() if INGEST_SOURCE == "replay" else MqttSource()
         
-        print("[MQTT] ✅ Cliente MQTT iniciado em background")
+        # Reprodução: backpressure até a leitura dos arquivos, nada descartado
+        start_ingest_queue(_persist, policy=None if source.live else "block")
+        start_jitter_buffer(source.wrap_release(lambda item: enqueue_reading(*item)),
+                            clock=source.clock)
+        if source.live:
+            start_overload_control(mqtt_client_id(), backlog_fraction)
+            if CAPTURE_DIR:
+                start_capture(CAPTURE_DIR)
+        
+        source.start(handle_message if source.live else partial(handle_message, live=False))
+        _source = source
         
     except Exception as e:
-        print(f"[MQTT] ❌ Erro ao iniciar MQTT: {e}")
-        raise
\ No newline at end of file
+        logger.error("Erro ao iniciar ingestão (%s): %s", getattr(source, "name", INGEST_SOURCE), e)
+        raise
+
+
+def stop_mqtt():
+    """
+    Para a fonte (com particionamento, avisa o grupo de ingestão da saída) e
+    drena a fila de persistência.
+    """
+    if _source is not None:
+        _source.stop()
+    stop_capture()
+    stop_jitter_buffer()
+    stop_ingest_queue()
+    stop_overload_control()
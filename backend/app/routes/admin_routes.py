@@ -0,0 +1,58 @@
+# app/routes/admin_routes.py
+import hmac
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.services.profiler_service import (
+    PROFILE_MAX_SECONDS,
+    ProfilerBusy,
+    profile_summary,
+    run_profile,
+    to_collapsed,
+    to_speedscope,
+)
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Exige o header X-Admin-Token igual a AURA_ADMIN_TOKEN (sem token configurado, rotas desativadas)."""
+    expected = os.getenv("AURA_ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=403, detail="Rotas de admin desativadas (defina AURA_ADMIN_TOKEN)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=401, detail="Token de admin inválido")
+
+
+@router.get("/profile", dependencies=[Depends(require_admin)])
+def route_admin_profile(
+    seconds: float = Query(10.0, gt=0, le=PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(10.0, ge=1, le=1000),
+    format: str = Query("collapsed", pattern="^(collapsed|speedscope|top)$"),
+):
+    """
+    Amostra as pilhas de todas as threads do processo por `seconds`.
+
+    - collapsed: texto `thread;f1;f2 <amostras>` (flamegraph.pl, speedscope, inferno)
+    - speedscope: JSON para https://www.speedscope.app
+    - top: funções folha mais amostradas
+
+    Roda no threadpool (não bloqueia o event loop); uma execução por vez (409).
+    """
+    try:
+        profile = run_profile(seconds, interval_ms)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if format == "speedscope":
+        return to_speedscope(profile)
+    if format == "top":
+        return {
+            "seconds": profile["seconds"],
+            "samples": profile["samples"],
+            "top": profile_summary(profile),
+        }
+    return PlainTextResponse(to_collapsed(profile))
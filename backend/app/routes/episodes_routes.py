@@ -1,10 +1,11 @@
 # app/routes/episodes_routes.py
 from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import date, datetime, timedelta
 from typing import Optional
 
-from app.db import get_db
+from app.db import get_async_db, get_db
 from app.services.episodes_service import (
     detect_and_save_episodes,
     get_episodes_by_date,
@@ -38,9 +39,9 @@ def route_detect_episodes(
 
 
 @router.get("/daily")
-def route_episodes_daily(
+async def route_episodes_daily(
     for_date: Optional[str] = Query(None, description="YYYY-MM-DD (default = today)"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Retorna todos os episódios de um dia específico.
@@ -52,15 +53,15 @@ def route_episodes_daily(
     
     return {
         "date": dt.isoformat(),
-        "episodes": get_episodes_by_date(db, for_date=dt)
+        "episodes": await db.run_sync(get_episodes_by_date, for_date=dt)
     }
 
 
 @router.get("/summary")
-def route_episodes_summary(
+async def route_episodes_summary(
     start_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Retorna resumo de episódios em um período.
@@ -75,4 +76,4 @@ def route_episodes_summary(
     else:
         start_dt = end_dt - timedelta(days=7)
     
-    return get_episodes_summary(db, start_date=start_dt, end_date=end_dt)
\ No newline at end of file
+    return await db.run_sync(get_episodes_summary, start_date=start_dt, end_date=end_dt)
\ No newline at end of file
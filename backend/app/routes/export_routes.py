@@ -0,0 +1,107 @@
+# app/routes/export_routes.py
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from datetime import datetime, timedelta
+from typing import Optional
+
+from app.services.bulk_export_service import arrow_schema, stream_bulk_export
+from app.services.export_service import decode_cursor, stream_export
+
+router = APIRouter(prefix="/export", tags=["Export"])
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _export_response(table: str, start: Optional[datetime], end: Optional[datetime],
+                     fmt: str, device_id: Optional[str], cursor: Optional[str],
+                     limit: Optional[int], gzip: bool) -> StreamingResponse:
+    end_dt = (end or datetime.now()).replace(tzinfo=None)
+    start_dt = (start or end_dt - timedelta(days=1)).replace(tzinfo=None)
+    if start_dt >= end_dt:
+        raise HTTPException(status_code=400, detail="start deve ser anterior a end")
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    filename = f"{table}_{start_dt:%Y%m%dT%H%M%S}_{end_dt:%Y%m%dT%H%M%S}.{fmt}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(
+        stream_export(table, start_dt, end_dt, fmt=fmt, device_id=device_id,
+                      cursor=cursor, limit=limit, gzip=gzip),
+        media_type=MEDIA_TYPES[fmt],
+        headers=headers
+    )
+
+
+@router.get("/readings")
+def route_export_readings(
+    start: Optional[datetime] = Query(None, description="ISO 8601 (default = end - 24h)"),
+    end: Optional[datetime] = Query(None, description="ISO 8601 (default = agora)"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson ou csv"),
+    device_id: Optional[str] = Query(None, description="Dispositivo (default = todos)"),
+    cursor: Optional[str] = Query(None, description="Cursor para retomar (next_cursor)"),
+    limit: Optional[int] = Query(None, ge=1, description="Máximo de linhas nesta resposta"),
+    gzip: bool = Query(False, description="Comprimir resposta com gzip"),
+):
+    """
+    Exporta leituras brutas em streaming, ordenadas por (timestamp, id).
+    Memória constante independente do intervalo.
+    """
+    return _export_response("readings", start, end, format, device_id, cursor, limit, gzip)
+
+
+@router.get("/features")
+def route_export_features(
+    start: Optional[datetime] = Query(None, description="ISO 8601 (default = end - 24h)"),
+    end: Optional[datetime] = Query(None, description="ISO 8601 (default = agora)"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson ou csv"),
+    device_id: Optional[str] = Query(None, description="Dispositivo (default = todos)"),
+    cursor: Optional[str] = Query(None, description="Cursor para retomar (next_cursor)"),
+    limit: Optional[int] = Query(None, ge=1, description="Máximo de linhas nesta resposta"),
+    gzip: bool = Query(False, description="Comprimir resposta com gzip"),
+):
+    """
+    Exporta features em streaming, ordenadas por (timestamp, id).
+    Memória constante independente do intervalo.
+    """
+    return _export_response("features", start, end, format, device_id, cursor, limit, gzip)
+
+
+@router.get("/bulk")
+def route_export_bulk(
+    table: str = Query("features", pattern="^(readings|features)$", description="readings ou features"),
+    start: Optional[datetime] = Query(None, description="ISO 8601 (default = end - 24h)"),
+    end: Optional[datetime] = Query(None, description="ISO 8601 (default = agora)"),
+    format: str = Query("arrow", pattern="^(arrow|parquet)$", description="arrow (IPC stream) ou parquet"),
+    device_id: Optional[str] = Query(None, description="Dispositivo (default = todos)"),
+):
+    """
+    Exportação colunar para pesquisa (pandas/pyarrow), com precisão float total.
+    Inclui dados já arquivados pela política de retenção.
+    Ex.: pd.read_feather / pyarrow.ipc.open_stream ou pd.read_parquet.
+    """
+    end_dt = (end or datetime.now()).replace(tzinfo=None)
+    start_dt = (start or end_dt - timedelta(days=1)).replace(tzinfo=None)
+    if start_dt >= end_dt:
+        raise HTTPException(status_code=400, detail="start deve ser anterior a end")
+    try:
+        arrow_schema(table)
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    filename = f"{table}_{start_dt:%Y%m%dT%H%M%S}_{end_dt:%Y%m%dT%H%M%S}.{format}"
+    return StreamingResponse(
+        stream_bulk_export(table, start_dt, end_dt, fmt=format, device_id=device_id),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
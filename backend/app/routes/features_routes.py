@@ -1,8 +1,11 @@
 # app/routes/features_routes.py
-from fastapi import APIRouter, Depends, HTTPException
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from typing import Optional
 from app.db import get_db
 from app.schemas import SensorFeatureRead, SensorFeatureBase, DailyStatsRead
+from app.services.downsampling import downsample_indices
 from app.services.features_repository import (
     get_latest_features,
     get_last_n_features,
@@ -13,6 +16,8 @@ from app.services.features_repository import (
 
 router = APIRouter(prefix="/features", tags=["Features"])
 
+MAX_LIMIT = 10000  # respostas JSON materializam tudo em memória
+
 
 @router.get("/latest", response_model=SensorFeatureRead | dict)
 def route_get_latest_feature(db: Session = Depends(get_db)):
@@ -23,12 +28,27 @@ def route_get_latest_feature(db: Session = Depends(get_db)):
 
 
 @router.get("/history", response_model=list[SensorFeatureRead])
-def route_get_feature_history(limit: int = 200, db: Session = Depends(get_db)):
-    return get_last_n_features(db, n=limit)
+def route_get_feature_history(
+    limit: int = Query(200, ge=1, le=MAX_LIMIT, description="Para volumes maiores use /export/features"),
+    max_points: Optional[int] = Query(None, ge=3, le=10000, description="Máximo de pontos (downsampling)"),
+    mode: str = Query("lttb", pattern="^(lttb|minmax)$", description="lttb ou envelope minmax"),
+    db: Session = Depends(get_db)
+):
+    rows = get_last_n_features(db, n=limit)
+    if max_points and len(rows) > max_points:
+        timestamps = np.array([r.timestamp for r in rows], dtype="datetime64[us]").astype(np.int64)
+        intensities = np.array(
+            [r.intensity if r.intensity is not None else np.nan for r in rows], dtype=np.float64
+        )
+        rows = [rows[i] for i in downsample_indices(timestamps, intensities, max_points, mode)]
+    return rows
 
 
 @router.get("/raw/latest")
-def route_get_latest_sensor_readings(limit: int = 200, db: Session = Depends(get_db)):
+def route_get_latest_sensor_readings(
+    limit: int = Query(200, ge=1, le=MAX_LIMIT, description="Para volumes maiores use /export/readings"),
+    db: Session = Depends(get_db)
+):
     rows = get_latest_sensor_readings(db, limit=limit)
     return rows
 
@@ -1,23 +1,25 @@
 # app/routes/heatmap_routes.py
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import date
 from typing import Optional
 
-from app.db import get_db
+from app.db import AsyncSessionLocal, get_async_db
+from app.services.cpu_executor import CpuExecutorSaturated, coalesce, run_cpu
 from app.services.heatmap_service import (
     get_hourly_heatmap,
     get_minute_heatmap,
-    get_amplitude_timeline
+    get_timeline_columns,
+    compute_amplitude_timeline
 )
 
 router = APIRouter(prefix="/heatmap", tags=["Heatmap"])
 
 
 @router.get("/hourly")
-def route_hourly_heatmap(
+async def route_hourly_heatmap(
     for_date: Optional[str] = Query(None, description="YYYY-MM-DD (default = today)"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Retorna heatmap de intensidade agrupado por hora (0-23).
@@ -27,13 +29,13 @@ def route_hourly_heatmap(
     else:
         dt = date.today()
     
-    return get_hourly_heatmap(db, for_date=dt)
+    return await db.run_sync(get_hourly_heatmap, for_date=dt)
 
 
 @router.get("/minute")
-def route_minute_heatmap(
+async def route_minute_heatmap(
     for_date: Optional[str] = Query(None, description="YYYY-MM-DD (default = today)"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Retorna matriz 24x60 com intensidade média por minuto.
@@ -44,7 +46,7 @@ def route_minute_heatmap(
     else:
         dt = date.today()
     
-    matrix = get_minute_heatmap(db, for_date=dt)
+    matrix = await db.run_sync(get_minute_heatmap, for_date=dt)
     
     return {
         "date": dt.isoformat(),
@@ -53,23 +55,42 @@ def route_minute_heatmap(
     }
 
 
+async def _amplitude_timeline(dt: date, bucket_minutes: int, max_points: Optional[int], mode: str):
+    # Sessão própria (não a da requisição): o resultado é compartilhado com
+    # as requisições coalescidas, como em /realtime/fft
+    async with AsyncSessionLocal() as db:
+        columns = await db.run_sync(get_timeline_columns, for_date=dt)
+    return await run_cpu("timeline", compute_amplitude_timeline, *columns,
+                         bucket_minutes, max_points, mode)
+
+
 @router.get("/timeline")
-def route_amplitude_timeline(
+async def route_amplitude_timeline(
     for_date: Optional[str] = Query(None, description="YYYY-MM-DD (default = today)"),
     bucket_minutes: int = Query(10, ge=1, le=60, description="Agrupamento em minutos"),
-    db: Session = Depends(get_db)
+    max_points: Optional[int] = Query(None, ge=3, le=10000, description="Máximo de pontos (downsampling)"),
+    mode: str = Query("lttb", pattern="^(lttb|minmax)$", description="lttb ou envelope minmax"),
 ):
     """
     Retorna timeline de amplitude ao longo do dia, agrupado em buckets.
     Útil para gráfico de área mostrando padrão diário.
+    O agrupamento percorre as features do dia em Python e roda no executor
+    de CPU; requisições simultâneas iguais compartilham o resultado.
+    Responde 503 se o executor estiver saturado.
     """
     if for_date:
         dt = date.fromisoformat(for_date)
     else:
         dt = date.today()
-    
+
+    key = ("timeline", dt, bucket_minutes, max_points, mode)
+    try:
+        timeline = await coalesce(key, lambda: _amplitude_timeline(dt, bucket_minutes, max_points, mode))
+    except CpuExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
     return {
         "date": dt.isoformat(),
         "bucket_minutes": bucket_minutes,
-        "timeline": get_amplitude_timeline(db, for_date=dt, bucket_minutes=bucket_minutes)
-    }
\ No newline at end of file
+        "timeline": timeline
+    }
@@ -0,0 +1,66 @@
+# app/routes/ingest_routes.py
+from fastapi import APIRouter, HTTPException, Query, Request
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+
+from app.db import SessionLocal
+from app.services.ingest_batch import (
+    BatchTooLarge, decompress, ingest_batch, parse_columnar, parse_ndjson,
+)
+
+router = APIRouter(prefix="/ingest", tags=["Ingest"])
+
+CONTENT_TYPES = {
+    "application/x-ndjson": parse_ndjson,
+    "application/jsonl": parse_ndjson,
+    "application/vnd.aura.columnar": parse_columnar,
+    "application/octet-stream": parse_columnar,
+}
+
+
+def _ingest(body: bytes, content_type: str, encoding: Optional[str], device_id: str,
+            boot: Optional[int], offset_ms: float):
+    parsed = CONTENT_TYPES[content_type](decompress(body, encoding))
+    db = SessionLocal()
+    try:
+        return ingest_batch(db, device_id, parsed["columns"], boot=boot,
+                            offset_ms=offset_ms, rejected=parsed["rejected"])
+    finally:
+        db.close()
+
+
+@router.post("/batch")
+async def route_ingest_batch(
+    request: Request,
+    device_id: str = Query(..., min_length=1, max_length=64, description="Dispositivo do lote"),
+    boot: Optional[int] = Query(None, ge=0, description="Boot do dispositivo (chave de duplicatas com ts_ms)"),
+    offset_ms: float = Query(0.0, description="Horário = ts_ms + offset_ms (0: ts_ms já em epoch ms)"),
+):
+    """
+    Envio em lote de um dispositivo (gateways, uploads de dados offline).
+
+    Corpo NDJSON (`Content-Type: application/x-ndjson`, uma leitura por linha
+    com ts_ms, acc_x..gyro_z e temp opcional) ou colunar binário
+    (`application/vnd.aura.columnar`, ver app/services/ingest_batch.py),
+    opcionalmente com `Content-Encoding: gzip`.
+
+    Idempotente: amostras com (device_id, boot, ts_ms) já gravados são
+    ignoradas, inclusive entre lotes concorrentes (sem boot, valem os lotes
+    enviados sem boot). Features, episódios e rollups do intervalo são atualizados.
+    """
+    content_type = (request.headers.get("content-type") or "").split(";")[0].strip().lower()
+    if content_type not in CONTENT_TYPES:
+        raise HTTPException(
+            status_code=415,
+            detail="Use Content-Type application/x-ndjson ou application/vnd.aura.columnar",
+        )
+    body = await request.body()
+    try:
+        # Decodificação, features e gravação fora do event loop
+        return await run_in_threadpool(_ingest, body, content_type,
+                                       request.headers.get("content-encoding"),
+                                       device_id, boot, offset_ms)
+    except BatchTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
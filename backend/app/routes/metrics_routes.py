@@ -0,0 +1,16 @@
+# app/routes/metrics_routes.py
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.metrics import render_prometheus
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def route_metrics():
+    """
+    Métricas no formato de exposição Prometheus (text/plain 0.0.4):
+    ingestão MQTT, commits no banco, features, episódios, rotas HTTP e WebSocket.
+    """
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,52 @@
+# app/routes/query_routes.py
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import Optional
+
+from app.db import get_db
+from app.services.query_service import DEFAULT_POINTS, MAX_POINTS, METRICS, get_series
+
+router = APIRouter(prefix="/query", tags=["Query"])
+
+MIN_SPAN_SECONDS = 10
+MAX_SPAN_DAYS = 400
+
+
+@router.get("/series")
+def route_query_series(
+    device_id: Optional[str] = Query(None, description="Dispositivo (default = todos)"),
+    start: Optional[datetime] = Query(None, description="ISO 8601 (default = end - 1h)"),
+    end: Optional[datetime] = Query(None, description="ISO 8601 (default = agora)"),
+    metrics: str = Query("intensity", description="Lista separada por vírgula: intensity,amplitude,freq,band_power"),
+    points: int = Query(DEFAULT_POINTS, ge=10, le=MAX_POINTS, description="Quantidade alvo de pontos"),
+    db: Session = Depends(get_db)
+):
+    """
+    Série temporal com resolução automática.
+    O planejador escolhe entre features brutas, rollups e arquivo para que
+    qualquer intervalo (10 s a 1 ano) retorne ~`points` pontos.
+    """
+    # Síncrona de propósito: o tier "archive" lê e agrega os arquivos .npz do
+    # retention em Python, o que travaria o event loop; no threadpool não.
+    end_dt = end or datetime.now()
+    start_dt = start or end_dt - timedelta(hours=1)
+    # Banco armazena datetimes SEM timezone
+    end_dt = end_dt.replace(tzinfo=None)
+    start_dt = start_dt.replace(tzinfo=None)
+
+    span = (end_dt - start_dt).total_seconds()
+    if span < MIN_SPAN_SECONDS:
+        raise HTTPException(status_code=400, detail=f"Intervalo mínimo é {MIN_SPAN_SECONDS}s")
+    if span > MAX_SPAN_DAYS * 86400:
+        raise HTTPException(status_code=400, detail=f"Intervalo máximo é {MAX_SPAN_DAYS} dias")
+
+    metric_list = [m.strip() for m in metrics.split(",") if m.strip()]
+    unknown = [m for m in metric_list if m not in METRICS]
+    if not metric_list or unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Métricas inválidas: {unknown}. Disponíveis: {list(METRICS)}"
+        )
+
+    return get_series(db, device_id, start_dt, end_dt, metric_list, points=points)
@@ -1,57 +1,94 @@
 # app/routes/realtime_routes.py
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 
-from app.db import get_db
+from app.db import AsyncSessionLocal, get_async_db
+from app.services.cpu_executor import CpuExecutorSaturated, coalesce, run_cpu
 from app.services.realtime_service import (
     get_latest_tremor_status,
+    get_latest_tremor_status_from_ring,
     get_realtime_series,
-    get_fft_spectrum,
+    get_realtime_series_from_ring,
+    get_fft_signal,
+    get_fft_signal_from_ring,
+    compute_fft_spectrum,
     get_sensor_health
 )
+from app.services.shm_ring import get_shm_reader
 
 router = APIRouter(prefix="/realtime", tags=["Real-time"])
 
 
 @router.get("/status")
-def route_tremor_status(db: Session = Depends(get_db)):
+async def route_tremor_status(db: AsyncSession = Depends(get_async_db)):
     """
     Retorna status atual do tremor com métricas para dashboard.
     Inclui: intensidade atual, média 30s, status qualitativo, frequência dominante.
     """
-    return get_latest_tremor_status(db)
+    ring = get_shm_reader()
+    if ring is not None:
+        return get_latest_tremor_status_from_ring(ring)
+    return await db.run_sync(get_latest_tremor_status)
 
 
 @router.get("/series")
-def route_realtime_series(
+async def route_realtime_series(
     duration_seconds: int = Query(60, ge=10, le=300, description="Duração em segundos"),
-    db: Session = Depends(get_db)
+    max_points: Optional[int] = Query(None, ge=3, le=10000, description="Máximo de pontos (downsampling)"),
+    mode: str = Query("lttb", pattern="^(lttb|minmax)$", description="lttb ou envelope minmax"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Retorna série temporal para gráfico em tempo real.
     Últimos N segundos de dados com intensidade, magnitudes e frequência.
+    Com max_points, a série é reduzida preservando os picos.
+    Workers da API leem do ring em memória compartilhada, sem consultar o banco.
     """
+    ring = get_shm_reader()
+    if ring is not None:
+        data = get_realtime_series_from_ring(ring, duration_seconds=duration_seconds,
+                                             max_points=max_points, mode=mode)
+    else:
+        data = await db.run_sync(get_realtime_series, duration_seconds=duration_seconds,
+                                 max_points=max_points, mode=mode)
     return {
         "duration_seconds": duration_seconds,
-        "data": get_realtime_series(db, duration_seconds=duration_seconds)
+        "data": data
     }
 
 
+async def _fft_spectrum(window_size: int):
+    # Sessão própria (não a da requisição): o resultado é compartilhado com
+    # as requisições coalescidas e não deve depender do ciclo de vida de uma delas
+    ring = get_shm_reader()
+    if ring is not None:
+        signal = get_fft_signal_from_ring(ring, window_size)
+    else:
+        async with AsyncSessionLocal() as db:
+            signal = await db.run_sync(get_fft_signal, window_size=window_size)
+    return await run_cpu("fft", compute_fft_spectrum, signal)
+
+
 @router.get("/fft")
-def route_fft_spectrum(
-    window_size: int = Query(100, ge=20, le=500, description="Tamanho da janela"),
-    db: Session = Depends(get_db)
+async def route_fft_spectrum(
+    window_size: int = Query(100, ge=20, le=500, description="Tamanho da janela")
 ):
     """
     Retorna espectro FFT para visualização de frequências.
     Útil para identificar tremor parkinsoniano (4-6 Hz).
+    O cálculo roda no executor de CPU; requisições simultâneas com a mesma
+    janela compartilham o resultado. Responde 503 se o executor estiver saturado.
     """
-    return get_fft_spectrum(db, window_size=window_size)
+    try:
+        return await coalesce(("fft", window_size), lambda: _fft_spectrum(window_size))
+    except CpuExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
 
 
 @router.get("/sensor-health")
-def route_sensor_health(db: Session = Depends(get_db)):
+async def route_sensor_health(db: AsyncSession = Depends(get_async_db)):
     """
     Retorna status de saúde do sensor (online/offline, última leitura, etc).
     """
-    return get_sensor_health(db)
\ No newline at end of file
+    return await db.run_sync(get_sensor_health)
\ No newline at end of file
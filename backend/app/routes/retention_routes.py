@@ -0,0 +1,42 @@
+# app/routes/retention_routes.py
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.db import get_db
+from app.services.retention_service import (
+    RETENTION_POLICY,
+    RETENTION_MAX_BATCHES,
+    apply_retention_policy,
+    rollup_resolutions,
+    rollup_watermark
+)
+
+router = APIRouter(prefix="/retention", tags=["Retention"])
+
+
+@router.get("/policy")
+def route_retention_policy(db: Session = Depends(get_db)):
+    """
+    Retorna a política de retenção/downsampling e até onde cada rollup já foi calculado.
+    """
+    watermarks = {}
+    for resolution in rollup_resolutions():
+        wm = rollup_watermark(db, resolution)
+        watermarks[str(resolution)] = wm.isoformat() if wm else None
+
+    return {
+        "policy": RETENTION_POLICY,
+        "rollup_watermarks": watermarks
+    }
+
+
+@router.post("/run")
+def route_retention_run(
+    max_batches: int = Query(RETENTION_MAX_BATCHES, ge=1, le=10000, description="Lotes por tabela"),
+    db: Session = Depends(get_db)
+):
+    """
+    Executa a política imediatamente (rollups + expiração) e retorna o relatório,
+    incluindo bytes liberados.
+    """
+    return apply_retention_policy(db, max_batches=max_batches)
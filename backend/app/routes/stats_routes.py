@@ -1,11 +1,11 @@
 # app/routes/stats_routes.py
 from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import date, datetime, timedelta
 from typing import Optional
-import traceback
+import logging
 
-from app.db import get_db
+from app.db import get_async_db
 from app.services.stats_service import (
     get_daily_stats, 
     get_weekly_stats, 
@@ -15,11 +15,13 @@ from app.services.stats_service import (
 
 router = APIRouter(prefix="/stats", tags=["Stats"])
 
+logger = logging.getLogger(__name__)
+
 
 @router.get("/daily")
-def route_stats_daily(
+async def route_stats_daily(
     for_date: Optional[str] = Query(None, description="YYYY-MM-DD (default = today)"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Retorna estatísticas do dia (avg, max, episodes_count, samples).
@@ -30,22 +32,21 @@ def route_stats_daily(
         else:
             dt = date.today()
         
-        print(f"[STATS ROUTE] Chamando get_daily_stats para {dt}")
-        result = get_daily_stats(db, for_date=dt)
-        print(f"[STATS ROUTE] Resultado: {result}")
+        logger.debug("Chamando get_daily_stats para %s", dt)
+        result = await db.run_sync(get_daily_stats, for_date=dt)
+        logger.debug("Resultado: %s", result)
         return result
         
     except Exception as e:
-        print(f"[STATS ROUTE ERROR] Erro em route_stats_daily: {e}")
-        traceback.print_exc()
+        logger.exception("Erro em route_stats_daily")
         raise HTTPException(status_code=500, detail=f"Erro ao buscar estatísticas diárias: {str(e)}")
 
 
 @router.get("/weekly")
-def route_stats_weekly(
+async def route_stats_weekly(
     end_date: Optional[str] = Query(None, description="YYYY-MM-DD (default = today)"),
     days: int = Query(7, ge=1, le=30),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Retorna estatísticas agregadas por dia para a última `days` dias (default 7).
@@ -56,23 +57,22 @@ def route_stats_weekly(
         else:
             dt = date.today()
         
-        print(f"[STATS ROUTE] Chamando get_weekly_stats: end_date={dt}, days={days}")
-        result = get_weekly_stats(db, end_date=dt, days=days)
-        print(f"[STATS ROUTE] Resultado: {len(result)} dias")
+        logger.debug("Chamando get_weekly_stats: end_date=%s, days=%s", dt, days)
+        result = await db.run_sync(get_weekly_stats, end_date=dt, days=days)
+        logger.debug("Resultado: %d dias", len(result))
         return result
         
     except Exception as e:
-        print(f"[STATS ROUTE ERROR] Erro em route_stats_weekly: {e}")
-        traceback.print_exc()
+        logger.exception("Erro em route_stats_weekly")
         raise HTTPException(status_code=500, detail=f"Erro ao buscar estatísticas semanais: {str(e)}")
 
 
 @router.get("/calendar")
-def route_stats_calendar(
+async def route_stats_calendar(
     start: Optional[str] = Query(None, description="YYYY-MM-DD"),
     end: Optional[str] = Query(None, description="YYYY-MM-DD"),
     bad_threshold: float = Query(6.0, description="limiar para considerar dia 'ruim'"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Retorna mapa diário no intervalo (default = último mês).
@@ -88,37 +88,35 @@ def route_stats_calendar(
         else:
             start_dt = end_dt - timedelta(days=30)
         
-        print(f"[STATS ROUTE] Chamando get_calendar_summary: {start_dt} até {end_dt}")
-        result = get_calendar_summary(
-            db, 
+        logger.debug("Chamando get_calendar_summary: %s até %s", start_dt, end_dt)
+        result = await db.run_sync(
+            get_calendar_summary,
             start_date=start_dt, 
             end_date=end_dt, 
             threshold_bad=bad_threshold
         )
-        print(f"[STATS ROUTE] Resultado: {len(result)} dias no calendário")
+        logger.debug("Resultado: %d dias no calendário", len(result))
         return result
         
     except Exception as e:
-        print(f"[STATS ROUTE ERROR] Erro em route_stats_calendar: {e}")
-        traceback.print_exc()
+        logger.exception("Erro em route_stats_calendar")
         raise HTTPException(status_code=500, detail=f"Erro ao buscar calendário: {str(e)}")
 
 
 @router.get("/compare")
-def route_stats_compare(
+async def route_stats_compare(
     days: int = Query(7, ge=1, le=30, description="Dias por período"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Compara período atual com período anterior (ex: esta semana vs semana passada).
     """
     try:
-        print(f"[STATS ROUTE] Chamando get_comparative_stats: days={days}")
-        result = get_comparative_stats(db, days=days)
-        print(f"[STATS ROUTE] Resultado: {result}")
+        logger.debug("Chamando get_comparative_stats: days=%s", days)
+        result = await db.run_sync(get_comparative_stats, days=days)
+        logger.debug("Resultado: %s", result)
         return result
         
     except Exception as e:
-        print(f"[STATS ROUTE ERROR] Erro em route_stats_compare: {e}")
-        traceback.print_exc()
+        logger.exception("Erro em route_stats_compare")
         raise HTTPException(status_code=500, detail=f"Erro ao comparar períodos: {str(e)}")
\ No newline at end of file
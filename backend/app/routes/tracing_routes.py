@@ -0,0 +1,28 @@
+# app/routes/tracing_routes.py
+from fastapi import APIRouter, Query
+
+from app.services.ingest_dedup import get_sequence_report
+from app.services.tracing_service import get_latency_report
+
+router = APIRouter(prefix="/tracing", tags=["Tracing"])
+
+
+@router.get("/latency")
+def route_tracing_latency(recent: int = Query(20, ge=0, le=200)):
+    """
+    Latência ponta a ponta amostrada: dispositivo → recebido → decodificado →
+    persistido → features → broadcast (WebSocket), com offset de relógio por dispositivo.
+    Quantis acima do último bucket vêm null (ver over_max). broadcast só é
+    medido para leituras amostradas que o /ws deste processo enviou (ver
+    app/services/tracing_service.py).
+    """
+    return get_latency_report(recent=recent)
+
+
+@router.get("/sequence")
+def route_tracing_sequence():
+    """
+    Sequência por dispositivo vista pela ingestão: boot atual, último ts_ms,
+    duplicatas descartadas, amostras faltando e chegadas fora de ordem.
+    """
+    return get_sequence_report()
@@ -10,6 +10,7 @@ from typing import Optional
 
 class SensorReadingBase(BaseModel):
     """Schema base para leituras do sensor."""
+    device_id: Optional[str] = None
     timestamp: Optional[datetime] = None
     acc_x: Optional[float] = None
     acc_y: Optional[float] = None
@@ -35,6 +36,7 @@ class SensorReadingRead(SensorReadingBase):
 
 class SensorFeatureBase(BaseModel):
     """Schema base para features processadas."""
+    device_id: Optional[str] = None
     timestamp: Optional[datetime] = None
     
     # Magnitudes
@@ -53,6 +55,7 @@ class SensorFeatureBase(BaseModel):
     # Métricas derivadas
     intensity: Optional[float] = Field(None, ge=0, le=10)
     freq_dominant: Optional[float] = None
+    band_power: Optional[float] = None
     tremor_score: Optional[float] = None
 
 
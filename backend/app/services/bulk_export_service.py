@@ -0,0 +1,211 @@
+# app/services/bulk_export_service.py
+import io
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+from sqlalchemy import DateTime, Float, Integer, select, tuple_
+
+from app.db import engine
+from app.services.export_service import EXPORT_TABLES
+from app.services.retention_service import iter_archive
+
+BULK_FORMATS = ("arrow", "parquet")
+BULK_BATCH_ROWS = 65536  # linhas por RecordBatch / página keyset
+
+# Nome da tabela na API de export → nome da tabela arquivada
+_ARCHIVE_TABLES = {
+    "readings": "sensor_readings",
+    "features": "sensor_features",
+}
+
+
+def _require_pyarrow():
+    """pyarrow é dependência opcional: só é exigido por este export."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("pyarrow não instalado (pip install pyarrow)") from e
+    return pa, pq
+
+
+def arrow_schema(table: str):
+    """Schema Arrow com precisão total a partir das colunas do modelo."""
+    pa, _ = _require_pyarrow()
+    fields = []
+    for col in EXPORT_TABLES[table].__table__.columns:
+        if isinstance(col.type, DateTime):
+            arrow_type = pa.timestamp("us")
+        elif isinstance(col.type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(col.type, Float):
+            arrow_type = pa.float64()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(col.name, arrow_type, nullable=not col.primary_key))
+    return pa.schema(fields)
+
+
+# ============================================================
+# FONTES COLUNARES
+# ============================================================
+
+def _driver_value(value: Any) -> Any:
+    """Valores de parâmetro no mesmo formato que o SQLAlchemy grava no SQLite."""
+    if isinstance(value, datetime) and engine.dialect.name == "sqlite":
+        return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+    return value
+
+
+def _db_batches(table: str, start_dt: datetime, end_dt: datetime,
+                device_id: Optional[str], schema) -> Iterator[Any]:
+    """
+    Lê do banco com SQL de driver (exec_driver_sql) em páginas keyset limitadas
+    e monta cada coluna direto em arrays Arrow, sem instanciar objetos ORM.
+    Passa pelo Connection (não pelo cursor cru) para os eventos do engine,
+    como a captura do benchmarks.query_plans, verem a consulta.
+    """
+    pa, _ = _require_pyarrow()
+    model = EXPORT_TABLES[table]
+    columns = list(model.__table__.columns)
+    ts_index = [c.name for c in columns].index("timestamp")
+    id_index = [c.name for c in columns].index("id")
+
+    cursor_key = None
+    with engine.connect() as conn:
+        while True:
+            stmt = (
+                select(*columns)
+                .where(model.timestamp >= start_dt, model.timestamp < end_dt)
+                .order_by(model.timestamp, model.id)
+                .limit(BULK_BATCH_ROWS)
+            )
+            if device_id:
+                stmt = stmt.where(model.device_id == device_id)
+            if cursor_key is not None:
+                stmt = stmt.where(tuple_(model.timestamp, model.id) > tuple_(*cursor_key))
+
+            compiled = stmt.compile(dialect=engine.dialect)
+            params = compiled.construct_params()
+            if compiled.positiontup:
+                params = tuple(_driver_value(params[name]) for name in compiled.positiontup)
+            else:
+                params = {k: _driver_value(v) for k, v in params.items()}
+
+            rows = conn.exec_driver_sql(str(compiled), params).all()
+            conn.commit()  # encerra a transação de leitura entre páginas
+            if not rows:
+                break
+
+            values = list(zip(*rows))
+            arrays = []
+            for col, field, data in zip(columns, schema, values):
+                if pa.types.is_timestamp(field.type):
+                    # SQLite devolve texto ISO; NumPy converte a coluna inteira de uma vez
+                    parsed = np.array(data, dtype="datetime64[us]")
+                    arrays.append(pa.array(parsed, type=field.type, from_pandas=True))
+                else:
+                    arrays.append(pa.array(data, type=field.type))
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+            if len(rows) < BULK_BATCH_ROWS:
+                break
+            last = rows[-1]
+            cursor_key = (last[ts_index], last[id_index])
+
+
+def _archive_batches(table: str, start_dt: datetime, end_dt: datetime,
+                     device_id: Optional[str], schema) -> Iterator[Any]:
+    """Converte os arquivos colunares (.npz) do retention em RecordBatches."""
+    pa, _ = _require_pyarrow()
+    for chunk in iter_archive(_ARCHIVE_TABLES[table], start_dt, end_dt, device_id=device_id):
+        arrays = []
+        for field in schema:
+            data = chunk[field.name]
+            if pa.types.is_timestamp(field.type):
+                arrays.append(pa.array(data, type=pa.timestamp("ms")).cast(field.type))
+            elif pa.types.is_string(field.type):
+                arrays.append(pa.array(data.astype(str), type=field.type))
+            else:
+                # Inteiros anuláveis são arquivados como float com NaN
+                arrays.append(pa.array(data, from_pandas=True).cast(field.type))
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def iter_record_batches(table: str, start_dt: datetime, end_dt: datetime,
+                        device_id: Optional[str] = None) -> Iterator[Any]:
+    """RecordBatches do intervalo: primeiro o que já foi arquivado, depois o banco."""
+    schema = arrow_schema(table)
+    yield from _archive_batches(table, start_dt, end_dt, device_id, schema)
+    yield from _db_batches(table, start_dt, end_dt, device_id, schema)
+
+
+# ============================================================
+# ESCRITA
+# ============================================================
+
+class _ChunkSink(io.RawIOBase):
+    """Arquivo somente-escrita cujo conteúdo é drenado a cada lote (streaming HTTP)."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _open_writer(pa, pq, sink, schema, fmt: str):
+    if fmt == "parquet":
+        return pq.ParquetWriter(sink, schema, compression="zstd")
+    return pa.ipc.new_stream(sink, schema)
+
+
+def stream_bulk_export(table: str, start_dt: datetime, end_dt: datetime,
+                       fmt: str = "arrow", device_id: Optional[str] = None) -> Iterator[bytes]:
+    """Gera o corpo Arrow IPC (stream) ou Parquet em blocos, um por RecordBatch."""
+    pa, pq = _require_pyarrow()
+    schema = arrow_schema(table)
+    sink = _ChunkSink()
+    writer = _open_writer(pa, pq, sink, schema, fmt)
+    try:
+        for batch in iter_record_batches(table, start_dt, end_dt, device_id):
+            writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def write_bulk_export(path: str, table: str, start_dt: datetime, end_dt: datetime,
+                      fmt: str = "parquet", device_id: Optional[str] = None) -> Dict[str, Any]:
+    """Grava o export em arquivo local. Retorna linhas e bytes escritos."""
+    pa, pq = _require_pyarrow()
+    schema = arrow_schema(table)
+    rows = 0
+    with open(path, "wb") as f:
+        writer = _open_writer(pa, pq, f, schema, fmt)
+        try:
+            for batch in iter_record_batches(table, start_dt, end_dt, device_id):
+                writer.write_batch(batch)
+                rows += batch.num_rows
+        finally:
+            writer.close()
+        size = f.tell()
+    return {"path": path, "rows": rows, "bytes": size}
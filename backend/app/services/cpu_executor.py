@@ -0,0 +1,137 @@
+# app/services/cpu_executor.py
+"""
+Executor dedicado para trabalho de CPU das rotas analíticas (FFT, espectros,
+agregações grandes).
+
+O NumPy solta o GIL só dentro dos kernels; os laços Python em volta disputam
+o GIL com a thread do paho (ingestão a 25 Hz). Aqui esse trabalho roda num
+pool de processos separado, com:
+
+- coalescência: requisições idênticas simultâneas (mesma chave) aguardam a
+  mesma computação em vez de repeti-la;
+- controle de admissão: no máximo AURA_CPU_QUEUE_LIMIT tarefas pendentes;
+  acima disso lança CpuExecutorSaturated e a rota responde 503, em vez de
+  enfileirar sem limite e degradar a ingestão.
+
+Com AURA_CPU_WORKERS=0 o trabalho roda no threadpool padrão (útil em
+ambientes sem multiprocessing), mantendo coalescência e admissão.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from app.metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+CPU_WORKERS = int(os.getenv("AURA_CPU_WORKERS", str(min(2, os.cpu_count() or 1))))
+CPU_QUEUE_LIMIT = int(os.getenv("AURA_CPU_QUEUE_LIMIT", "16"))
+
+CPU_TASKS_PENDING = Gauge(
+    "aura_cpu_tasks_pending", "Tarefas de CPU em execução ou na fila do executor"
+)
+CPU_TASKS_REJECTED = Counter(
+    "aura_cpu_tasks_rejected", "Tarefas de CPU recusadas por fila cheia (503)", ["task"]
+)
+CPU_TASKS_COALESCED = Counter(
+    "aura_cpu_tasks_coalesced", "Requisições atendidas por uma computação já em andamento", ["task"]
+)
+CPU_TASK_SECONDS = Histogram(
+    "aura_cpu_task_seconds", "Duração das tarefas de CPU (fila + execução)", ["task"]
+)
+
+_pool: Optional[Executor] = None
+_pool_lock = threading.Lock()
+_pending = 0
+_inflight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+CPU_TASKS_PENDING.set_function(lambda: _pending)
+
+
+class CpuExecutorSaturated(Exception):
+    """Fila do executor de CPU cheia; a requisição deve ser recusada (503)."""
+
+
+def _get_pool() -> Optional[Executor]:
+    global _pool
+    if CPU_WORKERS <= 0:
+        return None  # loop.run_in_executor(None, ...) usa o threadpool padrão
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: o processo da API tem threads (paho, retenção) e fork
+                # com threads ativas pode herdar locks travados
+                _pool = ProcessPoolExecutor(
+                    max_workers=CPU_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                logger.info("Executor de CPU iniciado com %d processos", CPU_WORKERS)
+    return _pool
+
+
+async def run_cpu(task: str, fn: Callable[..., Any], *args: Any) -> Any:
+    """
+    Executa fn(*args) no pool de CPU. `fn` e os argumentos precisam ser
+    serializáveis (funções de módulo, listas/arrays). Lança
+    CpuExecutorSaturated se já houver CPU_QUEUE_LIMIT tarefas pendentes.
+    """
+    global _pending
+    if _pending >= CPU_QUEUE_LIMIT:
+        CPU_TASKS_REJECTED.labels(task=task).inc()
+        raise CpuExecutorSaturated(f"Executor de CPU saturado ({_pending} tarefas pendentes)")
+
+    # _pending só é alterado no event loop, então não precisa de lock
+    _pending += 1
+    started = time.perf_counter()
+    pool = _get_pool()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+    except BrokenProcessPool:
+        # Um processo morreu (ex.: OOM): descarta o pool para recriá-lo na próxima tarefa
+        _discard_pool(pool)
+        raise
+    finally:
+        _pending -= 1
+        CPU_TASK_SECONDS.labels(task=task).observe(time.perf_counter() - started)
+
+
+async def coalesce(key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Executa factory() uma vez por chave enquanto houver uma execução em
+    andamento; chamadas concorrentes com a mesma chave recebem o mesmo
+    resultado (ou a mesma exceção). O cancelamento de um dos chamadores não
+    cancela a computação compartilhada.
+    """
+    future = _inflight.get(key)
+    if future is not None:
+        CPU_TASKS_COALESCED.labels(task=str(key[0] if isinstance(key, tuple) else key)).inc()
+        return await asyncio.shield(future)
+
+    future = asyncio.ensure_future(factory())
+    _inflight[key] = future
+    future.add_done_callback(lambda _: _inflight.pop(key, None))
+    return await asyncio.shield(future)
+
+
+def _discard_pool(pool: Executor):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    logger.warning("Pool de CPU quebrado; será recriado")
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_cpu_executor():
+    """Encerra os processos do pool (shutdown da aplicação)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -0,0 +1,297 @@
+# app/services/device_clock.py
+"""
+Relógio dos dispositivos e buffer de reordenação (jitter) da ingestão.
+
+O timestamp de uma leitura era o horário de chegada: um lote da rede (ou uma
+reconexão) juntava dezenas de amostras no mesmo instante do servidor. Agora
+o horário vem do ts_ms do dispositivo, convertido para o relógio do servidor
+por um modelo por dispositivo (e por boot):
+
+    servidor_ms = ts_ms + offset + drift * (ts_ms - ref)
+
+O atraso de rede só soma, então os pontos (ts_ms, recebido - ts_ms) de menor
+atraso formam o envelope inferior: guarda-se o mínimo de cada balde de
+CLOCK_BUCKET_MS do dispositivo, e a cada balde fechado a reta é refeita
+(a reta abaixo dos mínimos dos últimos CLOCK_BUCKETS baldes mais próxima
+deles, ver _envelope_slope). Uma amostra abaixo da reta a rebaixa na hora.
+O horário estimado é o de envio com o trânsito mínimo da rede, como o
+horário "device" dos traces.
+
+JitterBuffer segura cada mensagem por até AURA_JITTER_BUFFER_MS e entrega
+à fila de persistência em ordem de (boot, ts_ms) por dispositivo: as janelas
+de features veem as amostras em ordem mesmo com reentregas e lotes
+embaralhados. Uma mensagem sai antes do prazo quando o dispositivo já mandou
+outra AURA_JITTER_BUFFER_MS mais nova. Chegando depois de uma mais nova já
+entregue, segue direto (conta como atrasada). AURA_JITTER_BUFFER_MS=0
+desliga o buffer.
+"""
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+JITTER_BUFFER_MS = float(os.getenv("AURA_JITTER_BUFFER_MS", "100"))
+CLOCK_BUCKET_MS = 10_000
+CLOCK_BUCKETS = 30  # 5 min de relógio do dispositivo para a reta
+CLOCK_MIN_BUCKETS_FOR_DRIFT = 3
+MAX_DRIFT = 1e-3  # 1000 ppm: acima disso é ruído do atraso, não o cristal
+
+JITTER_BUFFER_DEPTH = Gauge(
+    "aura_jitter_buffer_depth", "Mensagens retidas no buffer de reordenação"
+)
+JITTER_REORDERED = Counter(
+    "aura_jitter_reordered", "Mensagens entregues em ordem diferente da chegada"
+)
+JITTER_LATE = Counter(
+    "aura_jitter_late", "Mensagens que chegaram depois de uma mais nova já entregue"
+)
+
+
+class ClockModel:
+    """Relógio de um boot de um dispositivo. Usado só pela thread do paho."""
+
+    __slots__ = ("boot", "ref", "last_ts", "bucket", "bucket_ts", "bucket_min",
+                 "minima", "offset", "drift", "samples")
+
+    def __init__(self, boot: Optional[int], ts_ms: float, delta: float):
+        self.boot = boot
+        self.ref = ts_ms
+        self.last_ts = ts_ms
+        self.bucket = ts_ms // CLOCK_BUCKET_MS
+        self.bucket_ts, self.bucket_min = ts_ms, delta
+        self.minima: Deque[Tuple[float, float]] = deque(maxlen=CLOCK_BUCKETS)
+        self.offset = delta
+        self.drift = 0.0
+        self.samples = 1
+
+    def offset_at(self, ts_ms: float) -> float:
+        return self.offset + self.drift * (ts_ms - self.ref)
+
+    def observe(self, ts_ms: float, delta: float):
+        self.samples += 1
+        bucket = ts_ms // CLOCK_BUCKET_MS
+        if bucket > self.bucket:
+            self.minima.append((self.bucket_ts, self.bucket_min))
+            self.bucket, self.bucket_ts, self.bucket_min = bucket, ts_ms, delta
+            self._fit()
+        elif bucket == self.bucket and delta < self.bucket_min:
+            self.bucket_ts, self.bucket_min = ts_ms, delta
+        self.last_ts = max(self.last_ts, ts_ms)
+        below = self.offset_at(ts_ms) - delta
+        if below > 0:
+            self.offset -= below
+
+    def _fit(self):
+        points = [*self.minima, (self.bucket_ts, self.bucket_min)]
+        if len(points) >= CLOCK_MIN_BUCKETS_FOR_DRIFT:
+            self.drift = min(max(_envelope_slope(points), -MAX_DRIFT), MAX_DRIFT)
+        self.offset = min(y - self.drift * (x - self.ref) for x, y in points)
+
+
+def _envelope_slope(points: List[Tuple[float, float]]) -> float:
+    """
+    Inclinação da reta abaixo de todos os pontos com a menor soma das
+    distâncias verticais: a aresta da envoltória convexa inferior que cobre o
+    x médio (Moon et al., estimativa de skew de relógio). Mínimos quadrados
+    puxariam a reta para o ruído do atraso, que só existe para cima.
+    """
+    points = sorted(points)
+    hull: List[Tuple[float, float]] = []
+    for p in points:
+        while len(hull) >= 2 and _cross(hull[-2], hull[-1], p) <= 0:
+            hull.pop()
+        hull.append(p)
+    mean_x = sum(x for x, _ in points) / len(points)
+    for (x0, y0), (x1, y1) in zip(hull, hull[1:]):
+        if x1 >= mean_x and x1 > x0:
+            return (y1 - y0) / (x1 - x0)
+    return 0.0
+
+
+def _cross(o: Tuple[float, float], a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+_clocks: Dict[str, ClockModel] = {}
+
+
+def observe_device_clock(device_id: str, ts_ms: Optional[float], boot: Optional[int],
+                         received_ms: float) -> float:
+    """
+    Atualiza o relógio do dispositivo com uma mensagem e retorna o horário da
+    amostra no relógio do servidor (ms). Sem ts_ms, o horário de chegada.
+    """
+    if ts_ms is None:
+        return received_ms
+    delta = received_ms - ts_ms
+    clock = _clocks.get(device_id)
+    # Boot novo (ou, sem o controle de duplicatas, ts_ms voltando além de um balde)
+    if clock is None or boot != clock.boot or ts_ms < clock.last_ts - CLOCK_BUCKET_MS:
+        clock = _clocks[device_id] = ClockModel(boot, ts_ms, delta)
+    else:
+        clock.observe(ts_ms, delta)
+    return ts_ms + clock.offset_at(ts_ms)
+
+
+def clock_offset(device_id: str, ts_ms: Optional[float] = None) -> Optional[float]:
+    """Offset servidor - dispositivo (ms) em ts_ms (padrão: a última amostra)."""
+    clock = _clocks.get(device_id)
+    if clock is None:
+        return None
+    return clock.offset_at(clock.last_ts if ts_ms is None else ts_ms)
+
+
+def drop_device_clocks(keep: Callable[[str], bool]):
+    """Descarta o relógio de dispositivos que não passam em keep (mudaram de dono)."""
+    for device_id in [d for d in _clocks if not keep(d)]:
+        del _clocks[device_id]
+
+
+def get_clock_report() -> Dict[str, Any]:
+    return {
+        device_id: {
+            "boot": clock.boot,
+            "offset_ms": clock.offset_at(clock.last_ts),
+            "drift_ppm": clock.drift * 1e6,
+            "samples": clock.samples,
+            "last_ts_ms": clock.last_ts,
+        }
+        for device_id, clock in list(_clocks.items())
+    }
+
+
+# ============================================================
+# BUFFER DE REORDENAÇÃO
+# ============================================================
+
+Key = Tuple[int, float]  # (boot, ts_ms)
+
+
+class JitterBuffer:
+    """
+    Reordena por (boot, ts_ms) as mensagens de cada dispositivo e chama
+    release(item) em ordem. push vem da thread do paho, flush da thread do
+    buffer; a entrega acontece sob o lock para não intercalar as duas.
+    """
+
+    def __init__(self, release: Callable[[Any], None], delay_ms: float = JITTER_BUFFER_MS):
+        self.release = release
+        self.delay_ms = delay_ms
+        self._lock = threading.Lock()
+        self._heaps: Dict[str, List[Tuple[Key, int, Any]]] = {}
+        self._arrivals: Dict[str, Deque[Tuple[float, Key]]] = {}
+        self._high: Dict[str, Key] = {}
+        self._released: Dict[str, Key] = {}
+        self._order = itertools.count()
+        self._depth = 0
+
+    def depth(self) -> int:
+        return self._depth
+
+    def push(self, device_id: str, key: Key, item: Any, now_ms: float):
+        with self._lock:
+            released = self._released.get(device_id)
+            if released is not None and key <= released:
+                JITTER_LATE.inc()
+                self.release(item)
+                return
+            heap = self._heaps.setdefault(device_id, [])
+            arrivals = self._arrivals.setdefault(device_id, deque())
+            if heap and key < self._high[device_id]:
+                JITTER_REORDERED.inc()
+            heapq.heappush(heap, (key, next(self._order), item))
+            arrivals.append((now_ms, key))
+            self._high[device_id] = max(self._high.get(device_id, key), key)
+            self._depth += 1
+            self._release_ready(device_id, now_ms)
+
+    def flush(self, now_ms: float, force: bool = False):
+        """Entrega o que venceu o prazo (tudo com force)."""
+        with self._lock:
+            for device_id in list(self._heaps):
+                self._release_ready(device_id, now_ms, force)
+
+    def _release_ready(self, device_id: str, now_ms: float, force: bool = False):
+        heap = self._heaps[device_id]
+        arrivals = self._arrivals[device_id]
+        boot, high_ts = self._high[device_id]
+        limit: Key = (boot, high_ts - self.delay_ms)
+        # Mensagem que venceu o prazo sai com tudo o que vem antes dela
+        while arrivals and (force or arrivals[0][0] + self.delay_ms <= now_ms):
+            limit = max(limit, arrivals.popleft()[1])
+        while heap and heap[0][0] <= limit:
+            key, _, item = heapq.heappop(heap)
+            self._depth -= 1
+            self._released[device_id] = key
+            self.release(item)
+
+
+_buffer: Optional[JitterBuffer] = None
+_release: Optional[Callable[[Any], None]] = None
+_clock: Callable[[], float] = lambda: time.time() * 1000.0
+_stop = threading.Event()
+
+JITTER_BUFFER_DEPTH.set_function(lambda: _buffer.depth() if _buffer is not None else 0)
+
+
+def _flush_loop(buffer: JitterBuffer):
+    interval = max(buffer.delay_ms / 4, 10.0) / 1000.0
+    while not _stop.wait(interval):
+        try:
+            buffer.flush(_clock())
+        except Exception:
+            logger.exception("Erro ao liberar o buffer de reordenação")
+
+
+def start_jitter_buffer(release: Callable[[Any], None],
+                        clock: Optional[Callable[[], float]] = None):
+    """
+    Liga o buffer na frente de release (a fila de persistência). clock (ms)
+    é o relógio dos prazos, o mesmo de received_ms: o de parede, ou o da
+    gravação numa reprodução (app/services/ingest_sources.py).
+    """
+    global _buffer, _release, _clock
+    _release = release
+    _clock = clock or (lambda: time.time() * 1000.0)
+    if JITTER_BUFFER_MS <= 0:
+        return
+    _stop.clear()
+    _buffer = JitterBuffer(release)
+    threading.Thread(target=_flush_loop, args=(_buffer,), daemon=True,
+                     name="aura-jitter-buffer").start()
+    logger.info("Buffer de reordenação: %.0f ms", JITTER_BUFFER_MS)
+
+
+def buffer_reading(device_id: str, payload: Dict[str, Any], trace: Optional[Dict[str, Any]],
+                   sampled_at: datetime, received_ms: float):
+    """Entrega a leitura em ordem de ts_ms (direto, sem ts_ms ou com o buffer desligado)."""
+    item = (payload, trace, sampled_at)
+    ts_ms = payload.get("ts_ms")
+    if _buffer is None or not isinstance(ts_ms, (int, float)):
+        _release(item)
+        return
+    _buffer.push(device_id, (payload.get("boot") or 0, ts_ms), item, received_ms)
+
+
+def flush_jitter_buffer():
+    """Entrega tudo o que está retido, sem desligar o buffer (fim de uma reprodução)."""
+    if _buffer is not None:
+        _buffer.flush(_clock(), force=True)
+
+
+def stop_jitter_buffer():
+    """Entrega tudo o que está retido (antes de parar a fila)."""
+    global _buffer
+    _stop.set()
+    if _buffer is not None:
+        _buffer.flush(_clock(), force=True)
+        _buffer = None
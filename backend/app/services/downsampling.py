@@ -0,0 +1,117 @@
+# app/services/downsampling.py
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+DOWNSAMPLE_MODES = ("lttb", "minmax")
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: escolhe `n_out` índices preservando a forma
+    da série (picos de tremor não são suavizados como em uma média).
+
+    Médias dos buckets e áreas são calculadas com NumPy; apenas a escolha do
+    ponto âncora (que depende do ponto escolhido no bucket anterior) percorre
+    os buckets.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # NaN não pode vencer a comparação de áreas
+    y = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0.0, y)
+
+    # Fronteiras dos n_out - 2 buckets internos (primeiro e último pontos são fixos)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+
+    # Média de cada bucket (usada como terceiro vértice do triângulo)
+    counts = ends - starts
+    avg_x = np.add.reduceat(x[:n - 1], starts) / counts
+    avg_y = np.add.reduceat(y[:n - 1], starts) / counts
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    anchor = 0
+    for i in range(n_out - 2):
+        s, e = starts[i], ends[i]
+        ax, ay = x[anchor], y[anchor]
+        area = np.abs(
+            (ax - next_x[i]) * (y[s:e] - ay) - (ax - x[s:e]) * (next_y[i] - ay)
+        )
+        anchor = s + int(np.argmax(area))
+        out[i + 1] = anchor
+    return out
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Envelope min/max: para cada bucket mantém o índice do mínimo e do máximo
+    (2 pontos por bucket), totalmente vetorizado. Bucket só com NaN mantém as
+    bordas (primeiro e último índice): o trecho sem dados continua no eixo x
+    e uma série toda NaN não some.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    n_buckets = max(n_out // 2, 1)
+    if n_out >= n:
+        return np.arange(n)
+
+    size = int(np.ceil(n / n_buckets))
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = y
+    grid = padded.reshape(n_buckets, size)
+
+    missing = np.isnan(grid)
+    empty_rows = np.all(missing, axis=1)
+    offsets = np.arange(n_buckets) * size
+
+    # Linhas só com NaN: argmin/argmax dão 0 (borda inicial); a final vai no máximo
+    filled_min = np.where(missing, np.inf, grid)
+    filled_max = np.where(missing, -np.inf, grid)
+    idx_min = offsets + np.argmin(filled_min, axis=1)
+    idx_max = np.where(empty_rows, np.minimum(offsets + size - 1, n - 1),
+                       offsets + np.argmax(filled_max, axis=1))
+    # Buckets inteiros de padding (n pequeno perto de n_buckets) ficam de fora
+    indices = np.concatenate([idx_min, idx_max])
+    return np.unique(indices[indices < n])
+
+
+def downsample_indices(x: np.ndarray, y: np.ndarray, max_points: Optional[int],
+                       mode: str = "lttb") -> np.ndarray:
+    """Índices a manter para no máximo `max_points` pontos (None = todos)."""
+    n = len(y)
+    if not max_points or n <= max_points:
+        return np.arange(n)
+    if mode == "minmax":
+        return minmax_indices(y, max_points)
+    return lttb_indices(x, y, max_points)
+
+
+def downsample_records(records: List[Dict[str, Any]], max_points: Optional[int],
+                       y_key: str, x_key: str = "timestamp",
+                       mode: str = "lttb") -> List[Dict[str, Any]]:
+    """
+    Reduz uma lista de pontos (dicts já serializados) escolhendo os índices
+    pela série `y_key`. `x_key` pode ser ISO 8601 ou numérico.
+    """
+    if not max_points or len(records) <= max_points:
+        return records
+    x = _as_x(r[x_key] for r in records)
+    y = np.array([r.get(y_key) if r.get(y_key) is not None else np.nan for r in records],
+                 dtype=np.float64)
+    return [records[i] for i in downsample_indices(x, y, max_points, mode)]
+
+
+def _as_x(values: Sequence[Any]) -> np.ndarray:
+    """Converte o eixo x (ISO 8601, datetime ou número) em float."""
+    values = list(values)
+    if values and isinstance(values[0], (str, datetime)):
+        return np.array(values, dtype="datetime64[us]").astype(np.int64).astype(np.float64)
+    return np.asarray(values, dtype=np.float64)
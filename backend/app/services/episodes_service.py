@@ -1,15 +1,58 @@
 # app/services/episodes_service.py
+import logging
+import numpy as np
 from datetime import datetime, timedelta, date
 from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_
 from app.models import SensorFeature, Episode
+from app.metrics import EPISODES_DETECTED
 
 # Configuração para detecção de episódios
 EPISODE_THRESHOLD = 6.0
 EPISODE_MIN_DURATION_SEC = 5
 EPISODE_GAP_TOLERANCE_SEC = 3
 
+logger = logging.getLogger(__name__)
+
+
+def find_episodes(times_s: np.ndarray, intensity: np.ndarray,
+                  freq_dominant: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+    """
+    Mesmo agrupamento de detect_and_save_episodes, vetorizado para séries já
+    em memória (ordenadas no tempo, `times_s` em segundos): amostras acima do
+    threshold separadas por até EPISODE_GAP_TOLERANCE_SEC formam um episódio,
+    mantido se durar pelo menos EPISODE_MIN_DURATION_SEC.
+
+    Retorna índices de início/fim na série original, intensidade máxima,
+    frequência da primeira amostra e número de amostras.
+    """
+    times_s = np.asarray(times_s, dtype=np.float64)
+    intensity = np.asarray(intensity, dtype=np.float64)
+    above = np.flatnonzero(intensity >= EPISODE_THRESHOLD)
+    if not len(above):
+        return []
+
+    breaks = np.flatnonzero(np.diff(times_s[above]) > EPISODE_GAP_TOLERANCE_SEC) + 1
+    starts = np.concatenate([[0], breaks])
+    ends = np.concatenate([breaks, [len(above)]]) - 1
+    maxima = np.maximum.reduceat(intensity[above], starts)
+
+    episodes = []
+    for s, e, peak in zip(starts, ends, maxima):
+        first, last = above[s], above[e]
+        if times_s[last] - times_s[first] < EPISODE_MIN_DURATION_SEC:
+            continue
+        freq = freq_dominant[first] if freq_dominant is not None else None
+        episodes.append({
+            "start_index": int(first),
+            "end_index": int(last),
+            "max_intensity": float(peak),
+            "freq_dominant": None if freq is None or np.isnan(freq) else float(freq),
+            "samples": int(e - s + 1),
+        })
+    return episodes
+
 
 def detect_and_save_episodes(db: Session, lookback_minutes: int = 5):
     """
@@ -30,10 +73,10 @@ def detect_and_save_episodes(db: Session, lookback_minutes: int = 5):
     )
     
     if not features:
-        print(f"[EPISODES] Nenhuma feature acima de {EPISODE_THRESHOLD} nos últimos {lookback_minutes} minutos")
+        logger.debug("Nenhuma feature acima de %s nos últimos %s minutos", EPISODE_THRESHOLD, lookback_minutes)
         return []
     
-    print(f"[EPISODES] Encontradas {len(features)} features acima do threshold")
+    logger.debug("Encontradas %d features acima do threshold", len(features))
     
     # Agrupar features em episódios
     episodes = []
@@ -78,7 +121,7 @@ def detect_and_save_episodes(db: Session, lookback_minutes: int = 5):
     if duration >= EPISODE_MIN_DURATION_SEC:
         episodes.append(current_episode)
     
-    print(f"[EPISODES] {len(episodes)} episódios detectados")
+    logger.debug("%d episódios detectados", len(episodes))
     
     # Salvar no banco
     saved_episodes = []
@@ -104,13 +147,66 @@ def detect_and_save_episodes(db: Session, lookback_minutes: int = 5):
     
     if saved_episodes:
         db.commit()
-        print(f"[EPISODES] ✅ {len(saved_episodes)} novos episódios salvos")
+        EPISODES_DETECTED.inc(len(saved_episodes))
+        logger.info("%d novos episódios salvos", len(saved_episodes))
     else:
-        print(f"[EPISODES] Nenhum episódio novo para salvar")
-    
+        logger.debug("Nenhum episódio novo para salvar")
+
     return saved_episodes
 
 
+def save_episodes_in_range(db: Session, device_id: str, start_dt: datetime,
+                           end_dt: datetime) -> int:
+    """
+    Detecta (find_episodes) e salva os episódios de um dispositivo no
+    intervalo [start_dt, end_dt], ex.: leituras enviadas em lote. A busca se
+    estende EPISODE_GAP_TOLERANCE_SEC para os dois lados, para emendar com as
+    features vizinhas já gravadas. Como em detect_and_save_episodes, um
+    episódio com o mesmo início e fim de um existente não é repetido.
+    """
+    margin = timedelta(seconds=EPISODE_GAP_TOLERANCE_SEC)
+    rows = (
+        db.query(SensorFeature.timestamp, SensorFeature.intensity, SensorFeature.freq_dominant)
+        .filter(
+            SensorFeature.device_id == device_id,
+            SensorFeature.timestamp >= start_dt - margin,
+            SensorFeature.timestamp <= end_dt + margin,
+            SensorFeature.intensity >= EPISODE_THRESHOLD,
+        )
+        .order_by(SensorFeature.timestamp)
+        .all()
+    )
+    if not rows:
+        return 0
+    times = [r.timestamp for r in rows]
+    origin = times[0]
+    times_s = np.array([(t - origin).total_seconds() for t in times])
+    freq = np.array([np.nan if r.freq_dominant is None else r.freq_dominant for r in rows])
+
+    saved = 0
+    for ep in find_episodes(times_s, np.array([r.intensity for r in rows]), freq):
+        ep_start, ep_end = times[ep["start_index"]], times[ep["end_index"]]
+        exists = db.query(Episode.id).filter(
+            Episode.start_time == ep_start, Episode.end_time == ep_end
+        ).first()
+        if exists:
+            continue
+        db.add(Episode(
+            start_time=ep_start,
+            end_time=ep_end,
+            duration=(ep_end - ep_start).total_seconds() / 60.0,
+            max_intensity=ep["max_intensity"],
+            freq_dominant=ep["freq_dominant"],
+            description=f"Episódio com {ep['samples']} leituras",
+        ))
+        saved += 1
+    if saved:
+        db.commit()
+        EPISODES_DETECTED.inc(saved)
+        logger.info("%d novos episódios salvos (%s)", saved, device_id)
+    return saved
+
+
 def get_episodes_by_date(db: Session, for_date: date) -> List[Dict[str, Any]]:
     """Retorna todos os episódios de um dia específico."""
     start_dt = datetime(for_date.year, for_date.month, for_date.day, 0, 0, 0)
@@ -126,7 +222,7 @@ def get_episodes_by_date(db: Session, for_date: date) -> List[Dict[str, Any]]:
         .all()
     )
     
-    print(f"[EPISODES] Encontrados {len(episodes)} episódios para {for_date}")
+    logger.debug("Encontrados %d episódios para %s", len(episodes), for_date)
     
     return [
         {
@@ -156,7 +252,7 @@ def get_episodes_summary(db: Session, start_date: date, end_date: date) -> Dict[
         .all()
     )
     
-    print(f"[EPISODES] Resumo: {len(episodes)} episódios entre {start_date} e {end_date}")
+    logger.debug("Resumo: %d episódios entre %s e %s", len(episodes), start_date, end_date)
     
     if not episodes:
         return {
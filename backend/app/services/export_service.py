@@ -0,0 +1,179 @@
+# app/services/export_service.py
+import base64
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select, tuple_
+
+from app.db import SessionLocal
+from app.models import SensorFeature, SensorReading
+
+EXPORT_TABLES = {
+    "readings": SensorReading,
+    "features": SensorFeature,
+}
+EXPORT_FORMATS = ("ndjson", "csv")
+
+EXPORT_PAGE_SIZE = 10000  # linhas por consulta (cada página é uma transação curta)
+EXPORT_YIELD_PER = 1000  # linhas materializadas por vez dentro da página
+EXPORT_FLUSH_BYTES = 64 * 1024  # tamanho dos blocos enviados ao cliente
+
+
+# ============================================================
+# CURSOR (keyset em (timestamp, id))
+# ============================================================
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Token opaco para retomar a exportação após (timestamp, id)."""
+    raw = f"{timestamp.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[datetime, int]:
+    """Inverso de encode_cursor. Lança ValueError se o token for inválido."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        ts, row_id = base64.urlsafe_b64decode(padded).decode("utf-8").split("|")
+        return datetime.fromisoformat(ts), int(row_id)
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {token}") from e
+
+
+# ============================================================
+# LEITURA EM PÁGINAS
+# ============================================================
+
+def export_columns(table: str) -> List[str]:
+    return [c.name for c in EXPORT_TABLES[table].__table__.columns]
+
+
+def iter_rows(table: str, start_dt: datetime, end_dt: datetime,
+              device_id: Optional[str] = None,
+              cursor: Optional[Tuple[datetime, int]] = None,
+              limit: Optional[int] = None) -> Iterator[Any]:
+    """
+    Itera as linhas de `table` em ordem (timestamp, id) com memória constante.
+
+    Cada página é uma consulta keyset curta com yield_per, e a transação é
+    encerrada entre páginas para não segurar o lock de leitura do SQLite
+    enquanto o cliente consome a resposta.
+    """
+    model = EXPORT_TABLES[table]
+    columns = list(model.__table__.columns)
+    remaining = limit
+
+    db = SessionLocal()
+    try:
+        while remaining is None or remaining > 0:
+            page_size = EXPORT_PAGE_SIZE if remaining is None else min(EXPORT_PAGE_SIZE, remaining)
+            stmt = (
+                select(*columns)
+                .where(model.timestamp >= start_dt, model.timestamp < end_dt)
+                .order_by(model.timestamp, model.id)
+                .limit(page_size)
+                .execution_options(yield_per=EXPORT_YIELD_PER)
+            )
+            if device_id:
+                stmt = stmt.where(model.device_id == device_id)
+            if cursor is not None:
+                stmt = stmt.where(tuple_(model.timestamp, model.id) > tuple_(*cursor))
+
+            count = 0
+            last = None
+            for row in db.execute(stmt):
+                count += 1
+                last = row
+                yield row
+            db.commit()  # encerra a transação de leitura desta página
+
+            if remaining is not None:
+                remaining -= count
+            if count < page_size:
+                break
+            cursor = (last.timestamp, last.id)
+    finally:
+        db.close()
+
+
+# ============================================================
+# SERIALIZAÇÃO
+# ============================================================
+
+def _json_value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _ndjson_lines(rows: Iterator[Any], columns: List[str]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps({c: _json_value(v) for c, v in zip(columns, row)}) + "\n"
+
+
+def _csv_lines(rows: Iterator[Any], columns: List[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_json_value(v) for v in row])
+        if buffer.tell() >= EXPORT_FLUSH_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_export(table: str, start_dt: datetime, end_dt: datetime,
+                  fmt: str = "ndjson", device_id: Optional[str] = None,
+                  cursor: Optional[str] = None, limit: Optional[int] = None,
+                  gzip: bool = False) -> Iterator[bytes]:
+    """
+    Gera o corpo da exportação em blocos de bytes (NDJSON ou CSV, opcionalmente gzip).
+
+    Quando `limit` interrompe a exportação, a última linha traz o cursor para
+    continuar: {"next_cursor": "..."} em NDJSON ou "# next_cursor=..." em CSV.
+    """
+    columns = export_columns(table)
+    state: Dict[str, Any] = {"count": 0, "last": None}
+
+    def tracked(rows):
+        for row in rows:
+            state["count"] += 1
+            state["last"] = row
+            yield row
+
+    rows = tracked(iter_rows(
+        table, start_dt, end_dt, device_id=device_id,
+        cursor=decode_cursor(cursor) if cursor else None, limit=limit,
+    ))
+    lines = _csv_lines(rows, columns) if fmt == "csv" else _ndjson_lines(rows, columns)
+
+    def with_trailer():
+        yield from lines
+        if limit is not None and state["count"] >= limit and state["last"] is not None:
+            token = encode_cursor(state["last"].timestamp, state["last"].id)
+            if fmt == "csv":
+                yield f"# next_cursor={token}\n"
+            else:
+                yield json.dumps({"next_cursor": token}) + "\n"
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None  # 31 = formato gzip
+    pending: List[str] = []
+    pending_size = 0
+    for text in with_trailer():
+        pending.append(text)
+        pending_size += len(text)
+        if pending_size >= EXPORT_FLUSH_BYTES:
+            data = "".join(pending).encode("utf-8")
+            pending, pending_size = [], 0
+            chunk = compressor.compress(data) if compressor else data
+            if chunk:
+                yield chunk
+
+    data = "".join(pending).encode("utf-8")
+    if compressor:
+        yield compressor.compress(data) + compressor.flush()
+    elif data:
+        yield data
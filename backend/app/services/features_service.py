@@ -1,18 +1,53 @@
 # app/services/features_service.py
+import logging
+import os
+import time
 import numpy as np
 from datetime import datetime
-from typing import List
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 from sqlalchemy.orm import Session
-from app.models import SensorFeature, SensorReading
+from app.models import SensorFeature, SensorReading, DEFAULT_DEVICE_ID
+from app.metrics import DB_COMMIT_SECONDS, FEATURE_COMPUTE_SECONDS
+from app.services.resampling import StreamResampler, resample_batch
+from app.services.shm_ring import write_feature
+from app.services.tracing_service import mark_reading
 
 # Config
 WINDOW_SIZE = 25
 MIN_FFT_SIZE = 10
+SAMPLING_RATE = 25  # Hz
+TREMOR_BAND = (4.0, 6.0)  # Hz - tremor parkinsoniano clássico
 intensity_scale_factor = 2.5
 
-# buffers em memória para janelas deslizantes
-acc_buffer: List[float] = []
-gyro_buffer: List[float] = []
+# As janelas são montadas numa grade uniforme de SAMPLING_RATE no relógio do
+# dispositivo (ts_ms), não na ordem de chegada: o espaçamento real das
+# amostras varia e a FFT supõe período fixo (app/services/resampling.py).
+# Lacuna maior que AURA_RESAMPLE_MAX_GAP_MS recomeça a janela; a grade é
+# reancorada numa amostra a cada GRID_ANCHOR_MS.
+GRID_PERIOD_MS = 1000.0 / SAMPLING_RATE
+GRID_ANCHOR_MS = 10_000
+RESAMPLE_MAX_GAP_MS = float(os.getenv("AURA_RESAMPLE_MAX_GAP_MS", "1000"))
+
+logger = logging.getLogger(__name__)
+
+# buffers em memória para janelas deslizantes (um par por dispositivo)
+acc_buffers: Dict[str, List[float]] = {}
+gyro_buffers: Dict[str, List[float]] = {}
+_resamplers: Dict[str, StreamResampler] = {}
+
+# Com ingestão particionada, um dispositivo pode chegar com histórico já
+# processado por outra instância: a janela é reconstruída a partir do banco
+seed_windows_from_db = False
+
+# Fidelidade das features, ajustada pelo controle de sobrecarga
+# (app/services/overload_controller.py):
+#   full        - todas as features a cada amostra
+#   no_spectral - sem frequência dominante e potência na banda (FFT)
+#   hop         - como no_spectral, mas só a cada FIDELITY_HOP amostras do dispositivo
+#   minimal     - como hop, só magnitudes, amplitudes e intensidade
+fidelity_mode = "full"
+FIDELITY_HOP = int(os.getenv("AURA_OVERLOAD_HOP", "5"))
+_hop_counters: Dict[str, int] = {}
 
 
 def vector_magnitude(x: float, y: float, z: float) -> float:
@@ -27,7 +62,7 @@ def compute_amplitude(series: List[float]) -> float:
     return float(np.max(series) - np.min(series))
 
 
-def compute_dominant_frequency(series: List[float], sampling_rate=25) -> float | None:
+def compute_dominant_frequency(series: List[float], sampling_rate=SAMPLING_RATE) -> float | None:
     """Calcula frequência dominante via FFT."""
     if len(series) < MIN_FFT_SIZE:
         return None
@@ -40,6 +75,21 @@ def compute_dominant_frequency(series: List[float], sampling_rate=25) -> float |
     return float(freqs[idx])
 
 
+def compute_band_power(series: List[float], sampling_rate=SAMPLING_RATE,
+                       band=TREMOR_BAND) -> float | None:
+    """Calcula potência média do sinal (sem componente DC) dentro da banda de tremor."""
+    if len(series) < MIN_FFT_SIZE:
+        return None
+    signal = np.asarray(series, dtype=float)
+    signal = signal - signal.mean()
+    power = np.abs(np.fft.rfft(signal)) ** 2 / len(signal) ** 2
+    freqs = np.fft.rfftfreq(len(signal), d=1.0 / sampling_rate)
+    mask = (freqs >= band[0]) & (freqs <= band[1])
+    if not mask.any():
+        return None
+    return float(np.sum(power[mask]))
+
+
 def compute_intensity(acc_amp: float, gyro_amp: float) -> float:
     """Calcula intensidade normalizada de 0 a 10."""
     raw = (acc_amp + gyro_amp) * intensity_scale_factor
@@ -47,6 +97,186 @@ def compute_intensity(acc_amp: float, gyro_amp: float) -> float:
     return float(scaled)
 
 
+def vector_magnitudes(x: np.ndarray, y: np.ndarray, z: np.ndarray) -> np.ndarray:
+    """Magnitude vetorial de arrays (versão vetorizada de vector_magnitude)."""
+    x, y, z = (np.asarray(v, dtype=np.float64) for v in (x, y, z))
+    return np.sqrt(x**2 + y**2 + z**2)
+
+
+def compute_features_batch(acc_mag: np.ndarray, gyro_mag: np.ndarray,
+                           acc_history: Optional[List[float]] = None,
+                           gyro_history: Optional[List[float]] = None,
+                           sampling_rate=SAMPLING_RATE) -> Dict[str, np.ndarray]:
+    """
+    Versão vetorizada de process_new_reading para uma sequência de amostras
+    de um dispositivo: mesma janela deslizante (até WINDOW_SIZE amostras
+    terminando em cada leitura) e mesmas fórmulas.
+
+    `acc_history`/`gyro_history` são as magnitudes anteriores (o buffer do
+    dispositivo), para a janela continuar entre lotes. Frequência e potência
+    ausentes (janela curta) vêm como NaN.
+    """
+    acc_mag = np.asarray(acc_mag, dtype=np.float64)
+    gyro_mag = np.asarray(gyro_mag, dtype=np.float64)
+    n = len(acc_mag)
+    keep = WINDOW_SIZE - 1
+    acc_prev = np.asarray((acc_history or [])[-keep:] if keep else [], dtype=np.float64)
+    gyro_prev = np.asarray((gyro_history or [])[-keep:] if keep else [], dtype=np.float64)
+    h = len(acc_prev)
+    acc_all = np.concatenate([acc_prev, acc_mag])
+    gyro_all = np.concatenate([gyro_prev, gyro_mag])
+
+    out = {name: np.full(n, np.nan) for name in (
+        "acc_mean", "acc_std", "acc_amplitude", "gyro_mean", "gyro_std",
+        "gyro_amplitude", "freq_dominant", "band_power",
+    )}
+
+    # Janelas completas: matriz (m, WINDOW_SIZE) sem cópia
+    first_full = max(h, WINDOW_SIZE - 1)
+    if first_full < h + n:
+        rows = slice(first_full - (WINDOW_SIZE - 1), h + n - (WINDOW_SIZE - 1))
+        target = slice(first_full - h, n)
+        acc_win = np.lib.stride_tricks.sliding_window_view(acc_all, WINDOW_SIZE)[rows]
+        gyro_win = np.lib.stride_tricks.sliding_window_view(gyro_all, WINDOW_SIZE)[rows]
+
+        for prefix, win in (("acc", acc_win), ("gyro", gyro_win)):
+            out[f"{prefix}_mean"][target] = win.mean(axis=1)
+            out[f"{prefix}_std"][target] = win.std(axis=1)
+            out[f"{prefix}_amplitude"][target] = win.max(axis=1) - win.min(axis=1)
+
+        if WINDOW_SIZE >= MIN_FFT_SIZE:
+            freqs = np.fft.rfftfreq(WINDOW_SIZE, d=1.0 / sampling_rate)
+            spectrum = np.abs(np.fft.rfft(acc_win, axis=1))
+            out["freq_dominant"][target] = freqs[np.argmax(spectrum[:, 1:], axis=1) + 1]
+
+            centered = acc_win - acc_win.mean(axis=1, keepdims=True)
+            power = np.abs(np.fft.rfft(centered, axis=1)) ** 2 / WINDOW_SIZE ** 2
+            mask = (freqs >= TREMOR_BAND[0]) & (freqs <= TREMOR_BAND[1])
+            if mask.any():
+                out["band_power"][target] = power[:, mask].sum(axis=1)
+
+    # Início sem histórico suficiente: janelas parciais (no máximo WINDOW_SIZE - 1)
+    for j in range(min(first_full - h, n)):
+        p = h + j
+        acc_buffer = acc_all[:p + 1].tolist()
+        gyro_buffer = gyro_all[:p + 1].tolist()
+        out["acc_mean"][j] = np.mean(acc_buffer)
+        out["acc_std"][j] = np.std(acc_buffer)
+        out["acc_amplitude"][j] = compute_amplitude(acc_buffer)
+        out["gyro_mean"][j] = np.mean(gyro_buffer)
+        out["gyro_std"][j] = np.std(gyro_buffer)
+        out["gyro_amplitude"][j] = compute_amplitude(gyro_buffer)
+        freq = compute_dominant_frequency(acc_buffer, sampling_rate)
+        power = compute_band_power(acc_buffer, sampling_rate)
+        out["freq_dominant"][j] = np.nan if freq is None else freq
+        out["band_power"][j] = np.nan if power is None else power
+
+    out["acc_magnitude"] = acc_mag
+    out["gyro_magnitude"] = gyro_mag
+    out["intensity"] = np.clip((out["acc_amplitude"] + out["gyro_amplitude"]) * intensity_scale_factor, 0, 10)
+    out["tremor_score"] = gyro_mag
+    return out
+
+
+def compute_features_resampled(ts_ms: Sequence[Optional[int]], acc_mag: np.ndarray,
+                               gyro_mag: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Versão vetorizada de process_new_reading com a reamostragem: o mesmo
+    resultado do fluxo ao vivo para a mesma sequência de leituras de um
+    dispositivo, começando com a janela vazia. As estatísticas de cada
+    leitura são as da janela que termina no último ponto da grade emitido
+    por ela; magnitudes e tremor_score são os da própria leitura.
+
+    Para continuar a janela de leituras anteriores, inclua-as no início
+    (window_history) e descarte as linhas delas. Se alguma leitura não tem
+    ts_ms, calcula sobre as amostras na ordem de chegada (como o fluxo ao
+    vivo faz com elas).
+    """
+    acc_mag = np.asarray(acc_mag, dtype=np.float64)
+    gyro_mag = np.asarray(gyro_mag, dtype=np.float64)
+    if not len(acc_mag) or any(t is None for t in ts_ms):
+        return compute_features_batch(acc_mag, gyro_mag)
+
+    (grid_acc, grid_gyro), starts, index = resample_batch(
+        ts_ms, [acc_mag, gyro_mag], GRID_PERIOD_MS, RESAMPLE_MAX_GAP_MS, GRID_ANCHOR_MS
+    )
+    bounds = [*starts.tolist(), len(grid_acc)]
+    parts = [compute_features_batch(grid_acc[a:b], grid_gyro[a:b])
+             for a, b in zip(bounds[:-1], bounds[1:])]
+    out = {name: np.concatenate([part[name] for part in parts])[index] for name in parts[0]}
+    out["acc_magnitude"] = acc_mag
+    out["gyro_magnitude"] = gyro_mag
+    out["tremor_score"] = gyro_mag
+    return out
+
+
+def _append_to_window(device_id: str, ts_ms: Optional[int], acc_mag: float,
+                      gyro_mag: float) -> Tuple[List[float], List[float]]:
+    """Acrescenta a amostra à janela do dispositivo (na grade uniforme quando há ts_ms)."""
+    acc_buffer = acc_buffers.setdefault(device_id, [])
+    gyro_buffer = gyro_buffers.setdefault(device_id, [])
+    if ts_ms is None:
+        points = [(acc_mag, gyro_mag)]
+    else:
+        resampler = _resamplers.get(device_id)
+        if resampler is None:
+            resampler = _resamplers[device_id] = StreamResampler(
+                GRID_PERIOD_MS, RESAMPLE_MAX_GAP_MS, GRID_ANCHOR_MS
+            )
+        reset, points = resampler.push(ts_ms, (acc_mag, gyro_mag))
+        if reset:
+            acc_buffer.clear()
+            gyro_buffer.clear()
+    for acc, gyro in points:
+        acc_buffer.append(acc)
+        gyro_buffer.append(gyro)
+    if len(acc_buffer) > WINDOW_SIZE:
+        del acc_buffer[:-WINDOW_SIZE]
+        del gyro_buffer[:-WINDOW_SIZE]
+    return acc_buffer, gyro_buffer
+
+
+def window_history(db: Session, device_id: str, before_id: int) -> List[SensorReading]:
+    """
+    Leituras completas anteriores a before_id (em ordem de processamento)
+    que reconstroem a janela do dispositivo: desde o início do intervalo de
+    GRID_ANCHOR_MS em que a grade da janela foi ancorada. Sem ts_ms, as
+    últimas WINDOW_SIZE - 1.
+    """
+    query = db.query(SensorReading).filter(
+        SensorReading.device_id == device_id, SensorReading.id < before_id
+    )
+    last = query.order_by(SensorReading.id.desc()).first()
+    if last is None:
+        return []
+    if last.ts_ms is None:
+        rows = query.order_by(SensorReading.id.desc()).limit(WINDOW_SIZE - 1).all()
+        rows.reverse()
+    else:
+        start = (last.ts_ms - (WINDOW_SIZE + 1) * GRID_PERIOD_MS) // GRID_ANCHOR_MS * GRID_ANCHOR_MS
+        boot = SensorReading.boot.is_(None) if last.boot is None else SensorReading.boot == last.boot
+        rows = query.filter(boot, SensorReading.ts_ms >= start).order_by(SensorReading.id).all()
+    return [r for r in rows if None not in (r.acc_x, r.acc_y, r.acc_z, r.gyro_x, r.gyro_y, r.gyro_z)]
+
+
+def seed_device_window(db: Session, device_id: str, before_id: int):
+    """Reconstrói a janela do dispositivo com as leituras anteriores a before_id."""
+    acc_buffers[device_id] = []
+    gyro_buffers[device_id] = []
+    _resamplers.pop(device_id, None)
+    for r in window_history(db, device_id, before_id):
+        _append_to_window(device_id, r.ts_ms, vector_magnitude(r.acc_x, r.acc_y, r.acc_z),
+                          vector_magnitude(r.gyro_x, r.gyro_y, r.gyro_z))
+
+
+def drop_device_windows(keep: Callable[[str], bool]):
+    """Descarta janelas de dispositivos que não passam em keep (ex.: mudaram de dono)."""
+    for device_id in [d for d in acc_buffers if not keep(d)]:
+        acc_buffers.pop(device_id, None)
+        gyro_buffers.pop(device_id, None)
+        _resamplers.pop(device_id, None)
+
+
 def process_new_reading(db: Session, reading: SensorReading):
     """Gera features completas de tremor e salva no banco."""
 
@@ -55,37 +285,49 @@ def process_new_reading(db: Session, reading: SensorReading):
               reading.gyro_x, reading.gyro_y, reading.gyro_z]
 
     if any(v is None for v in fields):
-        print(f"[FEATURES]  Ignorando leitura inválida (valores None). ID: {reading.id}")
+        logger.warning("Ignorando leitura inválida (valores None). ID: %s", reading.id)
         return
 
     try:
+        started = time.perf_counter()
+
         # Calcular magnitudes
         acc_mag = vector_magnitude(reading.acc_x, reading.acc_y, reading.acc_z)
         gyro_mag = vector_magnitude(reading.gyro_x, reading.gyro_y, reading.gyro_z)
 
-        # Atualizar buffers (janela deslizante)
-        acc_buffer.append(acc_mag)
-        gyro_buffer.append(gyro_mag)
-        
-        if len(acc_buffer) > WINDOW_SIZE:
-            acc_buffer.pop(0)
-            gyro_buffer.pop(0)
+        # Atualizar buffers (janela deslizante do dispositivo)
+        device_id = reading.device_id or DEFAULT_DEVICE_ID
+        if seed_windows_from_db and device_id not in acc_buffers:
+            seed_device_window(db, device_id, reading.id)
+        acc_buffer, gyro_buffer = _append_to_window(device_id, reading.ts_ms, acc_mag, gyro_mag)
 
-        # Calcular estatísticas sobre a janela
-        acc_arr = np.array(acc_buffer)
-        gyro_arr = np.array(gyro_buffer)
+        # Sob sobrecarga: janela atualizada, mas feature só a cada FIDELITY_HOP
+        # amostras (as demais são criadas pelo backfill)
+        mode = fidelity_mode
+        if mode in ("hop", "minimal"):
+            count = _hop_counters.get(device_id, 0)
+            _hop_counters[device_id] = count + 1
+            if count % FIDELITY_HOP:
+                return
 
-        acc_mean = float(np.mean(acc_arr))
-        acc_std = float(np.std(acc_arr))
+        # Calcular estatísticas sobre a janela
         acc_amp = compute_amplitude(acc_buffer)
-
-        gyro_mean = float(np.mean(gyro_arr))
-        gyro_std = float(np.std(gyro_arr))
         gyro_amp = compute_amplitude(gyro_buffer)
+        acc_mean = acc_std = gyro_mean = gyro_std = None
+        if mode != "minimal":
+            acc_arr = np.array(acc_buffer)
+            gyro_arr = np.array(gyro_buffer)
+            acc_mean = float(np.mean(acc_arr))
+            acc_std = float(np.std(acc_arr))
+            gyro_mean = float(np.mean(gyro_arr))
+            gyro_std = float(np.std(gyro_arr))
 
-        # Calcular intensidade e frequência
+        # Calcular intensidade e frequência (FFT só com fidelidade total)
         intensity = compute_intensity(acc_amp, gyro_amp)
-        freq_dom = compute_dominant_frequency(acc_buffer)
+        freq_dom = band_power = None
+        if mode == "full":
+            freq_dom = compute_dominant_frequency(acc_buffer)
+            band_power = compute_band_power(acc_buffer)
         
         # Tremor score simplificado
         tremor_score = gyro_mag
@@ -93,6 +335,7 @@ def process_new_reading(db: Session, reading: SensorReading):
         # Criar e salvar feature completa
         feature = SensorFeature(
             reading_id=reading.id,
+            device_id=device_id,
             timestamp=reading.timestamp,
             
             # Magnitudes
@@ -111,16 +354,23 @@ def process_new_reading(db: Session, reading: SensorReading):
             # Métricas derivadas
             intensity=intensity,
             freq_dominant=freq_dom,
+            band_power=band_power,
             tremor_score=tremor_score,
         )
 
+        FEATURE_COMPUTE_SECONDS.observe(time.perf_counter() - started)
+
         db.add(feature)
+        started = time.perf_counter()
         db.commit()
+        DB_COMMIT_SECONDS.labels(table="sensor_features").observe(time.perf_counter() - started)
         db.refresh(feature)
+        write_feature(feature)
+        mark_reading(reading.id, "features")
 
-        print(f"[FEATURES] ✅ Feature completa salva! ID={feature.id} | "
-              f"intensity={intensity:.2f} | tremor={tremor_score:.4f}")
+        logger.debug("Feature salva: id=%s intensity=%.2f tremor=%.4f",
+                     feature.id, intensity, tremor_score)
 
     except Exception as e:
-        print(f"[FEATURES]  Erro ao gerar features: {e}")
+        logger.error("Erro ao gerar features: %s", e)
         db.rollback()
\ No newline at end of file
@@ -1,9 +1,13 @@
 # app/services/heatmap_service.py
 from datetime import datetime, timedelta, date
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
 from app.models import SensorFeature
+from app.services.downsampling import downsample_records
+from app.services.retention_service import aggregate_features
 
 
 def get_hourly_heatmap(db: Session, for_date: date) -> Dict[str, Any]:
@@ -14,22 +18,10 @@ def get_hourly_heatmap(db: Session, for_date: date) -> Dict[str, Any]:
     start_dt = datetime(for_date.year, for_date.month, for_date.day)
     end_dt = start_dt + timedelta(days=1)
     
-    # Agrupar por hora
-    hour_label = func.strftime("%H", SensorFeature.timestamp).label("hour")
-    
-    results = (
-        db.query(
-            hour_label,
-            func.avg(SensorFeature.intensity).label("avg_intensity"),
-            func.max(SensorFeature.intensity).label("max_intensity"),
-            func.count(SensorFeature.id).label("samples")
-        )
-        .filter(
-            SensorFeature.timestamp >= start_dt,
-            SensorFeature.timestamp < end_dt
-        )
-        .group_by(hour_label)
-        .all()
+    # Agrupar por hora, na resolução mais fina ainda disponível (features
+    # brutas ou rollups, com as brutas depois da marca d'água)
+    results = aggregate_features(
+        db, start_dt, end_dt, lambda ts: [func.strftime("%H", ts).label("hour")]
     )
     
     # Preencher todas as 24 horas
@@ -42,11 +34,11 @@ def get_hourly_heatmap(db: Session, for_date: date) -> Dict[str, Any]:
         }
     
     for row in results:
-        hour = row.hour
+        hour = row["hour"]
         heatmap[hour] = {
-            "avg_intensity": round(row.avg_intensity, 2) if row.avg_intensity else None,
-            "max_intensity": round(row.max_intensity, 2) if row.max_intensity else None,
-            "samples": row.samples
+            "avg_intensity": round(row["avg_intensity"], 2) if row["avg_intensity"] else None,
+            "max_intensity": round(row["max_intensity"], 2) if row["max_intensity"] else None,
+            "samples": row["samples"]
         }
     
     return {
@@ -64,105 +56,105 @@ def get_minute_heatmap(db: Session, for_date: date) -> List[List[float]]:
     start_dt = datetime(for_date.year, for_date.month, for_date.day)
     end_dt = start_dt + timedelta(days=1)
     
-    # Buscar todas as features do dia
-    features = (
-        db.query(SensorFeature)
-        .filter(
-            SensorFeature.timestamp >= start_dt,
-            SensorFeature.timestamp < end_dt
-        )
-        .all()
+    # Agregar por minuto no banco, na resolução mais fina disponível
+    results = aggregate_features(
+        db, start_dt, end_dt,
+        lambda ts: [func.strftime("%H", ts).label("hour"), func.strftime("%M", ts).label("minute")],
     )
     
     # Criar matriz 24x60 zerada
     matrix = [[None for _ in range(60)] for _ in range(24)]
     
-    # Agrupar por hora e minuto
-    buckets = {}
-    for f in features:
-        if f.intensity is None:
+    for row in results:
+        if row["avg_intensity"] is None:
             continue
-        hour = f.timestamp.hour
-        minute = f.timestamp.minute
-        key = (hour, minute)
-        if key not in buckets:
-            buckets[key] = []
-        buckets[key].append(f.intensity)
-    
-    # Calcular médias
-    for (hour, minute), intensities in buckets.items():
-        matrix[hour][minute] = round(sum(intensities) / len(intensities), 2)
+        matrix[int(row["hour"])][int(row["minute"])] = round(float(row["avg_intensity"]), 2)
     
     return matrix
 
 
-def get_amplitude_timeline(db: Session, for_date: date, bucket_minutes: int = 10) -> List[Dict[str, Any]]:
+def get_amplitude_timeline(db: Session, for_date: date, bucket_minutes: int = 10,
+                           max_points: Optional[int] = None,
+                           mode: str = "lttb") -> List[Dict[str, Any]]:
     """
     Retorna timeline de amplitude ao longo do dia, agrupado em buckets de N minutos.
     Útil para gráfico de área mostrando padrão diário.
+    Com max_points, reduz os buckets preservando os picos de intensidade máxima.
+    """
+    start_dt, offsets_us, intensities, amplitudes = get_timeline_columns(db, for_date)
+    return compute_amplitude_timeline(start_dt, offsets_us, intensities, amplitudes,
+                                      bucket_minutes, max_points, mode)
+
+
+def get_timeline_columns(db: Session, for_date: date
+                         ) -> Tuple[datetime, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Colunas das features do dia para a timeline: offsets em µs desde o início
+    do dia, intensidade e amplitude (NaN onde nulas). Arrays em vez de objetos
+    ORM para a serialização barata até o executor de CPU.
     """
     start_dt = datetime(for_date.year, for_date.month, for_date.day)
     end_dt = start_dt + timedelta(days=1)
-    
-    features = (
-        db.query(SensorFeature)
-        .filter(
-            SensorFeature.timestamp >= start_dt,
-            SensorFeature.timestamp < end_dt
-        )
+
+    rows = db.execute(
+        select(SensorFeature.timestamp, SensorFeature.intensity, SensorFeature.acc_amplitude)
+        .where(SensorFeature.timestamp >= start_dt, SensorFeature.timestamp < end_dt)
         .order_by(SensorFeature.timestamp)
-        .all()
-    )
-    
-    if not features:
+    ).all()
+    if not rows:
+        empty = np.empty(0)
+        return start_dt, empty.astype(np.int64), empty, empty
+
+    timestamps, intensities, amplitudes = zip(*rows)
+    offsets_us = (np.array(timestamps, dtype="datetime64[us]")
+                  - np.datetime64(start_dt, "us")).astype(np.int64)
+    return (start_dt, offsets_us, np.array(intensities, dtype=np.float64),
+            np.array(amplitudes, dtype=np.float64))
+
+
+def compute_amplitude_timeline(start_dt: datetime, offsets_us: np.ndarray,
+                               intensities: np.ndarray, amplitudes: np.ndarray,
+                               bucket_minutes: int = 10, max_points: Optional[int] = None,
+                               mode: str = "lttb") -> List[Dict[str, Any]]:
+    """
+    Agrupa as colunas de get_timeline_columns em buckets de N minutos. Função
+    pura (sem sessão), para poder rodar no executor de CPU
+    (app.services.cpu_executor). Cada bucket começa na primeira feature a
+    N minutos ou mais do início do anterior.
+    """
+    if not len(offsets_us):
         return []
-    
-    # Agrupar em buckets
+
+    bucket_us = bucket_minutes * 60_000_000
     timeline = []
-    current_bucket = {
-        "start_time": None,
-        "intensities": [],
-        "amplitudes": []
-    }
-    
-    for f in features:
-        if current_bucket["start_time"] is None:
-            current_bucket["start_time"] = f.timestamp
-        
-        time_diff = (f.timestamp - current_bucket["start_time"]).total_seconds() / 60
-        
-        if time_diff >= bucket_minutes:
-            # Finalizar bucket atual
-            if current_bucket["intensities"]:
-                timeline.append({
-                    "timestamp": current_bucket["start_time"].isoformat(),
-                    "avg_intensity": round(sum(current_bucket["intensities"]) / len(current_bucket["intensities"]), 2),
-                    "max_intensity": round(max(current_bucket["intensities"]), 2),
-                    "avg_amplitude": round(sum(current_bucket["amplitudes"]) / len(current_bucket["amplitudes"]), 2) if current_bucket["amplitudes"] else 0,
-                    "samples": len(current_bucket["intensities"])
-                })
-            
-            # Iniciar novo bucket
-            current_bucket = {
-                "start_time": f.timestamp,
-                "intensities": [],
-                "amplitudes": []
-            }
-        
-        # Adicionar dados ao bucket atual
-        if f.intensity is not None:
-            current_bucket["intensities"].append(f.intensity)
-        if f.acc_amplitude is not None:
-            current_bucket["amplitudes"].append(f.acc_amplitude)
-    
-    # Adicionar último bucket
-    if current_bucket["intensities"]:
+
+    def close(bucket_start, bucket_intensities, bucket_amplitudes):
+        if not bucket_intensities:
+            return
         timeline.append({
-            "timestamp": current_bucket["start_time"].isoformat(),
-            "avg_intensity": round(sum(current_bucket["intensities"]) / len(current_bucket["intensities"]), 2),
-            "max_intensity": round(max(current_bucket["intensities"]), 2),
-            "avg_amplitude": round(sum(current_bucket["amplitudes"]) / len(current_bucket["amplitudes"]), 2) if current_bucket["amplitudes"] else 0,
-            "samples": len(current_bucket["intensities"])
+            "timestamp": (start_dt + timedelta(microseconds=bucket_start)).isoformat(),
+            "avg_intensity": round(sum(bucket_intensities) / len(bucket_intensities), 2),
+            "max_intensity": round(max(bucket_intensities), 2),
+            "avg_amplitude": round(sum(bucket_amplitudes) / len(bucket_amplitudes), 2) if bucket_amplitudes else 0,
+            "samples": len(bucket_intensities)
         })
-    
-    return timeline
\ No newline at end of file
+
+    bucket_start = None
+    bucket_intensities: List[float] = []
+    bucket_amplitudes: List[float] = []
+    for offset, intensity, amplitude in zip(offsets_us.tolist(), intensities.tolist(),
+                                            amplitudes.tolist()):
+        if bucket_start is None:
+            bucket_start = offset
+        elif offset - bucket_start >= bucket_us:
+            close(bucket_start, bucket_intensities, bucket_amplitudes)
+            bucket_start, bucket_intensities, bucket_amplitudes = offset, [], []
+
+        # NaN (coluna nula) não entra nas médias
+        if intensity == intensity:
+            bucket_intensities.append(intensity)
+        if amplitude == amplitude:
+            bucket_amplitudes.append(amplitude)
+
+    close(bucket_start, bucket_intensities, bucket_amplitudes)
+    return downsample_records(timeline, max_points, y_key="max_intensity", mode=mode)
@@ -0,0 +1,417 @@
+# app/services/ingest_batch.py
+"""
+Ingestão em lote por HTTP (POST /ingest/batch) para gateways e envios
+offline.
+
+Pelo MQTT cada amostra é uma mensagem, um commit e uma feature calculada
+sozinha. Um celular ou gateway que guardou horas de dados sem conexão manda
+tudo de um dispositivo numa requisição, que segue o caminho vetorizado:
+
+1. decodifica o corpo (NDJSON ou colunar binário, opcionalmente gzip/deflate);
+2. ordena por ts_ms e descarta o que já está no banco para (device_id, boot,
+   ts_ms) e as repetições dentro do lote: reenviar o mesmo lote não duplica
+   nada. Lotes sem boot gravam UNKNOWN_BOOT, para que o índice único também
+   os cubra; um conflito nele (lote concorrente) conta como já gravado;
+3. calcula as features de todas as amostras de uma vez
+   (compute_features_resampled, mesma grade uniforme da ingestão ao vivo),
+   continuando a janela das leituras anteriores do dispositivo
+   (window_history) quando o lote vem logo depois delas;
+4. grava leituras e features com INSERT em lote, em transações de até
+   BATCH_CHUNK amostras (o SQLite não fica travado para a ingestão ao vivo
+   durante o lote inteiro);
+5. detecta os episódios do intervalo e reagrega os rollups que já tinham
+   passado dele.
+
+Horário das amostras: ts_ms + offset_ms (parâmetro da requisição). Com
+offset_ms=0 (padrão) ts_ms já é epoch em ms; um gateway que conhece o boot
+do dispositivo manda o deslocamento. Não há correção de drift.
+
+Formato colunar (little-endian), para quem não quer o custo do JSON:
+
+    magic "AUR1" | uint32 n | uint8 flags (bit 0: tem temp)
+    int64[n] ts_ms | float32[n] acc_x, acc_y, acc_z, gyro_x, gyro_y, gyro_z
+    float32[n] temp (se flags & 1; NaN = sem valor)
+
+Leituras de um lote que caem antes de leituras já gravadas do dispositivo
+não recalculam as features dessas leituras posteriores.
+"""
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.metrics import DB_COMMIT_SECONDS, Counter, Histogram
+from app.models import UNKNOWN_BOOT, SensorFeature, SensorReading
+from app.services.episodes_service import save_episodes_in_range
+from app.services.features_service import (
+    compute_features_resampled, vector_magnitudes, window_history,
+)
+from app.services.retention_service import refresh_rollups
+
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_BYTES = int(os.getenv("AURA_INGEST_BATCH_MAX_BYTES", str(256 * 1024 * 1024)))
+BATCH_MAX_SAMPLES = int(os.getenv("AURA_INGEST_BATCH_MAX_SAMPLES", "2000000"))
+BATCH_CHUNK = 50_000  # amostras por transação
+BATCH_INSERT_RETRIES = 3
+
+BATCH_FORMATS = ("ndjson", "columnar")
+COLUMNAR_MAGIC = b"AUR1"
+_COLUMNAR_HEADER = struct.Struct("<4sIB")
+AXES = ("acc_x", "acc_y", "acc_z", "gyro_x", "gyro_y", "gyro_z")
+
+_FEATURE_COLUMNS = (
+    "acc_magnitude", "gyro_magnitude", "acc_mean", "acc_std", "acc_amplitude",
+    "gyro_mean", "gyro_std", "gyro_amplitude", "intensity", "freq_dominant",
+    "band_power", "tremor_score",
+)
+
+INGEST_BATCH_SAMPLES = Counter(
+    "aura_ingest_batch_samples", "Amostras recebidas por /ingest/batch", ["result"]
+)
+INGEST_BATCH_SECONDS = Histogram(
+    "aura_ingest_batch_seconds", "Duração do processamento de um lote de /ingest/batch",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+
+
+class BatchTooLarge(ValueError):
+    """Lote acima de AURA_INGEST_BATCH_MAX_BYTES / AURA_INGEST_BATCH_MAX_SAMPLES (413)."""
+
+
+# ============================================================
+# DECODIFICAÇÃO
+# ============================================================
+
+def decompress(body: bytes, encoding: Optional[str]) -> bytes:
+    """Content-Encoding gzip/deflate, limitado a BATCH_MAX_BYTES descomprimidos."""
+    encoding = (encoding or "identity").strip().lower()
+    if encoding == "identity":
+        data = body
+    elif encoding in ("gzip", "x-gzip", "deflate"):
+        # wbits 47: detecta cabeçalho gzip ou zlib
+        inflater = zlib.decompressobj(47)
+        try:
+            data = inflater.decompress(body, BATCH_MAX_BYTES + 1)
+        except zlib.error as e:
+            raise ValueError(f"Corpo {encoding} inválido: {e}") from e
+    else:
+        raise ValueError(f"Content-Encoding não suportado: {encoding} (use gzip ou deflate)")
+    if len(data) > BATCH_MAX_BYTES:
+        raise BatchTooLarge(f"Lote maior que {BATCH_MAX_BYTES} bytes descomprimidos")
+    return data
+
+
+def _check_size(n: int):
+    if n > BATCH_MAX_SAMPLES:
+        raise BatchTooLarge(f"Lote com {n} amostras (máximo {BATCH_MAX_SAMPLES})")
+
+
+def parse_ndjson(data: bytes) -> Dict[str, Any]:
+    """
+    Uma leitura por linha ({"ts_ms", "acc_x", ..., "gyro_z", "temp"}).
+    Linhas sem ts_ms inteiro ou sem algum eixo contam como rejeitadas.
+    """
+    lines = [line for line in data.splitlines() if line.strip()]
+    _check_size(len(lines))
+    try:
+        # Um json.loads só para o lote todo: o laço por linha fica só na extração
+        records = json.loads(b"[" + b",".join(lines) + b"]")
+    except ValueError:
+        for number, line in enumerate(lines, start=1):
+            try:
+                json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"JSON inválido na linha {number}: {e}") from e
+        raise ValueError("NDJSON inválido")
+    if not all(isinstance(record, dict) for record in records):
+        raise ValueError("Cada linha do NDJSON deve ser um objeto")
+
+    ts_raw = [record.get("ts_ms") for record in records]
+    valid = np.fromiter((type(v) is int for v in ts_raw), dtype=bool, count=len(ts_raw))
+    columns = {}
+    for key in (*AXES, "temp"):
+        columns[key] = _float_column([record.get(key) for record in records])
+        if key != "temp":
+            valid &= ~np.isnan(columns[key])
+    try:
+        columns["ts_ms"] = np.array([v if ok else 0 for v, ok in zip(ts_raw, valid.tolist())],
+                                    dtype=np.int64)
+    except OverflowError as e:
+        raise ValueError(f"ts_ms fora do intervalo: {e}") from e
+    rejected = int(len(records) - valid.sum())
+    if rejected:
+        columns = {key: column[valid] for key, column in columns.items()}
+    return {"columns": columns, "rejected": rejected}
+
+
+def _float_column(values: list) -> np.ndarray:
+    """Valores JSON → float64, com NaN no que falta ou não é número."""
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.array([v if type(v) in (int, float) else None for v in values], dtype=np.float64)
+
+
+def parse_columnar(data: bytes) -> Dict[str, Any]:
+    """Formato colunar binário descrito no início do módulo."""
+    if len(data) < _COLUMNAR_HEADER.size:
+        raise ValueError("Corpo colunar sem cabeçalho")
+    magic, n, flags = _COLUMNAR_HEADER.unpack_from(data)
+    if magic != COLUMNAR_MAGIC:
+        raise ValueError(f"Corpo colunar com magic inválido: {magic!r}")
+    _check_size(n)
+    float_columns = len(AXES) + (1 if flags & 1 else 0)
+    expected = _COLUMNAR_HEADER.size + n * 8 + float_columns * n * 4
+    if len(data) != expected:
+        raise ValueError(f"Corpo colunar com {len(data)} bytes (esperado {expected} para n={n})")
+    offset = _COLUMNAR_HEADER.size
+    columns = {"ts_ms": np.frombuffer(data, dtype="<i8", count=n, offset=offset).astype(np.int64)}
+    offset += n * 8
+    for key in (*AXES, "temp") if flags & 1 else AXES:
+        columns[key] = np.frombuffer(data, dtype="<f4", count=n, offset=offset).astype(np.float64)
+        offset += n * 4
+    if "temp" not in columns:
+        columns["temp"] = np.full(n, np.nan)
+    # NaN num eixo equivale a um campo ausente no NDJSON
+    valid = np.isfinite(np.column_stack([columns[axis] for axis in AXES])).all(axis=1)
+    rejected = int(n - valid.sum())
+    if rejected:
+        columns = {key: column[valid] for key, column in columns.items()}
+    return {"columns": columns, "rejected": rejected}
+
+
+def encode_columnar(columns: Dict[str, np.ndarray]) -> bytes:
+    """Inverso de parse_columnar (clientes em Python, benchmarks)."""
+    n = len(columns["ts_ms"])
+    has_temp = "temp" in columns
+    parts = [_COLUMNAR_HEADER.pack(COLUMNAR_MAGIC, n, 1 if has_temp else 0),
+             np.asarray(columns["ts_ms"], dtype="<i8").tobytes()]
+    for key in (*AXES, "temp") if has_temp else AXES:
+        parts.append(np.asarray(columns[key], dtype="<f4").tobytes())
+    return b"".join(parts)
+
+
+# ============================================================
+# GRAVAÇÃO
+# ============================================================
+
+def _existing_ts(db: Session, device_id: str, boot: int, ts: np.ndarray) -> np.ndarray:
+    """ts_ms do intervalo do lote já gravados para o dispositivo/boot."""
+    rows = db.connection().execute(
+        select(SensorReading.ts_ms).where(
+            SensorReading.device_id == device_id, SensorReading.boot == boot,
+            SensorReading.ts_ms.between(int(ts[0]), int(ts[-1])),
+        )
+    ).scalars().all()
+    return np.asarray(rows, dtype=np.int64)
+
+
+def _history(db: Session, device_id: str, boot: int, first_ts: int) -> List[SensorReading]:
+    """Leituras que continuam a janela, se o lote vem logo depois delas (mesmo boot)."""
+    last_id = db.query(func.max(SensorReading.id)).scalar()
+    if last_id is None:
+        return []
+    history = window_history(db, device_id, last_id + 1)
+    if not history or history[-1].boot != boot or history[-1].ts_ms is None \
+            or history[-1].ts_ms >= first_ts:
+        return []
+    return history
+
+
+def _sampled_at(ts_ms: np.ndarray, offset_ms: float) -> np.ndarray:
+    """
+    Horário de cada amostra no relógio do servidor, sem timezone (hora local,
+    como datetime.fromtimestamp na ingestão MQTT), em datetime64[us].
+    """
+    epoch_ms = ts_ms.astype(np.float64) + offset_ms
+    utc = np.round(epoch_ms * 1000).astype(np.int64).astype("datetime64[us]")
+    first, last = (datetime.fromtimestamp(v / 1000.0) - datetime.fromtimestamp(
+        v / 1000.0, timezone.utc).replace(tzinfo=None) for v in (epoch_ms[0], epoch_ms[-1]))
+    if first == last:
+        return utc + np.timedelta64(first)
+    # Lote atravessa uma troca de horário de verão: conversão amostra a amostra
+    return np.array([datetime.fromtimestamp(v / 1000.0) for v in epoch_ms.tolist()],
+                    dtype="datetime64[us]")
+
+
+def _driver_timestamps(values: np.ndarray, dialect) -> list:
+    """Instantes no formato que o SQLAlchemy grava no SQLite (datetime nos demais bancos)."""
+    if dialect.name == "sqlite":
+        return np.char.replace(np.datetime_as_string(values, unit="us"), "T", " ").tolist()
+    return values.astype(object).tolist()
+
+
+def _as_python(values: np.ndarray) -> list:
+    """NaN → None (colunas opcionais) e tipos NumPy → Python."""
+    out = values.tolist()
+    if np.isnan(values).any():
+        out = [None if v != v else v for v in out]
+    return out
+
+
+def _bulk_insert(db: Session, table, columns: Dict[str, list]):
+    """
+    INSERT Core compilado uma vez e executado com executemany do driver sobre
+    tuplas (sem o processamento de parâmetros por linha do SQLAlchemy), como
+    no generate_dataset.py.
+    """
+    conn = db.connection()
+    compiled = insert(table).compile(dialect=conn.dialect, column_keys=list(columns))
+    if compiled.positiontup:
+        rows = list(zip(*(columns[key] for key in compiled.positiontup)))
+    else:
+        keys = list(columns)
+        rows = [dict(zip(keys, values)) for values in zip(*columns.values())]
+    conn.exec_driver_sql(str(compiled), rows)
+
+
+def _inserted_ids(db: Session, device_id: str, boot: int, ts: np.ndarray,
+                  after_id: int) -> List[int]:
+    """Ids das leituras recém-gravadas, na ordem de ts (acima de after_id, na mesma transação)."""
+    rows = db.connection().execute(
+        select(SensorReading.ts_ms, SensorReading.id)
+        .where(SensorReading.device_id == device_id, SensorReading.boot == boot,
+               SensorReading.ts_ms.between(int(ts[0]), int(ts[-1])),
+               SensorReading.id > after_id)
+        .order_by(SensorReading.ts_ms, SensorReading.id)
+    ).all()
+    found_ts = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    found_id = np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows))
+    position = np.searchsorted(found_ts, ts, side="right") - 1
+    if len(rows) < len(ts) or (position < 0).any() or (found_ts[position] != ts).any():
+        raise RuntimeError("Leituras do lote não encontradas após o INSERT")
+    return found_id[position].tolist()
+
+
+def _insert_chunk(db: Session, device_id: str, boot: int, columns: Dict[str, np.ndarray],
+                  features: Dict[str, np.ndarray], timestamps: np.ndarray) -> np.ndarray:
+    """
+    Grava um trecho (leituras + features) numa transação; retorna a máscara
+    do que foi gravado. Repete a checagem de duplicatas dentro da transação:
+    a ingestão ao vivo ou outro lote pode ter gravado parte do intervalo
+    nesse meio tempo. Um conflito no índice único desfaz o trecho e refaz a
+    checagem: o que o outro gravou sai da máscara (conta como duplicata).
+    """
+    ts = columns["ts_ms"]
+    dialect = db.get_bind().dialect
+    for attempt in range(BATCH_INSERT_RETRIES):
+        fresh = ~np.isin(ts, _existing_ts(db, device_id, boot, ts))
+        index = np.flatnonzero(fresh)
+        if not len(index):
+            return fresh
+        stamps = _driver_timestamps(timestamps[index], dialect)
+        readings = {"device_id": [device_id] * len(index), "timestamp": stamps,
+                    "ts_ms": ts[index].tolist(), "boot": [boot] * len(index)}
+        for key in (*AXES, "temp"):
+            readings[key] = _as_python(columns[key][index])
+        try:
+            started = time.perf_counter()
+            after_id = db.query(func.coalesce(func.max(SensorReading.id), 0)).scalar()
+            _bulk_insert(db, SensorReading.__table__, readings)
+            rows = {"reading_id": _inserted_ids(db, device_id, boot, ts[index], after_id),
+                    "device_id": readings["device_id"], "timestamp": stamps}
+            for key in _FEATURE_COLUMNS:
+                rows[key] = _as_python(features[key][index])
+            _bulk_insert(db, SensorFeature.__table__, rows)
+            db.commit()
+            DB_COMMIT_SECONDS.labels(table="sensor_readings").observe(time.perf_counter() - started)
+            return fresh
+        except IntegrityError:
+            # Índice único (device_id, boot, ts_ms): outra escrita entrou no
+            # intervalo depois da checagem; na próxima volta ela é duplicata
+            db.rollback()
+            logger.debug("Conflito no lote de %s (tentativa %d)", device_id, attempt + 1)
+    raise RuntimeError("Conflitos repetidos ao gravar o lote")
+
+
+def ingest_batch(db: Session, device_id: str, columns: Dict[str, np.ndarray],
+                 boot: Optional[int] = None, offset_ms: float = 0.0,
+                 rejected: int = 0, refresh: bool = True) -> Dict[str, Any]:
+    """
+    Grava um lote decodificado de um dispositivo (passos 2-5 do módulo).
+
+    Uma coluna "sampled_at" (datetime64[us]) substitui ts_ms + offset_ms como
+    horário das amostras (reprodução com o relógio da ingestão ao vivo).
+    refresh=False pula episódios e rollups, para quem grava vários trechos
+    seguidos e detecta no fim (app/services/ingest_sources.py).
+    """
+    started = time.perf_counter()
+    received = len(columns["ts_ms"]) + rejected
+    result: Dict[str, Any] = {"device_id": device_id, "boot": boot, "received": received,
+                              "inserted": 0, "duplicates": 0, "rejected": rejected,
+                              "start": None, "end": None, "episodes": 0, "rollups": 0}
+    INGEST_BATCH_SAMPLES.labels(result="rejected").inc(rejected)
+    if not len(columns["ts_ms"]):
+        return result
+    stored_boot = UNKNOWN_BOOT if boot is None else boot
+
+    # Ordem de ts_ms, sem repetições dentro do lote (fica a primeira)
+    ts_all = columns["ts_ms"]
+    order = np.argsort(ts_all, kind="stable")
+    ts_sorted = ts_all[order]
+    first = np.concatenate([[True], ts_sorted[1:] != ts_sorted[:-1]])
+    order = order[first]
+    columns = {key: column[order] for key, column in columns.items()}
+    ts = columns["ts_ms"]
+    duplicates = len(ts_all) - len(ts)
+
+    # Já gravados (reenvio do mesmo lote): saem antes das features
+    new = ~np.isin(ts, _existing_ts(db, device_id, stored_boot, ts))
+    duplicates += int((~new).sum())
+    columns = {key: column[new] for key, column in columns.items()}
+    ts = columns["ts_ms"]
+    sampled_at = columns.pop("sampled_at", None)
+    if len(ts):
+        history = _history(db, device_id, stored_boot, int(ts[0]))
+        acc = vector_magnitudes(columns["acc_x"], columns["acc_y"], columns["acc_z"])
+        gyro = vector_magnitudes(columns["gyro_x"], columns["gyro_y"], columns["gyro_z"])
+        if history:
+            acc_prev = vector_magnitudes(*([getattr(r, f) for r in history]
+                                           for f in ("acc_x", "acc_y", "acc_z")))
+            gyro_prev = vector_magnitudes(*([getattr(r, f) for r in history]
+                                            for f in ("gyro_x", "gyro_y", "gyro_z")))
+            acc_all = np.concatenate([acc_prev, acc])
+            gyro_all = np.concatenate([gyro_prev, gyro])
+        else:
+            acc_all, gyro_all = acc, gyro
+        features = compute_features_resampled([r.ts_ms for r in history] + ts.tolist(),
+                                              acc_all, gyro_all)
+        features = {key: np.asarray(v, dtype=np.float64)[len(history):]
+                    for key, v in features.items()}
+        timestamps = sampled_at if sampled_at is not None else _sampled_at(ts, offset_ms)
+
+        inserted = 0
+        for lo in range(0, len(ts), BATCH_CHUNK):
+            part = slice(lo, lo + BATCH_CHUNK)
+            written = _insert_chunk(db, device_id, stored_boot,
+                                    {key: column[part] for key, column in columns.items()},
+                                    {key: column[part] for key, column in features.items()},
+                                    timestamps[part])
+            inserted += int(written.sum())
+        duplicates += len(ts) - inserted
+        result["inserted"] = inserted
+        start_dt, end_dt = timestamps[[0, -1]].astype(object).tolist()
+        result["start"], result["end"] = start_dt, end_dt
+        if inserted and refresh:
+            result["episodes"] = save_episodes_in_range(db, device_id, start_dt, end_dt)
+            result["rollups"] = refresh_rollups(db, start_dt, end_dt)
+
+    result["duplicates"] = duplicates
+    INGEST_BATCH_SAMPLES.labels(result="inserted").inc(result["inserted"])
+    INGEST_BATCH_SAMPLES.labels(result="duplicate").inc(duplicates)
+    elapsed = time.perf_counter() - started
+    INGEST_BATCH_SECONDS.observe(elapsed)
+    result["seconds"] = round(elapsed, 3)
+    logger.info("Lote de %s: %d amostras, %d gravadas, %d duplicadas em %.2fs",
+                device_id, received, result["inserted"], duplicates, elapsed)
+    return result
@@ -0,0 +1,216 @@
+# app/services/ingest_dedup.py
+"""
+Descarte de mensagens reentregues (QoS 1) antes da fila de persistência.
+
+Depois de uma reconexão o dispositivo reenvia o que não teve PUBACK; sem
+filtro cada reentrega vira outra linha em sensor_readings e empurra a janela
+deslizante das features. Consultar o banco a cada mensagem seria caro demais,
+então cada dispositivo tem uma janela anti-replay em memória (como a do
+IPsec): o maior ts_ms visto e um bitmap dos AURA_DEDUP_WINDOW_MS
+milissegundos anteriores (bit i = ts_ms "maior - i" já recebido). Checar e
+marcar custa O(1) e não toca no banco.
+
+ts_ms é millis() desde o boot do dispositivo e recomeça a cada boot: um
+ts_ms mais antigo que a janela é tratado como reinício e abre um novo
+`boot`. O índice único (device_id, boot, ts_ms) em sensor_readings é a
+barreira para o que escapa da janela (ex.: reentrega durante o reinício do
+servidor ou a troca de dono com ingestão particionada). A janela só precisa
+cobrir as mensagens em voo de uma reconexão; maior que isso piora o custo do
+bitmap e o caso ambíguo de um dispositivo que reinicia com menos de uma
+janela de uptime (as primeiras amostras do boot novo parecem duplicatas).
+
+Na primeira mensagem de um dispositivo (startup ou troca de dono) o estado
+vem do banco: o último boot/ts_ms dele e os ts_ms recentes desse boot.
+
+Lacunas: com o período estimado (menor intervalo entre amostras em ordem),
+um avanço de k períodos conta k - 1 amostras perdidas; chegadas atrasadas
+que preenchem a lacuna descontam.
+"""
+import logging
+import os
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.metrics import Counter
+from app.models import SensorReading
+
+logger = logging.getLogger(__name__)
+
+DEDUP_WINDOW_MS = int(os.getenv("AURA_DEDUP_WINDOW_MS", "10000"))
+GAP_TOLERANCE = 1.5  # avanço acima de 1,5 período conta como lacuna
+LOAD_SCAN_BATCH = 256  # linhas por busca ao procurar a última leitura ao vivo
+
+INGEST_DUPLICATES = Counter(
+    "aura_ingest_duplicates", "Leituras duplicadas descartadas", ["source"]
+)
+INGEST_GAP_SAMPLES = Counter(
+    "aura_ingest_gap_samples", "Amostras faltando inferidas por saltos de ts_ms"
+)
+INGEST_OUT_OF_ORDER = Counter(
+    "aura_ingest_out_of_order", "Leituras recebidas fora de ordem (dentro da janela)"
+)
+DEVICE_REBOOTS = Counter(
+    "aura_device_reboots", "Reinícios de dispositivo detectados (ts_ms voltou)"
+)
+
+
+class DeviceSequence:
+    """Janela anti-replay de um dispositivo. Usada só pela thread do paho."""
+
+    __slots__ = ("boot", "high", "bits", "period", "accepted", "duplicates",
+                 "missing", "out_of_order", "reboots")
+
+    def __init__(self, boot: int = 0):
+        self.boot = boot
+        self.high: Optional[int] = None
+        self.bits = 0
+        self.period: Optional[int] = None
+        self.accepted = 0
+        self.duplicates = 0
+        self.missing = 0
+        self.out_of_order = 0
+        self.reboots = 0
+
+    def seen(self, ts_ms: int) -> bool:
+        offset = self.high - ts_ms if self.high is not None else -1
+        return 0 <= offset < DEDUP_WINDOW_MS and bool(self.bits >> offset & 1)
+
+    def mark(self, ts_ms: int):
+        """Marca sem contabilizar (estado reconstruído do banco)."""
+        if self.high is None or ts_ms > self.high:
+            shift = ts_ms - self.high if self.high is not None else DEDUP_WINDOW_MS
+            self.bits = (self.bits << shift | 1) & _MASK if shift < DEDUP_WINDOW_MS else 1
+            self.high = ts_ms
+        elif self.high - ts_ms < DEDUP_WINDOW_MS:
+            self.bits |= 1 << (self.high - ts_ms)
+
+    def accept(self, ts_ms: int) -> bool:
+        """False se ts_ms já foi recebido (duplicata)."""
+        if self.high is None:
+            self.mark(ts_ms)
+        elif ts_ms > self.high:
+            delta = ts_ms - self.high
+            if self.period is None or delta < self.period:
+                self.period = delta
+            elif delta > self.period * GAP_TOLERANCE:
+                lost = round(delta / self.period) - 1
+                self.missing += lost
+                INGEST_GAP_SAMPLES.inc(lost)
+            self.mark(ts_ms)
+        elif self.high - ts_ms >= DEDUP_WINDOW_MS:
+            # Voltou além da janela: o dispositivo reiniciou (millis() recomeçou)
+            self.boot += 1
+            self.reboots += 1
+            self.high, self.bits, self.period = ts_ms, 1, None
+            DEVICE_REBOOTS.inc()
+        elif self.seen(ts_ms):
+            self.duplicates += 1
+            INGEST_DUPLICATES.labels(source="window").inc()
+            return False
+        else:
+            self.mark(ts_ms)
+            self.out_of_order += 1
+            self.missing = max(self.missing - 1, 0)
+            INGEST_OUT_OF_ORDER.inc()
+        self.accepted += 1
+        return True
+
+
+_MASK = (1 << DEDUP_WINDOW_MS) - 1
+_devices: Dict[str, DeviceSequence] = {}
+
+
+def last_readings_query(db: Session, device_id: str):
+    """
+    Leituras do dispositivo da mais recente para trás. Só device_id no
+    filtro: o SQLite percorre ix_sensor_readings_device_timestamp já na
+    ordem, sem ordenar todas as linhas do dispositivo (com boot/ts_ms no
+    filtro ele escolhia o índice único e ordenava numa B-tree temporária).
+    """
+    return (
+        db.query(SensorReading.boot, SensorReading.ts_ms)
+        .filter(SensorReading.device_id == device_id)
+        .order_by(SensorReading.timestamp.desc())
+    )
+
+
+def _load_sequence(db: Session, device_id: str, ts_ms: int) -> DeviceSequence:
+    """Estado inicial do dispositivo a partir das últimas leituras gravadas."""
+    # Pula as linhas sem boot da ingestão ao vivo (lotes com UNKNOWN_BOOT,
+    # cargas sintéticas): em geral a primeira linha já serve
+    last = None
+    for row in last_readings_query(db, device_id).yield_per(LOAD_SCAN_BATCH):
+        if row.boot is not None and row.boot >= 0 and row.ts_ms is not None:
+            last = row
+            break
+    if last is None:
+        return DeviceSequence()
+    if ts_ms < last.ts_ms - DEDUP_WINDOW_MS:
+        # Reiniciou enquanto o servidor estava fora (ou com outra instância)
+        DEVICE_REBOOTS.inc()
+        return DeviceSequence(boot=last.boot + 1)
+    sequence = DeviceSequence(boot=last.boot)
+    recent = (
+        db.query(SensorReading.ts_ms)
+        .filter(SensorReading.device_id == device_id, SensorReading.boot == last.boot,
+                SensorReading.ts_ms >= last.ts_ms - DEDUP_WINDOW_MS + 1)
+        .order_by(SensorReading.ts_ms)
+    )
+    for (recent_ts,) in recent:
+        sequence.mark(recent_ts)
+    return sequence
+
+
+def accept_reading(payload: Dict[str, Any], device_id: str) -> bool:
+    """
+    Filtra duplicatas pelo ts_ms do payload e grava nele o boot do
+    dispositivo (vai junto pela fila/spool até o banco). Mensagens sem ts_ms
+    passam sem filtro.
+    """
+    ts_ms = payload.get("ts_ms")
+    if DEDUP_WINDOW_MS <= 0 or not isinstance(ts_ms, int):
+        return True
+    sequence = _devices.get(device_id)
+    if sequence is None:
+        db = SessionLocal()
+        try:
+            sequence = _load_sequence(db, device_id, ts_ms)
+        finally:
+            db.close()
+        _devices[device_id] = sequence
+    if not sequence.accept(ts_ms):
+        return False
+    payload["boot"] = sequence.boot
+    return True
+
+
+def count_index_duplicate():
+    """Duplicata barrada pelo índice único (escapou da janela em memória)."""
+    INGEST_DUPLICATES.labels(source="index").inc()
+
+
+def drop_device_sequences(keep: Callable[[str], bool]):
+    """Descarta o estado de dispositivos que não passam em keep (mudaram de dono)."""
+    for device_id in [d for d in _devices if not keep(d)]:
+        del _devices[device_id]
+
+
+def get_sequence_report() -> Dict[str, Any]:
+    return {
+        "window_ms": DEDUP_WINDOW_MS,
+        "devices": {
+            device_id: {
+                "boot": s.boot,
+                "last_ts_ms": s.high,
+                "period_ms": s.period,
+                "accepted": s.accepted,
+                "duplicates": s.duplicates,
+                "missing": s.missing,
+                "out_of_order": s.out_of_order,
+                "reboots": s.reboots,
+            }
+            for device_id, s in list(_devices.items())
+        },
+    }
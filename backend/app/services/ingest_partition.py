@@ -0,0 +1,174 @@
+# app/services/ingest_partition.py
+"""
+Particionamento da ingestão MQTT entre várias instâncias por dispositivo.
+
+Assinaturas compartilhadas ($share/aura/...) distribuem mensagens, não
+dispositivos: amostras consecutivas de um mesmo dispositivo cairiam em
+instâncias diferentes e a janela deslizante de features (por dispositivo, em
+memória) ficaria partida. Aqui todas as instâncias assinam o tópico e cada
+uma processa só os dispositivos que lhe cabem por hashing de rendezvous
+(HRW): dono(d) = argmax_m hash(m, d). Quando uma instância entra ou sai, só
+os dispositivos dela mudam de dono.
+
+A composição do grupo vem do próprio broker: cada instância publica um
+heartbeat em aura/ingest/members/<id> a cada AURA_INGEST_HEARTBEAT_SECONDS e
+é removida após 3 intervalos sem heartbeat (ou ao publicar "leave"). Não usa
+retain nem will, então funciona com o Mosquitto e com benchmarks/mini_broker.
+Durante a troca de dono as visões podem divergir por até um intervalo
+(duplicatas ou lacunas curtas); o novo dono reconstrói a janela a partir do
+banco (features_service.seed_device_window).
+
+Habilitar com AURA_INGEST_PARTITIONING=hrw em todas as instâncias de ingestão,
+cada uma com um AURA_MQTT_CLIENT_ID fixo, que sobrevive a reinícios (e seu
+AURA_LIVE_SOCKET/AURA_SHM_NAME se estiverem na mesma máquina).
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from app.metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+PARTITIONING = os.getenv("AURA_INGEST_PARTITIONING", "off")
+HEARTBEAT_SECONDS = float(os.getenv("AURA_INGEST_HEARTBEAT_SECONDS", "2"))
+MEMBERS_TOPIC = "aura/ingest/members"
+MEMBER_TIMEOUT_FACTOR = 3
+
+INGEST_PARTITION_MEMBERS = Gauge(
+    "aura_ingest_partition_members", "Instâncias de ingestão vistas no grupo"
+)
+INGEST_PARTITION_SKIPPED = Counter(
+    "aura_ingest_partition_skipped", "Mensagens ignoradas por pertencerem a outra instância"
+)
+INGEST_PARTITION_REBALANCES = Counter(
+    "aura_ingest_partition_rebalances", "Mudanças na composição do grupo de ingestão"
+)
+
+if PARTITIONING not in ("off", "hrw"):
+    raise ValueError(f"AURA_INGEST_PARTITIONING inválido: {PARTITIONING} (use off ou hrw)")
+
+
+def _score(member_id: str, device_id: str) -> int:
+    digest = hashlib.blake2b(f"{member_id}\0{device_id}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def rendezvous_owner(device_id: str, members: List[str]) -> Optional[str]:
+    """Instância dona do dispositivo (a de maior hash); None se não há membros."""
+    return max(members, key=lambda m: _score(m, device_id), default=None)
+
+
+class PartitionMembership:
+    """
+    Estado do grupo visto por uma instância. Todas as mutações acontecem na
+    thread do paho (heartbeats recebidos), então não há lock.
+    """
+
+    def __init__(self, instance_id: str, heartbeat_seconds: float = HEARTBEAT_SECONDS,
+                 on_rebalance: Optional[Callable[["PartitionMembership"], None]] = None):
+        self.instance_id = instance_id
+        self.timeout = heartbeat_seconds * MEMBER_TIMEOUT_FACTOR
+        self.on_rebalance = on_rebalance
+        # A própria instância sempre é membro (mesmo antes do primeiro heartbeat voltar)
+        self._seen: Dict[str, float] = {instance_id: time.monotonic()}
+        self._members = [instance_id]
+        self._owner_cache: Dict[str, bool] = {}
+
+    @property
+    def members(self) -> List[str]:
+        return list(self._members)
+
+    def owns(self, device_id: str) -> bool:
+        owned = self._owner_cache.get(device_id)
+        if owned is None:
+            owned = rendezvous_owner(device_id, self._members) == self.instance_id
+            self._owner_cache[device_id] = owned
+        return owned
+
+    def on_heartbeat(self, member_id: str, leaving: bool = False):
+        now = time.monotonic()
+        if leaving:
+            if member_id != self.instance_id:
+                self._seen.pop(member_id, None)
+        else:
+            self._seen[member_id] = now
+        self._seen[self.instance_id] = now
+        self.expire(now)
+
+    def expire(self, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        for member_id, seen in list(self._seen.items()):
+            if member_id != self.instance_id and now - seen > self.timeout:
+                del self._seen[member_id]
+        members = sorted(self._seen)
+        if members != self._members:
+            logger.info("Grupo de ingestão: %s (antes %s)", members, self._members)
+            self._members = members
+            self._owner_cache.clear()
+            INGEST_PARTITION_MEMBERS.set(len(members))
+            INGEST_PARTITION_REBALANCES.inc()
+            if self.on_rebalance:
+                self.on_rebalance(self)
+
+
+_membership: Optional[PartitionMembership] = None
+_stop = threading.Event()
+
+
+def partitioning_enabled() -> bool:
+    return _membership is not None
+
+
+def owns_device(device_id: str) -> bool:
+    """True se esta instância deve processar o dispositivo (sempre, sem particionamento)."""
+    return _membership is None or _membership.owns(device_id)
+
+
+def is_membership_topic(topic: str) -> bool:
+    return topic.startswith(MEMBERS_TOPIC + "/")
+
+
+def handle_membership_message(topic: str, payload: bytes):
+    """Heartbeat recebido (chamado pelo on_message do cliente MQTT)."""
+    if _membership is None:
+        return
+    member_id = topic[len(MEMBERS_TOPIC) + 1:]
+    try:
+        leaving = json.loads(payload or b"{}").get("status") == "leave"
+    except ValueError:
+        return
+    _membership.on_heartbeat(member_id, leaving)
+
+
+def start_partitioning(client, instance_id: str,
+                       on_rebalance: Optional[Callable[[PartitionMembership], None]] = None):
+    """
+    Cria o estado do grupo e a thread de heartbeat. A assinatura de
+    MEMBERS_TOPIC/+ é feita pelo on_connect do cliente.
+    """
+    global _membership
+    _membership = PartitionMembership(instance_id, on_rebalance=on_rebalance)
+    INGEST_PARTITION_MEMBERS.set(1)
+    topic = f"{MEMBERS_TOPIC}/{instance_id}"
+
+    def _beat():
+        while not _stop.wait(HEARTBEAT_SECONDS):
+            client.publish(topic, json.dumps({"status": "alive"}), qos=0)
+
+    client.publish(topic, json.dumps({"status": "alive"}), qos=0)
+    threading.Thread(target=_beat, daemon=True, name="aura-ingest-heartbeat").start()
+    logger.info("Particionamento HRW ativo (instância %s)", instance_id)
+
+
+def stop_partitioning(client):
+    """Avisa o grupo da saída para o rebalanceamento não esperar o timeout."""
+    _stop.set()
+    if _membership is not None:
+        info = client.publish(f"{MEMBERS_TOPIC}/{_membership.instance_id}",
+                              json.dumps({"status": "leave"}), qos=1)
+        info.wait_for_publish(2)
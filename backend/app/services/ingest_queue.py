@@ -0,0 +1,291 @@
+# app/services/ingest_queue.py
+"""
+Fila limitada entre o recebimento MQTT e a persistência.
+
+Antes o on_message do paho gravava no banco na própria thread do cliente:
+com o SQLite travado o callback ficava até 30 s parado, sem ACK de QoS 1 nem
+keepalive, e o broker passava a segurar ou descartar mensagens. Agora o
+callback só valida e enfileira; uma thread de persistência consome a fila
+em ordem (uma só, para manter a ordem por dispositivo das janelas de
+features e um único escritor no SQLite).
+
+Política quando a fila (AURA_INGEST_QUEUE_SIZE) enche, AURA_INGEST_QUEUE_POLICY:
+
+- block: o callback espera vaga (backpressure até o broker, sem perda);
+- drop_oldest: descarta a mensagem mais antiga da fila (prioriza o ao vivo);
+- spool: grava o excedente num arquivo append-only (AURA_INGEST_SPOOL_PATH,
+  uma linha JSON por mensagem) reproduzido quando a fila esvazia. Enquanto
+  houver spool pendente, as mensagens novas também vão para ele, preservando
+  a ordem. Um spool que sobrou de uma execução anterior é reproduzido na
+  inicialização.
+
+O horário da amostra (app/services/device_clock.py) viaja com a mensagem,
+então leituras que esperaram na fila ou no spool não mudam de timestamp.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.metrics import Counter, Gauge, Histogram, MQTT_MESSAGES_DROPPED, INGEST_QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = int(os.getenv("AURA_INGEST_QUEUE_SIZE", "1000"))
+QUEUE_POLICY = os.getenv("AURA_INGEST_QUEUE_POLICY", "block")
+SPOOL_PATH = os.getenv("AURA_INGEST_SPOOL_PATH", "./ingest_spool.ndjson")
+SPOOL_REPLAY_BATCH = 100  # linhas lidas do spool por vez
+
+if QUEUE_POLICY not in ("block", "drop_oldest", "spool"):
+    raise ValueError(
+        f"AURA_INGEST_QUEUE_POLICY inválido: {QUEUE_POLICY} (use block, drop_oldest ou spool)"
+    )
+
+INGEST_QUEUE_CAPACITY = Gauge(
+    "aura_ingest_queue_capacity", "Capacidade da fila de persistência"
+)
+INGEST_QUEUE_BLOCKED_SECONDS = Histogram(
+    "aura_ingest_queue_blocked_seconds", "Tempo do callback MQTT esperando vaga na fila (block)",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0),
+)
+INGEST_SPOOL_WRITTEN = Counter(
+    "aura_ingest_spool_written", "Mensagens gravadas no spool de transbordo"
+)
+INGEST_SPOOL_REPLAYED = Counter(
+    "aura_ingest_spool_replayed", "Mensagens do spool reproduzidas na persistência"
+)
+INGEST_SPOOL_BYTES = Gauge(
+    "aura_ingest_spool_bytes", "Bytes pendentes no spool de transbordo"
+)
+
+# (payload, trace, horário da amostra); trace só existe para mensagens em memória
+Item = Tuple[Dict[str, Any], Optional[Dict[str, Any]], datetime]
+
+
+class OverflowSpool:
+    """
+    Arquivo append-only de mensagens excedentes. Não é thread-safe: o
+    IngestQueue chama tudo sob o próprio lock.
+    """
+
+    def __init__(self, path: str = SPOOL_PATH):
+        self.path = path
+        self._file = open(path, "a+b")
+        self._read_offset = 0
+        self._file.seek(0, os.SEEK_END)
+        self._size = self._file.tell()
+        if self._size:
+            logger.warning("Spool de ingestão com %d bytes pendentes (%s); reproduzindo",
+                           self._size, path)
+
+    @property
+    def pending(self) -> bool:
+        return self._read_offset < self._size
+
+    @property
+    def pending_bytes(self) -> int:
+        return self._size - self._read_offset
+
+    def append(self, item: Item):
+        payload, _trace, sampled_at = item
+        line = json.dumps({"payload": payload, "sampled_at": sampled_at.isoformat()})
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(line.encode() + b"\n")
+        self._file.flush()
+        self._size = self._file.tell()
+        INGEST_SPOOL_WRITTEN.inc()
+
+    def read_batch(self, limit: int = SPOOL_REPLAY_BATCH) -> List[Item]:
+        """Próximas mensagens pendentes; trunca o arquivo quando tudo foi lido."""
+        self._file.seek(self._read_offset)
+        items: List[Item] = []
+        while len(items) < limit and self._file.tell() < self._size:
+            line = self._file.readline()
+            try:
+                record = json.loads(line)
+                # received_at: spool gravado por versões anteriores
+                sampled_at = record.get("sampled_at") or record["received_at"]
+                items.append((record["payload"], None, datetime.fromisoformat(sampled_at)))
+            except (ValueError, KeyError):
+                # Ex.: linha incompleta de uma queda durante a escrita
+                logger.warning("Linha inválida no spool ignorada")
+                MQTT_MESSAGES_DROPPED.labels(reason="spool_corrupt").inc()
+        self._read_offset = self._file.tell()
+        if self._read_offset >= self._size:
+            # Alcançou o fim: esvazia o arquivo para ele não crescer sem limite
+            self._file.truncate(0)
+            self._read_offset = self._size = 0
+        return items
+
+    def close(self):
+        """Remove o trecho já reproduzido, para não repeti-lo na próxima execução."""
+        if self._read_offset:
+            self._file.seek(self._read_offset)
+            remainder = self._file.read(self._size - self._read_offset)
+            self._file.truncate(0)
+            self._file.write(remainder)
+        self._file.close()
+
+
+class IngestQueue:
+    """Fila limitada com uma thread de persistência que chama handler(item)."""
+
+    def __init__(self, handler: Callable[[Item], None], maxsize: int = QUEUE_SIZE,
+                 policy: str = QUEUE_POLICY, spool_path: str = SPOOL_PATH):
+        self.handler = handler
+        self.maxsize = maxsize
+        self.policy = policy
+        self._items: Deque[Item] = deque()
+        self._cond = threading.Condition()
+        self._running = True
+        self._busy = False  # handler processando um lote
+        # O spool também é aberto com outras políticas se sobrou um de antes
+        self._spool: Optional[OverflowSpool] = None
+        if policy == "spool" or (os.path.exists(spool_path) and os.path.getsize(spool_path)):
+            self._spool = OverflowSpool(spool_path)
+        self._thread = threading.Thread(target=self._run, daemon=True, name="aura-ingest-writer")
+
+    def start(self):
+        self._thread.start()
+
+    def depth(self) -> int:
+        return len(self._items)
+
+    def spool_bytes(self) -> int:
+        return self._spool.pending_bytes if self._spool is not None else 0
+
+    def put(self, payload: Dict[str, Any], trace: Optional[Dict[str, Any]] = None,
+            sampled_at: Optional[datetime] = None):
+        """Enfileira uma mensagem validada (chamado pela thread do paho)."""
+        item = (payload, trace, sampled_at or datetime.now())
+        with self._cond:
+            if self.policy == "spool" and self._spool.pending:
+                self._spool.append(item)  # mantém a ordem atrás do que já transbordou
+                return
+            if len(self._items) >= self.maxsize:
+                if self.policy == "block":
+                    started = time.perf_counter()
+                    while len(self._items) >= self.maxsize and self._running:
+                        self._cond.wait()
+                    INGEST_QUEUE_BLOCKED_SECONDS.observe(time.perf_counter() - started)
+                elif self.policy == "drop_oldest":
+                    self._items.popleft()
+                    MQTT_MESSAGES_DROPPED.labels(reason="queue_full").inc()
+                else:
+                    self._spool.append(item)
+                    self._cond.notify_all()
+                    return
+            self._items.append(item)
+            self._cond.notify_all()
+
+    def _next(self) -> Tuple[List[Item], bool]:
+        """Próximo lote e se veio do spool; lote vazio quando parado e sem nada pendente."""
+        with self._cond:
+            self._busy = False
+            if not self._items:
+                self._cond.notify_all()  # acorda join()
+            while self._running and not self._items and not (self._spool and self._spool.pending):
+                self._cond.wait()
+            self._busy = True
+            if self._items:
+                item = self._items.popleft()
+                self._cond.notify_all()  # libera produtores esperando vaga
+                return [item], False
+            if self._running and self._spool is not None and self._spool.pending:
+                return self._spool.read_batch(), True
+            return [], False
+
+    def _run(self):
+        while True:
+            items, from_spool = self._next()
+            if not items and not from_spool:
+                return
+            for item in items:
+                try:
+                    self.handler(item)
+                except Exception:
+                    logger.exception("Erro na persistência de leitura enfileirada")
+            if from_spool:
+                INGEST_SPOOL_REPLAYED.inc(len(items))
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Espera a fila (e o spool) esvaziar e o handler terminar; False no timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._busy or self._items or (self._spool is not None and self._spool.pending):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Drena a fila em memória por até `timeout`; o que sobrar vai para o
+        spool (política spool) ou é contado como descartado. O spool pendente
+        fica para a próxima execução.
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        with self._cond:
+            leftover = list(self._items)
+            self._items.clear()
+            if leftover and self.policy == "spool":
+                for item in leftover:
+                    self._spool.append(item)
+                logger.warning("%d leituras enfileiradas gravadas no spool no shutdown", len(leftover))
+            elif leftover:
+                MQTT_MESSAGES_DROPPED.labels(reason="shutdown").inc(len(leftover))
+                logger.warning("%d leituras enfileiradas descartadas no shutdown", len(leftover))
+            if self._spool is not None and not self._thread.is_alive():
+                self._spool.close()
+
+
+_queue: Optional[IngestQueue] = None
+
+INGEST_QUEUE_DEPTH.set_function(lambda: _queue.depth() if _queue is not None else 0)
+INGEST_SPOOL_BYTES.set_function(lambda: _queue.spool_bytes() if _queue is not None else 0)
+
+
+def start_ingest_queue(handler: Callable[[Item], None],
+                       policy: Optional[str] = None) -> IngestQueue:
+    """policy sobrepõe AURA_INGEST_QUEUE_POLICY (reprodução usa block: nada se perde)."""
+    global _queue
+    _queue = IngestQueue(handler, policy=policy or QUEUE_POLICY)
+    INGEST_QUEUE_CAPACITY.set(_queue.maxsize)
+    _queue.start()
+    logger.info("Fila de ingestão: %d mensagens, política %s", _queue.maxsize, _queue.policy)
+    return _queue
+
+
+def backlog_fraction() -> float:
+    """Ocupação da fila (0-1); 1 enquanto houver spool pendente."""
+    if _queue is None:
+        return 0.0
+    if _queue.spool_bytes():
+        return 1.0
+    return _queue.depth() / max(_queue.maxsize, 1)
+
+
+def enqueue_reading(payload: Dict[str, Any], trace: Optional[Dict[str, Any]] = None,
+                    sampled_at: Optional[datetime] = None):
+    """Entrega a leitura à fila iniciada por start_ingest_queue."""
+    _queue.put(payload, trace, sampled_at)
+
+
+def wait_ingest_idle(timeout: Optional[float] = None) -> bool:
+    """Espera a persistência alcançar tudo o que foi enfileirado (ver IngestQueue.join)."""
+    return _queue.join(timeout) if _queue is not None else True
+
+
+def stop_ingest_queue(timeout: float = 5.0):
+    global _queue
+    if _queue is not None:
+        _queue.stop(timeout)
+        _queue = None
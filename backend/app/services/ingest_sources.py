@@ -0,0 +1,506 @@
+# app/services/ingest_sources.py
+"""
+Fontes de ingestão atrás de start_mqtt, gravação do tráfego recebido e
+reprodução acelerada.
+
+Toda mensagem, venha de onde vier, passa por mqtt_client.handle_message
+(tópico, payload, received_ms): particionamento, JSON, validação,
+duplicatas, relógio do dispositivo, buffer de reordenação e persistência,
+como ao vivo. A fonte só decide de onde vêm as mensagens e qual é o relógio:
+
+- MqttSource (app/mqtt_client.py): o broker, relógio de parede;
+- ReplaySource: qualquer iterável de (received_ms, tópico, payload) em ordem
+  de chegada, no relógio da gravação. capture_messages lê arquivos de
+  captura; um gerador em processo (benchmarks, ajuste de limiares) serve
+  direto.
+
+AURA_INGEST_SOURCE=replay troca o broker pelos arquivos de
+AURA_INGEST_REPLAY_PATH (globs separados por vírgula), a
+AURA_INGEST_REPLAY_SPEED vezes o tempo real ou "max" (o mais rápido que a
+persistência aguentar). A reprodução não abre traces nem liga o controle de
+sobrecarga, e a fila usa a política block: nada é descartado.
+
+Gravação (AURA_INGEST_CAPTURE_DIR): as mensagens recebidas do broker vão
+para arquivos gzip rotativos (a cada AURA_INGEST_CAPTURE_ROTATE_MB
+comprimidos ou AURA_INGEST_CAPTURE_ROTATE_MIN minutos), no formato
+AURA_INGEST_CAPTURE_FORMAT:
+
+    ndjson: {"t": received_ms, "topic": ..., "payload": "<texto>"} por linha
+            ("payload_b64" se o payload não for UTF-8)
+    binary: "AURC1\\n" e, por mensagem, float64 t | uint16 len(tópico) |
+            uint32 len(payload) | tópico | payload (little-endian)
+
+O arquivo em escrita termina em .part e só ganha o nome final ao rodar ou
+no shutdown (depois de uma queda, renomeie-o para reproduzi-lo).
+
+Persistência da reprodução (AURA_INGEST_REPLAY_WRITER):
+
+- queue: a mesma fila e save_reading_to_db do ao vivo, um commit por leitura
+  e outro por feature (algumas centenas de leituras/s no SQLite);
+- bulk: as leituras que saem do buffer de reordenação são acumuladas por
+  (dispositivo, boot) e gravadas por ingest_batch em trechos de BATCH_CHUNK,
+  com o horário do modelo de relógio e as features da grade uniforme (as
+  mesmas do caminho incremental). Sem live feed nem ring em memória
+  compartilhada.
+
+Padrão: bulk com "max", queue com velocidade fixa. No fim da reprodução os
+episódios de cada dispositivo no intervalo reproduzido são detectados
+(save_episodes_in_range) e os rollups que já tinham passado dele,
+reagregados.
+"""
+import abc
+import base64
+import glob
+import gzip
+import heapq
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.db import SessionLocal
+from app.metrics import Counter, MQTT_MESSAGES_DROPPED
+from app.models import DEFAULT_DEVICE_ID
+from app.services.device_clock import flush_jitter_buffer
+from app.services.episodes_service import save_episodes_in_range
+from app.services.ingest_batch import AXES, BATCH_CHUNK, ingest_batch
+from app.services.ingest_queue import Item, wait_ingest_idle
+from app.services.retention_service import refresh_rollups
+
+logger = logging.getLogger(__name__)
+
+INGEST_SOURCE = os.getenv("AURA_INGEST_SOURCE", "mqtt")
+REPLAY_PATH = os.getenv("AURA_INGEST_REPLAY_PATH", "")
+REPLAY_SPEED = os.getenv("AURA_INGEST_REPLAY_SPEED", "max")
+REPLAY_WRITER = os.getenv("AURA_INGEST_REPLAY_WRITER", "")  # vazio: bulk com max, queue com fixa
+CAPTURE_DIR = os.getenv("AURA_INGEST_CAPTURE_DIR", "")
+CAPTURE_FORMAT = os.getenv("AURA_INGEST_CAPTURE_FORMAT", "ndjson")
+CAPTURE_ROTATE_MB = float(os.getenv("AURA_INGEST_CAPTURE_ROTATE_MB", "64"))
+CAPTURE_ROTATE_MIN = float(os.getenv("AURA_INGEST_CAPTURE_ROTATE_MIN", "60"))
+
+CAPTURE_FORMATS = {"ndjson": ".ndjson.gz", "binary": ".aurc.gz"}
+REPLAY_WRITERS = ("queue", "bulk")
+_BINARY_MAGIC = b"AURC1\n"
+_BINARY_RECORD = struct.Struct("<dHI")
+
+if INGEST_SOURCE not in ("mqtt", "replay"):
+    raise ValueError(f"AURA_INGEST_SOURCE inválido: {INGEST_SOURCE} (use mqtt ou replay)")
+if CAPTURE_FORMAT not in CAPTURE_FORMATS:
+    raise ValueError(f"AURA_INGEST_CAPTURE_FORMAT inválido: {CAPTURE_FORMAT} (use ndjson ou binary)")
+if REPLAY_WRITER and REPLAY_WRITER not in REPLAY_WRITERS:
+    raise ValueError(f"AURA_INGEST_REPLAY_WRITER inválido: {REPLAY_WRITER} (use queue ou bulk)")
+
+INGEST_REPLAY_MESSAGES = Counter(
+    "aura_ingest_replay_messages", "Mensagens entregues à ingestão pela reprodução"
+)
+INGEST_CAPTURE_MESSAGES = Counter(
+    "aura_ingest_capture_messages", "Mensagens recebidas gravadas nos arquivos de captura"
+)
+
+# (received_ms, tópico, payload)
+Message = Tuple[float, str, bytes]
+# mqtt_client.handle_message(tópico, payload, received_ms)
+Handler = Callable[[str, bytes, float], None]
+
+
+class IngestSource(abc.ABC):
+    """Origem das mensagens de start_mqtt. live=False: reprodução."""
+
+    name = "source"
+    live = True
+
+    def clock(self) -> float:
+        """Agora no relógio de received_ms (ms): prazos do buffer de reordenação."""
+        return time.time() * 1000.0
+
+    def wrap_release(self, release: Callable[[Item], None]) -> Callable[[Item], None]:
+        """Destino das leituras que saem do buffer de reordenação (padrão: a fila)."""
+        return release
+
+    @abc.abstractmethod
+    def start(self, handle: Handler):
+        """Começa a entregar mensagens a `handle` (retorna sem esperar o fim)."""
+
+    @abc.abstractmethod
+    def stop(self):
+        """Para de entregar mensagens e libera conexões/threads."""
+
+
+# ============================================================
+# REPRODUÇÃO
+# ============================================================
+
+def parse_replay_speed(value: str) -> Optional[float]:
+    """"max" → None (sem espera); senão o múltiplo do tempo real."""
+    if value.strip().lower() == "max":
+        return None
+    speed = float(value)
+    if speed <= 0:
+        raise ValueError(f"Velocidade de reprodução inválida: {value} (use max ou um número > 0)")
+    return speed
+
+
+class BulkWriter:
+    """
+    Acumula por (dispositivo, boot) as leituras liberadas pelo buffer de
+    reordenação e grava com ingest_batch a cada `chunk`. Leituras sem ts_ms
+    inteiro ou com eixo não numérico seguem para fallback (a fila), como
+    seriam gravadas ao vivo.
+    """
+
+    def __init__(self, fallback: Callable[[Item], None], chunk: int = BATCH_CHUNK):
+        self.fallback = fallback
+        self.chunk = chunk
+        self.inserted = 0
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[str, Optional[int]], List[Item]] = {}
+
+    def add(self, item: Item):
+        payload = item[0]
+        if type(payload.get("ts_ms")) is not int:
+            self.fallback(item)
+            return
+        key = (payload.get("device_id") or DEFAULT_DEVICE_ID, payload.get("boot"))
+        with self._lock:
+            rows = self._pending.setdefault(key, [])
+            rows.append(item)
+            if len(rows) >= self.chunk:
+                del self._pending[key]
+                self._write(key, rows)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            for key, rows in pending.items():
+                self._write(key, rows)
+
+    def _write(self, key: Tuple[str, Optional[int]], rows: List[Item]):
+        device_id, boot = key
+        axes = itemgetter(*AXES)
+        try:
+            values = np.array([axes(payload) for payload, _, _ in rows], dtype=np.float64)
+            numeric = ~np.isnan(values).any(axis=1)  # None vira NaN
+        except (TypeError, ValueError):
+            values = None
+            numeric = np.array([all(type(v) in (int, float) for v in axes(payload))
+                                for payload, _, _ in rows])
+        if not numeric.all():
+            for item, ok in zip(rows, numeric.tolist()):
+                if not ok:
+                    self.fallback(item)
+            rows = [item for item, ok in zip(rows, numeric.tolist()) if ok]
+            if not rows:
+                return
+            values = np.array([axes(payload) for payload, _, _ in rows], dtype=np.float64)
+        payloads = [payload for payload, _, _ in rows]
+        db = SessionLocal()
+        try:
+            columns = {"ts_ms": np.array([p["ts_ms"] for p in payloads], dtype=np.int64)}
+            for i, axis in enumerate(AXES):
+                columns[axis] = values[:, i]
+            columns["temp"] = np.array(
+                [p.get("temp") if type(p.get("temp")) in (int, float) else np.nan for p in payloads],
+                dtype=np.float64,
+            )
+            columns["sampled_at"] = np.array([sampled_at for _, _, sampled_at in rows],
+                                             dtype="datetime64[us]")
+            result = ingest_batch(db, device_id, columns, boot=boot, refresh=False)
+            self.inserted += result["inserted"]
+            MQTT_MESSAGES_DROPPED.labels(reason="duplicate").inc(result["duplicates"])
+        except Exception as e:
+            logger.error("Erro ao gravar trecho da reprodução (%s, %d leituras): %s",
+                         device_id, len(rows), e)
+            MQTT_MESSAGES_DROPPED.labels(reason="db_error").inc(len(rows))
+            db.rollback()
+        finally:
+            db.close()
+
+
+class ReplaySource(IngestSource):
+    """
+    Entrega mensagens (received_ms, tópico, payload) em ordem de chegada, a
+    `speed` vezes o tempo real ou sem espera (speed=None). done é sinalizado
+    depois de tudo gravado e dos episódios detectados; stats resume a
+    execução.
+    """
+
+    name = "replay"
+    live = False
+
+    def __init__(self, messages: Iterable[Message], speed: Optional[float] = None,
+                 writer: Optional[str] = None, label: str = "gerador"):
+        if writer is not None and writer not in REPLAY_WRITERS:
+            raise ValueError(f"Gravação da reprodução inválida: {writer} (use queue ou bulk)")
+        self.messages = messages
+        self.speed = speed
+        self.writer = writer or ("bulk" if speed is None else "queue")
+        self.label = label
+        self.done = threading.Event()
+        self.stats: Dict[str, Any] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._bulk: Optional[BulkWriter] = None
+        self._ranges: Dict[str, List[datetime]] = {}
+        self._first_ms: Optional[float] = None
+        self._virtual_ms = 0.0
+        self._wall_start = 0.0
+
+    def clock(self) -> float:
+        if self.speed is None or self._first_ms is None:
+            return self._virtual_ms
+        return self._first_ms + (time.monotonic() - self._wall_start) * 1000.0 * self.speed
+
+    def wrap_release(self, release: Callable[[Item], None]) -> Callable[[Item], None]:
+        if self.writer == "bulk":
+            self._bulk = BulkWriter(fallback=release)
+            release = self._bulk.add
+        ranges = self._ranges
+
+        def replay_release(item: Item):
+            # Intervalo reproduzido por dispositivo, para os episódios no fim
+            payload, _, sampled_at = item
+            device_id = payload.get("device_id") or DEFAULT_DEVICE_ID
+            span = ranges.get(device_id)
+            if span is None:
+                ranges[device_id] = [sampled_at, sampled_at]
+            elif sampled_at < span[0]:
+                span[0] = sampled_at
+            elif sampled_at > span[1]:
+                span[1] = sampled_at
+            release(item)
+
+        return replay_release
+
+    def start(self, handle: Handler):
+        speed = "max" if self.speed is None else f"{self.speed:g}x"
+        logger.info("Reprodução de %s (velocidade %s, gravação %s)", self.label, speed, self.writer)
+        self._thread = threading.Thread(target=self._run, args=(handle,), daemon=True,
+                                        name="aura-ingest-replay")
+        self._thread.start()
+
+    def _run(self, handle: Handler):
+        started = time.perf_counter()
+        count = 0
+        try:
+            for received_ms, topic, payload in self.messages:
+                if self._stop.is_set():
+                    return
+                if self._first_ms is None:
+                    self._first_ms, self._wall_start = received_ms, time.monotonic()
+                elif self.speed is not None:
+                    wait = ((received_ms - self._first_ms) / self.speed / 1000.0
+                            - (time.monotonic() - self._wall_start))
+                    if wait > 0 and self._stop.wait(wait):
+                        return
+                self._virtual_ms = received_ms
+                handle(topic, payload, received_ms)
+                INGEST_REPLAY_MESSAGES.inc()
+                count += 1
+            self._finish(count, time.perf_counter() - started)
+        except Exception:
+            logger.exception("Erro na reprodução de %s", self.label)
+        finally:
+            self.done.set()
+
+    def _drain(self):
+        """Grava tudo o que foi entregue: buffer de reordenação, trechos pendentes e fila."""
+        flush_jitter_buffer()
+        if self._bulk is not None:
+            self._bulk.flush()
+        wait_ingest_idle()
+
+    def _finish(self, count: int, read_seconds: float):
+        started = time.perf_counter()
+        self._drain()
+        episodes = rollups = 0
+        if self._ranges:
+            db = SessionLocal()
+            try:
+                for device_id, (start_dt, end_dt) in self._ranges.items():
+                    episodes += save_episodes_in_range(db, device_id, start_dt, end_dt)
+                starts, ends = zip(*self._ranges.values())
+                rollups = refresh_rollups(db, min(starts), max(ends))
+            finally:
+                db.close()
+        seconds = read_seconds + time.perf_counter() - started
+        span = (self._virtual_ms - self._first_ms) / 1000.0 if count else 0.0
+        self.stats = {
+            "messages": count, "devices": len(self._ranges), "writer": self.writer,
+            "speed": self.speed, "span_seconds": span, "seconds": seconds,
+            "messages_per_s": count / seconds if seconds else 0.0,
+            "speedup": span / seconds if seconds else 0.0,
+            "episodes": episodes, "rollups": rollups,
+        }
+        logger.info("Reprodução concluída: %d mensagens (%.0f s gravados) em %.1fs (%.0fx), "
+                    "%d episódios", count, span, seconds, self.stats["speedup"], episodes)
+
+    def stop(self):
+        """Interrompe a leitura e grava o que já foi entregue (antes de parar a fila)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(30)
+        if not self.done.is_set() or not self.stats:
+            self._drain()
+
+
+def capture_files(patterns: str) -> List[str]:
+    """Arquivos de captura dos globs separados por vírgula (sem os .part em escrita)."""
+    paths = set()
+    for pattern in filter(None, (p.strip() for p in patterns.split(","))):
+        paths.update(path for path in glob.glob(pattern) if not path.endswith(".part"))
+    return sorted(paths)
+
+
+def read_capture(path: str) -> Iterator[Message]:
+    """Mensagens de um arquivo de captura (formato pelo nome: .aurc binário, senão NDJSON)."""
+    opener = gzip.open if path.endswith(".gz") else open
+    try:
+        with opener(path, "rb") as f:
+            if ".aurc" in os.path.basename(path):
+                if f.read(len(_BINARY_MAGIC)) != _BINARY_MAGIC:
+                    raise ValueError(f"Captura binária sem cabeçalho: {path}")
+                while True:
+                    header = f.read(_BINARY_RECORD.size)
+                    if len(header) < _BINARY_RECORD.size:
+                        break
+                    received_ms, topic_len, payload_len = _BINARY_RECORD.unpack(header)
+                    topic = f.read(topic_len).decode("utf-8")
+                    payload = f.read(payload_len)
+                    if len(payload) < payload_len:
+                        break
+                    yield received_ms, topic, payload
+            else:
+                for number, line in enumerate(f, start=1):
+                    try:
+                        record = json.loads(line)
+                        payload = (base64.b64decode(record["payload_b64"]) if "payload_b64" in record
+                                   else record["payload"].encode("utf-8"))
+                        message = (float(record["t"]), record["topic"], payload)
+                    except (ValueError, KeyError, TypeError, AttributeError):
+                        logger.warning("Linha %d inválida na captura %s", number, path)
+                        continue
+                    yield message
+    except (EOFError, zlib.error, gzip.BadGzipFile) as e:
+        # Arquivo interrompido por uma queda: vale o que foi lido até aqui
+        logger.warning("Captura %s truncada: %s", path, e)
+
+
+def capture_messages(paths: List[str]) -> Iterator[Message]:
+    """Mensagens de vários arquivos em ordem de chegada (capturas de várias instâncias)."""
+    return heapq.merge(*(read_capture(path) for path in paths), key=itemgetter(0))
+
+
+def replay_source_from_env() -> ReplaySource:
+    """ReplaySource de AURA_INGEST_REPLAY_PATH / _SPEED / _WRITER."""
+    paths = capture_files(REPLAY_PATH)
+    if not paths:
+        raise ValueError(f"AURA_INGEST_REPLAY_PATH sem arquivos de captura: {REPLAY_PATH!r}")
+    return ReplaySource(capture_messages(paths), speed=parse_replay_speed(REPLAY_SPEED),
+                        writer=REPLAY_WRITER or None, label=f"{len(paths)} arquivo(s) de captura")
+
+
+# ============================================================
+# GRAVAÇÃO
+# ============================================================
+
+class CaptureWriter:
+    """Arquivos gzip rotativos com as mensagens recebidas (formatos no início do módulo)."""
+
+    def __init__(self, directory: str, fmt: str = CAPTURE_FORMAT,
+                 rotate_bytes: int = int(CAPTURE_ROTATE_MB * 1024 * 1024),
+                 rotate_seconds: float = CAPTURE_ROTATE_MIN * 60, compresslevel: int = 6):
+        if fmt not in CAPTURE_FORMATS:
+            raise ValueError(f"Formato de captura inválido: {fmt} (use ndjson ou binary)")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.fmt = fmt
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compresslevel = compresslevel
+        self.files: List[str] = []
+        self._lock = threading.Lock()
+        self._raw = None
+        self._gz: Optional[gzip.GzipFile] = None
+        self._path: Optional[str] = None
+        self._rotate_at = 0.0
+        self._sequence = 0
+
+    def write(self, received_ms: float, topic: str, payload: bytes):
+        if self.fmt == "binary":
+            topic_bytes = topic.encode("utf-8")
+            record = _BINARY_RECORD.pack(received_ms, len(topic_bytes), len(payload)) \
+                + topic_bytes + payload
+        else:
+            try:
+                body = {"t": received_ms, "topic": topic, "payload": payload.decode("utf-8")}
+            except UnicodeDecodeError:
+                body = {"t": received_ms, "topic": topic,
+                        "payload_b64": base64.b64encode(payload).decode("ascii")}
+            record = json.dumps(body, separators=(",", ":")).encode("utf-8") + b"\n"
+        with self._lock:
+            if self._gz is None or self._raw.tell() >= self.rotate_bytes \
+                    or time.monotonic() >= self._rotate_at:
+                self._rotate()
+            self._gz.write(record)
+        INGEST_CAPTURE_MESSAGES.inc()
+
+    def _rotate(self):
+        self._close_file()
+        self._sequence += 1
+        name = (f"capture-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}-{self._sequence:04d}"
+                f"{CAPTURE_FORMATS[self.fmt]}")
+        self._path = os.path.join(self.directory, name)
+        self._raw = open(self._path + ".part", "wb")
+        self._gz = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=self.compresslevel)
+        if self.fmt == "binary":
+            self._gz.write(_BINARY_MAGIC)
+        self._rotate_at = time.monotonic() + self.rotate_seconds
+
+    def _close_file(self):
+        if self._gz is None:
+            return
+        self._gz.close()
+        self._raw.close()
+        os.replace(self._path + ".part", self._path)
+        self.files.append(self._path)
+        logger.info("Captura fechada: %s", self._path)
+        self._gz = self._raw = None
+
+    def close(self):
+        with self._lock:
+            self._close_file()
+
+
+_capture: Optional[CaptureWriter] = None
+
+
+def start_capture(directory: str = CAPTURE_DIR, fmt: str = CAPTURE_FORMAT) -> CaptureWriter:
+    global _capture
+    _capture = CaptureWriter(directory, fmt)
+    logger.info("Gravando mensagens recebidas em %s (%s)", directory, fmt)
+    return _capture
+
+
+def capture_message(topic: str, payload: bytes, received_ms: float):
+    """Grava a mensagem se a captura estiver ligada (erros não param a ingestão)."""
+    if _capture is None:
+        return
+    try:
+        _capture.write(received_ms, topic, payload)
+    except Exception as e:
+        logger.error("Erro ao gravar captura: %s", e)
+
+
+def stop_capture():
+    global _capture
+    if _capture is not None:
+        _capture.close()
+        _capture = None
@@ -0,0 +1,248 @@
+# app/services/live_feed.py
+"""
+Canal local (socket Unix) de leituras ao vivo entre o processo de ingestão e
+os workers da API.
+
+Com AURA_ROLE=ingest um único processo mantém a sessão MQTT, as janelas de
+features e as escritas; cada leitura persistida é publicada como uma linha
+JSON para todos os workers conectados. Com AURA_ROLE=api os workers
+(uvicorn --workers N) não consomem MQTT: assinam o canal e o /ws lê a última
+leitura da memória, sem consultar o banco. Exemplo (a partir de backend/):
+
+    AURA_ROLE=ingest uvicorn app.main:app --port 8001   # MQTT + /metrics da ingestão
+    AURA_ROLE=api uvicorn app.main:app --port 8000 --workers 4
+
+Cada assinante tem uma fila limitada; se um worker não acompanhar, as
+leituras mais novas são descartadas para ele (o /ws só envia a última mesmo).
+
+No sentido contrário, cada worker devolve {"type": "broadcast", "id", "at_ms"}
+quando o /ws envia uma leitura mais nova que a última devolvida, para o
+processo de ingestão (dono dos traces) marcar o estágio broadcast.
+"""
+import asyncio
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.metrics import Counter, Gauge
+from app.services.tracing_service import mark_broadcast, now_ms
+
+logger = logging.getLogger(__name__)
+
+LIVE_SOCKET_PATH = os.getenv("AURA_LIVE_SOCKET", "/tmp/aura-live.sock")
+LIVE_QUEUE_SIZE = 256  # mensagens pendentes por assinante
+LIVE_RECONNECT_SECONDS = 1.0
+LIVE_REPORT_BUFFER_BYTES = 64 * 1024  # retorno de broadcast pendente no worker
+
+LIVE_FEED_SUBSCRIBERS = Gauge(
+    "aura_live_feed_subscribers", "Workers da API conectados ao canal de leituras"
+)
+LIVE_FEED_DROPPED = Counter(
+    "aura_live_feed_dropped", "Leituras descartadas para assinantes lentos do canal"
+)
+
+_publisher: Optional["LiveFeedPublisher"] = None
+_subscriber_task: Optional["asyncio.Task[None]"] = None
+_latest: Optional[Dict[str, Any]] = None
+_feed_writer: Optional[asyncio.StreamWriter] = None
+_reported_id = 0
+
+
+def reading_message(reading) -> Dict[str, Any]:
+    """Mensagem "sensor_reading" do /ws a partir de um SensorReading."""
+    return {
+        "type": "sensor_reading",
+        "id": reading.id,
+        "device_id": reading.device_id,
+        "timestamp": reading.timestamp.isoformat(),
+        "acc_x": reading.acc_x,
+        "acc_y": reading.acc_y,
+        "acc_z": reading.acc_z,
+        "gyro_x": reading.gyro_x,
+        "gyro_y": reading.gyro_y,
+        "gyro_z": reading.gyro_z,
+        "temp": reading.temp,
+    }
+
+
+# ============================================================
+# PUBLICAÇÃO (processo de ingestão)
+# ============================================================
+
+class _Subscriber:
+    def __init__(self, conn: socket.socket):
+        self.conn = conn
+        self.queue: "queue.Queue[bytes]" = queue.Queue(maxsize=LIVE_QUEUE_SIZE)
+        self.thread = threading.Thread(target=self._write, daemon=True, name="aura-live-writer")
+        self.reader = threading.Thread(target=self._read, daemon=True, name="aura-live-reader")
+
+    def _write(self):
+        try:
+            while True:
+                self.conn.sendall(self.queue.get())
+        except OSError:
+            pass
+        finally:
+            self.conn.close()
+
+    def _read(self):
+        """Envios do /ws devolvidos pelo worker (estágio broadcast dos traces)."""
+        try:
+            for line in self.conn.makefile("rb"):
+                try:
+                    message = json.loads(line)
+                    if message.get("type") == "broadcast":
+                        mark_broadcast(int(message["id"]), float(message["at_ms"]))
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    logger.warning("Canal de leituras: retorno inválido do worker (%s)", e)
+        except OSError:
+            pass  # worker desconectou; _write encerra a conexão
+
+
+class LiveFeedPublisher:
+    """Servidor do socket Unix; publish() é chamado pela thread de ingestão."""
+
+    def __init__(self, path: str = LIVE_SOCKET_PATH):
+        self.path = path
+        self._subscribers: List[_Subscriber] = []
+        self._lock = threading.Lock()
+        self._server: Optional[socket.socket] = None
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # socket de uma execução anterior
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.path)
+        self._server.listen()
+        threading.Thread(target=self._accept, daemon=True, name="aura-live-accept").start()
+        logger.info("Canal de leituras ao vivo em %s", self.path)
+
+    def stop(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        with self._lock:
+            for subscriber in self._subscribers:
+                subscriber.conn.close()
+            self._subscribers.clear()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _accept(self):
+        while self._server is not None:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            subscriber = _Subscriber(conn)
+            with self._lock:
+                self._subscribers.append(subscriber)
+            subscriber.thread.start()
+            subscriber.reader.start()
+            logger.info("Worker da API conectado ao canal (%d)", len(self._subscribers))
+
+    def publish(self, message: Dict[str, Any]):
+        data = (json.dumps(message) + "\n").encode()
+        with self._lock:
+            alive = []
+            for subscriber in self._subscribers:
+                if not subscriber.thread.is_alive():
+                    continue  # worker desconectou
+                try:
+                    subscriber.queue.put_nowait(data)
+                except queue.Full:
+                    LIVE_FEED_DROPPED.inc()
+                alive.append(subscriber)
+            self._subscribers = alive
+        LIVE_FEED_SUBSCRIBERS.set(len(alive))
+
+
+def start_live_publisher(path: str = LIVE_SOCKET_PATH) -> LiveFeedPublisher:
+    global _publisher
+    _publisher = LiveFeedPublisher(path)
+    _publisher.start()
+    return _publisher
+
+
+def stop_live_publisher():
+    global _publisher
+    if _publisher is not None:
+        _publisher.stop()
+        _publisher = None
+
+
+def publish_reading(reading):
+    """Publica uma leitura persistida (no-op se o canal não foi iniciado)."""
+    if _publisher is not None:
+        _publisher.publish(reading_message(reading))
+
+
+# ============================================================
+# ASSINATURA (workers da API)
+# ============================================================
+
+def latest_message() -> Optional[Dict[str, Any]]:
+    """Última leitura recebida pelo canal (None antes da primeira)."""
+    return _latest
+
+
+def report_broadcast(reading_id: int):
+    """
+    Devolve ao processo de ingestão o id enviado pelo /ws (no-op sem conexão
+    ou se um id maior já foi devolvido por este worker). Chamar no event loop.
+    """
+    global _reported_id
+    if _feed_writer is None or reading_id <= _reported_id:
+        return
+    if _feed_writer.transport.get_write_buffer_size() > LIVE_REPORT_BUFFER_BYTES:
+        return  # ingestão não está lendo o retorno; não acumular
+    _reported_id = reading_id
+    message = {"type": "broadcast", "id": reading_id, "at_ms": now_ms()}
+    _feed_writer.write((json.dumps(message) + "\n").encode())
+
+
+async def _subscribe(path: str):
+    global _latest, _feed_writer
+    while True:
+        try:
+            reader, writer = await asyncio.open_unix_connection(path)
+        except OSError:
+            await asyncio.sleep(LIVE_RECONNECT_SECONDS)
+            continue
+        logger.info("Conectado ao canal de leituras %s", path)
+        _feed_writer = writer
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                _latest = json.loads(line)
+        except (OSError, ValueError) as e:
+            logger.warning("Canal de leituras: %s", e)
+        finally:
+            _feed_writer = None
+            writer.close()
+        logger.warning("Canal de leituras desconectado; reconectando...")
+        await asyncio.sleep(LIVE_RECONNECT_SECONDS)
+
+
+def start_live_subscriber(path: str = LIVE_SOCKET_PATH):
+    """Inicia a assinatura no event loop atual (chamar no startup da API)."""
+    global _subscriber_task
+    _subscriber_task = asyncio.get_running_loop().create_task(_subscribe(path))
+
+
+def stop_live_subscriber():
+    global _subscriber_task
+    if _subscriber_task is not None:
+        _subscriber_task.cancel()
+        _subscriber_task = None
+
+
+def message_lag_seconds(message: Dict[str, Any]) -> float:
+    return (datetime.now() - datetime.fromisoformat(message["timestamp"])).total_seconds()
@@ -0,0 +1,368 @@
+# app/services/overload_controller.py
+"""
+Controle de sobrecarga da ingestão: fidelidade adaptativa das features.
+
+A thread de persistência (app/services/ingest_queue.py) informa o tempo de
+cada mensagem; a cada segundo o controle compara a ocupação da fila e a
+fração do tempo em que a thread esteve ocupada com os limiares:
+
+- pressão (fila >= AURA_OVERLOAD_BACKLOG_HIGH da capacidade, ou thread
+  >= 90% ocupada com a fila crescendo mais de BACKLOG_GROWTH da capacidade
+  em GROWTH_TICKS avaliações): sobe um nível de degradação. Fila ocupada
+  mas estável (a thread dá conta da taxa de chegada) não é pressão;
+- folga (fila <= AURA_OVERLOAD_BACKLOG_LOW e ocupação estimada no nível
+  anterior < 70%) por AURA_OVERLOAD_HOLD_SECONDS: desce um nível.
+
+Os níveis são os modos de features_service.fidelity_mode: full →
+no_spectral → hop → minimal. Quase todo o custo por amostra é commit no
+banco, então o ganho grande vem do hop (uma feature a cada
+AURA_OVERLOAD_HOP amostras por dispositivo, metade dos commits); os demais
+cortam o cálculo.
+
+Cada período degradado vira um intervalo de leituras em feature_backfills.
+Com a fidelidade de volta a full e a fila vazia, uma thread recalcula esses
+intervalos em lotes (compute_features_resampled, mesmas fórmulas e mesma
+grade uniforme da ingestão), completando as features existentes e criando
+as que o hop pulou.
+
+AURA_OVERLOAD_CONTROL=off mantém sempre a fidelidade total.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.metrics import Counter, Gauge
+from app.models import FeatureBackfill, SensorFeature, SensorReading, DEFAULT_DEVICE_ID
+from app.services import features_service
+from app.services.features_service import (
+    compute_features_resampled, vector_magnitudes, window_history,
+)
+from app.services.ingest_partition import owns_device, partitioning_enabled
+
+logger = logging.getLogger(__name__)
+
+FIDELITY_MODES = ("full", "no_spectral", "hop", "minimal")
+
+OVERLOAD_CONTROL = os.getenv("AURA_OVERLOAD_CONTROL", "on")
+BACKLOG_HIGH = float(os.getenv("AURA_OVERLOAD_BACKLOG_HIGH", "0.2"))
+BACKLOG_LOW = float(os.getenv("AURA_OVERLOAD_BACKLOG_LOW", "0.02"))
+HOLD_SECONDS = float(os.getenv("AURA_OVERLOAD_HOLD_SECONDS", "5"))
+BUSY_HIGH = 0.9
+BUSY_LOW = 0.7
+EVAL_SECONDS = 1.0
+GROWTH_TICKS = 3  # avaliações (s) para considerar a fila crescendo
+BACKLOG_GROWTH = 0.01  # crescimento mínimo (fração da capacidade) nessas avaliações
+COST_EWMA_ALPHA = 0.05
+BACKFILL_INTERVAL_SECONDS = 2.0
+BACKFILL_CHUNK = 500  # leituras por transação do backfill
+# Pausa entre lotes proporcional à duração do lote: o backfill ocupa no máximo
+# metade do tempo do banco e não é confundido com sobrecarga pelo controle
+BACKFILL_DUTY_CYCLE = 0.5
+
+if OVERLOAD_CONTROL not in ("on", "off"):
+    raise ValueError(f"AURA_OVERLOAD_CONTROL inválido: {OVERLOAD_CONTROL} (use on ou off)")
+
+FEATURE_FIDELITY_LEVEL = Gauge(
+    "aura_feature_fidelity_level", "Nível de degradação das features (0 = full, 3 = minimal)"
+)
+FEATURE_FIDELITY_CHANGES = Counter(
+    "aura_feature_fidelity_changes", "Trocas de modo de fidelidade das features", ["mode"]
+)
+INGEST_BUSY_RATIO = Gauge(
+    "aura_ingest_busy_ratio", "Fração do tempo em que a thread de persistência esteve ocupada"
+)
+FEATURE_BACKFILLED = Counter(
+    "aura_feature_backfilled", "Features recalculadas pelo backfill após sobrecarga"
+)
+FEATURE_BACKFILL_PENDING = Gauge(
+    "aura_feature_backfill_pending", "Leituras aguardando backfill de features"
+)
+
+
+class OverloadController:
+    """
+    Decide o nível de fidelidade. observe() vem da thread de persistência e
+    tick() da thread de backfill (para reavaliar sem tráfego), por isso o lock.
+    """
+
+    def __init__(self, backlog: Callable[[], float],
+                 on_change: Optional[Callable[[int, int], None]] = None):
+        self.level = 0
+        self._backlog = backlog
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        self._window_started = time.monotonic()
+        self._busy = 0.0
+        self._changed_at = self._window_started
+        # Ocupação da fila nas últimas avaliações, desde a última troca de nível
+        self._backlogs: deque = deque(maxlen=GROWTH_TICKS)
+        # Custo médio por mensagem em cada nível (estima a ocupação ao descer)
+        self._cost: List[Optional[float]] = [None] * len(FIDELITY_MODES)
+
+    @property
+    def mode(self) -> str:
+        return FIDELITY_MODES[self.level]
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._busy += seconds
+            cost = self._cost[self.level]
+            self._cost[self.level] = seconds if cost is None else cost + COST_EWMA_ALPHA * (seconds - cost)
+        self.tick()
+
+    def tick(self):
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._window_started
+            if elapsed < EVAL_SECONDS:
+                return
+            busy = min(self._busy / elapsed, 1.0)
+            self._busy = 0.0
+            self._window_started = now
+            backlog = self._backlog()
+            change = self._decide(busy, backlog, now)
+            self._backlogs.append(backlog)
+            INGEST_BUSY_RATIO.set(busy)
+            if change is None:
+                return
+            old, self.level = self.level, change
+            self._changed_at = now
+            self._backlogs.clear()  # o novo nível precisa mostrar crescimento de novo
+        logger.warning("Fidelidade das features: %s → %s (ocupação %.0f%%, fila %.0f%%)",
+                       FIDELITY_MODES[old], FIDELITY_MODES[change], busy * 100, backlog * 100)
+        FEATURE_FIDELITY_LEVEL.set(change)
+        FEATURE_FIDELITY_CHANGES.labels(mode=FIDELITY_MODES[change]).inc()
+        if self.on_change:
+            self.on_change(old, change)
+
+    def _decide(self, busy: float, backlog: float, now: float) -> Optional[int]:
+        growing = (len(self._backlogs) == GROWTH_TICKS
+                   and backlog - self._backlogs[0] > BACKLOG_GROWTH)
+        pressured = backlog >= BACKLOG_HIGH or (
+            busy >= BUSY_HIGH and backlog > BACKLOG_LOW and growing
+        )
+        if pressured:
+            return self.level + 1 if self.level < len(FIDELITY_MODES) - 1 else None
+        if self.level == 0 or backlog > BACKLOG_LOW or now - self._changed_at < HOLD_SECONDS:
+            return None
+        current, previous = self._cost[self.level], self._cost[self.level - 1]
+        projected = busy * previous / current if current and previous else busy
+        return self.level - 1 if projected < BUSY_LOW else None
+
+
+# ============================================================
+# BACKFILL
+# ============================================================
+
+def _max_reading_id(db: Session) -> int:
+    return db.query(func.max(SensorReading.id)).scalar() or 0
+
+
+def _backfill_query(db: Session, owner: str):
+    query = db.query(FeatureBackfill)
+    if partitioning_enabled():
+        # Cada instância recalcula só o que ela mesma degradou. O dono é o
+        # AURA_MQTT_CLIENT_ID (fixo com particionamento): uma instância que
+        # caiu fecha e retoma os seus intervalos ao voltar
+        query = query.filter(FeatureBackfill.owner == owner)
+    return query
+
+
+def open_backfill_range(owner: str):
+    """Início de um período degradado (a leitura em andamento já entra)."""
+    db = SessionLocal()
+    try:
+        db.add(FeatureBackfill(owner=owner, start_reading_id=_max_reading_id(db)))
+        db.commit()
+    finally:
+        db.close()
+
+
+def close_backfill_ranges(owner: str):
+    """Fim do período degradado (também fecha intervalos deixados por uma queda)."""
+    db = SessionLocal()
+    try:
+        end = _max_reading_id(db)
+        _backfill_query(db, owner).filter(FeatureBackfill.end_reading_id.is_(None)).update(
+            {FeatureBackfill.end_reading_id: end}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _complete(reading: SensorReading) -> bool:
+    return None not in (reading.acc_x, reading.acc_y, reading.acc_z,
+                        reading.gyro_x, reading.gyro_y, reading.gyro_z)
+
+
+def _magnitudes(readings: List[SensorReading]):
+    acc = vector_magnitudes(*(
+        [getattr(r, f) for r in readings] for f in ("acc_x", "acc_y", "acc_z")
+    ))
+    gyro = vector_magnitudes(*(
+        [getattr(r, f) for r in readings] for f in ("gyro_x", "gyro_y", "gyro_z")
+    ))
+    return acc, gyro
+
+
+_FEATURE_COLUMNS = (
+    "acc_magnitude", "gyro_magnitude", "acc_mean", "acc_std", "acc_amplitude",
+    "gyro_mean", "gyro_std", "gyro_amplitude", "intensity", "freq_dominant",
+    "band_power", "tremor_score",
+)
+
+
+def backfill_step(db: Session, owner: str) -> int:
+    """Recalcula o próximo lote do intervalo pendente mais antigo; retorna as features gravadas."""
+    pending = (
+        _backfill_query(db, owner)
+        .filter(FeatureBackfill.end_reading_id.isnot(None))
+        .order_by(FeatureBackfill.id)
+        .first()
+    )
+    if pending is None:
+        return 0
+    lo = pending.start_reading_id
+    hi = min(pending.end_reading_id, lo + BACKFILL_CHUNK - 1)
+
+    readings = (
+        db.query(SensorReading)
+        .filter(SensorReading.id.between(lo, hi))
+        .order_by(SensorReading.id)
+        .all()
+    )
+    by_device: Dict[str, List[SensorReading]] = {}
+    for reading in readings:
+        device_id = reading.device_id or DEFAULT_DEVICE_ID
+        if _complete(reading) and owns_device(device_id):
+            by_device.setdefault(device_id, []).append(reading)
+
+    existing = dict(
+        db.query(SensorFeature.reading_id, SensorFeature.id)
+        .filter(SensorFeature.reading_id.between(lo, hi))
+        .all()
+    )
+    updates, inserts = [], []
+    for device_id, device_readings in by_device.items():
+        # Leituras anteriores entram na reamostragem só para completar a janela
+        history = window_history(db, device_id, device_readings[0].id)
+        sequence = history + device_readings
+        acc_mag, gyro_mag = _magnitudes(sequence)
+        features = compute_features_resampled([r.ts_ms for r in sequence], acc_mag, gyro_mag)
+        for i, reading in enumerate(device_readings, start=len(history)):
+            values = {}
+            for column in _FEATURE_COLUMNS:
+                value = float(features[column][i])
+                values[column] = None if math.isnan(value) else value
+            if reading.id in existing:
+                updates.append({"id": existing[reading.id], **values})
+            else:
+                inserts.append({"reading_id": reading.id, "device_id": device_id,
+                                "timestamp": reading.timestamp, **values})
+
+    if updates:
+        db.bulk_update_mappings(SensorFeature, updates)
+    if inserts:
+        db.bulk_insert_mappings(SensorFeature, inserts)
+    if hi >= pending.end_reading_id:
+        db.delete(pending)
+    else:
+        pending.start_reading_id = hi + 1
+    db.commit()
+    FEATURE_BACKFILLED.inc(len(updates) + len(inserts))
+    return len(updates) + len(inserts)
+
+
+def backfill_pending(db: Session, owner: str) -> int:
+    """Leituras ainda cobertas por intervalos de backfill."""
+    total = 0
+    end = None
+    for start, stop in _backfill_query(db, owner).with_entities(
+            FeatureBackfill.start_reading_id, FeatureBackfill.end_reading_id):
+        if stop is None:
+            end = _max_reading_id(db) if end is None else end
+            stop = end
+        total += max(stop - start + 1, 0)
+    return total
+
+
+# ============================================================
+# CICLO DE VIDA
+# ============================================================
+
+_controller: Optional[OverloadController] = None
+_owner = ""
+_stop = threading.Event()
+
+
+def observe_processing(seconds: float):
+    """Tempo de uma mensagem na thread de persistência (no-op sem controle)."""
+    if _controller is not None:
+        _controller.observe(seconds)
+
+
+def _apply_mode(owner: str, old: int, new: int):
+    features_service.fidelity_mode = FIDELITY_MODES[new]
+    if old == 0:
+        open_backfill_range(owner)
+    elif new == 0:
+        close_backfill_ranges(owner)
+
+
+def _backfill_loop(controller: OverloadController, owner: str, backlog: Callable[[], float]):
+    while not _stop.wait(BACKFILL_INTERVAL_SECONDS):
+        controller.tick()
+        db = SessionLocal()
+        try:
+            FEATURE_BACKFILL_PENDING.set(backfill_pending(db, owner))
+            # Só com fidelidade total e fila vazia, um lote por vez
+            while controller.level == 0 and backlog() <= BACKLOG_LOW and not _stop.is_set():
+                started = time.perf_counter()
+                if not backfill_step(db, owner):
+                    break
+                elapsed = time.perf_counter() - started
+                _stop.wait(elapsed * (1 - BACKFILL_DUTY_CYCLE) / BACKFILL_DUTY_CYCLE)
+            FEATURE_BACKFILL_PENDING.set(backfill_pending(db, owner))
+        except Exception as e:
+            logger.error("Erro no backfill de features: %s", e)
+            db.rollback()
+        finally:
+            db.close()
+
+
+def start_overload_control(owner: str, backlog: Callable[[], float]):
+    """Inicia o controle (chamado por start_mqtt junto com a fila de ingestão)."""
+    global _controller, _owner
+    if OVERLOAD_CONTROL == "off":
+        return
+    _owner = owner
+    # Intervalo deixado aberto por uma queda termina onde a ingestão parou
+    close_backfill_ranges(owner)
+    _stop.clear()
+    _controller = OverloadController(
+        backlog, on_change=lambda old, new: _apply_mode(owner, old, new)
+    )
+    FEATURE_FIDELITY_LEVEL.set(0)
+    threading.Thread(target=_backfill_loop, args=(_controller, owner, backlog), daemon=True,
+                     name="aura-feature-backfill").start()
+    logger.info("Controle de sobrecarga ativo (fila alta %.0f%%, hop %d)",
+                BACKLOG_HIGH * 100, features_service.FIDELITY_HOP)
+
+
+def stop_overload_control():
+    global _controller
+    _stop.set()
+    if _controller is not None:
+        if _controller.level:
+            close_backfill_ranges(_owner)
+        features_service.fidelity_mode = "full"
+        _controller = None
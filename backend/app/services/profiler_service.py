@@ -0,0 +1,148 @@
+# app/services/profiler_service.py
+"""
+Profiler por amostragem sob demanda para o processo em execução.
+
+Uma thread temporária lê sys._current_frames() a cada intervalo e conta as
+pilhas de todas as threads (loop do paho, threadpool da API, event loop, job
+de retenção). Nada é instalado quando o profiler não está rodando (sem
+sys.setprofile/settrace), então o custo ocioso é zero.
+"""
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+PROFILE_MAX_SECONDS = 60
+PROFILE_MIN_INTERVAL_MS = 1
+PROFILE_MAX_DEPTH = 128
+
+# Uma execução por vez: amostrar em paralelo só dobraria o custo
+_run_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Já existe uma execução do profiler em andamento."""
+
+
+def _frame_label(code, cache: Dict[Any, str]) -> str:
+    label = cache.get(code)
+    if label is None:
+        label = f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+        cache[code] = label
+    return label
+
+
+def _sample(seconds: float, interval: float) -> Tuple[Dict[Tuple[str, ...], int], int, float]:
+    """Conta pilhas (raiz → folha, prefixadas pelo nome da thread) durante `seconds`."""
+    own = threading.get_ident()
+    counts: Dict[Tuple[str, ...], int] = {}
+    labels: Dict[Any, str] = {}
+    samples = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+
+    while time.perf_counter() < deadline:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack: List[str] = []
+            while frame is not None and len(stack) < PROFILE_MAX_DEPTH:
+                stack.append(_frame_label(frame.f_code, labels))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            key = tuple(reversed(stack))
+            counts[key] = counts.get(key, 0) + 1
+        frame = None  # não reter referências às pilhas entre amostras
+        samples += 1
+        time.sleep(interval)
+
+    return counts, samples, time.perf_counter() - started
+
+
+def run_profile(seconds: float, interval_ms: float = 10.0) -> Dict[str, Any]:
+    """
+    Amostra todas as threads por `seconds`. Lança ProfilerBusy se outra
+    execução estiver em andamento.
+    """
+    if not _run_lock.acquire(blocking=False):
+        raise ProfilerBusy("Profiler já está em execução")
+    try:
+        seconds = min(max(float(seconds), 0.1), PROFILE_MAX_SECONDS)
+        interval = max(float(interval_ms), PROFILE_MIN_INTERVAL_MS) / 1000.0
+        counts, samples, elapsed = _sample(seconds, interval)
+    finally:
+        _run_lock.release()
+
+    return {
+        "seconds": elapsed,
+        "interval_ms": interval * 1000.0,
+        "samples": samples,
+        "stacks": counts,
+    }
+
+
+# ============================================================
+# FORMATOS DE SAÍDA
+# ============================================================
+
+def to_collapsed(profile: Dict[str, Any]) -> str:
+    """Formato "collapsed" (flamegraph.pl / speedscope / inferno): `a;b;c <contagem>`."""
+    lines = [
+        ";".join(frame.replace(";", ":") for frame in stack) + f" {count}"
+        for stack, count in sorted(profile["stacks"].items(), key=lambda item: -item[1])
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def to_speedscope(profile: Dict[str, Any], name: str = "aura-backend") -> Dict[str, Any]:
+    """Arquivo speedscope com um perfil "sampled" por thread (pesos em ms)."""
+    frames: List[Dict[str, Any]] = []
+    frame_index: Dict[str, int] = {}
+    per_thread: Dict[str, Dict[str, list]] = {}
+
+    for stack, count in profile["stacks"].items():
+        thread, calls = stack[0], stack[1:]
+        indices = []
+        for label in calls:
+            idx = frame_index.get(label)
+            if idx is None:
+                idx = frame_index[label] = len(frames)
+                func_name, _, location = label.partition(" (")
+                file_name, _, line = location.rstrip(")").rpartition(":")
+                frames.append({"name": func_name, "file": file_name, "line": int(line or 0)})
+            indices.append(idx)
+        entry = per_thread.setdefault(thread, {"samples": [], "weights": []})
+        entry["samples"].append(indices)
+        entry["weights"].append(count * profile["interval_ms"])
+
+    profiles = []
+    for thread, entry in sorted(per_thread.items()):
+        profiles.append({
+            "type": "sampled",
+            "name": thread,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(entry["weights"]),
+            "samples": entry["samples"],
+            "weights": entry["weights"],
+        })
+
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "aura-backend",
+        "activeProfileIndex": 0,
+        "shared": {"frames": frames},
+        "profiles": profiles,
+    }
+
+
+def profile_summary(profile: Dict[str, Any], top: Optional[int] = 20) -> List[Dict[str, Any]]:
+    """Funções folha mais amostradas (fração das amostras por thread somadas)."""
+    leaves: Dict[str, int] = {}
+    for stack, count in profile["stacks"].items():
+        leaves[stack[-1]] = leaves.get(stack[-1], 0) + count
+    total = sum(leaves.values()) or 1
+    ranked = sorted(leaves.items(), key=lambda item: -item[1])[:top]
+    return [{"frame": frame, "samples": count, "share": count / total} for frame, count in ranked]
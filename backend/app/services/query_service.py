@@ -0,0 +1,237 @@
+# app/services/query_service.py
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from app.models import FeatureRollup, SensorFeature
+from app.services.features_service import SAMPLING_RATE
+from app.services.retention_service import (
+    archive_bounds, epoch_seconds, floor_int, read_archive, rollup_resolutions, tier_segments,
+)
+
+# Métrica pública → (coluna bruta, coluna média no rollup, coluna máxima no rollup)
+METRICS = {
+    "intensity": ("intensity", "avg_intensity", "max_intensity"),
+    "amplitude": ("acc_amplitude", "avg_acc_amplitude", "max_acc_amplitude"),
+    "freq": ("freq_dominant", "avg_freq_dominant", None),
+    "band_power": ("band_power", "avg_band_power", None),
+}
+
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+
+_EPOCH = datetime(1970, 1, 1)
+_RAW_RESOLUTION = 1.0 / SAMPLING_RATE
+
+
+def _epoch_seconds(dt: datetime) -> float:
+    return (dt - _EPOCH).total_seconds()
+
+
+def _tiers() -> List[Dict[str, Any]]:
+    """Tiers consultáveis, do mais fino para o mais grosso."""
+    tiers = [{"tier": "raw", "resolution_seconds": _RAW_RESOLUTION}]
+    tiers += [{"tier": f"rollup_{r}s", "resolution_seconds": r} for r in rollup_resolutions()]
+    return tiers
+
+
+def _tier_oldest(db: Session, tier: Dict[str, Any], device_id: Optional[str]) -> Optional[datetime]:
+    if tier["tier"] == "raw":
+        q = db.query(func.min(SensorFeature.timestamp))
+        if device_id:
+            q = q.filter(SensorFeature.device_id == device_id)
+        return q.scalar()
+
+    q = db.query(func.min(FeatureRollup.bucket_start)).filter(
+        FeatureRollup.resolution_seconds == tier["resolution_seconds"]
+    )
+    if device_id:
+        q = q.filter(FeatureRollup.device_id == device_id)
+    return q.scalar()
+
+
+def plan_series_query(db: Session, device_id: Optional[str], start_dt: datetime,
+                      end_dt: datetime, points: int = DEFAULT_POINTS) -> Dict[str, Any]:
+    """
+    Escolhe o tier que responde ao intervalo com trabalho ~constante:
+    o mais grosso cuja resolução ainda cabe em um bucket de saída, desde que
+    cubra start_dt. Dados brutos expirados são lidos do arquivo (tier "archive").
+    """
+    span = (end_dt - start_dt).total_seconds()
+    bucket_seconds = max(span / points, _RAW_RESOLUTION)
+    tiers = _tiers()
+
+    ideal = max(i for i, t in enumerate(tiers) if t["resolution_seconds"] <= bucket_seconds)
+    # Preferência: ideal → mais finos (mesma forma, mais trabalho) → mais grossos
+    order = list(range(ideal, -1, -1)) + list(range(ideal + 1, len(tiers)))
+
+    chosen = None
+    raw_oldest = None
+    for idx in order:
+        tier = tiers[idx]
+        oldest = _tier_oldest(db, tier, device_id)
+        if tier["tier"] == "raw":
+            raw_oldest = oldest
+            bounds = archive_bounds("sensor_features")
+            if (oldest is None or oldest > start_dt) and bounds and bounds[0] <= start_dt:
+                chosen = {"tier": "archive", "resolution_seconds": _RAW_RESOLUTION}
+                break
+        if oldest is not None and oldest <= start_dt:
+            chosen = tier
+            break
+
+    if chosen is None:
+        # Nenhum tier cobre o início (dados começam depois): usar o ideal
+        chosen = tiers[ideal]
+
+    return {
+        "tier": chosen["tier"],
+        "resolution_seconds": chosen["resolution_seconds"],
+        "bucket_seconds": bucket_seconds,
+        "points": int(np.ceil(span / bucket_seconds)),
+        "estimated_rows": int(span / chosen["resolution_seconds"]),
+        # Até onde o arquivo é usado (a partir daí, sensor_features)
+        "archive_until": (raw_oldest or end_dt).isoformat() if chosen["tier"] == "archive" else None,
+    }
+
+
+# ============================================================
+# EXECUÇÃO
+# ============================================================
+
+def _empty_acc() -> Dict[str, float]:
+    return {"sum": 0.0, "count": 0.0, "max": None}
+
+
+def _merge(buckets: Dict[int, Dict[str, Any]], bucket: int, metric: str,
+           total, count, maximum):
+    """Acumula soma/contagem/máximo de uma métrica no bucket."""
+    entry = buckets.setdefault(bucket, {"samples": 0, "metrics": {}})
+    acc = entry["metrics"].setdefault(metric, _empty_acc())
+    if total is not None and count:
+        acc["sum"] += float(total)
+        acc["count"] += float(count)
+    if maximum is not None:
+        acc["max"] = float(maximum) if acc["max"] is None else max(acc["max"], float(maximum))
+
+
+def _db_buckets(db: Session, plan: Dict[str, Any], device_id: Optional[str], origin: datetime,
+                start_dt: datetime, end_dt: datetime, metrics: List[str],
+                buckets: Dict[int, Dict[str, Any]], resolution: int = 0):
+    """
+    Agrega [start_dt, end_dt) de um tier (0 = bruto, N = rollup de N s) em
+    buckets de saída direto no banco. Os buckets contam a partir de origin
+    (início da série), para que trechos de tiers diferentes se somem.
+    """
+    bucket_seconds = plan["bucket_seconds"]
+    is_raw = resolution == 0
+    model = SensorFeature if is_raw else FeatureRollup
+    ts = SensorFeature.timestamp if is_raw else FeatureRollup.bucket_start
+
+    # Mesmo floor do _archive_buckets (//), para os trechos caírem nos mesmos buckets
+    key = floor_int((epoch_seconds(ts) - _epoch_seconds(origin)) / bucket_seconds).label("bucket")
+    samples = func.count(SensorFeature.id) if is_raw else func.sum(FeatureRollup.samples)
+
+    columns = [key, samples.label("samples")]
+    for metric in metrics:
+        raw_col, avg_col, max_col = METRICS[metric]
+        if is_raw:
+            col = getattr(SensorFeature, raw_col)
+            columns += [func.sum(col), func.count(col), func.max(col)]
+        else:
+            col = getattr(FeatureRollup, avg_col)
+            weight = FeatureRollup.samples
+            columns += [
+                func.sum(col * weight),
+                func.sum(case((col.isnot(None), weight), else_=0)),
+                func.max(getattr(FeatureRollup, max_col)) if max_col else func.max(col),
+            ]
+
+    q = db.query(*columns).filter(ts >= start_dt, ts < end_dt)
+    if not is_raw:
+        q = q.filter(FeatureRollup.resolution_seconds == resolution)
+    if device_id:
+        q = q.filter(model.device_id == device_id)
+
+    for row in q.group_by(key).all():
+        bucket = int(row[0])
+        buckets.setdefault(bucket, {"samples": 0, "metrics": {}})["samples"] += int(row[1] or 0)
+        for i, metric in enumerate(metrics):
+            total, count, maximum = row[2 + 3 * i: 5 + 3 * i]
+            _merge(buckets, bucket, metric, total, count, maximum)
+
+
+def _archive_buckets(plan: Dict[str, Any], device_id: Optional[str],
+                     start_dt: datetime, end_dt: datetime, metrics: List[str],
+                     buckets: Dict[int, Dict[str, Any]]):
+    """Agrega features arquivadas (.npz) em buckets, vetorizado com NumPy."""
+    columns = [METRICS[m][0] for m in metrics]
+    data = read_archive("sensor_features", start_dt, end_dt, columns=columns, device_id=device_id)
+    if not len(data["timestamp"]):
+        return
+
+    seconds = data["timestamp"] / 1000.0 - _epoch_seconds(start_dt)
+    idx = (seconds // plan["bucket_seconds"]).astype(np.int64)
+    uniq, inverse = np.unique(idx, return_inverse=True)
+    counts = np.bincount(inverse)
+
+    for b, n in zip(uniq, counts):
+        buckets.setdefault(int(b), {"samples": 0, "metrics": {}})["samples"] += int(n)
+
+    for metric, col in zip(metrics, columns):
+        values = data[col].astype(np.float64)
+        valid = ~np.isnan(values)
+        sums = np.bincount(inverse[valid], weights=values[valid], minlength=len(uniq))
+        valid_counts = np.bincount(inverse[valid], minlength=len(uniq))
+        maxima = np.full(len(uniq), -np.inf)
+        np.maximum.at(maxima, inverse[valid], values[valid])
+        for i, b in enumerate(uniq):
+            if valid_counts[i]:
+                _merge(buckets, int(b), metric, sums[i], valid_counts[i], maxima[i])
+
+
+def get_series(db: Session, device_id: Optional[str], start_dt: datetime, end_dt: datetime,
+               metrics: List[str], points: int = DEFAULT_POINTS) -> Dict[str, Any]:
+    """
+    Série temporal com ~`points` buckets para qualquer intervalo (10 s a 1 ano).
+    Cada métrica traz a média do bucket; intensity/amplitude trazem também o máximo.
+    """
+    plan = plan_series_query(db, device_id, start_dt, end_dt, points)
+    buckets: Dict[int, Dict[str, Any]] = {}
+
+    if plan["tier"] == "archive":
+        archive_until = min(datetime.fromisoformat(plan["archive_until"]), end_dt)
+        _archive_buckets(plan, device_id, start_dt, archive_until, metrics, buckets)
+        if archive_until < end_dt:
+            _db_buckets(db, plan, device_id, start_dt, archive_until, end_dt, metrics, buckets)
+    else:
+        # Rollup só até a sua marca d'água; o resto vem dos tiers mais finos
+        resolution = 0 if plan["tier"] == "raw" else int(plan["resolution_seconds"])
+        for tier, seg_start, seg_end in tier_segments(db, resolution, start_dt, end_dt):
+            _db_buckets(db, plan, device_id, start_dt, seg_start, seg_end, metrics, buckets, tier)
+
+    out = []
+    for bucket in sorted(buckets):
+        entry = buckets[bucket]
+        point = {
+            "timestamp": (start_dt + timedelta(seconds=bucket * plan["bucket_seconds"])).isoformat(),
+            "samples": entry["samples"],
+        }
+        for metric in metrics:
+            acc = entry["metrics"].get(metric, _empty_acc())
+            point[metric] = acc["sum"] / acc["count"] if acc["count"] else None
+            if METRICS[metric][2]:
+                point[f"{metric}_max"] = acc["max"]
+        out.append(point)
+
+    return {
+        "device_id": device_id,
+        "start": start_dt.isoformat(),
+        "end": end_dt.isoformat(),
+        "metrics": metrics,
+        "plan": plan,
+        "data": out,
+    }
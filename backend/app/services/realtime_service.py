@@ -4,6 +4,10 @@ from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from app.models import SensorFeature, SensorReading
+from app.services.downsampling import downsample_indices
+from app.services.features_service import GRID_ANCHOR_MS, GRID_PERIOD_MS, RESAMPLE_MAX_GAP_MS
+from app.services.resampling import resample_signal
+from app.services.shm_ring import ShmRing
 import numpy as np
 
 
@@ -19,17 +23,7 @@ def get_latest_tremor_status(db: Session) -> Dict[str, Any]:
     )
     
     if not latest_feature:
-        return {
-            "status": "no_data",
-            "message": "Nenhum dado disponível",
-            "current_intensity": 0,
-            "avg_intensity_30s": 0,
-            "acc_magnitude": 0,
-            "gyro_magnitude": 0,
-            "freq_dominant": None,
-            "timestamp": None,
-            "is_parkinsonian": False
-        }
+        return _tremor_status(None, 0.0)
     
     # Calcular intensidade média dos últimos 30 segundos
     cutoff = datetime.now() - timedelta(seconds=30)
@@ -42,6 +36,30 @@ def get_latest_tremor_status(db: Session) -> Dict[str, Any]:
     recent_intensities = [f.intensity for f in recent_features if f.intensity is not None]
     avg_intensity_30s = float(np.mean(recent_intensities)) if recent_intensities else 0.0
     
+    return _tremor_status({
+        "intensity": latest_feature.intensity,
+        "acc_magnitude": latest_feature.acc_magnitude,
+        "gyro_magnitude": latest_feature.gyro_magnitude,
+        "freq_dominant": latest_feature.freq_dominant,
+        "timestamp": latest_feature.timestamp,
+    }, avg_intensity_30s)
+
+
+def _tremor_status(latest: Optional[Dict[str, Any]], avg_intensity_30s: float) -> Dict[str, Any]:
+    """Resposta de status a partir da última feature e da média de 30 s."""
+    if not latest:
+        return {
+            "status": "no_data",
+            "message": "Nenhum dado disponível",
+            "current_intensity": 0,
+            "avg_intensity_30s": 0,
+            "acc_magnitude": 0,
+            "gyro_magnitude": 0,
+            "freq_dominant": None,
+            "timestamp": None,
+            "is_parkinsonian": False
+        }
+    
     # Determinar status qualitativo
     if avg_intensity_30s < 2:
         status = "normal"
@@ -60,72 +78,96 @@ def get_latest_tremor_status(db: Session) -> Dict[str, Any]:
         status_text = "Tremor intenso"
         color = "red"
     
+    freq_dominant = latest["freq_dominant"]
     return {
         "status": status,
         "status_text": status_text,
         "color": color,
-        "current_intensity": round(latest_feature.intensity, 2) if latest_feature.intensity else 0,
+        "current_intensity": round(latest["intensity"], 2) if latest["intensity"] else 0,
         "avg_intensity_30s": round(avg_intensity_30s, 2),
-        "acc_magnitude": round(latest_feature.acc_magnitude, 4) if latest_feature.acc_magnitude else 0,
-        "gyro_magnitude": round(latest_feature.gyro_magnitude, 4) if latest_feature.gyro_magnitude else 0,
-        "freq_dominant": round(latest_feature.freq_dominant, 2) if latest_feature.freq_dominant else None,
-        "timestamp": latest_feature.timestamp.isoformat(),
-        "is_parkinsonian": (4 <= (latest_feature.freq_dominant or 0) <= 6) if latest_feature.freq_dominant else False
+        "acc_magnitude": round(latest["acc_magnitude"], 4) if latest["acc_magnitude"] else 0,
+        "gyro_magnitude": round(latest["gyro_magnitude"], 4) if latest["gyro_magnitude"] else 0,
+        "freq_dominant": round(freq_dominant, 2) if freq_dominant else None,
+        "timestamp": latest["timestamp"].isoformat(),
+        "is_parkinsonian": (4 <= freq_dominant <= 6) if freq_dominant else False
     }
 
 
-def get_realtime_series(db: Session, duration_seconds: int = 60) -> List[Dict[str, Any]]:
+def get_realtime_series(db: Session, duration_seconds: int = 60,
+                        max_points: Optional[int] = None,
+                        mode: str = "lttb") -> List[Dict[str, Any]]:
     """
     Retorna série temporal para gráfico em tempo real.
+    Com max_points, reduz a série (LTTB ou envelope min/max sobre a intensidade)
+    antes de serializar, mantendo o tamanho da resposta constante.
     """
     cutoff = datetime.now() - timedelta(seconds=duration_seconds)
     
-    features = (
-        db.query(SensorFeature)
+    rows = (
+        db.query(
+            SensorFeature.timestamp,
+            SensorFeature.intensity,
+            SensorFeature.acc_magnitude,
+            SensorFeature.gyro_magnitude,
+            SensorFeature.freq_dominant
+        )
         .filter(SensorFeature.timestamp >= cutoff)
         .order_by(SensorFeature.timestamp)
         .all()
     )
     
+    if max_points and len(rows) > max_points:
+        timestamps = np.array([r.timestamp for r in rows], dtype="datetime64[us]")
+        intensities = np.array(
+            [r.intensity if r.intensity is not None else np.nan for r in rows], dtype=np.float64
+        )
+        keep = downsample_indices(timestamps.astype(np.int64), intensities, max_points, mode)
+        rows = [rows[i] for i in keep]
+    
     return [
-        {
-            "timestamp": f.timestamp.isoformat(),
-            "intensity": round(f.intensity, 2) if f.intensity else 0,
-            "acc_magnitude": round(f.acc_magnitude, 4) if f.acc_magnitude else 0,
-            "gyro_magnitude": round(f.gyro_magnitude, 4) if f.gyro_magnitude else 0,
-            "freq_dominant": round(f.freq_dominant, 2) if f.freq_dominant else None
-        }
-        for f in features
+        _series_point(f.timestamp, f.intensity, f.acc_magnitude, f.gyro_magnitude, f.freq_dominant)
+        for f in rows
     ]
 
 
-def get_fft_spectrum(db: Session, window_size: int = 100) -> Dict[str, Any]:
+def _series_point(timestamp, intensity, acc_magnitude, gyro_magnitude, freq_dominant) -> Dict[str, Any]:
+    return {
+        "timestamp": timestamp.isoformat(),
+        "intensity": round(intensity, 2) if intensity else 0,
+        "acc_magnitude": round(acc_magnitude, 4) if acc_magnitude else 0,
+        "gyro_magnitude": round(gyro_magnitude, 4) if gyro_magnitude else 0,
+        "freq_dominant": round(freq_dominant, 2) if freq_dominant else None
+    }
+
+
+def get_fft_signal(db: Session, window_size: int = 100) -> List[float]:
     """
-    Retorna espectro FFT dos últimos dados para visualização.
+    Série de intensidade (mais antigo primeiro) das últimas `window_size`
+    features, entrada de compute_fft_spectrum. Reamostrada na grade uniforme
+    pelo timestamp (horário da amostra): a FFT supõe período fixo.
     """
-    latest_features = (
-        db.query(SensorFeature)
+    rows = (
+        db.query(SensorFeature.timestamp, SensorFeature.intensity)
+        .filter(SensorFeature.intensity.isnot(None))
         .order_by(SensorFeature.timestamp.desc())
         .limit(window_size)
         .all()
     )
-    
-    if len(latest_features) < 10:
-        return {
-            "status": "insufficient_data",
-            "frequencies": [],
-            "magnitudes": [],
-            "dominant_frequency": None,
-            "is_parkinsonian": False,
-            "window_size": len(latest_features)
-        }
-    
-    # Reverter ordem (mais antigo primeiro)
-    latest_features.reverse()
-    
-    # Extrair série temporal de intensidade
-    signal = [f.intensity for f in latest_features if f.intensity is not None]
-    
+    rows.reverse()
+    return _uniform_signal([r.timestamp.timestamp() * 1000.0 for r in rows],
+                           [r.intensity for r in rows], window_size)
+
+
+def _uniform_signal(t_ms: List[float], values: List[float], window_size: int) -> List[float]:
+    signal = resample_signal(t_ms, values, GRID_PERIOD_MS, RESAMPLE_MAX_GAP_MS, GRID_ANCHOR_MS)
+    return signal[-window_size:].tolist()
+
+
+def compute_fft_spectrum(signal: List[float]) -> Dict[str, Any]:
+    """
+    Espectro FFT de uma série de intensidade. Função pura (sem sessão), para
+    poder rodar no executor de CPU (app.services.cpu_executor).
+    """
     if len(signal) < 10:
         return {
             "status": "insufficient_data",
@@ -171,6 +213,57 @@ def get_fft_spectrum(db: Session, window_size: int = 100) -> Dict[str, Any]:
     }
 
 
+def get_fft_spectrum(db: Session, window_size: int = 100) -> Dict[str, Any]:
+    """
+    Retorna espectro FFT dos últimos dados para visualização (na thread atual).
+    """
+    return compute_fft_spectrum(get_fft_signal(db, window_size))
+
+
+# ============================================================
+# LEITURA DO RING EM MEMÓRIA COMPARTILHADA (workers com AURA_ROLE=api)
+# ============================================================
+
+def _nan_to_none(values: np.ndarray) -> List[Optional[float]]:
+    return [None if v != v else v for v in values.tolist()]
+
+
+def get_latest_tremor_status_from_ring(ring: ShmRing) -> Dict[str, Any]:
+    """Mesma resposta de get_latest_tremor_status, sem consultar o banco."""
+    latest = ring.latest("feature")
+    if latest is None:
+        return _tremor_status(None, 0.0)
+    recent = ring.window("feature", seconds=30)["intensity"]
+    recent = recent[~np.isnan(recent)]
+    latest = {k: (None if isinstance(v, float) and v != v else v) for k, v in latest.items()}
+    latest["timestamp"] = datetime.fromtimestamp(latest["t"])
+    return _tremor_status(latest, float(recent.mean()) if len(recent) else 0.0)
+
+
+def get_realtime_series_from_ring(ring: ShmRing, duration_seconds: int = 60,
+                                  max_points: Optional[int] = None,
+                                  mode: str = "lttb") -> List[Dict[str, Any]]:
+    """Mesma saída de get_realtime_series, a partir do ring."""
+    rows = ring.window("feature", seconds=duration_seconds)
+    if max_points and len(rows) > max_points:
+        keep = downsample_indices((rows["t"] * 1e6).astype(np.int64), rows["intensity"],
+                                  max_points, mode)
+        rows = rows[keep]
+    columns = zip(
+        [datetime.fromtimestamp(t) for t in rows["t"].tolist()],
+        _nan_to_none(rows["intensity"]), _nan_to_none(rows["acc_magnitude"]),
+        _nan_to_none(rows["gyro_magnitude"]), _nan_to_none(rows["freq_dominant"]),
+    )
+    return [_series_point(*point) for point in columns]
+
+
+def get_fft_signal_from_ring(ring: ShmRing, window_size: int = 100) -> List[float]:
+    """Mesma série de get_fft_signal, a partir do ring."""
+    records = ring.window("feature", last=window_size)
+    records = records[~np.isnan(records["intensity"])]
+    return _uniform_signal((records["t"] * 1000.0).tolist(), records["intensity"].tolist(), window_size)
+
+
 def get_sensor_health(db: Session) -> Dict[str, Any]:
     """
     Retorna status de saúde do sensor.
@@ -0,0 +1,188 @@
+# app/services/resampling.py
+"""
+Reamostragem para uma grade uniforme no relógio do dispositivo (ts_ms).
+
+As amostras chegam com espaçamento irregular (jitter do dispositivo, perdas,
+lotes da rede), mas a FFT das features supõe um período fixo. Cada série é
+interpolada linearmente nos pontos âncora + k * período.
+
+A âncora é uma amostra real: a primeira de cada segmento e, depois, a
+primeira de cada intervalo de anchor_ms do relógio do dispositivo. Um
+dispositivo regular cai sobre a própria grade (a interpolação só corrige o
+jitter, sem atenuar o tremor como uma grade fora de fase faria), e a grade
+de qualquer trecho depende só das amostras desde o início do intervalo de
+anchor_ms: o backfill e reprocessamentos reconstroem a mesma grade do fluxo
+ao vivo a partir do banco.
+
+Regras, iguais nas duas formas:
+
+- a primeira amostra de um segmento é um ponto da grade (a âncora);
+- cada amostra seguinte emite os pontos da grade em (anterior, atual];
+- a primeira amostra de um novo intervalo de anchor_ms emite os pontos da
+  grade antiga antes dela e passa a ser a âncora (um passo irregular na
+  emenda, do tamanho do desvio de fase acumulado);
+- salto maior que max_gap_ms (para frente ou para trás, ex.: reinício do
+  dispositivo) começa um segmento novo, sem interpolar através da lacuna;
+- amostra atrasada (ts_ms <= último, dentro de max_gap_ms) não emite nada.
+
+StreamResampler é a forma incremental (um dispositivo, amostra a amostra);
+resample_batch a vetorizada, com o mesmo resultado bit a bit.
+"""
+import math
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+def _interp(t0: float, v0: float, t1: float, v1: float, g: float) -> float:
+    return v0 + (v1 - v0) * ((g - t0) / (t1 - t0))
+
+
+class StreamResampler:
+    """Reamostragem incremental das séries de um dispositivo."""
+
+    __slots__ = ("period_ms", "max_gap_ms", "anchor_ms", "anchor", "next_k",
+                 "last_t", "last_values")
+
+    def __init__(self, period_ms: float, max_gap_ms: float, anchor_ms: float):
+        self.period_ms = period_ms
+        self.max_gap_ms = max_gap_ms
+        self.anchor_ms = anchor_ms
+        self.anchor = 0.0
+        self.next_k = 0
+        self.last_t = None
+        self.last_values: Tuple[float, ...] = ()
+
+    def push(self, t_ms: float, values: Tuple[float, ...]) -> Tuple[bool, List[Tuple[float, ...]]]:
+        """
+        Processa uma amostra. Retorna (novo segmento, valores nos pontos da
+        grade emitidos), um tuple por ponto na ordem de `values`.
+        """
+        if self.last_t is None or abs(t_ms - self.last_t) > self.max_gap_ms:
+            self.anchor, self.next_k = t_ms, 1
+            self.last_t, self.last_values = t_ms, values
+            return True, [values]
+        if t_ms <= self.last_t:
+            return False, []
+        t0, v0 = self.last_t, self.last_values
+        reanchor = t_ms // self.anchor_ms != t0 // self.anchor_ms
+        rows = []
+        k = self.next_k
+        while True:
+            g = self.anchor + k * self.period_ms
+            if g > t_ms or (reanchor and g >= t_ms):
+                break
+            if g == t_ms:
+                rows.append(values)
+            else:
+                rows.append(tuple(_interp(t0, a, t_ms, b, g) for a, b in zip(v0, values)))
+            k += 1
+        if reanchor:
+            rows.append(values)
+            self.anchor, k = t_ms, 1
+        self.next_k = k
+        self.last_t, self.last_values = t_ms, values
+        return False, rows
+
+
+def _walk(t_ms: np.ndarray, max_gap_ms: float):
+    """
+    Percorre os instantes como o StreamResampler: índice do segmento de cada
+    amostra, máscara das que entram na interpolação e, por amostra, o último
+    instante usado até ela.
+    """
+    n = len(t_ms)
+    diffs = np.diff(t_ms)
+    if (diffs > 0).all():
+        # Caso comum (tudo em ordem): sem laço em Python
+        segment = np.concatenate([[0], np.cumsum(diffs > max_gap_ms)])
+        return segment, np.ones(n, dtype=bool), t_ms
+
+    segment = np.empty(n, dtype=np.int64)
+    used = np.zeros(n, dtype=bool)
+    last_used = np.empty(n)
+    current = -1
+    last_t = None
+    for i, t in enumerate(t_ms.tolist()):
+        if last_t is None or abs(t - last_t) > max_gap_ms:
+            current += 1
+            last_t = t
+            used[i] = True
+        elif t > last_t:
+            last_t = t
+            used[i] = True
+        segment[i] = current
+        last_used[i] = last_t
+    return segment, used, last_used
+
+
+def _segment_grid(ts: np.ndarray, period_ms: float, anchor_ms: float) -> np.ndarray:
+    """Pontos da grade de um segmento (instantes usados, crescentes)."""
+    epoch = ts // anchor_ms
+    anchors = np.concatenate([[0], np.flatnonzero(np.diff(epoch)) + 1])
+    parts = []
+    for r, i in enumerate(anchors.tolist()):
+        a = ts[i]
+        last = r + 1 == len(anchors)
+        end = ts[-1] if last else ts[anchors[r + 1]]
+        k = np.arange(0, math.ceil((end - a) / period_ms) + 2)
+        g = a + k * period_ms
+        parts.append(g[g <= end] if last else g[g < end])
+    return np.concatenate(parts)
+
+
+def resample_batch(t_ms: Sequence[float], series: Sequence[Sequence[float]],
+                   period_ms: float, max_gap_ms: float, anchor_ms: float):
+    """
+    Forma vetorizada de StreamResampler para uma sequência de amostras (na
+    ordem de processamento). Retorna:
+
+    - grid: lista de arrays, uma por série, com os pontos da grade de todos os
+      segmentos concatenados;
+    - segment_starts: índice em grid do primeiro ponto de cada segmento;
+    - sample_index: para cada amostra, o índice em grid do último ponto
+      emitido até ela (fim da janela que o fluxo ao vivo teria).
+    """
+    t = np.asarray(t_ms, dtype=np.float64)
+    values = [np.asarray(s, dtype=np.float64) for s in series]
+    if not len(t):
+        return [np.empty(0) for _ in values], np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    segment, used, last_used = _walk(t, max_gap_ms)
+
+    grid = [[] for _ in values]
+    segment_starts = []
+    sample_index = np.empty(len(t), dtype=np.int64)
+    position = 0
+    order = np.flatnonzero(used)
+    bounds = np.searchsorted(segment[order], np.arange(segment[-1] + 2))
+    sample_bounds = np.searchsorted(segment, np.arange(segment[-1] + 2))
+    for s in range(segment[-1] + 1):
+        idx = order[bounds[s]:bounds[s + 1]]
+        ts = t[idx]
+        g = _segment_grid(ts, period_ms, anchor_ms)
+        # Intervalo [ts[j], ts[j + 1]) de cada ponto; ponto igual ao último
+        # instante usa o valor da amostra
+        j = np.clip(np.searchsorted(ts, g, side="right") - 1, 0, max(len(ts) - 2, 0))
+        for out, v in zip(grid, values):
+            vs = v[idx]
+            if len(ts) > 1:
+                t0, t1, v0, v1 = ts[j], ts[j + 1], vs[j], vs[j + 1]
+                out.append(np.where(g == t1, v1, v0 + (v1 - v0) * ((g - t0) / (t1 - t0))))
+            else:
+                out.append(np.full(len(g), vs[0]))
+        rows = slice(sample_bounds[s], sample_bounds[s + 1])
+        sample_index[rows] = position + np.searchsorted(g, last_used[rows], side="right") - 1
+        segment_starts.append(position)
+        position += len(g)
+
+    grid_arrays = [np.concatenate(parts) for parts in grid]
+    return grid_arrays, np.asarray(segment_starts, dtype=np.int64), sample_index
+
+
+def resample_signal(t_ms: Sequence[float], values: Sequence[float], period_ms: float,
+                    max_gap_ms: float, anchor_ms: float) -> np.ndarray:
+    """Série na grade uniforme a partir do último segmento (ex.: entrada da FFT)."""
+    grid, starts, _ = resample_batch(t_ms, [values], period_ms, max_gap_ms, anchor_ms)
+    if not len(starts):
+        return np.empty(0)
+    return grid[0][starts[-1]:]
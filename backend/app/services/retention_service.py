@@ -0,0 +1,770 @@
+# app/services/retention_service.py
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import (
+    DateTime, Float, Integer, case, delete, exists, func, insert, select, text,
+)
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import FunctionElement
+
+from app.db import SessionLocal
+from app.models import FeatureRollup, SensorFeature, SensorReading
+
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# POLÍTICA DE RETENÇÃO (declarativa)
+# ============================================================
+# keep_days=None → manter para sempre.
+# Cada tier de rollup é gerado a partir do tier imediatamente mais fino
+# (features brutas → 1s → 60s → 1h → 1d), então só é possível expirar um tier
+# depois que o tier seguinte já cobriu aquele intervalo. Leituras seguem as
+# features (sensor_features.reading_id): expiram depois delas e só as que já
+# não têm feature.
+RETENTION_POLICY: List[Dict[str, Any]] = [
+    {"table": "sensor_features", "keep_days": 7, "archive": True},
+    {"table": "sensor_readings", "keep_days": 7, "archive": True},
+    {"table": "feature_rollups", "resolution_seconds": 1, "keep_days": 90},
+    {"table": "feature_rollups", "resolution_seconds": 60, "keep_days": None},
+    # Tiers grossos para intervalos longos: 1 ano em /query/series lê ~8,8 mil
+    # buckets de 1h por dispositivo em vez de ~525 mil de 60s
+    {"table": "feature_rollups", "resolution_seconds": 3600, "keep_days": None},
+    {"table": "feature_rollups", "resolution_seconds": 86400, "keep_days": None},
+    {"table": "episodes", "keep_days": None},
+]
+
+RETENTION_INTERVAL_SECONDS = 600  # intervalo do job agendado (mantém rollups recentes)
+RETENTION_BATCH_SIZE = 5000  # linhas por lote de DELETE
+RETENTION_MAX_BATCHES = 200  # lotes por execução (limita a duração de cada ciclo)
+ROLLUP_CHUNK_BUCKETS = 3600  # buckets processados por transação de rollup
+ROLLUP_LAG_SECONDS = 5  # não agregar buckets que ainda podem receber dados
+ROLLUP_EPISODE_THRESHOLD = 6.0  # mesmo critério de stats_service (intensity > 6.0)
+ARCHIVE_DIR = os.path.join(".", "archive")
+
+# Tamanho médio aproximado por linha (usado quando o banco não informa páginas livres)
+APPROX_ROW_BYTES = {
+    "sensor_readings": 96,
+    "sensor_features": 144,
+    "feature_rollups": 112,
+}
+
+_EPOCH = datetime(1970, 1, 1)
+
+_TABLES = {
+    "sensor_readings": (SensorReading, SensorReading.timestamp),
+    "sensor_features": (SensorFeature, SensorFeature.timestamp),
+    "feature_rollups": (FeatureRollup, FeatureRollup.bucket_start),
+}
+
+
+# ============================================================
+# SELEÇÃO DE RESOLUÇÃO
+# ============================================================
+
+def rollup_resolutions() -> List[int]:
+    """Resoluções de rollup declaradas na política, da mais fina para a mais grossa."""
+    return sorted(
+        p["resolution_seconds"] for p in RETENTION_POLICY if p["table"] == "feature_rollups"
+    )
+
+
+def _cutoff(policy: Optional[Dict[str, Any]], now: datetime) -> Optional[datetime]:
+    if policy is None or policy.get("keep_days") is None:
+        return None
+    return now - timedelta(days=policy["keep_days"])
+
+
+def _oldest_timestamp(db: Session, resolution: int) -> Optional[datetime]:
+    if resolution == 0:
+        return db.query(func.min(SensorFeature.timestamp)).scalar()
+    return (
+        db.query(func.min(FeatureRollup.bucket_start))
+        .filter(FeatureRollup.resolution_seconds == resolution)
+        .scalar()
+    )
+
+
+def pick_feature_resolution(db: Session, start_dt: datetime) -> int:
+    """
+    Retorna a resolução mais fina ainda disponível para dados a partir de start_dt.
+    0 = features brutas (sensor_features); N > 0 = rollup de N segundos.
+    """
+    tiers = [0] + rollup_resolutions()
+    oldest = {r: _oldest_timestamp(db, r) for r in tiers}
+    known = [ts for ts in oldest.values() if ts is not None]
+    if not known:
+        return 0
+
+    # Não exigir cobertura anterior ao primeiro dado existente em qualquer tier
+    effective_start = max(start_dt, min(known))
+    for resolution in tiers:
+        if oldest[resolution] is not None and oldest[resolution] <= effective_start:
+            return resolution
+    return 0
+
+
+def feature_segments(db: Session, start_dt: datetime,
+                     end_dt: datetime) -> List[Tuple[int, datetime, datetime]]:
+    """tier_segments a partir da resolução de pick_feature_resolution."""
+    return tier_segments(db, pick_feature_resolution(db, start_dt), start_dt, end_dt)
+
+
+def tier_segments(db: Session, resolution: int, start_dt: datetime,
+                  end_dt: datetime) -> List[Tuple[int, datetime, datetime]]:
+    """
+    Divide [start_dt, end_dt) em trechos (resolução, início, fim): `resolution`
+    vale até a sua marca d'água; o que ainda não foi agregado (os últimos
+    minutos) vem do tier mais fino seguinte, até as features brutas (0).
+    """
+    segments = []
+    cursor = start_dt
+    for tier in sorted((r for r in rollup_resolutions() if r <= resolution), reverse=True):
+        watermark = rollup_watermark(db, tier)
+        if cursor >= end_dt or watermark is None or watermark <= cursor:
+            continue
+        stop = min(end_dt, watermark)
+        segments.append((tier, cursor, stop))
+        cursor = stop
+    if cursor < end_dt:
+        segments.append((0, cursor, end_dt))
+    return segments
+
+
+def weighted_avg(column, weight):
+    """Média ponderada ignorando NULLs (equivalente a avg() sobre as linhas originais)."""
+    return func.sum(column * weight) / func.nullif(
+        func.sum(case((column.isnot(None), weight), else_=0)), 0
+    )
+
+
+def feature_aggregates(resolution: int) -> Dict[str, Any]:
+    """
+    Expressões de agregação de intensidade equivalentes para qualquer tier.
+    Permite que as consultas analíticas troquem de tabela sem mudar o formato.
+    """
+    if resolution == 0:
+        return {
+            "timestamp": SensorFeature.timestamp,
+            "avg_intensity": func.avg(SensorFeature.intensity),
+            "max_intensity": func.max(SensorFeature.intensity),
+            "samples": func.count(SensorFeature.id),
+            "episode_candidates": func.sum(
+                case((SensorFeature.intensity > ROLLUP_EPISODE_THRESHOLD, 1), else_=0)
+            ),
+            "filters": [],
+        }
+
+    r = FeatureRollup
+    return {
+        "timestamp": r.bucket_start,
+        "avg_intensity": weighted_avg(r.avg_intensity, r.samples),
+        "max_intensity": func.max(r.max_intensity),
+        "samples": func.sum(r.samples),
+        "episode_candidates": func.sum(r.episode_candidates),
+        "filters": [r.resolution_seconds == resolution],
+    }
+
+
+def aggregate_features(db: Session, start_dt: datetime, end_dt: datetime,
+                       group_by: Callable[[Any], List[Any]]) -> List[Dict[str, Any]]:
+    """
+    Agregados de feature_aggregates em [start_dt, end_dt) por grupo, somando
+    os trechos de feature_segments. group_by recebe a coluna de tempo do tier
+    e devolve as expressões rotuladas do grupo (ex.: dia, hora).
+    Retorna um dict por grupo (rótulos + avg_intensity, max_intensity,
+    samples, episode_candidates), ordenado pelos rótulos.
+    """
+    merged: Dict[tuple, Dict[str, Any]] = {}
+    weights: Dict[tuple, int] = {}
+    for resolution, seg_start, seg_end in feature_segments(db, start_dt, end_dt):
+        agg = feature_aggregates(resolution)
+        ts = agg["timestamp"]
+        keys = group_by(ts)
+        rows = (
+            db.query(
+                *keys,
+                agg["avg_intensity"].label("avg_intensity"),
+                agg["max_intensity"].label("max_intensity"),
+                agg["samples"].label("samples"),
+                agg["episode_candidates"].label("episode_candidates"),
+            )
+            .filter(ts >= seg_start, ts < seg_end, *agg["filters"])
+            .group_by(*keys)
+            .all()
+        )
+        for row in rows:
+            values = row._mapping
+            group = tuple(values[k.name] for k in keys)
+            entry = merged.setdefault(group, {
+                **{k.name: values[k.name] for k in keys},
+                "avg_intensity": None, "max_intensity": None,
+                "samples": 0, "episode_candidates": 0,
+            })
+            samples = int(values["samples"] or 0)
+            if values["avg_intensity"] is not None and samples:
+                # Média ponderada pelas amostras de cada trecho
+                weight = weights.get(group, 0)
+                total = (entry["avg_intensity"] or 0.0) * weight + float(values["avg_intensity"]) * samples
+                weights[group] = weight + samples
+                entry["avg_intensity"] = total / weights[group]
+            if values["max_intensity"] is not None:
+                entry["max_intensity"] = float(values["max_intensity"]) if entry["max_intensity"] is None \
+                    else max(entry["max_intensity"], float(values["max_intensity"]))
+            entry["samples"] += samples
+            entry["episode_candidates"] += int(values["episode_candidates"] or 0)
+    return [merged[group] for group in sorted(merged)]
+
+
+# ============================================================
+# EPOCH POR DIALETO
+# ============================================================
+# strftime('%s') só existe no SQLite; o Postgres (asyncpg) usa EXTRACT(EPOCH).
+# Os dois tratam o DateTime sem timezone como UTC, como _EPOCH aqui.
+
+class epoch_seconds(FunctionElement):
+    """Segundos desde epoch (com fração de ms) de uma coluna DateTime."""
+    type = Float()
+    inherit_cache = True
+
+
+class epoch_whole_seconds(FunctionElement):
+    """Segundos inteiros desde epoch (arredondados para baixo) de uma coluna DateTime."""
+    type = Integer()
+    inherit_cache = True
+
+
+@compiles(epoch_seconds)
+def _epoch_seconds(element, compiler, **kw):
+    return f"EXTRACT(EPOCH FROM {compiler.process(element.clauses, **kw)})"
+
+
+@compiles(epoch_seconds, "sqlite")
+def _epoch_seconds_sqlite(element, compiler, **kw):
+    column = compiler.process(element.clauses, **kw)
+    # '%f' é SS.SSS: a fração vem de '%f' - '%S'
+    return (f"(CAST(strftime('%s', {column}) AS INTEGER)"
+            f" + (strftime('%f', {column}) - CAST(strftime('%S', {column}) AS INTEGER)))")
+
+
+@compiles(epoch_whole_seconds)
+def _epoch_whole_seconds(element, compiler, **kw):
+    return f"CAST(FLOOR(EXTRACT(EPOCH FROM {compiler.process(element.clauses, **kw)})) AS BIGINT)"
+
+
+@compiles(epoch_whole_seconds, "sqlite")
+def _epoch_whole_seconds_sqlite(element, compiler, **kw):
+    return f"CAST(strftime('%s', {compiler.process(element.clauses, **kw)}) AS INTEGER)"
+
+
+class floor_int(FunctionElement):
+    """
+    floor() inteiro de uma expressão numérica. CAST sozinho não serve: trunca
+    no SQLite e arredonda no Postgres.
+    """
+    type = Integer()
+    inherit_cache = True
+
+
+@compiles(floor_int)
+def _floor_int(element, compiler, **kw):
+    return f"CAST(FLOOR({compiler.process(element.clauses, **kw)}) AS BIGINT)"
+
+
+@compiles(floor_int, "sqlite")
+def _floor_int_sqlite(element, compiler, **kw):
+    # floor() do SQLite depende de SQLITE_ENABLE_MATH_FUNCTIONS; o CAST trunca
+    # em direção a zero, então negativos não inteiros descem mais um
+    value = compiler.process(element.clauses, **kw)
+    return f"(CAST({value} AS INTEGER) - ({value} < CAST({value} AS INTEGER)))"
+
+
+# ============================================================
+# ROLLUPS (DOWNSAMPLING INCREMENTAL)
+# ============================================================
+
+def _bucket_key(column, resolution: int):
+    """Índice inteiro do bucket (segundos desde epoch // resolução)."""
+    return epoch_whole_seconds(column) // resolution
+
+
+def _floor(dt: datetime, resolution: int) -> datetime:
+    seconds = int((dt - _EPOCH).total_seconds()) // resolution * resolution
+    return _EPOCH + timedelta(seconds=seconds)
+
+
+def _source_rows(db: Session, resolution: int, source_resolution: int,
+                 start_dt: datetime, end_dt: datetime):
+    """Agrega o tier de origem em buckets de `resolution` segundos."""
+    if source_resolution == 0:
+        f = SensorFeature
+        key = _bucket_key(f.timestamp, resolution).label("bucket")
+        return (
+            db.query(
+                f.device_id,
+                key,
+                func.count(f.id).label("samples"),
+                func.avg(f.intensity).label("avg_intensity"),
+                func.min(f.intensity).label("min_intensity"),
+                func.max(f.intensity).label("max_intensity"),
+                func.avg(f.acc_magnitude).label("avg_acc_magnitude"),
+                func.avg(f.gyro_magnitude).label("avg_gyro_magnitude"),
+                func.avg(f.acc_amplitude).label("avg_acc_amplitude"),
+                func.max(f.acc_amplitude).label("max_acc_amplitude"),
+                func.avg(f.freq_dominant).label("avg_freq_dominant"),
+                func.avg(f.band_power).label("avg_band_power"),
+                func.sum(
+                    case((f.intensity > ROLLUP_EPISODE_THRESHOLD, 1), else_=0)
+                ).label("episode_candidates"),
+            )
+            .filter(f.timestamp >= start_dt, f.timestamp < end_dt)
+            .group_by(f.device_id, key)
+            .all()
+        )
+
+    r = FeatureRollup
+    key = _bucket_key(r.bucket_start, resolution).label("bucket")
+    return (
+        db.query(
+            r.device_id,
+            key,
+            func.sum(r.samples).label("samples"),
+            weighted_avg(r.avg_intensity, r.samples).label("avg_intensity"),
+            func.min(r.min_intensity).label("min_intensity"),
+            func.max(r.max_intensity).label("max_intensity"),
+            weighted_avg(r.avg_acc_magnitude, r.samples).label("avg_acc_magnitude"),
+            weighted_avg(r.avg_gyro_magnitude, r.samples).label("avg_gyro_magnitude"),
+            weighted_avg(r.avg_acc_amplitude, r.samples).label("avg_acc_amplitude"),
+            func.max(r.max_acc_amplitude).label("max_acc_amplitude"),
+            weighted_avg(r.avg_freq_dominant, r.samples).label("avg_freq_dominant"),
+            weighted_avg(r.avg_band_power, r.samples).label("avg_band_power"),
+            func.sum(r.episode_candidates).label("episode_candidates"),
+        )
+        .filter(
+            r.resolution_seconds == source_resolution,
+            r.bucket_start >= start_dt,
+            r.bucket_start < end_dt,
+        )
+        .group_by(r.device_id, key)
+        .all()
+    )
+
+
+def _source_bounds(db: Session, source_resolution: int):
+    """Retorna (primeiro timestamp, fim coberto) do tier de origem."""
+    if source_resolution == 0:
+        return (
+            db.query(func.min(SensorFeature.timestamp)).scalar(),
+            None,
+        )
+    first, last = (
+        db.query(func.min(FeatureRollup.bucket_start), func.max(FeatureRollup.bucket_start))
+        .filter(FeatureRollup.resolution_seconds == source_resolution)
+        .one()
+    )
+    covered_end = last + timedelta(seconds=source_resolution) if last else None
+    return first, covered_end
+
+
+def _next_source_timestamp(db: Session, source_resolution: int,
+                           after: datetime) -> Optional[datetime]:
+    """Primeiro timestamp do tier de origem em `after` ou depois."""
+    if source_resolution == 0:
+        return (
+            db.query(func.min(SensorFeature.timestamp))
+            .filter(SensorFeature.timestamp >= after)
+            .scalar()
+        )
+    return (
+        db.query(func.min(FeatureRollup.bucket_start))
+        .filter(FeatureRollup.resolution_seconds == source_resolution,
+                FeatureRollup.bucket_start >= after)
+        .scalar()
+    )
+
+
+def rollup_watermark(db: Session, resolution: int) -> Optional[datetime]:
+    """Fim do intervalo já agregado para a resolução (exclusivo)."""
+    last = (
+        db.query(func.max(FeatureRollup.bucket_start))
+        .filter(FeatureRollup.resolution_seconds == resolution)
+        .scalar()
+    )
+    return last + timedelta(seconds=resolution) if last else None
+
+
+def rollup_range(db: Session, resolution: int, source_resolution: int,
+                 start_dt: datetime, end_dt: datetime) -> int:
+    """
+    (Re)agrega o intervalo [start_dt, end_dt) no tier `resolution`.
+    Idempotente: substitui os buckets existentes no intervalo.
+    """
+    start_dt = _floor(start_dt, resolution)
+    rows = _source_rows(db, resolution, source_resolution, start_dt, end_dt)
+
+    db.execute(
+        delete(FeatureRollup).where(
+            FeatureRollup.resolution_seconds == resolution,
+            FeatureRollup.bucket_start >= start_dt,
+            FeatureRollup.bucket_start < end_dt,
+        )
+    )
+    if rows:
+        db.execute(
+            insert(FeatureRollup),
+            [
+                {
+                    "device_id": row.device_id,
+                    "resolution_seconds": resolution,
+                    "bucket_start": _EPOCH + timedelta(seconds=int(row.bucket) * resolution),
+                    "samples": int(row.samples or 0),
+                    "avg_intensity": row.avg_intensity,
+                    "min_intensity": row.min_intensity,
+                    "max_intensity": row.max_intensity,
+                    "avg_acc_magnitude": row.avg_acc_magnitude,
+                    "avg_gyro_magnitude": row.avg_gyro_magnitude,
+                    "avg_acc_amplitude": row.avg_acc_amplitude,
+                    "max_acc_amplitude": row.max_acc_amplitude,
+                    "avg_freq_dominant": row.avg_freq_dominant,
+                    "avg_band_power": row.avg_band_power,
+                    "episode_candidates": int(row.episode_candidates or 0),
+                }
+                for row in rows
+            ],
+        )
+    db.commit()
+    return len(rows)
+
+
+def refresh_rollups(db: Session, start_dt: datetime, end_dt: datetime) -> int:
+    """
+    Reagrega [start_dt, end_dt) nos tiers que já passaram desse intervalo
+    (dados gravados atrasados, ex.: envio em lote). O trecho além da marca
+    d'água de cada tier fica para o job agendado: agregá-lo aqui avançaria a
+    marca e pularia o que existe entre ela e start_dt.
+    """
+    written = 0
+    source = 0
+    for resolution in rollup_resolutions():
+        watermark = rollup_watermark(db, resolution)
+        if watermark is None:
+            break
+        stop = min(_floor(end_dt, resolution) + timedelta(seconds=resolution), watermark)
+        cursor = _floor(start_dt, resolution)
+        chunk = timedelta(seconds=resolution * ROLLUP_CHUNK_BUCKETS)
+        while cursor < stop:
+            written += rollup_range(db, resolution, source, cursor, min(cursor + chunk, stop))
+            cursor += chunk
+        source = resolution
+    return written
+
+
+def _rollup_tier(db: Session, resolution: int, source_resolution: int,
+                 now: datetime, max_batches: int) -> int:
+    """
+    Avança o rollup de um tier a partir da sua marca d'água, em lotes limitados.
+    Um trecho vazio (dispositivos desligados) pula direto para o próximo dado
+    da origem: a marca d'água vem do último bucket gravado, e um buraco maior
+    que max_batches trechos a prenderia para sempre.
+    """
+    first_source, source_end = _source_bounds(db, source_resolution)
+    if first_source is None:
+        return 0
+
+    start_dt = rollup_watermark(db, resolution) or _floor(first_source, resolution)
+    end_limit = _floor(now - timedelta(seconds=ROLLUP_LAG_SECONDS), resolution)
+    if source_end is not None:
+        end_limit = min(end_limit, _floor(source_end, resolution))
+
+    chunk = timedelta(seconds=resolution * ROLLUP_CHUNK_BUCKETS)
+    written = 0
+    batches = 0
+    while start_dt < end_limit and batches < max_batches:
+        chunk_end = min(start_dt + chunk, end_limit)
+        chunk_written = rollup_range(db, resolution, source_resolution, start_dt, chunk_end)
+        written += chunk_written
+        start_dt = chunk_end
+        batches += 1
+        if not chunk_written and start_dt < end_limit:
+            next_ts = _next_source_timestamp(db, source_resolution, start_dt)
+            if next_ts is None:
+                break
+            start_dt = max(start_dt, _floor(next_ts, resolution))
+    return written
+
+
+# ============================================================
+# EXPIRAÇÃO E ARQUIVAMENTO
+# ============================================================
+
+def _column_array(values: list, column) -> np.ndarray:
+    """Converte uma coluna em array NumPy (datetime → epoch ms, NULL → NaN)."""
+    if isinstance(column.type, DateTime):
+        return np.array(
+            [int((v - _EPOCH).total_seconds() * 1000) if v is not None else -1 for v in values],
+            dtype=np.int64,
+        )
+    if isinstance(column.type, Integer) and all(v is not None for v in values):
+        return np.array(values, dtype=np.int64)
+    if isinstance(column.type, (Integer, Float)):
+        return np.array(values, dtype=np.float64)
+    return np.array(["" if v is None else str(v) for v in values])
+
+
+def _archive_rows(db: Session, table: str, predicate) -> Optional[str]:
+    """Grava as linhas selecionadas em um .npz colunar (comprimido) antes de apagar."""
+    model, ts_col = _TABLES[table]
+    columns = list(model.__table__.columns)
+    rows = db.execute(select(*columns).where(*predicate).order_by(model.id)).all()
+    if not rows:
+        return None
+
+    data = {
+        col.name: _column_array([row[i] for row in rows], col)
+        for i, col in enumerate(columns)
+    }
+    timestamps = [row._mapping[ts_col.key] for row in rows if row._mapping[ts_col.key] is not None]
+    t0, t1 = min(timestamps), max(timestamps)
+
+    directory = os.path.join(ARCHIVE_DIR, table)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(
+        directory,
+        f"{table}_{t0:%Y%m%dT%H%M%S}_{t1:%Y%m%dT%H%M%S}_{rows[0][0]}.npz",
+    )
+    np.savez_compressed(path, **data)
+    return path
+
+
+def _archive_interval(filename: str):
+    """Extrai (início, fim) do nome do arquivo gerado por _archive_rows."""
+    parts = os.path.splitext(filename)[0].split("_")
+    return (datetime.strptime(parts[-3], "%Y%m%dT%H%M%S"),
+            datetime.strptime(parts[-2], "%Y%m%dT%H%M%S") + timedelta(seconds=1))
+
+
+def archive_bounds(table: str) -> Optional[tuple]:
+    """Intervalo (início, fim) coberto pelos arquivos de uma tabela, ou None."""
+    directory = os.path.join(ARCHIVE_DIR, table)
+    if not os.path.isdir(directory):
+        return None
+    intervals = [_archive_interval(name) for name in os.listdir(directory) if name.endswith(".npz")]
+    if not intervals:
+        return None
+    return min(i[0] for i in intervals), max(i[1] for i in intervals)
+
+
+def iter_archive(table: str, start_dt: datetime, end_dt: datetime,
+                 columns: Optional[List[str]] = None,
+                 device_id: Optional[str] = None) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Itera os arquivos de `table` que se sobrepõem a [start_dt, end_dt),
+    um dict de colunas por arquivo (só o intervalo pedido).
+    Só abre os arquivos cujo intervalo (no nome) se sobrepõe ao pedido.
+    Timestamps retornam como epoch em ms (int64).
+    """
+    model, ts_col = _TABLES[table]
+    ts_name = ts_col.key
+    wanted = columns or [c.name for c in model.__table__.columns]
+    if ts_name not in wanted:
+        wanted = [ts_name] + list(wanted)
+
+    directory = os.path.join(ARCHIVE_DIR, table)
+    if not os.path.isdir(directory):
+        return
+
+    start_ms = int((start_dt - _EPOCH).total_seconds() * 1000)
+    end_ms = int((end_dt - _EPOCH).total_seconds() * 1000)
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".npz"):
+            continue
+        f_start, f_end = _archive_interval(name)
+        if f_end <= start_dt or f_start >= end_dt:
+            continue
+        with np.load(os.path.join(directory, name)) as data:
+            mask = (data[ts_name] >= start_ms) & (data[ts_name] < end_ms)
+            if device_id is not None and "device_id" in data.files:
+                mask &= data["device_id"] == device_id
+            if not mask.any():
+                continue
+            chunk = {}
+            for col in wanted:
+                if col in data.files:
+                    chunk[col] = data[col][mask]
+                else:
+                    # Coluna criada depois do arquivamento
+                    chunk[col] = np.full(int(mask.sum()), np.nan)
+            yield chunk
+
+
+def read_archive(table: str, start_dt: datetime, end_dt: datetime,
+                 columns: Optional[List[str]] = None,
+                 device_id: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Lê colunas arquivadas de `table` no intervalo [start_dt, end_dt),
+    concatenadas e ordenadas por timestamp (epoch em ms).
+    """
+    model, ts_col = _TABLES[table]
+    ts_name = ts_col.key
+    wanted = columns or [c.name for c in model.__table__.columns]
+    if ts_name not in wanted:
+        wanted = [ts_name] + list(wanted)
+
+    chunks: Dict[str, List[np.ndarray]] = {name: [] for name in wanted}
+    for chunk in iter_archive(table, start_dt, end_dt, wanted, device_id):
+        for col in wanted:
+            chunks[col].append(chunk[col])
+
+    out = {
+        col: np.concatenate(parts) if parts else np.array([], dtype=np.float64)
+        for col, parts in chunks.items()
+    }
+    order = np.argsort(out[ts_name], kind="stable")
+    return {col: values[order] if len(values) else values for col, values in out.items()}
+
+
+def _expire_table(db: Session, table: str, cutoff: datetime, archive: bool,
+                  max_batches: int, resolution: Optional[int] = None) -> Dict[str, Any]:
+    """Apaga linhas mais antigas que cutoff em lotes de RETENTION_BATCH_SIZE."""
+    model, ts_col = _TABLES[table]
+    base_filter = [ts_col < cutoff]
+    if resolution is not None:
+        base_filter.append(FeatureRollup.resolution_seconds == resolution)
+    if table == "sensor_readings":
+        # Nunca deixar sensor_features.reading_id apontando para o vazio
+        base_filter.append(~exists().where(SensorFeature.reading_id == SensorReading.id))
+
+    deleted = 0
+    batches = 0
+    archived: List[str] = []
+    while batches < max_batches:
+        ids = db.execute(
+            select(model.id).where(*base_filter).order_by(model.id).limit(RETENTION_BATCH_SIZE)
+        ).scalars().all()
+        if not ids:
+            break
+
+        # Os ids menores que satisfazem o filtro formam exatamente o lote
+        predicate = base_filter + [model.id <= ids[-1]]
+        if archive:
+            path = _archive_rows(db, table, predicate)
+            if path:
+                archived.append(path)
+
+        db.execute(delete(model).where(*predicate))
+        db.commit()
+        deleted += len(ids)
+        batches += 1
+
+    return {"deleted": deleted, "batches": batches, "archived_files": archived}
+
+
+def _free_bytes(db: Session) -> Optional[int]:
+    """Bytes em páginas livres do SQLite (None em outros bancos)."""
+    if db.bind.dialect.name != "sqlite":
+        return None
+    page_size = db.execute(text("PRAGMA page_size")).scalar()
+    freelist = db.execute(text("PRAGMA freelist_count")).scalar()
+    return int(page_size) * int(freelist)
+
+
+def apply_retention_policy(db: Session, now: Optional[datetime] = None,
+                           max_batches: int = RETENTION_MAX_BATCHES) -> Dict[str, Any]:
+    """
+    Aplica a política de retenção: primeiro avança os rollups, depois expira
+    (e arquiva) o que saiu da janela de cada tabela. Retorna um relatório.
+    """
+    now = now or datetime.now()
+    started = time.perf_counter()
+    free_before = _free_bytes(db)
+
+    # 1. Rollups incrementais (fino → grosso)
+    rollups = {}
+    source = 0
+    for resolution in rollup_resolutions():
+        rollups[str(resolution)] = _rollup_tier(db, resolution, source, now, max_batches)
+        source = resolution
+
+    # 2. Expiração. Um tier só expira até onde o próximo tier já cobriu.
+    resolutions = rollup_resolutions()
+    expired: Dict[str, Any] = {}
+    estimated_bytes = 0
+    for policy in RETENTION_POLICY:
+        table = policy["table"]
+        cutoff = _cutoff(policy, now)
+        if cutoff is None or table not in _TABLES:
+            continue
+
+        resolution = policy.get("resolution_seconds")
+        if table in ("sensor_features", "sensor_readings") and resolutions:
+            covered = rollup_watermark(db, resolutions[0])
+            cutoff = min(cutoff, covered) if covered else None
+        elif table == "feature_rollups":
+            coarser = [r for r in resolutions if r > resolution]
+            if coarser:
+                covered = rollup_watermark(db, coarser[0])
+                cutoff = min(cutoff, covered) if covered else None
+        if cutoff is None:
+            continue
+
+        key = table if resolution is None else f"{table}:{resolution}s"
+        result = _expire_table(
+            db, table, cutoff, policy.get("archive", False), max_batches, resolution
+        )
+        result["cutoff"] = cutoff.isoformat()
+        expired[key] = result
+        estimated_bytes += result["deleted"] * APPROX_ROW_BYTES.get(table, 100)
+
+    free_after = _free_bytes(db)
+    if free_before is not None and free_after is not None:
+        bytes_reclaimed = max(free_after - free_before, 0)
+        estimated = False
+    else:
+        bytes_reclaimed = estimated_bytes
+        estimated = True
+
+    return {
+        "ran_at": now.isoformat(),
+        "duration_seconds": round(time.perf_counter() - started, 3),
+        "rollups_written": rollups,
+        "expired": expired,
+        "bytes_reclaimed": bytes_reclaimed,
+        "bytes_reclaimed_estimated": estimated,
+    }
+
+
+def start_retention_scheduler(interval_seconds: int = RETENTION_INTERVAL_SECONDS,
+                              should_run: Optional[Callable[[], bool]] = None):
+    """
+    Inicia job de retenção em thread separada.
+    Cada ciclo processa no máximo RETENTION_MAX_BATCHES lotes por tabela.
+    should_run, se informado, é consultado a cada ciclo (ex.: só uma das
+    instâncias de ingestão particionada executa a retenção).
+    """
+    def _loop():
+        while True:
+            if should_run is not None and not should_run():
+                time.sleep(interval_seconds)
+                continue
+            db = SessionLocal()
+            try:
+                report = apply_retention_policy(db)
+                deleted = sum(r["deleted"] for r in report["expired"].values())
+                logger.info("Ciclo concluído: rollups=%s | removidas=%s | bytes=%s",
+                            report["rollups_written"], deleted, report["bytes_reclaimed"])
+            except Exception as e:
+                logger.exception("Erro ao aplicar política: %s", e)
+                db.rollback()
+            finally:
+                db.close()
+            time.sleep(interval_seconds)
+
+    thread = threading.Thread(target=_loop, daemon=True, name="aura-retention")
+    thread.start()
+    logger.info("Job de retenção iniciado (intervalo=%ss)", interval_seconds)
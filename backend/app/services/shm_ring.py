@@ -0,0 +1,404 @@
+# app/services/shm_ring.py
+"""
+Ring buffer em memória compartilhada (multiprocessing.shared_memory) com os
+últimos minutos de leituras brutas e features por dispositivo.
+
+Um único escritor (processo com AURA_ROLE=ingest) e vários leitores (workers
+com AURA_ROLE=api), sem locks:
+
+- layout fixo: cabeçalho, tabela de slots (device_id + contadores) e, para
+  cada slot, um anel de RAW_DTYPE e outro de FEATURE_DTYPE com capacidade
+  potência de 2;
+- o escritor grava o registro com seq=0, depois seq=n+1 e só então avança o
+  contador (head) do slot; o leitor lê head, fatia [início, head) e confere os
+  seq. Se o escritor der a volta sobre o trecho lido, still_valid() retorna
+  False e o trecho deve ser descartado (overrun).
+
+As leituras devolvem views NumPy sobre a memória compartilhada (sem cópia),
+exceto quando o trecho cruza o fim do anel. Views só são confiáveis enquanto
+still_valid() for True; quem guarda os dados deve copiá-los.
+A ordem das escritas é garantida em x86 (TSO); em ARM não há barreira explícita.
+"""
+import logging
+import os
+import time
+from datetime import datetime
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from app.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+SHM_NAME = os.getenv("AURA_SHM_NAME", "aura_live")
+SHM_DEVICES = int(os.getenv("AURA_SHM_DEVICES", "16"))
+SHM_SECONDS = int(os.getenv("AURA_SHM_SECONDS", "300"))
+SHM_SAMPLING_RATE = 25
+# Registros mais antigos que o escritor pode sobrescrever a qualquer momento
+READ_MARGIN = SHM_SAMPLING_RATE
+REATTACH_SECONDS = 5.0
+
+MAGIC = 0x41524E47  # "ARNG"
+VERSION = 2  # 2: device_id com 64 bytes
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "<u4"), ("version", "<u4"), ("devices", "<u4"), ("capacity", "<u4"),
+    ("generation", "<u8"),
+])
+# device_id: String(64) nos modelos; ids com mais de 64 bytes em UTF-8 ficam fora do ring
+DEVICE_ID_BYTES = 64
+SLOT_DTYPE = np.dtype([
+    ("device_id", f"S{DEVICE_ID_BYTES}"), ("raw_head", "<u8"), ("feature_head", "<u8"),
+])
+RAW_DTYPE = np.dtype([
+    ("seq", "<u8"), ("id", "<i8"), ("t", "<f8"), ("ts_ms", "<i8"),
+    ("acc_x", "<f8"), ("acc_y", "<f8"), ("acc_z", "<f8"),
+    ("gyro_x", "<f8"), ("gyro_y", "<f8"), ("gyro_z", "<f8"), ("temp", "<f8"),
+])
+FEATURE_DTYPE = np.dtype([
+    ("seq", "<u8"), ("reading_id", "<i8"), ("t", "<f8"), ("intensity", "<f8"),
+    ("acc_magnitude", "<f8"), ("gyro_magnitude", "<f8"), ("freq_dominant", "<f8"),
+])
+KINDS = {"raw": RAW_DTYPE, "feature": FEATURE_DTYPE}
+
+SHM_RING_OVERRUNS = Counter(
+    "aura_shm_ring_overruns", "Leituras do ring descartadas porque o escritor deu a volta", ["kind"]
+)
+SHM_RING_SLOTS_FULL = Counter(
+    "aura_shm_ring_slots_full",
+    "Registros não gravados no ring por falta de slot de dispositivo (ou device_id com mais de 64 bytes)"
+)
+
+_writer: Optional["ShmRing"] = None
+_reader: Optional["ShmRing"] = None
+_reader_checked = 0.0
+_reader_enabled = False
+
+
+class RingRead(NamedTuple):
+    records: np.ndarray  # view (ou cópia, se cruzou o fim do anel)
+    start: int           # seq do primeiro registro
+    next: int            # seq a pedir na próxima leitura incremental (since=)
+    overrun: bool        # parte do intervalo pedido já tinha sido sobrescrita
+
+
+def _align(offset: int) -> int:
+    return (offset + 63) & ~63
+
+
+def _capacity_for(seconds: int) -> int:
+    capacity = 1
+    while capacity < seconds * SHM_SAMPLING_RATE:
+        capacity <<= 1
+    return capacity
+
+
+def _none_to_nan(value) -> float:
+    return np.nan if value is None else float(value)
+
+
+class ShmRing:
+    """Visão do segmento; o escritor usa create(), os leitores attach()."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((), HEADER_DTYPE, shm.buf, 0)
+        self.devices = int(self.header["devices"])
+        self.capacity = int(self.header["capacity"])
+        self.mask = self.capacity - 1
+        self.generation = int(self.header["generation"])
+
+        offset = _align(HEADER_DTYPE.itemsize)
+        self.slots = np.ndarray((self.devices,), SLOT_DTYPE, shm.buf, offset)
+        offset = _align(offset + SLOT_DTYPE.itemsize * self.devices)
+        self.rings: Dict[str, np.ndarray] = {}
+        for kind, dtype in KINDS.items():
+            self.rings[kind] = np.ndarray((self.devices, self.capacity), dtype, shm.buf, offset)
+            offset = _align(offset + dtype.itemsize * self.devices * self.capacity)
+        self._slot_of: Dict[str, int] = {}
+
+    @staticmethod
+    def size_for(devices: int, capacity: int) -> int:
+        size = _align(HEADER_DTYPE.itemsize) + _align(SLOT_DTYPE.itemsize * devices)
+        for dtype in KINDS.values():
+            size += _align(dtype.itemsize * devices * capacity)
+        return size
+
+    @classmethod
+    def create(cls, name: str = SHM_NAME, devices: int = SHM_DEVICES,
+               seconds: int = SHM_SECONDS) -> "ShmRing":
+        capacity = _capacity_for(seconds)
+        size = cls.size_for(devices, capacity)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Segmento de uma execução anterior que não terminou limpa
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        np.frombuffer(shm.buf, np.uint8)[:] = 0
+        header = np.ndarray((), HEADER_DTYPE, shm.buf, 0)
+        header["devices"], header["capacity"] = devices, capacity
+        header["version"], header["generation"] = VERSION, time.time_ns()
+        header["magic"] = MAGIC  # por último: leitores só aceitam segmentos completos
+        logger.info("Ring em memória compartilhada %s: %d dispositivos × %d registros (%.1f MB)",
+                    name, devices, capacity, size / 1e6)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str = SHM_NAME) -> "ShmRing":
+        shm = shared_memory.SharedMemory(name=name)
+        # Antes do 3.13 o resource_tracker do leitor apagaria o segmento ao sair
+        resource_tracker.unregister(shm._name, "shared_memory")
+        header = np.ndarray((), HEADER_DTYPE, shm.buf, 0)
+        valid = int(header["magic"]) == MAGIC and int(header["version"]) == VERSION
+        del header
+        if not valid:
+            shm.close()
+            raise ValueError(f"Segmento {name} não é um ring do Aura (ou versão diferente)")
+        return cls(shm, owner=False)
+
+    def close(self):
+        # Views NumPy mantêm o buffer exportado; soltá-las antes de fechar
+        self.header = self.slots = None
+        self.rings = {}
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # ainda há views em uso; o mapeamento é liberado quando forem coletadas
+        if self.owner:
+            self.shm.unlink()
+
+    # ------------------------------------------------------------
+    # Escrita (um único processo)
+    # ------------------------------------------------------------
+
+    def _writer_slot(self, device_id: str) -> Optional[int]:
+        slot = self._slot_of.get(device_id)
+        if slot is None:
+            encoded = device_id.encode()
+            if len(encoded) > DEVICE_ID_BYTES:
+                # Truncar colidiria com outros ids e poderia cortar um caractere UTF-8
+                SHM_RING_SLOTS_FULL.inc()
+                return None
+            used = len(self._slot_of)
+            if used >= self.devices:
+                SHM_RING_SLOTS_FULL.inc()
+                return None
+            self.slots["device_id"][used] = encoded
+            self._slot_of[device_id] = slot = used
+        return slot
+
+    def _append(self, kind: str, device_id: str, values: tuple):
+        slot = self._writer_slot(device_id)
+        if slot is None:
+            return
+        head_field = f"{kind}_head"
+        seq = int(self.slots[head_field][slot])
+        ring = self.rings[kind][slot]
+        index = seq & self.mask
+        ring[index] = (0,) + values     # seq=0: registro em escrita
+        ring["seq"][index] = seq + 1    # registro completo
+        self.slots[head_field][slot] = seq + 1  # publica
+
+    def append_reading(self, reading):
+        self._append("raw", reading.device_id, (
+            reading.id, reading.timestamp.timestamp(),
+            -1 if reading.ts_ms is None else reading.ts_ms,
+            _none_to_nan(reading.acc_x), _none_to_nan(reading.acc_y), _none_to_nan(reading.acc_z),
+            _none_to_nan(reading.gyro_x), _none_to_nan(reading.gyro_y), _none_to_nan(reading.gyro_z),
+            _none_to_nan(reading.temp),
+        ))
+
+    def append_feature(self, feature):
+        self._append("feature", feature.device_id, (
+            feature.reading_id, feature.timestamp.timestamp(),
+            _none_to_nan(feature.intensity), _none_to_nan(feature.acc_magnitude),
+            _none_to_nan(feature.gyro_magnitude), _none_to_nan(feature.freq_dominant),
+        ))
+
+    # ------------------------------------------------------------
+    # Leitura (qualquer processo)
+    # ------------------------------------------------------------
+
+    def device_ids(self) -> List[str]:
+        names = self.slots["device_id"]
+        return [n.decode() for n in names if n]
+
+    def _reader_slot(self, device_id: str) -> Optional[int]:
+        slot = self._slot_of.get(device_id)
+        if slot is None:
+            for i, name in enumerate(self.slots["device_id"]):
+                if name:
+                    self._slot_of[name.decode()] = i
+            slot = self._slot_of.get(device_id)
+        return slot
+
+    def read(self, device_id: str, kind: str = "raw", since: Optional[int] = None,
+             last: Optional[int] = None) -> Optional[RingRead]:
+        """
+        Registros [since, head) do dispositivo (ou os `last` mais recentes).
+        Sem `since`, lê tudo o que ainda é seguro ler. None se o dispositivo
+        não tem slot.
+        """
+        slot = self._reader_slot(device_id)
+        if slot is None:
+            return None
+        head = self._head(slot, kind)
+        oldest = max(0, head - self.capacity + READ_MARGIN)
+        start = oldest if since is None else max(since, oldest)
+        overrun = since is not None and since < oldest
+        if last is not None:
+            start = max(start, head - last)
+        count = head - start
+        ring = self.rings[kind][slot]
+        first = start & self.mask
+        if count <= 0:
+            records = ring[:0]
+        elif first + count <= self.capacity:
+            records = ring[first:first + count]
+        else:
+            records = np.concatenate((ring[first:], ring[:count - (self.capacity - first)]))
+        if count > 0 and (records["seq"][0] != start + 1 or records["seq"][-1] != head):
+            overrun = True  # escritor passou durante a leitura
+        if overrun:
+            SHM_RING_OVERRUNS.labels(kind=kind).inc()
+        return RingRead(records, start, head, overrun)
+
+    def _head(self, slot: int, kind: str) -> int:
+        return int(self.slots[f"{kind}_head"][slot])
+
+    def still_valid(self, device_id: str, read: RingRead, kind: str = "raw") -> bool:
+        """
+        True se nenhum registro de `read` foi sobrescrito desde a leitura (a
+        escrita do seq h, mesmo em andamento, destrói o seq h - capacity).
+        """
+        return self._head(self._reader_slot(device_id), kind) - self.capacity < read.start
+
+    def window(self, kind: str, seconds: Optional[float] = None,
+               last: Optional[int] = None) -> np.ndarray:
+        """
+        Registros dos últimos `seconds` (e/ou os `last` mais recentes) de todos
+        os dispositivos, ordenados por t (cópia).
+        """
+        parts = []
+        for device_id in self.device_ids():
+            records = self.read(device_id, kind, last=last).records
+            if not len(records):
+                continue
+            if seconds is not None:
+                # t é o horário da amostra (relógio do dispositivo), que pode
+                # vir fora de ordem no anel: máscara em vez de busca binária
+                records = records[records["t"] >= time.time() - seconds]
+            part = records.copy()
+            # Descarta o que o escritor sobrescreveu durante a cópia (seq gravado = s + 1)
+            intact = part["seq"] > self._head(self._reader_slot(device_id), kind) - self.capacity + 1
+            if not intact.all():
+                SHM_RING_OVERRUNS.labels(kind=kind).inc()
+                part = part[intact]
+            parts.append(part)
+        if not parts:
+            return np.empty(0, KINDS[kind])
+        merged = np.concatenate(parts)
+        merged = merged[np.argsort(merged["t"], kind="stable")]
+        return merged if last is None else merged[-last:]
+
+    def latest(self, kind: str = "raw") -> Optional[Dict[str, Any]]:
+        """Registro mais recente entre todos os dispositivos (com device_id)."""
+        best = None
+        for device_id in self.device_ids():
+            result = self.read(device_id, kind, last=1)
+            if len(result.records) and (best is None or result.records["t"][0] > best[1]["t"]):
+                best = (device_id, result.records[0].copy())
+        if best is None:
+            return None
+        device_id, record = best
+        return {"device_id": device_id, **{name: record[name].item() for name in record.dtype.names}}
+
+
+def record_message(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Mensagem "sensor_reading" do /ws a partir de um registro bruto do ring."""
+    def value(name):
+        v = record[name]
+        return None if v != v else v  # NaN → None
+
+    return {
+        "type": "sensor_reading",
+        "id": record["id"],
+        "device_id": record["device_id"],
+        "timestamp": datetime.fromtimestamp(record["t"]).isoformat(),
+        **{name: value(name) for name in
+           ("acc_x", "acc_y", "acc_z", "gyro_x", "gyro_y", "gyro_z", "temp")},
+    }
+
+
+# ============================================================
+# SINGLETONS DO PROCESSO
+# ============================================================
+
+def start_shm_writer(name: str = SHM_NAME) -> ShmRing:
+    global _writer
+    _writer = ShmRing.create(name)
+    return _writer
+
+
+def stop_shm_writer():
+    global _writer
+    if _writer is not None:
+        _writer.close()
+        _writer = None
+
+
+def write_reading(reading):
+    """Grava a leitura no ring (no-op se este processo não é o escritor)."""
+    if _writer is not None:
+        _writer.append_reading(reading)
+
+
+def write_feature(feature):
+    if _writer is not None:
+        _writer.append_feature(feature)
+
+
+def enable_shm_reader():
+    """Habilita a leitura do ring neste processo (workers com AURA_ROLE=api)."""
+    global _reader_enabled
+    _reader_enabled = True
+
+
+def get_shm_reader(name: str = SHM_NAME) -> Optional[ShmRing]:
+    """
+    Ring para leitura, anexado sob demanda. A cada REATTACH_SECONDS confere se
+    o escritor recriou o segmento (reinício da ingestão) e troca de segmento.
+    None se a leitura não foi habilitada ou enquanto não houver escritor.
+    """
+    global _reader, _reader_checked
+    if not _reader_enabled:
+        return None
+    now = time.monotonic()
+    if now - _reader_checked < REATTACH_SECONDS:
+        return _reader
+    _reader_checked = now
+    try:
+        ring = ShmRing.attach(name)
+    except (FileNotFoundError, ValueError):
+        return _reader
+    if _reader is not None and _reader.generation == ring.generation:
+        ring.close()
+        return _reader
+    if _reader is not None:
+        logger.info("Ring %s recriado pelo escritor; trocando de segmento", name)
+        _reader.close()
+    _reader = ring
+    return _reader
+
+
+def stop_shm_reader():
+    global _reader
+    if _reader is not None:
+        _reader.close()
+        _reader = None
@@ -2,11 +2,14 @@
 from datetime import datetime, timedelta, date
 from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case
-from app.models import SensorFeature
+from sqlalchemy import func
+from app.services.retention_service import (
+    ROLLUP_EPISODE_THRESHOLD,
+    aggregate_features
+)
 
 # configuração
-EPISODE_INTENSITY_THRESHOLD = 6.0
+EPISODE_INTENSITY_THRESHOLD = ROLLUP_EPISODE_THRESHOLD  # rollups já contam candidatos com este limiar
 MINUTES_IN_DAY = 24 * 60
 
 
@@ -22,33 +25,21 @@ def get_aggregated_by_day(db: Session, start_date: date, end_date: date) -> List
     start_dt = _day_start(start_date)
     end_dt = _day_start(end_date) + timedelta(days=1)
 
+    # Resolução mais fina ainda disponível (features brutas ou rollups), com
+    # as features brutas depois da marca d'água dos rollups
     # Usar strftime que sabemos que funciona
-    day_label = func.strftime("%Y-%m-%d", SensorFeature.timestamp).label("day")
-
-    q = (
-        db.query(
-            day_label,
-            func.avg(SensorFeature.intensity).label("avg_intensity"),
-            func.max(SensorFeature.intensity).label("max_intensity"),
-            func.count(SensorFeature.id).label("samples"),
-            func.sum(
-                case((SensorFeature.intensity > EPISODE_INTENSITY_THRESHOLD, 1), else_=0)
-            ).label("episode_candidates"),
-        )
-        .filter(SensorFeature.timestamp >= start_dt, SensorFeature.timestamp < end_dt)
-        .group_by(day_label)
-        .order_by(day_label)
+    rows = aggregate_features(
+        db, start_dt, end_dt, lambda ts: [func.strftime("%Y-%m-%d", ts).label("day")]
     )
 
-    rows = q.all()
     result = []
     for r in rows:
         result.append({
-            "date": r.day,  # Já vem como string do strftime
-            "avg_intensity": round(float(r.avg_intensity), 2) if r.avg_intensity is not None else None,
-            "max_intensity": round(float(r.max_intensity), 2) if r.max_intensity is not None else None,
-            "episodes_count": int(r.episode_candidates or 0),
-            "samples": int(r.samples or 0)
+            "date": r["day"],  # Já vem como string do strftime
+            "avg_intensity": round(float(r["avg_intensity"]), 2) if r["avg_intensity"] is not None else None,
+            "max_intensity": round(float(r["max_intensity"]), 2) if r["max_intensity"] is not None else None,
+            "episodes_count": r["episode_candidates"],
+            "samples": r["samples"]
         })
     return result
 
@@ -0,0 +1,205 @@
+# app/services/tracing_service.py
+"""
+Rastreamento de latência ponta a ponta (dispositivo → dashboard) por amostragem.
+
+Uma a cada TRACE_SAMPLE_EVERY mensagens de cada dispositivo recebe um trace com
+o horário de cada estágio. Os intervalos alimentam histogramas (app.metrics) e
+os últimos traces completos ficam disponíveis para inspeção.
+
+O relógio do dispositivo (ts_ms) tem origem arbitrária (ex.: millis() desde o
+boot), então o horário "device" vem do modelo de relógio da ingestão
+(app/services/device_clock.py: envelope inferior de recebido_ms - ts_ms, com
+drift). O menor atraso observado aproxima o trânsito mínimo, logo a idade
+reportada é o atraso *acima* do mínimo da rede.
+
+O estágio "broadcast" vem do /ws (app/main.py): cada envio marca todos os
+traces pendentes com reading_id <= id enviado (o poll de 100 ms só envia a
+leitura mais recente; as anteriores já estão no estado do dashboard). Com
+AURA_ROLE=api o /ws roda em outro processo e devolve o id enviado pelo canal
+ao vivo (app/services/live_feed.py), que chama mark_broadcast no processo de
+ingestão. Traces sem broadcast (nenhum cliente conectado) saem de _pending
+para os completos quando passam de TRACE_MAX_PENDING; a contagem do estágio
+broadcast no relatório mostra a cobertura.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+
+from app.metrics import Histogram
+from app.services.device_clock import clock_offset, get_clock_report
+
+TRACE_SAMPLE_EVERY = 25  # 1 trace por segundo a 25 Hz
+TRACE_MAX_PENDING = 1000  # traces aguardando broadcast (os mais antigos são descartados)
+TRACE_MAX_COMPLETED = 200
+
+STAGES = ("device", "received", "parsed", "persisted", "features", "broadcast")
+
+_TRACE_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+    0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+TRACE_STAGE_SECONDS = Histogram(
+    "aura_trace_stage_seconds", "Tempo desde o estágio anterior (traces amostrados)",
+    ["stage"], buckets=_TRACE_BUCKETS,
+)
+TRACE_AGE_SECONDS = Histogram(
+    "aura_trace_age_seconds", "Idade da amostra em cada estágio desde o horário do dispositivo",
+    ["stage"], buckets=_TRACE_BUCKETS,
+)
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = {}
+_pending: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+_completed: deque = deque(maxlen=TRACE_MAX_COMPLETED)
+_broadcast_upto = 0  # maior reading_id já enviado pelo /ws
+
+
+def now_ms() -> float:
+    return time.time() * 1000.0
+
+
+# ============================================================
+# TRACES
+# ============================================================
+
+def begin_trace(device_id: str, ts_ms: Optional[float], received_ms: float) -> Optional[Dict[str, Any]]:
+    """
+    Se a mensagem for amostrada, abre um trace com os estágios
+    device/received/parsed (o relógio do dispositivo já foi atualizado por
+    observe_device_clock). Retorna None para mensagens não amostradas.
+    """
+    count = _counters.get(device_id, 0)
+    _counters[device_id] = count + 1
+    if count % TRACE_SAMPLE_EVERY:
+        return None
+
+    trace = {"device_id": device_id, "ts_ms": ts_ms, "reading_id": None, "stages": {}}
+    offset = clock_offset(device_id, ts_ms) if ts_ms is not None else None
+    if offset is not None:
+        trace["stages"]["device"] = float(ts_ms) + offset
+    mark(trace, "received", received_ms)
+    mark(trace, "parsed")
+    return trace
+
+
+def mark(trace: Optional[Dict[str, Any]], stage: str, at_ms: Optional[float] = None):
+    """Grava o horário do estágio e observa os histogramas."""
+    if trace is None:
+        return
+    at_ms = now_ms() if at_ms is None else at_ms
+    stages = trace["stages"]
+    previous = [stages[s] for s in STAGES[:STAGES.index(stage)] if s in stages]
+    stages[stage] = at_ms
+    if previous:
+        TRACE_STAGE_SECONDS.labels(stage=stage).observe(max(at_ms - previous[-1], 0.0) / 1000.0)
+    if "device" in stages and stage != "device":
+        TRACE_AGE_SECONDS.labels(stage=stage).observe(max(at_ms - stages["device"], 0.0) / 1000.0)
+
+
+def attach_reading(trace: Optional[Dict[str, Any]], reading_id: int):
+    """Associa o trace à leitura persistida para os estágios seguintes."""
+    if trace is None:
+        return
+    trace["reading_id"] = reading_id
+    mark(trace, "persisted")
+    with _lock:
+        _pending[reading_id] = trace
+        while len(_pending) > TRACE_MAX_PENDING:
+            _, dropped = _pending.popitem(last=False)
+            _completed.append(_summary(dropped))
+
+
+def mark_reading(reading_id: int, stage: str):
+    """Marca um estágio pelo id da leitura (no-op se a leitura não foi amostrada)."""
+    trace = _pending.get(reading_id)
+    if trace is None or stage in trace["stages"]:
+        return
+    mark(trace, stage)
+    if stage == STAGES[-1]:
+        with _lock:
+            _pending.pop(reading_id, None)
+            _completed.append(_summary(trace))
+
+
+def mark_broadcast(reading_id: int, at_ms: Optional[float] = None):
+    """
+    Marca "broadcast" em todos os traces pendentes com reading_id <= o id
+    enviado e os move para os completos. at_ms: horário do envio, quando o
+    /ws roda em outro processo (mesmo host, mesmo relógio).
+    """
+    global _broadcast_upto
+    at_ms = now_ms() if at_ms is None else at_ms
+    with _lock:
+        if reading_id <= _broadcast_upto:
+            return
+        _broadcast_upto = reading_id
+        sent = [rid for rid in _pending if rid <= reading_id]
+        traces = [_pending.pop(rid) for rid in sent]
+    for trace in traces:
+        mark(trace, "broadcast", at_ms)
+    with _lock:
+        _completed.extend(_summary(trace) for trace in traces)
+
+
+def _summary(trace: Dict[str, Any]) -> Dict[str, Any]:
+    stages = trace["stages"]
+    origin = stages.get("device", stages.get("received"))
+    return {
+        "device_id": trace["device_id"],
+        "reading_id": trace["reading_id"],
+        "ts_ms": trace["ts_ms"],
+        "received_at": stages.get("received", 0) / 1000.0,
+        "stages_ms": {s: round(stages[s] - origin, 3) for s in STAGES if s in stages},
+    }
+
+
+# ============================================================
+# CONSULTA
+# ============================================================
+
+def _histogram_stats(hist: Histogram) -> Dict[str, Any]:
+    snap = hist.snapshot()
+    count = snap["count"]
+    return {
+        "count": int(count),
+        "mean_ms": snap["sum"] / count * 1000.0 if count else None,
+        "p50_ms": _ms(hist.quantile(0.5)),
+        "p95_ms": _ms(hist.quantile(0.95)),
+        "p99_ms": _ms(hist.quantile(0.99)),
+        # Acima do último bucket (quantis que caem ali saem None)
+        "over_max": int(count - snap["buckets"][-2][1]) if count else 0,
+        "max_bucket_ms": _TRACE_BUCKETS[-1] * 1000.0,
+    }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    """Segundos → ms; None para o bucket +Inf (não serializável em JSON)."""
+    if seconds is None or seconds == float("inf"):
+        return None
+    return seconds * 1000.0
+
+
+def get_latency_report(recent: int = 20) -> Dict[str, Any]:
+    """
+    Latência por estágio (desde o estágio anterior) e idade acumulada desde o
+    horário estimado do dispositivo. Quantis são limites superiores de bucket.
+    """
+    stages = {}
+    for stage in STAGES[1:]:
+        stages[stage] = {
+            "since_previous": _histogram_stats(TRACE_STAGE_SECONDS.labels(stage=stage)),
+            "age": _histogram_stats(TRACE_AGE_SECONDS.labels(stage=stage)),
+        }
+
+    with _lock:
+        completed: List[Dict[str, Any]] = list(_completed)[-recent:] if recent else []
+        pending = len(_pending)
+
+    return {
+        "sample_every": TRACE_SAMPLE_EVERY,
+        "stages": stages,
+        "clock_offsets": get_clock_report(),
+        "pending_traces": pending,
+        "recent_traces": completed,
+    }
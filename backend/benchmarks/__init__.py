@@ -0,0 +1,17 @@
+# benchmarks/__init__.py
+"""
+Benchmarks reprodutíveis do backend (ingestão, features e rotas de análise).
+
+Uso (a partir de backend/):
+    python -m benchmarks.run_benchmarks --dataset 1d
+    python -m benchmarks.run_benchmarks --dataset 30d --save-baseline
+    python -m benchmarks.run_benchmarks --dataset 30d --compare
+    python -m benchmarks.soak --devices 10 --rate 25 --duration 300   # MQTT ponta a ponta
+    python -m benchmarks.ws_fanout --levels 10,100,500,1000 --compare    # capacidade do /ws
+    python -m benchmarks.query_plans                                     # EXPLAIN das consultas
+    python -m benchmarks.ingest_partition --instances 3 --devices 12     # ingestão particionada
+    python -m benchmarks.overload --devices 4 --burst 4                  # rajada x fidelidade adaptativa
+    python -m benchmarks.jitter --loss 0.1 --batch-ms 500                # reordenação e grade uniforme
+    python -m benchmarks.ingest_batch --hours 4                          # POST /ingest/batch
+    python -m benchmarks.replay --devices 1 --hours 24                   # captura e reprodução acelerada
+"""
@@ -0,0 +1,207 @@
+# benchmarks/cases.py
+"""
+Casos de benchmark. Importar somente depois de AURA_DATABASE_URL apontar
+para o dataset (app.db cria o engine na importação).
+"""
+import json
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from app.db import SessionLocal
+from app.metrics import FEATURE_COMPUTE_SECONDS
+from app.models import SensorReading
+from app.mqtt_client import MQTT_TOPIC, _persist, on_message
+from app.services.device_clock import flush_jitter_buffer, start_jitter_buffer, stop_jitter_buffer
+from app.services.features_service import process_new_reading
+from app.services.ingest_queue import (
+    enqueue_reading, start_ingest_queue, stop_ingest_queue, wait_ingest_idle,
+)
+
+BENCH_DEVICE = "bench-ingest"
+
+
+def _percentiles(samples_s: List[float]) -> Dict[str, float]:
+    ms = np.asarray(samples_s) * 1000.0
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "min_ms": float(ms.min()),
+    }
+
+
+# ============================================================
+# INGESTÃO
+# ============================================================
+
+class _Message:
+    """Mensagem no formato entregue pelo paho a on_message."""
+
+    def __init__(self, topic: str, payload: bytes):
+        self.topic = topic
+        self.payload = payload
+
+
+def _payloads(count: int, rate: float = 25.0) -> List[_Message]:
+    rng = np.random.default_rng(7)
+    t = np.arange(count) / rate
+    tremor = 0.8 * np.sin(2 * np.pi * 5.0 * t)
+    messages = []
+    for i in range(count):
+        payload = {
+            "acc_x": float(rng.normal(0, 0.05) + tremor[i]),
+            "acc_y": float(rng.normal(0, 0.05)),
+            "acc_z": float(9.81 + rng.normal(0, 0.05)),
+            "gyro_x": float(rng.normal(0, 0.01)),
+            "gyro_y": float(rng.normal(0, 0.01)),
+            "gyro_z": float(rng.normal(0, 0.01)),
+            "temp": 25.0,
+            "ts_ms": int(t[i] * 1000),
+        }
+        messages.append(_Message(f"{MQTT_TOPIC}/{BENCH_DEVICE}", json.dumps(payload).encode()))
+    return messages
+
+
+def _bench_rows() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(SensorReading).filter(SensorReading.device_id == BENCH_DEVICE).count()
+    finally:
+        db.close()
+
+
+def bench_on_message(count: int) -> Dict[str, Any]:
+    """
+    Caminho completo de uma mensagem MQTT: JSON → leitura → features → commits,
+    com a fila de persistência e o buffer de reordenação de start_mqtt (sem
+    broker). Os percentis são do callback; a vazão vai até a fila esvaziar.
+    """
+    messages = _payloads(count)
+    before = _bench_rows()
+    # block: nada descartado, toda mensagem chega ao banco
+    start_ingest_queue(_persist, policy="block")
+    start_jitter_buffer(lambda item: enqueue_reading(*item))
+    try:
+        on_message(None, None, messages[0])  # aquecimento (buffers, conexões)
+        flush_jitter_buffer()
+        wait_ingest_idle()
+
+        durations = []
+        started = time.perf_counter()
+        for msg in messages[1:]:
+            t0 = time.perf_counter()
+            on_message(None, None, msg)
+            durations.append(time.perf_counter() - t0)
+        flush_jitter_buffer()
+        wait_ingest_idle()
+        elapsed = time.perf_counter() - started
+    finally:
+        stop_jitter_buffer()
+        stop_ingest_queue()
+
+    written = _bench_rows() - before
+    if written != len(messages):
+        raise RuntimeError(f"bench_on_message: {written} leituras gravadas para {len(messages)} mensagens")
+    return {
+        "messages": len(durations),
+        "throughput_per_s": len(durations) / elapsed,
+        **_percentiles(durations),
+    }
+
+
+def bench_process_new_reading(count: int) -> Dict[str, Any]:
+    """Custo por amostra de process_new_reading (cálculo + commit da feature)."""
+    db = SessionLocal()
+    try:
+        now = datetime.now()
+        readings = [
+            SensorReading(device_id=BENCH_DEVICE, timestamp=now + timedelta(milliseconds=40 * i),
+                          acc_x=0.1 * np.sin(i), acc_y=0.0, acc_z=9.81,
+                          gyro_x=0.01, gyro_y=0.0, gyro_z=0.0, ts_ms=40 * i)
+            for i in range(count)
+        ]
+        db.add_all(readings)
+        db.commit()
+
+        before = FEATURE_COMPUTE_SECONDS.snapshot()
+        durations = []
+        for reading in readings:
+            t0 = time.perf_counter()
+            process_new_reading(db, reading)
+            durations.append(time.perf_counter() - t0)
+        after = FEATURE_COMPUTE_SECONDS.snapshot()
+    finally:
+        db.close()
+
+    computed = after["count"] - before["count"]
+    return {
+        "samples": count,
+        "mean_us": statistics.fmean(durations) * 1e6,
+        "compute_mean_us": (after["sum"] - before["sum"]) / computed * 1e6 if computed else None,
+        **_percentiles(durations),
+    }
+
+
+# ============================================================
+# ROTAS
+# ============================================================
+
+def route_cases(meta: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """(método, URL) de cada rota de stats/heatmap/episodes/realtime para o dataset."""
+    end_day = (datetime.fromisoformat(meta["end"]) - timedelta(seconds=1)).date()
+    start_day = datetime.fromisoformat(meta["start"]).date()
+    calendar_start = max(start_day, end_day - timedelta(days=365))
+    d, s = end_day.isoformat(), calendar_start.isoformat()
+    return [
+        ("GET", f"/stats/daily?for_date={d}"),
+        ("GET", f"/stats/weekly?end_date={d}&days=7"),
+        ("GET", f"/stats/calendar?start={s}&end={d}"),
+        ("GET", "/stats/compare?days=7"),
+        ("GET", f"/heatmap/hourly?for_date={d}"),
+        ("GET", f"/heatmap/minute?for_date={d}"),
+        ("GET", f"/heatmap/timeline?for_date={d}&bucket_minutes=10"),
+        ("GET", f"/heatmap/timeline?for_date={d}&bucket_minutes=1&max_points=200"),
+        ("POST", "/episodes/detect?lookback_minutes=5"),
+        ("GET", f"/episodes/daily?for_date={d}"),
+        ("GET", f"/episodes/summary?start_date={s}&end_date={d}"),
+        ("GET", "/realtime/status"),
+        ("GET", "/realtime/series?duration_seconds=60"),
+        ("GET", "/realtime/series?duration_seconds=300&max_points=200"),
+        ("GET", "/realtime/fft?window_size=100"),
+        ("GET", "/realtime/sensor-health"),
+    ]
+
+
+def _peak_memory(call: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        call()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_routes(client, cases: List[Tuple[str, str]], repeat: int) -> Dict[str, Dict[str, Any]]:
+    """Latência (p50/p95/min de `repeat` execuções) e pico de memória de cada rota."""
+    results = {}
+    for method, url in cases:
+        response = client.request(method, url)  # aquecimento
+        durations = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            client.request(method, url)
+            durations.append(time.perf_counter() - t0)
+        peak = _peak_memory(lambda: client.request(method, url))
+        results[f"{method} {url}"] = {
+            "status": response.status_code,
+            "bytes": len(response.content),
+            "peak_mem_kb": peak / 1024.0,
+            **_percentiles(durations),
+        }
+    return results
+
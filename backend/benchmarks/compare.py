@@ -0,0 +1,92 @@
+# benchmarks/compare.py
+"""Baselines em JSON e detecção de regressões entre duas execuções."""
+import json
+import os
+from typing import Any, Dict, Iterator, List, Tuple
+
+from benchmarks.datasets import BENCH_DIR
+
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Métricas comparadas: sufixo → direção (+1 maior é melhor, -1 menor é melhor)
+DIRECTIONS = {
+    "throughput_per_s": +1,
+    "per_client_per_s": +1,
+    "_ms": -1,
+    "_us": -1,
+    "peak_mem_kb": -1,
+    "per_client_kb": -1,
+    "cpu_percent": -1,
+    "slow_degradation": -1,
+}
+# Diferenças absolutas menores que isto são ruído, não regressão
+MIN_DELTA = {
+    "_ms": 0.5, "_us": 5.0, "peak_mem_kb": 64.0, "throughput_per_s": 0.0,
+    "per_client_per_s": 0.2, "per_client_kb": 4.0, "cpu_percent": 2.0, "slow_degradation": 0.1,
+}
+
+
+def baseline_path(dataset: str) -> str:
+    return os.path.join(BASELINE_DIR, f"{dataset}.json")
+
+
+def save_json(path: str, data: Dict[str, Any]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def load_json(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def _metrics(result: Dict[str, Any]) -> Iterator[Tuple[str, str, float]]:
+    """(caminho, sufixo, valor) de cada métrica numérica comparável."""
+    for section in ("ingest", "routes", "capacity"):
+        for case, values in result.get(section, {}).items():
+            for key, value in values.items():
+                if not isinstance(value, (int, float)) or isinstance(value, bool):
+                    continue
+                suffix = next((s for s in DIRECTIONS if key.endswith(s)), None)
+                if suffix:
+                    yield f"{section}/{case}/{key}", suffix, float(value)
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any],
+            threshold: float = 0.2) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Compara métrica a métrica. Regressão: piora maior que `threshold`
+    (fração) e maior que o ruído mínimo da unidade.
+    """
+    base = {path: value for path, _, value in _metrics(baseline)}
+    report: Dict[str, List[Dict[str, Any]]] = {"regressions": [], "improvements": [], "missing": []}
+
+    for path, suffix, value in _metrics(current):
+        if path not in base:
+            report["missing"].append({"metric": path, "current": value})
+            continue
+        reference = base[path]
+        if not reference:
+            continue
+        change = (value - reference) / reference
+        worse = change * DIRECTIONS[suffix] < 0
+        entry = {"metric": path, "baseline": reference, "current": value, "change": change}
+        if abs(value - reference) < MIN_DELTA[suffix] or abs(change) <= threshold:
+            continue
+        report["regressions" if worse else "improvements"].append(entry)
+    return report
+
+
+def format_report(report: Dict[str, List[Dict[str, Any]]], threshold: float) -> str:
+    lines = [f"Limite de regressão: {threshold:.0%}"]
+    for kind, title in (("regressions", "❌ Regressões"), ("improvements", "✅ Melhorias")):
+        entries = sorted(report[kind], key=lambda e: -abs(e["change"]))
+        lines.append(f"{title}: {len(entries)}")
+        for e in entries:
+            lines.append(f"  {e['change']:+7.1%}  {e['metric']}  "
+                         f"({e['baseline']:.3f} → {e['current']:.3f})")
+    if report["missing"]:
+        lines.append(f"⚠️  Sem baseline: {len(report['missing'])} métricas")
+    return "\n".join(lines)
@@ -0,0 +1,81 @@
+# benchmarks/datasets.py
+"""
+Datasets de benchmark gerados com generate_dataset.py, um arquivo SQLite por
+preset em benchmarks/data/. São reaproveitados entre execuções (mesma seed →
+mesmos dados) e só regenerados com --regenerate.
+"""
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+DATA_DIR = os.path.join(BENCH_DIR, "data")
+
+# Fim fixo: datasets reprodutíveis (as rotas recebem datas explícitas)
+DATASET_END = datetime(2025, 1, 1)
+
+# 25 Hz por dispositivo. O preset 1y é grande (~790M leituras por dispositivo);
+# --rate permite uma versão reduzida com a mesma forma.
+PRESETS: Dict[str, Dict[str, Any]] = {
+    "1d": {"days": 1, "devices": 1},
+    "30d": {"days": 30, "devices": 1},
+    "1y": {"days": 365, "devices": 1},
+}
+
+
+def dataset_paths(name: str, rate: float) -> Dict[str, str]:
+    suffix = "" if rate == 25 else f"_{rate:g}hz"
+    base = os.path.join(DATA_DIR, f"{name}{suffix}")
+    return {"db": base + ".db", "meta": base + ".json"}
+
+
+def database_url(path: str) -> str:
+    return f"sqlite:///{path}"
+
+
+def ensure_dataset(name: str, rate: float = 25.0, regenerate: bool = False) -> Dict[str, Any]:
+    """Gera o dataset se ainda não existir e devolve seus metadados."""
+    preset = PRESETS[name]
+    paths = dataset_paths(name, rate)
+    os.makedirs(DATA_DIR, exist_ok=True)
+
+    if regenerate:
+        for path in paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+
+    if not (os.path.exists(paths["db"]) and os.path.exists(paths["meta"])):
+        env = dict(os.environ, AURA_DATABASE_URL=database_url(paths["db"]),
+                   AURA_LOG_LEVEL="WARNING")
+        subprocess.run(
+            [
+                sys.executable, "generate_dataset.py",
+                "--devices", str(preset["devices"]),
+                "--days", str(preset["days"]),
+                "--rate", str(rate),
+                "--end", DATASET_END.isoformat(),
+                "--device-prefix", "bench-",
+                "--reset", "--rollups",
+            ],
+            cwd=BACKEND_DIR, env=env, check=True,
+        )
+        meta = {
+            "name": name,
+            "days": preset["days"],
+            "devices": preset["devices"],
+            "rate_hz": rate,
+            "start": (DATASET_END - timedelta(days=preset["days"])).isoformat(),
+            "end": DATASET_END.isoformat(),
+            "readings": int(preset["days"] * 86400 * rate * preset["devices"]),
+        }
+        with open(paths["meta"], "w") as f:
+            json.dump(meta, f, indent=2)
+
+    with open(paths["meta"]) as f:
+        meta = json.load(f)
+    meta["db"] = paths["db"]
+    return meta
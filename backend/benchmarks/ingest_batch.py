@@ -0,0 +1,154 @@
+# benchmarks/ingest_batch.py
+"""
+Vazão do envio em lote (POST /ingest/batch, app/services/ingest_batch.py).
+
+Sobe uma instância (uvicorn, papel api, sem broker) com banco novo e envia,
+para cada formato, --hours horas de um dispositivo a 25 Hz numa requisição
+só: colunar binário e NDJSON, com e sem gzip. Cada lote é enviado duas vezes
+(a segunda deve ser toda duplicada). Relata bytes enviados, duração,
+amostras/s e episódios detectados.
+
+Exemplo (a partir de backend/):
+    python -m benchmarks.ingest_batch --hours 4
+"""
+import argparse
+import gzip
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict
+
+import httpx
+import numpy as np
+
+from app.services.ingest_batch import AXES, encode_columnar
+from benchmarks.compare import RESULTS_DIR, save_json
+from benchmarks.datasets import BACKEND_DIR, DATA_DIR, database_url
+from benchmarks.soak import _free_port
+
+FORMATS = {
+    "columnar": "application/vnd.aura.columnar",
+    "columnar+gzip": "application/vnd.aura.columnar",
+    "ndjson": "application/x-ndjson",
+    "ndjson+gzip": "application/x-ndjson",
+}
+
+
+def synthesize(hours: float, seed: int) -> Dict[str, np.ndarray]:
+    """Dispositivo a 25 Hz com surtos de tremor de 5 Hz (1 min a cada 10) e jitter de 2 ms."""
+    rng = np.random.default_rng(seed)
+    n = int(hours * 3600 * 25)
+    t = np.arange(n) / 25.0
+    tremor = np.where(t % 600 < 60, 1.2, 0.05) * np.sin(2 * np.pi * 5.0 * t)
+    start_ms = int(time.time() * 1000) - n * 40 - 3_600_000
+    columns = {"ts_ms": start_ms + np.arange(n) * 40 + rng.integers(-2, 3, n)}
+    noise = rng.normal(0, 0.03, (6, n))
+    columns.update(acc_x=noise[0], acc_y=noise[1] + 0.3 * tremor, acc_z=9.81 + tremor + noise[2],
+                   gyro_x=0.4 * tremor + noise[3] * 0.2, gyro_y=noise[4] * 0.2,
+                   gyro_z=noise[5] * 0.2, temp=np.full(n, 25.0))
+    return columns
+
+
+def encode(columns: Dict[str, np.ndarray], fmt: str) -> bytes:
+    if fmt.startswith("columnar"):
+        body = encode_columnar(columns)
+    else:
+        keys = ("ts_ms", *AXES, "temp")
+        rows = zip(*(columns[key].tolist() for key in keys))
+        body = "\n".join(json.dumps(dict(zip(keys, row))) for row in rows).encode()
+    return gzip.compress(body, compresslevel=6) if fmt.endswith("gzip") else body
+
+
+def run(args) -> Dict[str, Any]:
+    db_path = os.path.join(DATA_DIR, "ingest-batch.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    port = _free_port()
+    env = dict(
+        os.environ, AURA_ROLE="api", AURA_DATABASE_URL=database_url(db_path),
+        AURA_LOG_LEVEL="WARNING", AURA_LIVE_SOCKET="/tmp/aura-live-ingest-batch.sock",
+        AURA_SHM_NAME="aura_live_ingest_batch",
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    http = httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=600)
+    cases = []
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                if http.get("/health").status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("instância não subiu em 30s")
+            time.sleep(0.2)
+
+        columns = synthesize(args.hours, args.seed)
+        for i, fmt in enumerate(args.formats.split(",")):
+            # Episódios não têm device_id: deslocar 1 ms evita que um formato
+            # encontre os episódios do anterior como já existentes
+            body = encode(dict(columns, ts_ms=columns["ts_ms"] + i), fmt)
+            headers = {"Content-Type": FORMATS[fmt]}
+            if fmt.endswith("gzip"):
+                headers["Content-Encoding"] = "gzip"
+            case: Dict[str, Any] = {"format": fmt, "samples": len(columns["ts_ms"]),
+                                    "body_bytes": len(body)}
+            for attempt in ("first", "repeat"):
+                started = time.perf_counter()
+                response = http.post(f"/ingest/batch?device_id=batch-{fmt}", content=body,
+                                     headers=headers)
+                elapsed = time.perf_counter() - started
+                response.raise_for_status()
+                data = response.json()
+                case[attempt] = {"seconds": elapsed, "samples_per_s": case["samples"] / elapsed,
+                                 "inserted": data["inserted"], "duplicates": data["duplicates"],
+                                 "episodes": data["episodes"]}
+            cases.append(case)
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        http.close()
+    return {"created_at": datetime.now().isoformat(), "config": vars(args), "cases": cases}
+
+
+def print_report(result: Dict[str, Any]):
+    print(f"\n  {'formato':<14} {'amostras':>9} {'MB':>7} {'s':>6} {'amostras/s':>11} "
+          f"{'episódios':>9} {'reenvio s':>9} {'duplicadas':>10}")
+    for case in result["cases"]:
+        first, repeat = case["first"], case["repeat"]
+        print(f"  {case['format']:<14} {case['samples']:>9,} {case['body_bytes'] / 1e6:7.1f} "
+              f"{first['seconds']:6.1f} {first['samples_per_s']:11,.0f} {first['episodes']:9} "
+              f"{repeat['seconds']:9.1f} {repeat['duplicates']:10,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vazão de POST /ingest/batch")
+    parser.add_argument("--hours", type=float, default=4.0, help="horas de dados por lote (25 Hz)")
+    parser.add_argument("--formats", default=",".join(FORMATS), help="formatos a comparar")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Arquivo JSON do resultado")
+    args = parser.parse_args()
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    result = run(args)
+    print_report(result)
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"ingest-batch-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    save_json(output, result)
+    print(f"💾 Resultado: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+# benchmarks/ingest_partition.py
+"""
+Ingestão particionada (AURA_INGEST_PARTITIONING=hrw) com várias instâncias.
+
+Sobe N instâncias de ingestão (uvicorn, AURA_ROLE=ingest) contra o broker em
+processo (benchmarks.mini_broker) ou um Mosquitto (--broker host:porta), com
+um banco compartilhado, e passa por três fases:
+
+1. estável: N instâncias;
+2. saída: a última instância é encerrada (publica "leave");
+3. entrada: uma instância nova entra no grupo.
+
+Por fase: mensagens processadas por instância contra a fatia esperada pelo
+hashing de rendezvous, tempo até o grupo convergir e, no fim, leituras
+duplicadas/perdidas no banco (por device_id, ts_ms).
+
+Exemplo (a partir de backend/):
+    python -m benchmarks.ingest_partition --instances 3 --devices 12 --rate 5
+    docker compose -f ../infra/docker-compose.yml up -d mqtt
+    python -m benchmarks.ingest_partition --broker localhost:1883
+"""
+import argparse
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.compare import RESULTS_DIR, save_json
+from benchmarks.datasets import BACKEND_DIR, DATA_DIR, database_url
+from benchmarks.mini_broker import MiniBroker
+from benchmarks.mqtt_load import DeviceFleet, parse_broker
+from benchmarks.soak import _free_port, _scrape, _sum_metric
+from app.services.ingest_partition import rendezvous_owner
+
+
+class _Instance:
+    def __init__(self, name: str, db_path: str, host: str, mqtt_port: int):
+        self.name = name
+        self.port = _free_port()
+        env = dict(
+            os.environ, AURA_ROLE="ingest", AURA_INGEST_PARTITIONING="hrw",
+            AURA_INGEST_HEARTBEAT_SECONDS="1", AURA_MQTT_CLIENT_ID=name,
+            AURA_MQTT_HOST=host, AURA_MQTT_PORT=str(mqtt_port),
+            AURA_DATABASE_URL=database_url(db_path), AURA_LOG_LEVEL="WARNING",
+            AURA_LIVE_SOCKET=f"/tmp/aura-live-{name}.sock", AURA_SHM_NAME=f"aura_live_{name}",
+            AURA_INGEST_SPOOL_PATH=os.path.join(DATA_DIR, f"spool-{name}.ndjson"),
+        )
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+             "--port", str(self.port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env,
+        )
+        self.http = httpx.Client(base_url=f"http://127.0.0.1:{self.port}", timeout=10)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                if self.http.get("/health").status_code == 200:
+                    return
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"instância {name} não subiu em 30s")
+
+    def metrics(self) -> Dict[str, float]:
+        samples = _scrape(self.http)
+        return {
+            "parsed": _sum_metric(samples, "aura_mqtt_messages_parsed_total"),
+            "skipped": _sum_metric(samples, "aura_ingest_partition_skipped_total"),
+            "members": _sum_metric(samples, "aura_ingest_partition_members"),
+        }
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.http.close()
+
+
+def _wait_members(instances: List[_Instance], expected: int, timeout: float = 15.0) -> Optional[float]:
+    """Segundos até todas as instâncias verem `expected` membros (None se não convergiu)."""
+    started = time.monotonic()
+    while time.monotonic() - started < timeout:
+        if all(i.metrics()["members"] == expected for i in instances):
+            return time.monotonic() - started
+        time.sleep(0.1)
+    return None
+
+
+def _phase(name: str, instances: List[_Instance], devices: List[str], rate: float,
+           seconds: float, convergence: Optional[float]) -> Dict[str, Any]:
+    members = [i.name for i in instances]
+    before = {i.name: i.metrics() for i in instances}
+    time.sleep(seconds)
+    after = {i.name: i.metrics() for i in instances}
+
+    total = sum(after[m]["parsed"] - before[m]["parsed"] for m in members) or 1.0
+    per_instance = {}
+    for m in members:
+        owned = [d for d in devices if rendezvous_owner(d, members) == m]
+        per_instance[m] = {
+            "devices": len(owned),
+            "expected_share": len(owned) / len(devices),
+            "share": (after[m]["parsed"] - before[m]["parsed"]) / total,
+            "parsed": after[m]["parsed"] - before[m]["parsed"],
+            "skipped": after[m]["skipped"] - before[m]["skipped"],
+        }
+    return {
+        "phase": name,
+        "members": members,
+        "convergence_s": convergence,
+        "throughput_per_s": total / seconds,
+        "offered_per_s": rate * len(devices),
+        "instances": per_instance,
+    }
+
+
+def _db_check(db_path: str) -> Dict[str, int]:
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        total = conn.execute("SELECT COUNT(*) FROM sensor_readings").fetchone()[0]
+        duplicates = conn.execute(
+            "SELECT COALESCE(SUM(n - 1), 0) FROM ("
+            " SELECT COUNT(*) AS n FROM sensor_readings GROUP BY device_id, ts_ms HAVING n > 1)"
+        ).fetchone()[0]
+    finally:
+        conn.close()
+    return {"readings": total, "duplicates": duplicates}
+
+
+def run(args) -> Dict[str, Any]:
+    os.makedirs(DATA_DIR, exist_ok=True)
+    db_path = os.path.join(DATA_DIR, "ingest_partition.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    broker = None
+    if args.broker:
+        host, port = parse_broker(args.broker)
+    else:
+        broker = MiniBroker().start()
+        host, port = broker.host, broker.port
+
+    instances: List[_Instance] = []
+    fleet = None
+    phases = []
+    try:
+        for n in range(args.instances):
+            instances.append(_Instance(f"ingest-{n}", db_path, host, port))
+        convergence = _wait_members(instances, len(instances))
+
+        fleet = DeviceFleet(host, port, args.devices, args.rate, fmt=args.format)
+        device_ids = [d.device_id for d in fleet.devices]
+        fleet.start()
+        phases.append(_phase("estável", instances, device_ids, args.rate,
+                             args.phase_seconds, convergence))
+
+        leaving = instances.pop()
+        leaving.stop()
+        convergence = _wait_members(instances, len(instances))
+        phases.append(_phase("saída", instances, device_ids, args.rate,
+                             args.phase_seconds, convergence))
+
+        instances.append(_Instance(f"ingest-{args.instances}", db_path, host, port))
+        convergence = _wait_members(instances, len(instances))
+        phases.append(_phase("entrada", instances, device_ids, args.rate,
+                             args.phase_seconds, convergence))
+
+        fleet.stop()
+        time.sleep(2)  # drena o que ainda está em processamento
+        published = fleet.stats["published"]
+    finally:
+        if fleet is not None:
+            fleet.stop()
+        for instance in instances:
+            instance.stop()
+        if broker is not None:
+            broker.stop()
+
+    db = _db_check(db_path)
+    return {
+        "created_at": datetime.now().isoformat(),
+        "config": vars(args),
+        "phases": phases,
+        "published": published,
+        "db": db,
+        # Publicadas durante as janelas de convergência podem ser perdidas ou duplicadas
+        "lost": max(0, published - (db["readings"] - db["duplicates"])),
+    }
+
+
+def print_report(result: Dict[str, Any]):
+    for phase in result["phases"]:
+        conv = phase["convergence_s"]
+        print(f"\n▶ {phase['phase']}: {len(phase['members'])} instâncias, "
+              f"convergiu em {'—' if conv is None else f'{conv:.1f}s'}, "
+              f"{phase['throughput_per_s']:.0f}/{phase['offered_per_s']:.0f} msg/s")
+        print(f"  {'instância':<12} {'disp.':>5} {'esperado':>9} {'medido':>7} {'ignoradas':>9}")
+        for name, r in phase["instances"].items():
+            print(f"  {name:<12} {r['devices']:5d} {r['expected_share']:9.0%} "
+                  f"{r['share']:7.0%} {r['skipped']:9.0f}")
+    db = result["db"]
+    print(f"\nPublicadas: {result['published']}  no banco: {db['readings']}  "
+          f"duplicadas: {db['duplicates']}  perdidas: {result['lost']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestão particionada entre instâncias (HRW)")
+    parser.add_argument("--instances", type=int, default=3)
+    parser.add_argument("--devices", type=int, default=12)
+    parser.add_argument("--rate", type=float, default=5.0, help="Hz por dispositivo")
+    parser.add_argument("--phase-seconds", type=float, default=10.0)
+    parser.add_argument("--format", choices=("firmware", "device-field"), default="firmware",
+                        help="firmware: dispositivo no tópico; device-field: no payload")
+    parser.add_argument("--broker", help="host:porta de um broker externo (padrão: em processo)")
+    parser.add_argument("--output", help="Arquivo JSON do resultado")
+    args = parser.parse_args()
+
+    result = run(args)
+    print_report(result)
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"ingest-partition-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    save_json(output, result)
+    print(f"💾 Resultado: {output}")
+
+
+if __name__ == "__main__":
+    main()
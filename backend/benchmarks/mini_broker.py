@@ -0,0 +1,197 @@
+# benchmarks/mini_broker.py
+"""
+Broker MQTT 3.1.1 mínimo, em processo, para testes de carga sem o Mosquitto
+(infra/docker-compose.yml). Cobre o que o firmware e o backend usam:
+CONNECT, SUBSCRIBE/UNSUBSCRIBE com curingas + e #, PUBLISH QoS 0/1/2,
+PINGREQ e DISCONNECT. Não implementa retain, will, sessões persistentes nem
+retransmissão; não serve para produção.
+
+Como num broker real, cada assinante tem um limite de bytes pendentes de
+envio: mensagens além dele são descartadas e contadas em `stats["dropped"]`
+(equivalente ao max_queued_messages do Mosquitto).
+"""
+import asyncio
+import struct
+import threading
+from typing import Dict, List, Optional, Tuple
+
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 10, 11, 12, 13, 14
+
+MAX_PENDING_BYTES = 4 * 1024 * 1024  # por assinante
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    """Casamento de filtro MQTT (+ = um nível, # = resto)."""
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    for i, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if i >= len(topic_levels):
+            return False
+        if level != "+" and level != topic_levels[i]:
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+def _packet(packet_type: int, flags: int, body: bytes) -> bytes:
+    header = bytearray([(packet_type << 4) | flags])
+    length = len(body)
+    while True:
+        byte, length = length % 128, length // 128
+        header.append(byte | (0x80 if length else 0))
+        if not length:
+            break
+    return bytes(header) + body
+
+
+def _string(data: bytes, pos: int) -> Tuple[bytes, int]:
+    (length,) = struct.unpack_from("!H", data, pos)
+    return data[pos + 2:pos + 2 + length], pos + 2 + length
+
+
+class _Session:
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.client_id = ""
+        self.subscriptions: Dict[str, int] = {}
+        self._packet_id = 0
+
+    def next_packet_id(self) -> int:
+        self._packet_id = self._packet_id % 65535 + 1
+        return self._packet_id
+
+
+class MiniBroker:
+    """Broker em uma thread própria (loop asyncio dedicado)."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 max_pending_bytes: int = MAX_PENDING_BYTES):
+        self.host = host
+        self.port = port
+        self.max_pending_bytes = max_pending_bytes
+        self.stats = {"connections": 0, "received": 0, "delivered": 0, "dropped": 0}
+        self._sessions: List[_Session] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    # ------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------
+
+    def start(self) -> "MiniBroker":
+        self._thread = threading.Thread(target=self._run, name="mini-broker", daemon=True)
+        self._thread.start()
+        self._ready.wait(5)
+        return self
+
+    def stop(self):
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            for session in list(self._sessions):
+                session.writer.close()
+            self._loop.close()
+
+    # ------------------------------------------------------------
+    # Protocolo
+    # ------------------------------------------------------------
+
+    async def _read_packet(self, reader: asyncio.StreamReader) -> Tuple[int, int, bytes]:
+        first = (await reader.readexactly(1))[0]
+        length, multiplier = 0, 1
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            length += (byte & 0x7F) * multiplier
+            multiplier *= 128
+            if not byte & 0x80:
+                break
+        body = await reader.readexactly(length) if length else b""
+        return first >> 4, first & 0x0F, body
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        session = _Session(writer)
+        self.stats["connections"] += 1
+        self._sessions.append(session)
+        try:
+            while True:
+                packet_type, flags, body = await self._read_packet(reader)
+                if packet_type == CONNECT:
+                    pos = _string(body, 0)[1] + 4  # nome do protocolo, nível, flags, keepalive
+                    client_id, _ = _string(body, pos)
+                    session.client_id = client_id.decode(errors="replace")
+                    writer.write(_packet(CONNACK, 0, b"\x00\x00"))
+                elif packet_type == PUBLISH:
+                    self._on_publish(session, flags, body)
+                elif packet_type == PUBREL:
+                    writer.write(_packet(PUBCOMP, 0, body[:2]))
+                elif packet_type == SUBSCRIBE:
+                    packet_id, pos, granted = body[:2], 2, bytearray()
+                    while pos < len(body):
+                        topic_filter, pos = _string(body, pos)
+                        qos = min(body[pos], 2)
+                        pos += 1
+                        session.subscriptions[topic_filter.decode()] = qos
+                        granted.append(qos)
+                    writer.write(_packet(SUBACK, 0, packet_id + bytes(granted)))
+                elif packet_type == UNSUBSCRIBE:
+                    pos = 2
+                    while pos < len(body):
+                        topic_filter, pos = _string(body, pos)
+                        session.subscriptions.pop(topic_filter.decode(), None)
+                    writer.write(_packet(UNSUBACK, 0, body[:2]))
+                elif packet_type == PINGREQ:
+                    writer.write(_packet(PINGRESP, 0, b""))
+                elif packet_type == DISCONNECT:
+                    break
+                # PUBACK/PUBREC/PUBCOMP dos assinantes: sem retransmissão, nada a fazer
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._sessions.remove(session)
+            writer.close()
+
+    def _on_publish(self, session: _Session, flags: int, body: bytes):
+        qos = (flags >> 1) & 0x03
+        topic, pos = _string(body, 0)
+        if qos:
+            packet_id = body[pos:pos + 2]
+            pos += 2
+            session.writer.write(_packet(PUBACK if qos == 1 else PUBREC, 0, packet_id))
+        self.stats["received"] += 1
+
+        topic_str = topic.decode()
+        payload = body[pos:]
+        for subscriber in self._sessions:
+            granted = max(
+                (q for f, q in subscriber.subscriptions.items() if topic_matches(f, topic_str)),
+                default=None,
+            )
+            if granted is None:
+                continue
+            if subscriber.writer.transport.get_write_buffer_size() > self.max_pending_bytes:
+                self.stats["dropped"] += 1
+                continue
+            out_qos = min(qos, granted, 1)  # QoS 2 é entregue como 1 (sem PUBREC/PUBREL de saída)
+            header = struct.pack("!H", len(topic)) + topic
+            if out_qos:
+                header += struct.pack("!H", subscriber.next_packet_id())
+            subscriber.writer.write(_packet(PUBLISH, out_qos << 1, header + payload))
+            self.stats["delivered"] += 1
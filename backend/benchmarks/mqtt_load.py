@@ -0,0 +1,216 @@
+# benchmarks/mqtt_load.py
+"""
+Gerador de carga MQTT: N dispositivos simulados publicando leituras do MPU6050
+numa taxa fixa, como o firmware (device/firmware/src/main.cpp).
+
+Cada dispositivo tem seu "boot" em um instante aleatório da última hora e
+envia ts_ms = millis() desde o boot, calculado do instante *agendado* da
+amostra (grade de 1/rate), como o timer de amostragem do firmware: o horário
+da amostra é boot_ms + ts_ms, o que permite medir a latência ponta a ponta a
+partir do banco (ver benchmarks/soak.py). Se o gerador atrasa, o ts_ms não
+muda (nem colide com a amostra seguinte); o atraso do publicador (envio -
+instante agendado) é medido à parte em DeviceFleet.lateness_ms.
+
+Uso isolado contra um broker/backend já em execução (a partir de backend/):
+    python -m benchmarks.mqtt_load --broker localhost:1883 --devices 20 --rate 25 --duration 60
+"""
+import argparse
+import heapq
+import json
+import math
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import paho.mqtt.client as mqtt
+
+# Mesmo tópico base de app.mqtt_client (o firmware publica nele)
+TOPIC = "parkinson/mpu6050"
+
+# firmware:     JSON do firmware (4 casas), dispositivo no sufixo do tópico
+# device-field: JSON do firmware com "device_id", no tópico base
+# verbose:      json.dumps com precisão total e campos extras (payload maior)
+PAYLOAD_FORMATS = ("firmware", "device-field", "verbose")
+
+LATENESS_SAMPLES = 100_000  # atrasos do publicador guardados (os mais recentes)
+
+_FIRMWARE_JSON = (
+    '{"acc_x":%.4f,"acc_y":%.4f,"acc_z":%.4f,'
+    '"gyro_x":%.4f,"gyro_y":%.4f,"gyro_z":%.4f,"temp":%.2f,"ts_ms":%d}'
+)
+
+
+def parse_broker(value: str) -> Tuple[str, int]:
+    host, _, port = value.rpartition(":")
+    return (host or "localhost"), int(port or 1883)
+
+
+class SimulatedDevice:
+    """Sinal de um dispositivo: tremor de 4–6 Hz com amplitude variável e ruído."""
+
+    def __init__(self, device_id: str, fmt: str, rng: random.Random, bad_ratio: float = 0.0):
+        self.device_id = device_id
+        self.fmt = fmt
+        self.rng = rng
+        self.bad_ratio = bad_ratio
+        self.boot_ms = time.time() * 1000.0 - rng.uniform(0, 3_600_000)
+        self.freq = rng.uniform(4.0, 6.0)
+        self.phase = rng.uniform(0, 2 * math.pi)
+
+    def message(self, sample_ms: float) -> Tuple[str, bytes, bool]:
+        """(tópico, payload, é_inválida) da amostra agendada para `sample_ms` (epoch)."""
+        ts_ms = int(round(sample_ms - self.boot_ms))
+        t = ts_ms / 1000.0
+        gauss = self.rng.gauss
+        amplitude = 0.6 * (1 + math.sin(2 * math.pi * t / 120.0))  # surtos a cada ~2 min
+        tremor = amplitude * math.sin(2 * math.pi * self.freq * t + self.phase)
+        values = (
+            tremor + gauss(0, 0.05), 0.5 * tremor + gauss(0, 0.05), 9.81 + gauss(0, 0.05),
+            0.2 * tremor + gauss(0, 0.01), gauss(0, 0.01), gauss(0, 0.01),
+            30.0 + gauss(0, 0.1), ts_ms,
+        )
+
+        topic = f"{TOPIC}/{self.device_id}" if self.fmt == "firmware" else TOPIC
+        if self.fmt == "verbose":
+            keys = ("acc_x", "acc_y", "acc_z", "gyro_x", "gyro_y", "gyro_z", "temp", "ts_ms")
+            body = dict(zip(keys, values), device_id=self.device_id, fw="1.0.0",
+                        rssi=self.rng.randint(-80, -40), seq=ts_ms)
+            payload = json.dumps(body)
+        else:
+            payload = _FIRMWARE_JSON % values
+            if self.fmt == "device-field":
+                payload = f'{{"device_id":"{self.device_id}",' + payload[1:]
+
+        if self.bad_ratio and self.rng.random() < self.bad_ratio:
+            # metade JSON truncado, metade sem campos obrigatórios
+            payload = payload[: len(payload) // 2] if self.rng.random() < 0.5 else '{"temp":30.0}'
+            return topic, payload.encode(), True
+        return topic, payload.encode(), False
+
+
+class DeviceFleet:
+    """
+    Publica para todos os dispositivos a partir de uma única thread de
+    cadência (heap de próximos envios). Por padrão cada dispositivo tem sua
+    própria conexão, como no campo; shared_connection=True usa uma só
+    (gateway), útil para milhares de dispositivos.
+    """
+
+    def __init__(self, host: str, port: int, devices: int, rate: float,
+                 fmt: str = "firmware", qos: int = 0, prefix: str = "load-",
+                 seed: int = 1, bad_ratio: float = 0.0, shared_connection: bool = False):
+        if fmt not in PAYLOAD_FORMATS:
+            raise ValueError(f"formato inválido: {fmt}")
+        self.host, self.port = host, port
+        self.rate, self.qos = rate, qos
+        self.shared_connection = shared_connection
+        rng = random.Random(seed)
+        self.devices = [
+            SimulatedDevice(f"{prefix}{i:04d}", fmt, random.Random(rng.random()), bad_ratio)
+            for i in range(devices)
+        ]
+        self.stats = {"published": 0, "invalid": 0, "errors": 0, "late": 0}
+        # Envio - instante agendado (ms) de cada publicação; "late" conta os > 1 período
+        self.lateness_ms: deque = deque(maxlen=LATENESS_SAMPLES)
+        self._clients: List[mqtt.Client] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def boot_ms(self) -> Dict[str, float]:
+        return {d.device_id: d.boot_ms for d in self.devices}
+
+    def start(self):
+        connections = 1 if self.shared_connection else len(self.devices)
+        for i in range(connections):
+            client_id = "load-gateway" if self.shared_connection else self.devices[i].device_id
+            client = mqtt.Client(client_id=f"{client_id}-{random.getrandbits(24):06x}",
+                                 clean_session=True)
+            client.connect(self.host, self.port, keepalive=60)
+            client.loop_start()
+            self._clients.append(client)
+        self._thread = threading.Thread(target=self._run, name="mqtt-load", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(5)
+        for client in self._clients:
+            client.loop_stop()
+            client.disconnect()
+        self._clients.clear()
+
+    def _run(self):
+        period = 1.0 / self.rate
+        start = time.perf_counter()
+        # Agenda em perf_counter (monotônico); epoch só para o ts_ms da amostra
+        epoch_offset = time.time() - start
+        # Envios espalhados dentro do primeiro período (dispositivos não sincronizados)
+        heap = [(start + period * i / len(self.devices), i) for i in range(len(self.devices))]
+        heapq.heapify(heap)
+        stats = self.stats
+
+        while not self._stop.is_set():
+            due, index = heap[0]
+            now = time.perf_counter()
+            if due > now:
+                time.sleep(min(due - now, 0.05))
+                continue
+
+            device = self.devices[index]
+            client = self._clients[0 if self.shared_connection else index]
+            topic, payload, invalid = device.message((due + epoch_offset) * 1000.0)
+            info = client.publish(topic, payload, qos=self.qos)
+            self.lateness_ms.append((now - due) * 1000.0)
+            if info.rc == mqtt.MQTT_ERR_SUCCESS:
+                stats["published"] += 1
+                stats["invalid"] += invalid
+            else:
+                stats["errors"] += 1
+            if now - due > period:
+                stats["late"] += 1  # o gerador não acompanha a taxa pedida
+            heapq.heapreplace(heap, (due + period, index))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gerador de carga MQTT (dispositivos simulados)")
+    parser.add_argument("--broker", default="localhost:1883", help="host:porta do broker")
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=25.0, help="Hz por dispositivo")
+    parser.add_argument("--duration", type=float, default=60.0, help="Segundos")
+    parser.add_argument("--format", choices=PAYLOAD_FORMATS, default="firmware")
+    parser.add_argument("--qos", type=int, choices=(0, 1, 2), default=0)
+    parser.add_argument("--prefix", default="load-", help="Prefixo dos device_id")
+    parser.add_argument("--bad-ratio", type=float, default=0.0,
+                        help="Fração de payloads inválidos (exercita os descartes)")
+    parser.add_argument("--shared-connection", action="store_true",
+                        help="Uma conexão para todos os dispositivos")
+    args = parser.parse_args()
+
+    host, port = parse_broker(args.broker)
+    fleet = DeviceFleet(host, port, args.devices, args.rate, fmt=args.format, qos=args.qos,
+                        prefix=args.prefix, bad_ratio=args.bad_ratio,
+                        shared_connection=args.shared_connection)
+    print(f"📡 {args.devices} dispositivos × {args.rate:g} Hz → {host}:{port} ({args.format})")
+    fleet.start()
+    started = time.perf_counter()
+    try:
+        while time.perf_counter() - started < args.duration:
+            time.sleep(5)
+            elapsed = time.perf_counter() - started
+            print(f"  {elapsed:6.0f}s  {fleet.stats['published'] / elapsed:8.0f} msg/s  "
+                  f"erros={fleet.stats['errors']}  atrasadas={fleet.stats['late']}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fleet.stop()
+    lateness = sorted(fleet.lateness_ms)
+    p99 = lateness[int(0.99 * (len(lateness) - 1))] if lateness else 0.0
+    print(f"✅ Publicadas: {fleet.stats['published']} (atraso do publicador p99={p99:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# benchmarks/overload.py
+"""
+Rajada de carga contra a ingestão com e sem o controle de sobrecarga
+(fidelidade adaptativa das features, app/services/overload_controller.py).
+
+Para cada configuração (AURA_OVERLOAD_CONTROL=on/off) sobe uma instância
+(uvicorn) contra o broker em processo e publica:
+
+1. base: --devices dispositivos a --rate Hz;
+2. rajada: mais (--burst - 1) x --devices dispositivos por --burst-seconds;
+3. recuperação: de volta à base.
+
+Amostra a cada segundo a fila de persistência, o modo de fidelidade e a
+ocupação da thread de persistência. No fim informa o pico e o tempo para a
+fila voltar a zero, quanto tempo o backfill levou e se toda leitura tem
+feature completa.
+
+Exemplo (a partir de backend/):
+    python -m benchmarks.overload --devices 4 --rate 25 --burst 4
+"""
+import argparse
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmarks.compare import RESULTS_DIR, save_json
+from benchmarks.datasets import BACKEND_DIR, DATA_DIR, database_url
+from benchmarks.mini_broker import MiniBroker
+from benchmarks.mqtt_load import DeviceFleet
+from benchmarks.soak import _free_port, _scrape, _sum_metric
+
+_SAMPLED = {
+    "depth": "aura_ingest_queue_depth",
+    "level": "aura_feature_fidelity_level",
+    "busy": "aura_ingest_busy_ratio",
+    "parsed": "aura_mqtt_messages_parsed_total",
+    "pending": "aura_feature_backfill_pending",
+    "dropped": "aura_mqtt_messages_dropped_total",
+}
+
+
+def _sample(http: httpx.Client) -> Dict[str, float]:
+    samples = _scrape(http)
+    return {key: _sum_metric(samples, name) for key, name in _SAMPLED.items()}
+
+
+def _db_check(db_path: str) -> Dict[str, int]:
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        readings = conn.execute("SELECT COUNT(*) FROM sensor_readings").fetchone()[0]
+        features = conn.execute("SELECT COUNT(*) FROM sensor_features").fetchone()[0]
+        # Sem FFT por falta de histórico só nas primeiras amostras de cada dispositivo
+        incomplete = conn.execute(
+            "SELECT COUNT(*) FROM sensor_features WHERE acc_mean IS NULL OR freq_dominant IS NULL"
+        ).fetchone()[0]
+    finally:
+        conn.close()
+    return {"readings": readings, "features": features, "incomplete": incomplete}
+
+
+def run_case(control: str, broker: MiniBroker, args) -> Dict[str, Any]:
+    db_path = os.path.join(DATA_DIR, f"overload-{control}.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    port = _free_port()
+    env = dict(
+        os.environ, AURA_ROLE="ingest", AURA_OVERLOAD_CONTROL=control,
+        AURA_MQTT_HOST=broker.host, AURA_MQTT_PORT=str(broker.port),
+        AURA_DATABASE_URL=database_url(db_path), AURA_LOG_LEVEL="WARNING",
+        AURA_INGEST_QUEUE_SIZE=str(args.queue_size),
+        AURA_LIVE_SOCKET=f"/tmp/aura-live-overload-{control}.sock",
+        AURA_SHM_NAME=f"aura_live_overload_{control}",
+        AURA_INGEST_LOCK=f"/tmp/aura-ingest-overload-{control}.lock",
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    http = httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=10)
+    base = burst = None
+    timeline: List[Dict[str, Any]] = []
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                if http.get("/health").status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("instância não subiu em 30s")
+            time.sleep(0.2)
+
+        base = DeviceFleet(broker.host, broker.port, args.devices, args.rate)
+        burst = DeviceFleet(broker.host, broker.port, args.devices * (args.burst - 1),
+                            args.rate, prefix="burst-", seed=2)
+        base.start()
+        started = time.monotonic()
+        phase = "base"
+        burst_end = args.warmup + args.burst_seconds
+        total = burst_end + args.recovery
+        while True:
+            t = time.monotonic() - started
+            if phase == "base" and t >= args.warmup:
+                burst.start()
+                phase = "rajada"
+            elif phase == "rajada" and t >= burst_end:
+                burst.stop()
+                phase = "recuperação"
+            sample = _sample(http)
+            sample.update(t=round(t, 1), phase=phase)
+            timeline.append(sample)
+            if t >= total:
+                # Fim da recuperação: espera só o backfill terminar
+                if sample["depth"] == 0 and sample["pending"] == 0 and sample["level"] == 0:
+                    break
+                if t >= total + args.backfill_timeout:
+                    break
+            time.sleep(1.0)
+        base.stop()
+        time.sleep(2)
+        published = base.stats["published"] + burst.stats["published"]
+    finally:
+        for fleet in (base, burst):
+            if fleet is not None:
+                fleet.stop()
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        http.close()
+
+    after_burst = [s for s in timeline if s["t"] >= burst_end]
+    drained = next((s["t"] - burst_end for s in after_burst if s["depth"] == 0), None)
+    return {
+        "control": control,
+        "published": published,
+        "peak_depth": max(s["depth"] for s in timeline),
+        "max_level": max(s["level"] for s in timeline),
+        "drain_after_burst_s": drained,
+        "duration_s": timeline[-1]["t"],
+        "db": _db_check(db_path),
+        "timeline": timeline,
+    }
+
+
+def print_report(result: Dict[str, Any]):
+    for case in result["cases"]:
+        print(f"\n▶ controle {case['control']}")
+        print(f"  {'t':>5} {'fase':<12} {'fila':>6} {'nível':>5} {'ocup.':>6} {'backfill':>8}")
+        for s in case["timeline"]:
+            print(f"  {s['t']:5.0f} {s['phase']:<12} {s['depth']:6.0f} {s['level']:5.0f} "
+                  f"{s['busy']:6.0%} {s['pending']:8.0f}")
+        drained = case["drain_after_burst_s"]
+        db = case["db"]
+        print(f"  pico da fila: {case['peak_depth']:.0f}  "
+              f"fila zerada {'—' if drained is None else f'{drained:.0f}s'} após a rajada  "
+              f"nível máx.: {case['max_level']:.0f}")
+        print(f"  publicadas: {case['published']}  leituras: {db['readings']}  "
+              f"features: {db['features']}  incompletas: {db['incomplete']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rajada de ingestão com fidelidade adaptativa")
+    parser.add_argument("--devices", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=25.0, help="Hz por dispositivo")
+    parser.add_argument("--burst", type=int, default=4, help="multiplicador da carga na rajada")
+    parser.add_argument("--warmup", type=float, default=10.0)
+    parser.add_argument("--burst-seconds", type=float, default=20.0)
+    parser.add_argument("--recovery", type=float, default=20.0)
+    parser.add_argument("--backfill-timeout", type=float, default=60.0)
+    parser.add_argument("--queue-size", type=int, default=1000)
+    parser.add_argument("--controls", default="on,off", help="configurações a comparar")
+    parser.add_argument("--output", help="Arquivo JSON do resultado")
+    args = parser.parse_args()
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    broker = MiniBroker().start()
+    try:
+        cases = [run_case(control, broker, args) for control in args.controls.split(",")]
+    finally:
+        broker.stop()
+    result = {"created_at": datetime.now().isoformat(), "config": vars(args), "cases": cases}
+    print_report(result)
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"overload-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    save_json(output, result)
+    print(f"💾 Resultado: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# benchmarks/replay.py
+"""
+Reprodução acelerada de tráfego gravado (app/services/ingest_sources.py).
+
+Gera --hours horas de --devices dispositivos a 25 Hz no JSON do firmware
+(benchmarks/mqtt_load.py), com surtos de tremor e atraso de rede variável, e
+grava as mensagens em arquivos de captura rotativos (o mesmo CaptureWriter
+da gravação ao vivo). Depois reproduz os arquivos em processo, contra um
+banco novo, pelo caminho de produção: handle_message → relógio/buffer de
+reordenação → persistência (--writer bulk ou queue) → features → episódios.
+Relata a duração da gravação e da reprodução, mensagens/s, quantas vezes o
+tempo real e o que foi gravado no banco.
+
+--source generator pula os arquivos e reproduz direto do gerador.
+
+Exemplo (a partir de backend/):
+    python -m benchmarks.replay --devices 1 --hours 24
+    python -m benchmarks.replay --hours 0.25 --writer queue
+"""
+import argparse
+import glob
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, Tuple
+
+import numpy as np
+
+from benchmarks.compare import RESULTS_DIR, save_json
+from benchmarks.datasets import DATA_DIR, database_url
+from benchmarks.mqtt_load import _FIRMWARE_JSON, TOPIC
+
+CAPTURE_DIR = os.path.join(DATA_DIR, "replay-capture")
+
+
+def synthetic_traffic(devices: int, hours: float, rate: float,
+                      seed: int) -> Iterator[Tuple[float, str, bytes]]:
+    """
+    (received_ms, tópico, payload) em ordem de chegada, no JSON do firmware:
+    cada dispositivo envia a `rate` Hz desde a meia-noite de ontem, com surtos
+    de tremor de 5 Hz (1 min a cada 10, defasados por dispositivo), e cada
+    mensagem leva 5 ms + atraso exponencial (média 3 ms) até o servidor.
+    """
+    rng = np.random.default_rng(seed)
+    start_ms = datetime.combine(datetime.now().date() - timedelta(days=1),
+                                datetime.min.time()).timestamp() * 1000.0
+    boot_ms = start_ms - rng.uniform(0, 3_600_000, devices)
+    phase_s = rng.uniform(0, 600, devices)
+    topics = [f"{TOPIC}/replay-{i:03d}" for i in range(devices)]
+    period = 1000.0 / rate
+    total = int(hours * 3600 * rate)
+    block = int(rate)  # um segundo por vez, ordenado pela chegada
+    for first in range(0, total, block):
+        k = np.arange(first, min(first + block, total))
+        sent_ms = start_ms + k * period
+        t = (k * period / 1000.0)[None, :] + phase_s[:, None]
+        tremor = np.where(t % 600 < 60, 1.2, 0.05) * np.sin(2 * np.pi * 5.0 * t)
+        noise = rng.normal(0, 0.03, (6, devices, len(k)))
+        values = np.stack([noise[0], noise[1] + 0.3 * tremor, 9.81 + tremor + noise[2],
+                           0.4 * tremor + noise[3] * 0.2, noise[4] * 0.2, noise[5] * 0.2,
+                           np.full(tremor.shape, 25.0)], axis=-1)
+        ts_ms = (sent_ms[None, :] - boot_ms[:, None]).astype(np.int64)
+        received = sent_ms[None, :] + 5.0 + rng.exponential(3.0, tremor.shape)
+        arrivals = [
+            (received[d, j], topics[d], (_FIRMWARE_JSON % (*values[d, j], ts_ms[d, j])).encode())
+            for d in range(devices) for j in range(len(k))
+        ]
+        arrivals.sort(key=lambda m: m[0])
+        yield from arrivals
+
+
+def write_capture(args) -> Dict[str, Any]:
+    from app.services.ingest_sources import CaptureWriter
+
+    shutil.rmtree(CAPTURE_DIR, ignore_errors=True)
+    writer = CaptureWriter(CAPTURE_DIR, args.format, rotate_bytes=args.rotate_mb * 1024 * 1024)
+    started = time.perf_counter()
+    count = 0
+    for received_ms, topic, payload in synthetic_traffic(args.devices, args.hours, args.rate,
+                                                         args.seed):
+        writer.write(received_ms, topic, payload)
+        count += 1
+    writer.close()
+    seconds = time.perf_counter() - started
+    return {"messages": count, "files": len(writer.files), "seconds": seconds,
+            "bytes": sum(os.path.getsize(path) for path in writer.files)}
+
+
+def replay(args) -> Dict[str, Any]:
+    from sqlalchemy import func
+
+    from app.db import SessionLocal, engine, ensure_columns, ensure_indexes
+    from app.models import Base, Episode, SensorFeature, SensorReading
+    from app.mqtt_client import start_mqtt, stop_mqtt
+    from app.services.ingest_sources import (
+        ReplaySource, capture_files, capture_messages, parse_replay_speed,
+    )
+
+    Base.metadata.create_all(bind=engine)
+    ensure_columns()
+    ensure_indexes()
+    if args.source == "file":
+        paths = capture_files(os.path.join(CAPTURE_DIR, "capture-*"))
+        messages, label = capture_messages(paths), f"{len(paths)} arquivo(s)"
+    else:
+        messages = synthetic_traffic(args.devices, args.hours, args.rate, args.seed)
+        label = "gerador"
+    source = ReplaySource(messages, speed=parse_replay_speed(args.speed),
+                          writer=args.writer, label=label)
+    start_mqtt(source)
+    try:
+        source.done.wait()
+    finally:
+        stop_mqtt()
+
+    db = SessionLocal()
+    try:
+        stored = {
+            "readings": db.query(func.count(SensorReading.id)).scalar(),
+            "features": db.query(func.count(SensorFeature.id)).scalar(),
+            "episodes": db.query(func.count(Episode.id)).scalar(),
+        }
+    finally:
+        db.close()
+    return {**source.stats, "stored": stored}
+
+
+def print_report(result: Dict[str, Any]):
+    capture, replayed = result.get("capture"), result["replay"]
+    if capture:
+        print(f"  📼 Captura: {capture['messages']:,} mensagens em {capture['files']} arquivo(s), "
+              f"{capture['bytes'] / 1e6:.1f} MB, {capture['seconds']:.1f}s")
+    stored = replayed["stored"]
+    print(f"  ⏩ Reprodução ({replayed['writer']}): {replayed['messages']:,} mensagens "
+          f"({replayed['span_seconds'] / 3600:.2f} h gravadas) em {replayed['seconds']:.1f}s — "
+          f"{replayed['messages_per_s']:,.0f} msg/s, {replayed['speedup']:,.0f}x o tempo real")
+    print(f"  🗄️  Banco: {stored['readings']:,} leituras, {stored['features']:,} features, "
+          f"{stored['episodes']} episódios")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reprodução acelerada de tráfego gravado")
+    parser.add_argument("--devices", type=int, default=1)
+    parser.add_argument("--hours", type=float, default=24.0, help="horas gravadas por dispositivo")
+    parser.add_argument("--rate", type=float, default=25.0, help="Hz por dispositivo")
+    parser.add_argument("--format", choices=("ndjson", "binary"), default="ndjson",
+                        help="formato dos arquivos de captura")
+    parser.add_argument("--rotate-mb", type=int, default=64, help="rotação dos arquivos (MB comprimidos)")
+    parser.add_argument("--source", choices=("file", "generator"), default="file")
+    parser.add_argument("--speed", default="max", help='"max" ou múltiplo do tempo real')
+    parser.add_argument("--writer", choices=("bulk", "queue"), help="padrão: bulk com max, queue com velocidade fixa")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Arquivo JSON do resultado")
+    args = parser.parse_args()
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    db_path = os.path.join(DATA_DIR, "replay.db")
+    for path in glob.glob(db_path + "*"):
+        os.remove(path)
+    # app.db lê a configuração na importação
+    os.environ["AURA_DATABASE_URL"] = database_url(db_path)
+    os.environ.setdefault("AURA_LOG_LEVEL", "WARNING")
+
+    result: Dict[str, Any] = {"created_at": datetime.now().isoformat(), "config": vars(args)}
+    if args.source == "file":
+        result["capture"] = write_capture(args)
+    result["replay"] = replay(args)
+    print_report(result)
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"replay-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    save_json(output, result)
+    print(f"💾 Resultado: {output}")
+
+
+if __name__ == "__main__":
+    main()
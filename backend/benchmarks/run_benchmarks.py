@@ -0,0 +1,122 @@
+# benchmarks/run_benchmarks.py
+"""
+Executa o suite de benchmarks contra um dataset gerado e grava o resultado em
+JSON (benchmarks/results/). Com --save-baseline o resultado vira a referência
+do dataset; com --compare é comparado à referência e o processo sai com
+código 1 se alguma métrica piorar além do limite.
+
+Exemplos (a partir de backend/):
+    python -m benchmarks.run_benchmarks --dataset 1d --save-baseline
+    python -m benchmarks.run_benchmarks --dataset 1d --compare --threshold 0.15
+    python -m benchmarks.run_benchmarks --dataset 1y --rate 1   # versão reduzida do ano
+"""
+import argparse
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+from benchmarks.datasets import PRESETS, database_url, ensure_dataset
+from benchmarks.compare import (
+    RESULTS_DIR, baseline_path, compare, format_report, load_json, save_json,
+)
+
+
+def _environment():
+    import numpy
+    import sqlalchemy
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "numpy": numpy.__version__,
+        "sqlalchemy": sqlalchemy.__version__,
+    }
+
+
+def run(args) -> dict:
+    meta = ensure_dataset(args.dataset, rate=args.rate, regenerate=args.regenerate)
+
+    # O engine é criado na importação de app.db: configurar antes de importar o app
+    os.environ["AURA_DATABASE_URL"] = database_url(meta["db"])
+    os.environ.setdefault("AURA_LOG_LEVEL", "WARNING")
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from benchmarks import cases
+
+    started = time.perf_counter()
+    result = {
+        "created_at": datetime.now().isoformat(),
+        "dataset": meta,
+        "environment": _environment(),
+        "ingest": {},
+        "routes": {},
+    }
+
+    print(f"📥 Ingestão ({args.messages} mensagens)...")
+    result["ingest"]["on_message"] = cases.bench_on_message(args.messages)
+    result["ingest"]["process_new_reading"] = cases.bench_process_new_reading(args.messages)
+
+    # Sem o contexto do TestClient o startup (MQTT, retenção) não roda
+    client = TestClient(app)
+    route_cases = cases.route_cases(meta)
+    print(f"🌐 Rotas ({len(route_cases)} casos × {args.repeat})...")
+    result["routes"] = cases.bench_routes(client, route_cases, args.repeat)
+    result["elapsed_seconds"] = time.perf_counter() - started
+    return result
+
+
+def print_summary(result: dict):
+    for name, values in result["ingest"].items():
+        extra = (f"{values['throughput_per_s']:,.0f} msg/s" if "throughput_per_s" in values
+                 else f"{values['mean_us']:,.0f} µs/amostra")
+        print(f"  {name:<24} {extra:>16}  p50={values['p50_ms']:.2f} ms  p95={values['p95_ms']:.2f} ms")
+    for name, values in result["routes"].items():
+        print(f"  {values['status']} {values['p50_ms']:9.2f} ms  p95={values['p95_ms']:9.2f} ms  "
+              f"mem={values['peak_mem_kb']:9.0f} KB  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do backend Aura")
+    parser.add_argument("--dataset", choices=sorted(PRESETS), default="1d")
+    parser.add_argument("--rate", type=float, default=25.0,
+                        help="Hz do dataset gerado (reduza para uma versão menor do preset)")
+    parser.add_argument("--regenerate", action="store_true", help="Recria o dataset")
+    parser.add_argument("--messages", type=int, default=2000, help="Mensagens no benchmark de ingestão")
+    parser.add_argument("--repeat", type=int, default=5, help="Execuções por rota")
+    parser.add_argument("--output", help="Arquivo de resultado (default = results/<dataset>-<data>.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="Grava o resultado como baseline")
+    parser.add_argument("--compare", nargs="?", const="", metavar="BASELINE",
+                        help="Compara com a baseline do dataset (ou o arquivo informado)")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Piora relativa que conta como regressão (default 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    result = run(args)
+    print_summary(result)
+
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    output = args.output or os.path.join(RESULTS_DIR, f"{args.dataset}-{stamp}.json")
+    save_json(output, result)
+    print(f"💾 Resultado: {output}")
+
+    dataset_key = os.path.splitext(os.path.basename(result["dataset"]["db"]))[0]
+    if args.save_baseline:
+        save_json(baseline_path(dataset_key), result)
+        print(f"📌 Baseline atualizada: {baseline_path(dataset_key)}")
+
+    if args.compare is not None:
+        reference = args.compare or baseline_path(dataset_key)
+        if not os.path.exists(reference):
+            print(f"⚠️  Baseline não encontrada: {reference}")
+            sys.exit(2)
+        report = compare(load_json(reference), result, threshold=args.threshold)
+        print(format_report(report, args.threshold))
+        if report["regressions"]:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,454 @@
+# benchmarks/soak.py
+"""
+Teste de soak ponta a ponta: sobe o backend de verdade (uvicorn + start_mqtt)
+contra um broker, aplica a carga de benchmarks.mqtt_load e mantém clientes de
+dashboard (WebSocket /ws e polling HTTP) conectados durante todo o período.
+
+Relata, por intervalo e no total: msgs/s publicadas e persistidas, backlog
+(publicadas - persistidas), descartes (broker e app), crescimento do banco e
+latência dispositivo → banco (p50/p99): boot_ms + ts_ms contra o instante em
+que a leitura aparece no banco (consultado a cada SAMPLER_POLL_SECONDS; o
+timestamp gravado é o horário da amostra, não o da gravação). O resultado
+vai para benchmarks/results/soak-<data>.json.
+
+O ts_ms é o instante agendado da amostra, então o atraso do próprio gerador
+entra na latência; ele é relatado à parte ("publisher.lateness"). Duplicatas
+descartadas pela ingestão (ex.: reentrega com QoS 1) também saem à parte e
+não contam como perda.
+
+Exemplos (a partir de backend/):
+    python -m benchmarks.soak --devices 10 --rate 25 --duration 120
+    python -m benchmarks.soak --broker localhost:1883 --devices 50 --ws-clients 20
+    python -m benchmarks.soak --duration 600 --max-p99-ms 500 --max-loss 0.001   # gate
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.compare import RESULTS_DIR, save_json
+from benchmarks.datasets import DATA_DIR, database_url
+from benchmarks.mqtt_load import PAYLOAD_FORMATS, DeviceFleet, parse_broker
+
+SAMPLER_POLL_SECONDS = 0.05
+PUBLISHER_LATE_WARN = 0.01  # fração de envios atrasados que merece aviso no resumo
+DUPLICATES_METRIC = 'aura_mqtt_messages_dropped_total{reason="duplicate"}'
+
+DASHBOARD_ROUTES = (
+    "/realtime/status",
+    "/realtime/series?duration_seconds=60&max_points=200",
+    "/realtime/sensor-health",
+    "/stats/daily",
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _latency_summary(values_ms) -> Dict[str, Optional[float]]:
+    if not len(values_ms):
+        return {"count": 0, "p50_ms": None, "p99_ms": None, "max_ms": None}
+    arr = np.asarray(values_ms, dtype=float)
+    return {
+        "count": int(arr.size),
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p99_ms": float(np.percentile(arr, 99)),
+        "max_ms": float(arr.max()),
+    }
+
+
+def _scrape(http) -> Dict[str, float]:
+    """Amostras de /metrics: 'nome{labels}' → valor."""
+    samples = {}
+    for line in http.get("/metrics").text.splitlines():
+        if line and not line.startswith("#"):
+            key, _, value = line.rpartition(" ")
+            samples[key] = float(value)
+    return samples
+
+
+def _sum_metric(samples: Dict[str, float], name: str) -> float:
+    return sum(v for k, v in samples.items() if k == name or k.startswith(name + "{"))
+
+
+# ============================================================
+# CLIENTES DE DASHBOARD
+# ============================================================
+
+class DashboardClients:
+    """Clientes WebSocket (num loop asyncio) e threads de polling HTTP."""
+
+    def __init__(self, base_url: str, ws_clients: int, http_clients: int, http_interval: float):
+        self.base_url = base_url
+        self.ws_clients = ws_clients
+        self.http_clients = http_clients
+        self.http_interval = http_interval
+        self.ws_lag_ms: List[float] = []
+        self.ws_messages = 0
+        self.ws_errors = 0
+        self.http_ms: List[float] = []
+        self.http_errors = 0
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        if self.ws_clients:
+            self._threads.append(threading.Thread(target=self._run_ws, daemon=True))
+        for _ in range(self.http_clients):
+            self._threads.append(threading.Thread(target=self._run_http, daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(5)
+
+    def _run_ws(self):
+        asyncio.run(self._ws_main())
+
+    async def _ws_main(self):
+        url = self.base_url.replace("http://", "ws://") + "/ws"
+        await asyncio.gather(*(self._ws_client(url) for _ in range(self.ws_clients)))
+
+    async def _ws_client(self, url: str):
+        import websockets
+
+        try:
+            async with websockets.connect(url) as ws:
+                while not self._stop.is_set():
+                    try:
+                        raw = await asyncio.wait_for(ws.recv(), timeout=0.5)
+                    except asyncio.TimeoutError:
+                        continue
+                    received = time.time()
+                    message = json.loads(raw)
+                    sampled = datetime.fromisoformat(message["timestamp"]).timestamp()
+                    self.ws_lag_ms.append((received - sampled) * 1000.0)
+                    self.ws_messages += 1
+        except Exception:
+            self.ws_errors += 1
+
+    def _run_http(self):
+        import httpx
+
+        with httpx.Client(base_url=self.base_url, timeout=30.0) as http:
+            while not self._stop.is_set():
+                for route in DASHBOARD_ROUTES:
+                    started = time.perf_counter()
+                    try:
+                        response = http.get(route)
+                        if response.status_code >= 400:
+                            self.http_errors += 1
+                    except httpx.HTTPError:
+                        self.http_errors += 1
+                    self.http_ms.append((time.perf_counter() - started) * 1000.0)
+                self._stop.wait(self.http_interval)
+
+
+# ============================================================
+# SOAK
+# ============================================================
+
+class _IngestSampler:
+    """
+    Consulta as leituras novas do banco a cada SAMPLER_POLL_SECONDS (thread
+    própria) e calcula a latência dispositivo → banco.
+    """
+
+    def __init__(self, engine, boot_ms: Dict[str, float]):
+        from app.models import SensorReading
+
+        self.engine = engine
+        self.table = SensorReading.__table__
+        self.boot_ms = boot_ms
+        self.last_id = 0
+        self.rows = 0
+        self.latencies_ms: List[float] = []
+        self._interval: List[float] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(5)
+
+    def _run(self):
+        while not self._stop.wait(SAMPLER_POLL_SECONDS):
+            self._fetch()
+
+    def _fetch(self):
+        from sqlalchemy import select
+
+        t = self.table
+        query = (select(t.c.id, t.c.device_id, t.c.ts_ms)
+                 .where(t.c.id > self.last_id).order_by(t.c.id))
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).all()
+        seen_ms = time.time() * 1000.0
+        with self._lock:
+            for row in rows:
+                boot = self.boot_ms.get(row.device_id)
+                if boot is not None and row.ts_ms is not None:
+                    self._interval.append(seen_ms - (boot + row.ts_ms))
+            if rows:
+                self.last_id = rows[-1].id
+            self.rows += len(rows)
+
+    def poll(self) -> List[float]:
+        """Latências desde a última chamada."""
+        with self._lock:
+            interval, self._interval = self._interval, []
+        self.latencies_ms.extend(interval)
+        return interval
+
+
+def run(args) -> Dict[str, Any]:
+    broker = None
+    if args.broker == "embedded":
+        from benchmarks.mini_broker import MiniBroker
+        broker = MiniBroker().start()
+        host, port = broker.host, broker.port
+    else:
+        host, port = parse_broker(args.broker)
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    db_path = args.db or os.path.join(DATA_DIR, "soak.db")
+    if not args.keep_db and os.path.exists(db_path):
+        os.remove(db_path)
+
+    # app.db e app.mqtt_client leem a configuração na importação
+    os.environ["AURA_DATABASE_URL"] = database_url(db_path)
+    os.environ["AURA_MQTT_HOST"] = host
+    os.environ["AURA_MQTT_PORT"] = str(port)
+    os.environ.setdefault("AURA_LOG_LEVEL", "WARNING")
+
+    import httpx
+    import uvicorn
+    from app.db import engine
+    from app.main import app
+
+    api_port = _free_port()
+    base_url = f"http://127.0.0.1:{api_port}"
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=api_port,
+                                           log_level="warning", lifespan="on"))
+    server_thread = threading.Thread(target=server.run, daemon=True)
+    server_thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    time.sleep(0.5)  # SUBSCRIBE do backend
+
+    http = httpx.Client(base_url=base_url, timeout=30.0)
+    fleet = DeviceFleet(host, port, args.devices, args.rate, fmt=args.format, qos=args.qos,
+                        bad_ratio=args.bad_ratio, shared_connection=args.shared_connection)
+    sampler = _IngestSampler(engine, fleet.boot_ms)
+    dashboards = DashboardClients(base_url, args.ws_clients, args.http_clients, args.http_interval)
+    db_bytes_start = os.path.getsize(db_path)
+
+    print(f"🔥 Soak: {args.devices} dispositivos × {args.rate:g} Hz por {args.duration:g}s "
+          f"(broker {host}:{port}, {args.ws_clients} WS, {args.http_clients} HTTP)")
+    print(f"  {'t':>6} {'pub/s':>8} {'ingest/s':>9} {'backlog':>8} {'descart.':>8} "
+          f"{'db MB':>8} {'p50 ms':>8} {'p99 ms':>8}")
+
+    intervals = []
+    dashboards.start()
+    sampler.start()
+    fleet.start()
+    started = last = time.perf_counter()
+    last_published = last_rows = 0
+    try:
+        while last - started < args.duration:
+            time.sleep(min(args.report_every, args.duration - (last - started)))
+            now = time.perf_counter()
+            latencies = sampler.poll()
+            metrics = _scrape(http)
+            published = fleet.stats["published"]
+            dropped = _sum_metric(metrics, "aura_mqtt_messages_dropped_total")
+            duplicates = _sum_metric(metrics, DUPLICATES_METRIC)
+            entry = {
+                "t_s": now - started,
+                "published_per_s": (published - last_published) / (now - last),
+                "persisted_per_s": (sampler.rows - last_rows) / (now - last),
+                "backlog": int(published - fleet.stats["invalid"] - duplicates - sampler.rows),
+                "dropped": dropped,
+                "db_bytes": os.path.getsize(db_path),
+                **_latency_summary(latencies),
+            }
+            intervals.append(entry)
+            print(f"  {entry['t_s']:6.0f} {entry['published_per_s']:8.0f} "
+                  f"{entry['persisted_per_s']:9.0f} {entry['backlog']:8d} {dropped:8.0f} "
+                  f"{entry['db_bytes'] / 1e6:8.1f} {entry['p50_ms'] or 0:8.1f} "
+                  f"{entry['p99_ms'] or 0:8.1f}")
+            last, last_published, last_rows = now, published, sampler.rows
+    except KeyboardInterrupt:
+        print("⏹️  Interrompido")
+    finally:
+        soak_seconds = time.perf_counter() - started
+        persisted_in_soak = sampler.rows
+        published_in_soak = fleet.stats["published"]
+        fleet.stop()
+
+    # Drenar: esperar o backlog zerar (ou parar de andar)
+    expected = fleet.stats["published"] - fleet.stats["invalid"]
+    drain_started = time.perf_counter()
+    drained = False
+    while not drained and time.perf_counter() - drain_started < args.drain_seconds:
+        before = sampler.rows
+        time.sleep(1.0)
+        sampler.poll()
+        drained = sampler.rows >= expected or sampler.rows == before
+    drain_seconds = time.perf_counter() - drain_started
+
+    sampler.stop()
+    dashboards.stop()
+    metrics = _scrape(http)
+    http.close()
+    server.should_exit = True
+    server_thread.join(10)
+    if broker:
+        broker.stop()
+
+    db_bytes = os.path.getsize(db_path)
+    # Duplicata descartada não é perda: a mesma amostra já está no banco
+    duplicates = int(_sum_metric(metrics, DUPLICATES_METRIC))
+    lost = max(expected - duplicates - sampler.rows, 0)
+    backlogs = [i["backlog"] for i in intervals]
+    return {
+        "created_at": datetime.now().isoformat(),
+        "config": {k: v for k, v in vars(args).items()},
+        "broker": dict(broker.stats) if broker else {"address": f"{host}:{port}"},
+        "soak_seconds": soak_seconds,
+        "drain_seconds": drain_seconds,
+        "publisher": {**fleet.stats, "lateness": _latency_summary(list(fleet.lateness_ms))},
+        "ingest": {
+            "received": _sum_metric(metrics, "aura_mqtt_messages_received_total"),
+            "parsed": _sum_metric(metrics, "aura_mqtt_messages_parsed_total"),
+            "persisted": sampler.rows,
+            "dropped": {
+                k.split('reason="')[1].rstrip('"}'): v for k, v in metrics.items()
+                if k.startswith("aura_mqtt_messages_dropped_total{")
+            },
+            # Sem drenagem completa o que falta ainda pode estar na fila, não perdido
+            "drained": drained,
+            "duplicates": duplicates,
+            "lost": lost,
+            "loss_ratio": lost / expected if expected else 0.0,
+            "sustained_per_s": persisted_in_soak / soak_seconds,
+            "offered_per_s": published_in_soak / soak_seconds,
+            "backlog_growth_per_s": ((backlogs[-1] - backlogs[0]) / (intervals[-1]["t_s"] - intervals[0]["t_s"])
+                                     if len(intervals) > 1 else None),
+        },
+        "latency": {"device_to_db": _latency_summary(sampler.latencies_ms),
+                    "device_to_websocket": _latency_summary(dashboards.ws_lag_ms)},
+        "database": {
+            "rows": sampler.rows,
+            "bytes_start": db_bytes_start,
+            "bytes_end": db_bytes,
+            "bytes_per_reading": (db_bytes - db_bytes_start) / sampler.rows if sampler.rows else None,
+            "growth_mb_per_hour": (db_bytes - db_bytes_start) / 1e6 / soak_seconds * 3600,
+        },
+        "dashboard": {
+            "ws_messages": dashboards.ws_messages,
+            "ws_errors": dashboards.ws_errors,
+            "http_requests": len(dashboards.http_ms),
+            "http_errors": dashboards.http_errors,
+            "http": _latency_summary(dashboards.http_ms),
+        },
+        "intervals": intervals,
+    }
+
+
+def print_summary(result: Dict[str, Any]):
+    ingest, db, dash = result["ingest"], result["database"], result["dashboard"]
+    e2e, ws = result["latency"]["device_to_db"], result["latency"]["device_to_websocket"]
+    publisher = result["publisher"]
+    print(f"📊 Oferecido {ingest['offered_per_s']:,.0f} msg/s → sustentado "
+          f"{ingest['sustained_per_s']:,.0f} msg/s")
+    missing = "perdidas" if ingest["drained"] else "não drenadas"
+    print(f"   Persistidas {ingest['persisted']:,} | {missing} {ingest['lost']:,} "
+          f"({ingest['loss_ratio']:.2%}) | duplicatas {ingest['duplicates']:,} | "
+          f"descartes {ingest['dropped'] or '{}'}")
+    lateness = publisher["lateness"]
+    if lateness["count"]:
+        print(f"   Atraso do publicador: p50={lateness['p50_ms']:.1f} ms  p99={lateness['p99_ms']:.1f} ms  "
+              f"max={lateness['max_ms']:.1f} ms ({publisher['late']:,} envios > 1 período)")
+    if publisher["published"] and publisher["late"] / publisher["published"] > PUBLISHER_LATE_WARN:
+        print(f"⚠️  {publisher['late'] / publisher['published']:.1%} dos envios saíram mais de um período "
+              f"atrasados: parte da latência dispositivo → banco é do gerador, não do backend")
+    if "dropped" in result["broker"]:
+        print(f"   Broker: recebidas {result['broker']['received']:,}, "
+              f"entregues {result['broker']['delivered']:,}, descartadas {result['broker']['dropped']:,}")
+    if e2e["count"]:
+        print(f"   Dispositivo → banco: p50={e2e['p50_ms']:.1f} ms  p99={e2e['p99_ms']:.1f} ms  "
+              f"max={e2e['max_ms']:.1f} ms")
+    if ws["count"]:
+        print(f"   Dispositivo → WS:    p50={ws['p50_ms']:.1f} ms  p99={ws['p99_ms']:.1f} ms "
+              f"({dash['ws_messages']:,} mensagens)")
+    if dash["http_requests"]:
+        print(f"   Dashboard HTTP: {dash['http_requests']:,} req, {dash['http_errors']} erros, "
+              f"p50={dash['http']['p50_ms']:.1f} ms  p99={dash['http']['p99_ms']:.1f} ms")
+    if db["bytes_per_reading"]:
+        print(f"   Banco: +{(db['bytes_end'] - db['bytes_start']) / 1e6:.1f} MB "
+              f"({db['bytes_per_reading']:.0f} B/leitura, {db['growth_mb_per_hour']:.0f} MB/h)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak test ponta a ponta (MQTT → banco → dashboard)")
+    parser.add_argument("--broker", default="embedded",
+                        help="'embedded' (broker em processo) ou host:porta (ex.: Mosquitto de infra/)")
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=25.0, help="Hz por dispositivo")
+    parser.add_argument("--duration", type=float, default=60.0, help="Segundos de carga")
+    parser.add_argument("--format", choices=PAYLOAD_FORMATS, default="firmware")
+    parser.add_argument("--qos", type=int, choices=(0, 1, 2), default=0)
+    parser.add_argument("--bad-ratio", type=float, default=0.0, help="Fração de payloads inválidos")
+    parser.add_argument("--shared-connection", action="store_true")
+    parser.add_argument("--ws-clients", type=int, default=2)
+    parser.add_argument("--http-clients", type=int, default=1)
+    parser.add_argument("--http-interval", type=float, default=1.0, help="Segundos entre rodadas de polling")
+    parser.add_argument("--report-every", type=float, default=10.0)
+    parser.add_argument("--drain-seconds", type=float, default=30.0)
+    parser.add_argument("--db", help="Arquivo SQLite (default = benchmarks/data/soak.db, recriado)")
+    parser.add_argument("--keep-db", action="store_true", help="Não apaga o banco antes do soak")
+    parser.add_argument("--output", help="Arquivo de resultado (default = results/soak-<data>.json)")
+    parser.add_argument("--max-p99-ms", type=float, help="Falha se o p99 dispositivo → banco passar disto")
+    parser.add_argument("--max-loss", type=float, help="Falha se a fração perdida passar disto")
+    args = parser.parse_args()
+
+    result = run(args)
+    print_summary(result)
+
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    output = args.output or os.path.join(RESULTS_DIR, f"soak-{stamp}.json")
+    save_json(output, result)
+    print(f"💾 Resultado: {output}")
+
+    failures = []
+    p99 = result["latency"]["device_to_db"]["p99_ms"]
+    if args.max_p99_ms is not None and (p99 is None or p99 > args.max_p99_ms):
+        failures.append(f"p99 {p99} ms > {args.max_p99_ms} ms")
+    if args.max_loss is not None and result["ingest"]["loss_ratio"] > args.max_loss:
+        failures.append(f"perda {result['ingest']['loss_ratio']:.4f} > {args.max_loss}")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+# benchmarks/ws_fanout.py
+"""
+Capacidade do /ws com muitos espectadores.
+
+Sobe o backend num subprocesso (uvicorn) alimentado por um dispositivo
+simulado via broker em processo (benchmarks.mini_broker + mqtt_load) e, para
+cada nível de clientes, mede duas rodadas: só leitores rápidos e com uma
+fração de leitores lentos (que dormem entre mensagens). Por rodada:
+
+- latência de entrega (recebido - timestamp da leitura) dos rápidos e lentos;
+- mensagens/s por cliente;
+- CPU e RSS do servidor (/proc), totais e por cliente acima do ocioso;
+- degradação dos rápidos causada pelos lentos (p99 com lentos / p99 sem).
+
+A seção "capacity" do resultado entra no benchmarks.compare, então a curva
+pode ser comparada com uma baseline a cada mudança na camada de tempo real.
+
+Exemplos (a partir de backend/):
+    python -m benchmarks.ws_fanout --levels 10,100,500,1000 --save-baseline
+    python -m benchmarks.ws_fanout --levels 10,100,500,1000 --compare
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.compare import (
+    RESULTS_DIR, baseline_path, compare, format_report, load_json, save_json,
+)
+from benchmarks.datasets import BACKEND_DIR, DATA_DIR, database_url
+from benchmarks.mini_broker import MiniBroker
+from benchmarks.mqtt_load import DeviceFleet
+from benchmarks.soak import _free_port
+
+BASELINE_KEY = "ws-fanout"
+CONNECT_BATCH = 100  # conexões abertas em paralelo durante a rampa
+
+
+# ============================================================
+# SERVIDOR
+# ============================================================
+
+def _proc_usage(pid: int) -> Optional[Dict[str, float]]:
+    """CPU acumulada (s) e RSS (KB) do processo, via /proc (somente Linux)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/status") as f:
+            rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    except (OSError, StopIteration):
+        return None
+    ticks = os.sysconf("SC_CLK_TCK")
+    # utime e stime são os campos 14 e 15 (11 e 12 depois do nome do processo)
+    return {"cpu_s": (int(fields[11]) + int(fields[12])) / ticks, "rss_kb": rss_kb}
+
+
+def start_server(db_path: str, mqtt_port: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, AURA_DATABASE_URL=database_url(db_path),
+               AURA_MQTT_HOST="127.0.0.1", AURA_MQTT_PORT=str(mqtt_port),
+               AURA_LOG_LEVEL="WARNING")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    import httpx
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("backend não subiu em 30s")
+
+
+# ============================================================
+# CLIENTES
+# ============================================================
+
+class _Group:
+    def __init__(self):
+        self.latencies_ms: List[float] = []
+        self.messages = 0
+        self.clients = 0
+        self.errors = 0
+
+    def summary(self, seconds: float) -> Dict[str, Any]:
+        arr = np.asarray(self.latencies_ms, dtype=float)
+        result = {
+            "clients": self.clients,
+            "errors": self.errors,
+            "msgs_per_client_per_s": self.messages / self.clients / seconds if self.clients else 0.0,
+        }
+        if arr.size:
+            result.update({
+                "p50_ms": float(np.percentile(arr, 50)),
+                "p95_ms": float(np.percentile(arr, 95)),
+                "p99_ms": float(np.percentile(arr, 99)),
+            })
+        return result
+
+
+async def _client(url: str, group: _Group, slow_delay: float, measuring: asyncio.Event,
+                  stop: asyncio.Event, connected: asyncio.Event):
+    import websockets
+
+    try:
+        # max_queue pequeno: leitor lento para de ler o socket e o servidor sente a pressão
+        async with websockets.connect(url, open_timeout=60, ping_interval=None,
+                                      max_queue=4 if slow_delay else 32) as ws:
+            group.clients += 1
+            connected.set()
+            while not stop.is_set():
+                try:
+                    raw = await asyncio.wait_for(ws.recv(), timeout=0.5)
+                except asyncio.TimeoutError:
+                    continue
+                if measuring.is_set():
+                    persisted = datetime.fromisoformat(json.loads(raw)["timestamp"]).timestamp()
+                    group.latencies_ms.append((time.time() - persisted) * 1000.0)
+                    group.messages += 1
+                if slow_delay:
+                    await asyncio.sleep(slow_delay)
+    except Exception:
+        group.errors += 1
+
+
+async def _run_round(url: str, clients: int, slow_fraction: float, slow_delay: float,
+                     seconds: float, warmup: float, pid: int) -> Dict[str, Any]:
+    fast, slow = _Group(), _Group()
+    measuring, stop = asyncio.Event(), asyncio.Event()
+    slow_count = int(round(clients * slow_fraction))
+    idle = _proc_usage(pid)
+
+    ramp_started = time.perf_counter()
+    tasks = []
+    for start in range(0, clients, CONNECT_BATCH):
+        batch = []
+        for i in range(start, min(start + CONNECT_BATCH, clients)):
+            connected = asyncio.Event()
+            is_slow = i < slow_count
+            tasks.append(asyncio.create_task(_client(
+                url, slow if is_slow else fast, slow_delay if is_slow else 0.0,
+                measuring, stop, connected,
+            )))
+            batch.append(connected)
+        await asyncio.wait([asyncio.create_task(e.wait()) for e in batch], timeout=60)
+    ramp_seconds = time.perf_counter() - ramp_started
+
+    await asyncio.sleep(warmup)
+    before = _proc_usage(pid)
+    measuring.set()
+    started = time.perf_counter()
+    await asyncio.sleep(seconds)
+    measuring.clear()
+    elapsed = time.perf_counter() - started
+    after = _proc_usage(pid)
+
+    stop.set()
+    await asyncio.gather(*tasks)
+
+    result = {
+        "clients": clients,
+        "slow_clients": slow_count,
+        "ramp_seconds": ramp_seconds,
+        "fast": fast.summary(elapsed),
+        "slow": slow.summary(elapsed),
+    }
+    if before and after and idle:
+        cpu = (after["cpu_s"] - before["cpu_s"]) / elapsed
+        connected = fast.clients + slow.clients
+        result["server"] = {
+            "cpu_percent": cpu * 100.0,
+            "rss_kb": after["rss_kb"],
+            "rss_per_client_kb": (after["rss_kb"] - idle["rss_kb"]) / connected if connected else None,
+        }
+    return result
+
+
+def _idle_cpu(pid: int, seconds: float = 3.0) -> Optional[float]:
+    before = _proc_usage(pid)
+    time.sleep(seconds)
+    after = _proc_usage(pid)
+    if not (before and after):
+        return None
+    return (after["cpu_s"] - before["cpu_s"]) / seconds * 100.0
+
+
+def _fmt(value: Optional[float], width: int) -> str:
+    return f"{value:{width}.1f}" if value is not None else "-".rjust(width)
+
+
+def _raise_fd_limit(clients: int):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = min(hard, max(soft, clients * 2 + 256))
+    if wanted > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+    if clients * 2 + 256 > wanted:
+        print(f"⚠️  Limite de arquivos ({wanted}) pode não bastar para {clients} clientes")
+
+
+# ============================================================
+# CURVA
+# ============================================================
+
+def run(args) -> Dict[str, Any]:
+    levels = [int(n) for n in args.levels.split(",")]
+    _raise_fd_limit(max(levels))  # herdado pelo subprocesso do servidor
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    db_path = os.path.join(DATA_DIR, "ws_fanout.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    broker = MiniBroker().start()
+    port = _free_port()
+    server = start_server(db_path, broker.port, port)
+    fleet = DeviceFleet(broker.host, broker.port, devices=1, rate=args.rate)
+    fleet.start()
+    url = f"ws://127.0.0.1:{port}/ws"
+
+    result: Dict[str, Any] = {
+        "created_at": datetime.now().isoformat(),
+        "config": {k: v for k, v in vars(args).items()},
+        "capacity": {},
+        "rounds": [],
+    }
+    try:
+        time.sleep(2)  # primeiras leituras no banco
+        result["idle_cpu_percent"] = _idle_cpu(server.pid)
+        idle_cpu = result["idle_cpu_percent"] or 0.0
+
+        print(f"{'clientes':>8} {'lentos':>6} {'p50 ms':>8} {'p99 ms':>8} {'msg/s/cli':>9} "
+              f"{'CPU %':>6} {'RSS MB':>7} {'KB/cli':>7} {'lentos p99':>10}")
+        for clients in levels:
+            fractions = [0.0] + ([args.slow_fraction] if args.slow_fraction else [])
+            rounds = {}
+            for fraction in fractions:
+                r = asyncio.run(_run_round(url, clients, fraction, args.slow_delay,
+                                           args.seconds, args.warmup, server.pid))
+                rounds[fraction] = r
+                result["rounds"].append(r)
+                server_stats = r.get("server", {})
+                print(f"{clients:8d} {r['slow_clients']:6d} {_fmt(r['fast'].get('p50_ms'), 8)} "
+                      f"{_fmt(r['fast'].get('p99_ms'), 8)} {r['fast']['msgs_per_client_per_s']:9.2f} "
+                      f"{_fmt(server_stats.get('cpu_percent'), 6)} "
+                      f"{_fmt(server_stats.get('rss_kb', 0) / 1024, 7)} "
+                      f"{_fmt(server_stats.get('rss_per_client_kb'), 7)} "
+                      f"{_fmt(r['slow'].get('p99_ms'), 10)}")
+                time.sleep(1)  # servidor libera as conexões da rodada
+
+            base = rounds[0.0]
+            entry = {
+                "p50_ms": base["fast"].get("p50_ms"),
+                "p99_ms": base["fast"].get("p99_ms"),
+                "msgs_per_client_per_s": base["fast"]["msgs_per_client_per_s"],
+                "connect_errors": base["fast"]["errors"],
+                "ramp_ms": base["ramp_seconds"] * 1000.0,
+            }
+            if "server" in base:
+                entry["cpu_percent"] = base["server"]["cpu_percent"]
+                entry["cpu_per_client_ms"] = (
+                    (base["server"]["cpu_percent"] - idle_cpu) / 100.0 / clients * 1000.0
+                )
+                entry["rss_per_client_kb"] = base["server"]["rss_per_client_kb"]
+            if args.slow_fraction:
+                mixed = rounds[args.slow_fraction]["fast"]
+                entry["mixed_fast_p99_ms"] = mixed.get("p99_ms")
+                # Cai a zero se os lentos travarem a entrega para todos
+                entry["mixed_fast_msgs_per_client_per_s"] = mixed["msgs_per_client_per_s"]
+                if entry["p99_ms"] and mixed.get("p99_ms"):
+                    entry["slow_degradation"] = mixed["p99_ms"] / entry["p99_ms"]
+            result["capacity"][f"{clients} clients"] = {k: v for k, v in entry.items() if v is not None}
+    finally:
+        fleet.stop()
+        server.terminate()
+        try:
+            server.wait(10)
+        except subprocess.TimeoutExpired:
+            server.kill()  # servidor travado (ex.: event loop bloqueado no pool do banco)
+        broker.stop()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Curva de capacidade do WebSocket /ws")
+    parser.add_argument("--levels", default="10,100,500,1000", help="Números de clientes")
+    parser.add_argument("--seconds", type=float, default=15.0, help="Medição por rodada")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--rate", type=float, default=25.0, help="Hz do dispositivo simulado")
+    parser.add_argument("--slow-fraction", type=float, default=0.1,
+                        help="Fração de leitores lentos na segunda rodada (0 desliga)")
+    parser.add_argument("--slow-delay", type=float, default=1.0,
+                        help="Segundos que um leitor lento dorme entre mensagens")
+    parser.add_argument("--output", help="Arquivo de resultado (default = results/ws-fanout-<data>.json)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", nargs="?", const="", metavar="BASELINE")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    result = run(args)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    output = args.output or os.path.join(RESULTS_DIR, f"ws-fanout-{stamp}.json")
+    save_json(output, result)
+    print(f"💾 Resultado: {output}")
+
+    if args.save_baseline:
+        save_json(baseline_path(BASELINE_KEY), result)
+        print(f"📌 Baseline atualizada: {baseline_path(BASELINE_KEY)}")
+    if args.compare is not None:
+        reference = args.compare or baseline_path(BASELINE_KEY)
+        if not os.path.exists(reference):
+            print(f"⚠️  Baseline não encontrada: {reference}")
+            sys.exit(2)
+        report = compare(load_json(reference), result, threshold=args.threshold)
+        print(format_report(report, args.threshold))
+        if report["regressions"]:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+# bulk_export.py
+"""
+Exporta leituras/features para Arrow IPC ou Parquet (uso offline com pandas).
+
+Exemplos:
+    python bulk_export.py --table features --start 2025-11-01 --end 2025-12-01 --out features.parquet
+    python bulk_export.py --table readings --format arrow --device default --out readings.arrow
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from app.services.bulk_export_service import BULK_FORMATS, write_bulk_export
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export colunar (Arrow/Parquet) do Aura")
+    parser.add_argument("--table", choices=["readings", "features"], default="features")
+    parser.add_argument("--start", help="ISO 8601 (default = end - 1 dia)")
+    parser.add_argument("--end", help="ISO 8601 (default = agora)")
+    parser.add_argument("--device", default=None, help="device_id (default = todos)")
+    parser.add_argument("--format", choices=BULK_FORMATS, default=None,
+                        help="arrow ou parquet (default = pela extensão de --out)")
+    parser.add_argument("--out", required=True, help="Arquivo de saída")
+    args = parser.parse_args()
+
+    end = datetime.fromisoformat(args.end) if args.end else datetime.now()
+    start = datetime.fromisoformat(args.start) if args.start else end - timedelta(days=1)
+    fmt = args.format or ("arrow" if args.out.endswith((".arrow", ".arrows", ".ipc")) else "parquet")
+
+    print(f"📦 Exportando {args.table} de {start} até {end} ({fmt})...")
+    started = time.perf_counter()
+    result = write_bulk_export(args.out, args.table, start, end, fmt=fmt, device_id=args.device)
+    elapsed = time.perf_counter() - started
+
+    print(f"✅ {result['rows']:,} linhas → {result['path']} "
+          f"({result['bytes'] / 1e6:.1f} MB em {elapsed:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+# generate_dataset.py
+"""
+Gera um dataset sintético realista para benchmarks: N dispositivos × D dias de
+leituras a 25 Hz (acelerômetro + giroscópio) com gravidade, postura variando,
+movimento voluntário, ruído e surtos de tremor de 4–6 Hz.
+
+As features saem do mesmo caminho da ingestão: compute_features_resampled
+reamostra as leituras (ts_ms) na grade do dispositivo (25 Hz, ancorada a cada
+GRID_ANCHOR_MS) antes da janela e das fórmulas de process_new_reading, e cada
+bloco continua a janela do anterior como o backfill (window_history). Com
+--rate diferente de 25 Hz as leituras ficam na taxa pedida e as features na
+grade, como ao vivo. Tudo é gravado com INSERT Core em lote (executemany) com
+ids explícitos, em blocos de tempo ordenados.
+
+Exemplos:
+    python generate_dataset.py --devices 2 --days 1 --reset
+    python generate_dataset.py --devices 10 --days 30 --reset --rollups
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+
+from app.db import engine, ensure_columns, ensure_indexes, SessionLocal
+from app.models import Base, Episode, FeatureRollup, SensorFeature, SensorReading
+from app.services.episodes_service import EPISODE_THRESHOLD, find_episodes
+from app.services.features_service import (
+    GRID_ANCHOR_MS, GRID_PERIOD_MS, SAMPLING_RATE, WINDOW_SIZE,
+    compute_features_resampled, vector_magnitudes,
+)
+from app.services.retention_service import ROLLUP_CHUNK_BUCKETS, rollup_range, rollup_resolutions
+
+GRAVITY = 9.81  # m/s²
+FEATURE_COLUMNS = (
+    "acc_magnitude", "gyro_magnitude", "acc_mean", "acc_std", "acc_amplitude",
+    "gyro_mean", "gyro_std", "gyro_amplitude", "intensity", "freq_dominant",
+    "band_power", "tremor_score",
+)
+
+
+# ============================================================
+# SINAIS
+# ============================================================
+
+def plan_bursts(rng: np.random.Generator, total_seconds: float, args) -> Dict[str, np.ndarray]:
+    """Agenda de surtos de tremor do dispositivo para todo o intervalo."""
+    count = rng.poisson(args.bursts_per_hour * total_seconds / 3600.0)
+    starts = np.sort(rng.uniform(0, total_seconds, count))
+    return {
+        "start": starts,
+        "duration": rng.uniform(args.burst_min_seconds, args.burst_max_seconds, count),
+        "freq": rng.uniform(args.freq_min, args.freq_max, count),
+        "amplitude": rng.uniform(args.amplitude_min, args.amplitude_max, count),
+    }
+
+
+def burst_envelope(t: np.ndarray, bursts: Dict[str, np.ndarray], rate: float):
+    """Amplitude (m/s²) e frequência do tremor em cada amostra, com rampas suaves."""
+    envelope = np.zeros(len(t))
+    freq = np.full(len(t), 5.0)
+    t0, t1 = t[0], t[-1]
+    overlapping = np.flatnonzero(
+        (bursts["start"] <= t1) & (bursts["start"] + bursts["duration"] >= t0)
+    )
+    for b in overlapping:
+        start, duration = bursts["start"][b], bursts["duration"][b]
+        lo = max(int(np.ceil((start - t0) * rate)), 0)
+        hi = min(int(np.floor((start + duration - t0) * rate)) + 1, len(t))
+        if hi <= lo:
+            continue
+        # Janela de Tukey: 1 s de subida/descida
+        position = t[lo:hi] - start
+        ramp = np.clip(np.minimum(position, duration - position), 0, 1.0)
+        envelope[lo:hi] = bursts["amplitude"][b] * (0.5 - 0.5 * np.cos(np.pi * ramp))
+        freq[lo:hi] = bursts["freq"][b]
+    return envelope, freq
+
+
+def synthesize(rng: np.random.Generator, state: Dict[str, Any], t: np.ndarray,
+               rate: float, args) -> Dict[str, np.ndarray]:
+    """Leituras brutas de um dispositivo para os instantes `t` (segundos)."""
+    n = len(t)
+    envelope, freq = burst_envelope(t, state["bursts"], rate)
+
+    # Fase contínua entre blocos (frequência varia entre surtos)
+    phase = state["phase"] + 2 * np.pi * np.cumsum(freq) / rate
+    state["phase"] = float(phase[-1] % (2 * np.pi))
+
+    # Postura: orientação da gravidade oscila lentamente (minutos)
+    tilt = 0.35 * np.sin(2 * np.pi * t / state["posture_period"] + state["posture_phase"])
+    roll = 0.25 * np.sin(2 * np.pi * t / (state["posture_period"] * 1.7))
+    gravity = GRAVITY * np.stack([np.sin(tilt), np.sin(roll) * np.cos(tilt),
+                                  np.cos(roll) * np.cos(tilt)])
+
+    # Movimento voluntário lento (0.2–1 Hz) e ruído do sensor
+    voluntary = args.movement * np.sin(2 * np.pi * state["movement_freq"] * t)
+    tremor = envelope * np.sin(phase)
+    direction = state["tremor_dir"][:, None]
+    acc = gravity + direction * (tremor + voluntary) + rng.normal(0, args.noise, (3, n))
+    gyro = (direction * envelope * args.gyro_gain * np.cos(phase)
+            + rng.normal(0, args.noise * 0.2, (3, n)))
+
+    return {
+        "acc_x": acc[0], "acc_y": acc[1], "acc_z": acc[2],
+        "gyro_x": gyro[0], "gyro_y": gyro[1], "gyro_z": gyro[2],
+        "temp": 25.0 + 1.5 * np.sin(2 * np.pi * t / 86400.0) + rng.normal(0, 0.1, n),
+        "ts_ms": (state["boot_ms"] + t * 1000.0).astype(np.int64),
+    }
+
+
+def new_device_state(rng: np.random.Generator, total_seconds: float, args) -> Dict[str, Any]:
+    direction = rng.normal(size=3)
+    direction[2] = abs(direction[2]) + 0.5  # componente ao longo da gravidade → varia a magnitude
+    return {
+        "bursts": plan_bursts(rng, total_seconds, args),
+        "phase": 0.0,
+        "posture_period": rng.uniform(120, 900),
+        "posture_phase": rng.uniform(0, 2 * np.pi),
+        "movement_freq": rng.uniform(0.2, 1.0),
+        "tremor_dir": direction / np.linalg.norm(direction),
+        "boot_ms": int(rng.integers(0, 3_600_000)),
+        # Leituras do fim do bloco anterior que reconstroem a janela
+        "history": {"ts_ms": np.empty(0, dtype=np.int64), "acc": np.empty(0), "gyro": np.empty(0)},
+        "episode_samples": [],
+    }
+
+
+# ============================================================
+# CARGA
+# ============================================================
+
+def _next_id(conn, model) -> int:
+    return int(conn.execute(select(func.coalesce(func.max(model.id), 0))).scalar()) + 1
+
+
+def _bulk_insert(conn, table, columns: Dict[str, list]):
+    """
+    INSERT Core compilado uma vez e executado com executemany do driver sobre
+    tuplas (sem o processamento de parâmetros por linha do SQLAlchemy).
+    """
+    compiled = insert(table).compile(dialect=engine.dialect, column_keys=list(columns))
+    if compiled.positiontup:
+        rows = list(zip(*(columns[key] for key in compiled.positiontup)))
+    else:
+        keys = list(columns)
+        rows = [dict(zip(keys, values)) for values in zip(*columns.values())]
+    conn.exec_driver_sql(str(compiled), rows)
+
+
+def _timestamps(start: datetime, seconds: np.ndarray) -> list:
+    """Instantes no formato que o SQLAlchemy grava no SQLite (datetime nos demais bancos)."""
+    values = np.datetime64(start, "us") + np.round(seconds * 1e6).astype("timedelta64[us]")
+    if engine.dialect.name == "sqlite":
+        return np.char.replace(np.datetime_as_string(values, unit="us"), "T", " ").tolist()
+    return values.astype(object).tolist()
+
+
+def _as_python(values: np.ndarray) -> list:
+    """NaN → None (colunas opcionais) e tipos NumPy → Python."""
+    values = np.asarray(values, dtype=np.float64)
+    out = values.tolist()
+    if np.isnan(values).any():
+        out = [None if v != v else v for v in out]
+    return out
+
+
+def load_chunk(conn, start: datetime, t: np.ndarray, blocks: List[Dict[str, Any]],
+               next_ids: Dict[str, int]) -> int:
+    """Intercala os dispositivos em ordem de tempo e grava leituras + features."""
+    device = np.concatenate([np.full(len(t), b["device_id"], dtype=object) for b in blocks])
+    times = np.concatenate([t] * len(blocks))
+    order = np.argsort(times, kind="stable")
+    n = len(order)
+
+    def column(key, source):
+        return np.concatenate([b[source][key] for b in blocks])[order]
+
+    reading_ids = np.arange(next_ids["reading"], next_ids["reading"] + n)
+    feature_ids = np.arange(next_ids["feature"], next_ids["feature"] + n)
+    next_ids["reading"] += n
+    next_ids["feature"] += n
+
+    timestamps = _timestamps(start, times[order])
+    devices = device[order].tolist()
+
+    readings = {"id": reading_ids.tolist(), "device_id": devices, "timestamp": timestamps}
+    for key in ("acc_x", "acc_y", "acc_z", "gyro_x", "gyro_y", "gyro_z", "temp"):
+        readings[key] = column(key, "raw").tolist()
+    readings["ts_ms"] = column("ts_ms", "raw").tolist()
+
+    features = {"id": feature_ids.tolist(), "reading_id": reading_ids.tolist(),
+                "device_id": devices, "timestamp": timestamps}
+    for key in FEATURE_COLUMNS:
+        features[key] = _as_python(column(key, "features"))
+
+    _bulk_insert(conn, SensorReading.__table__, readings)
+    _bulk_insert(conn, SensorFeature.__table__, features)
+    return n
+
+
+def generate(args):
+    rate = float(args.rate)
+    end = datetime.fromisoformat(args.end) if args.end else datetime.now().replace(microsecond=0)
+    start = end - timedelta(days=args.days)
+    total_seconds = args.days * 86400.0
+    rng = np.random.default_rng(args.seed)
+    device_ids = [f"{args.device_prefix}{i:02d}" for i in range(args.devices)]
+    states = {d: new_device_state(rng, total_seconds, args) for d in device_ids}
+
+    Base.metadata.create_all(bind=engine)
+    ensure_columns()
+    ensure_indexes()  # bancos antigos recebem colunas e índices novos, como no startup
+    with engine.begin() as conn:
+        if args.reset:
+            print("🗑️  Limpando dados antigos...")
+            for model in (Episode, FeatureRollup, SensorFeature, SensorReading):
+                conn.execute(delete(model))
+
+    print(f"🚀 Gerando {len(device_ids)} dispositivos × {args.days} dias a {rate:g} Hz "
+          f"({int(total_seconds * rate * len(device_ids)):,} leituras)...")
+    started = time.perf_counter()
+    deferred = [] if args.keep_indexes else drop_indexes()
+
+    try:
+        written = load_range(rng, start, total_seconds, rate, states, args, started)
+    finally:
+        if deferred:
+            print("🗂️  Recriando índices...")
+            recreate_indexes(deferred)
+
+    episodes = save_episodes(start, states)
+    print(f"✅ {written:,} leituras + features e {episodes} episódios em "
+          f"{time.perf_counter() - started:.1f}s")
+
+    if args.rollups:
+        build_rollups(start, end)
+
+
+def load_range(rng: np.random.Generator, start: datetime, total_seconds: float, rate: float,
+               states: Dict[str, Dict[str, Any]], args, started: float) -> int:
+    """Gera e grava o intervalo em blocos de `chunk_seconds` (todos os dispositivos por bloco)."""
+    written = 0
+    step = 1.0 / rate
+    chunk_start = 0.0
+    while chunk_start < total_seconds:
+        chunk_end = min(chunk_start + args.chunk_seconds, total_seconds)
+        t = np.arange(int(round(chunk_start * rate)), int(round(chunk_end * rate))) * step
+
+        blocks = []
+        for device_id, state in states.items():
+            raw = synthesize(rng, state, t, rate, args)
+            acc_mag = vector_magnitudes(raw["acc_x"], raw["acc_y"], raw["acc_z"])
+            gyro_mag = vector_magnitudes(raw["gyro_x"], raw["gyro_y"], raw["gyro_z"])
+            features = device_features(state, raw["ts_ms"], acc_mag, gyro_mag)
+
+            # Só as amostras acima do limiar são guardadas para detectar episódios no fim
+            hot = features["intensity"] >= EPISODE_THRESHOLD
+            if hot.any():
+                state["episode_samples"].append(
+                    (t[hot], features["intensity"][hot], features["freq_dominant"][hot])
+                )
+            blocks.append({"device_id": device_id, "raw": raw, "features": features})
+
+        with engine.begin() as conn:
+            if engine.dialect.name == "sqlite":
+                conn.exec_driver_sql("PRAGMA synchronous=OFF")
+            next_ids = {"reading": _next_id(conn, SensorReading), "feature": _next_id(conn, SensorFeature)}
+            written += load_chunk(conn, start, t, blocks, next_ids)
+
+        elapsed = time.perf_counter() - started
+        print(f"  {start + timedelta(seconds=chunk_end)} | {written:,} leituras "
+              f"| {written / max(elapsed, 1e-9):,.0f} leituras/s")
+        chunk_start = chunk_end
+    return written
+
+
+def device_features(state: Dict[str, Any], ts_ms: np.ndarray, acc_mag: np.ndarray,
+                    gyro_mag: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Features do bloco pelo caminho da ingestão (reamostragem + janela), com
+    as leituras guardadas do bloco anterior na frente, como o backfill faz
+    com window_history; as linhas delas são descartadas.
+    """
+    history = state["history"]
+    ts_all = np.concatenate([history["ts_ms"], ts_ms])
+    acc_all = np.concatenate([history["acc"], acc_mag])
+    gyro_all = np.concatenate([history["gyro"], gyro_mag])
+    features = compute_features_resampled(ts_all, acc_all, gyro_all)
+
+    # Mesmo início de features_service.window_history: o intervalo de
+    # GRID_ANCHOR_MS em que a grade da próxima janela foi ancorada
+    start = (ts_all[-1] - (WINDOW_SIZE + 1) * GRID_PERIOD_MS) // GRID_ANCHOR_MS * GRID_ANCHOR_MS
+    keep = ts_all >= start
+    state["history"] = {"ts_ms": ts_all[keep], "acc": acc_all[keep], "gyro": gyro_all[keep]}
+    h = len(history["ts_ms"])
+    return {name: values[h:] for name, values in features.items()}
+
+
+def drop_indexes() -> list:
+    """
+    Remove os índices secundários de leituras/features durante a carga:
+    reconstruí-los no fim (ordenado) é bem mais barato que mantê-los linha a linha.
+    """
+    indexes = [idx for table in (SensorReading.__table__, SensorFeature.__table__)
+               for idx in table.indexes]
+    with engine.begin() as conn:
+        for idx in indexes:
+            idx.drop(conn, checkfirst=True)
+    return indexes
+
+
+def recreate_indexes(indexes: list):
+    with engine.begin() as conn:
+        for idx in indexes:
+            idx.create(conn, checkfirst=True)
+
+
+def save_episodes(start: datetime, states: Dict[str, Dict[str, Any]]) -> int:
+    rows = []
+    for state in states.values():
+        if not state["episode_samples"]:
+            continue
+        t, intensity, freq = (np.concatenate(parts) for parts in zip(*state["episode_samples"]))
+        for ep in find_episodes(t, intensity, freq):
+            ep_start = start + timedelta(seconds=float(t[ep["start_index"]]))
+            ep_end = start + timedelta(seconds=float(t[ep["end_index"]]))
+            rows.append({
+                "start_time": ep_start,
+                "end_time": ep_end,
+                "duration": (ep_end - ep_start).total_seconds() / 60.0,
+                "max_intensity": ep["max_intensity"],
+                "freq_dominant": ep["freq_dominant"],
+                "description": f"Episódio com {ep['samples']} leituras",
+            })
+    if rows:
+        with engine.begin() as conn:
+            conn.execute(insert(Episode.__table__), rows)
+    return len(rows)
+
+
+def build_rollups(start: datetime, end: datetime):
+    """Calcula todos os tiers de rollup para o intervalo gerado."""
+    db = SessionLocal()
+    try:
+        source = 0
+        for resolution in rollup_resolutions():
+            print(f"📈 Rollup {resolution}s...")
+            chunk = timedelta(seconds=resolution * ROLLUP_CHUNK_BUCKETS)
+            cursor = start
+            while cursor < end:
+                rollup_range(db, resolution, source, cursor, min(cursor + chunk, end))
+                cursor += chunk
+            source = resolution
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gerador de dataset sintético do Aura")
+    parser.add_argument("--devices", type=int, default=2)
+    parser.add_argument("--days", type=float, default=1.0)
+    parser.add_argument("--end", help="ISO 8601 (default = agora)")
+    parser.add_argument("--rate", type=float, default=SAMPLING_RATE, help="Hz (default = 25)")
+    parser.add_argument("--device-prefix", default="sim-")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-seconds", type=float, default=600.0,
+                        help="Tamanho do bloco de tempo gerado/gravado por vez")
+    parser.add_argument("--bursts-per-hour", type=float, default=2.0)
+    parser.add_argument("--burst-min-seconds", type=float, default=10.0)
+    parser.add_argument("--burst-max-seconds", type=float, default=120.0)
+    parser.add_argument("--freq-min", type=float, default=4.0)
+    parser.add_argument("--freq-max", type=float, default=6.0)
+    parser.add_argument("--amplitude-min", type=float, default=0.4, help="m/s²")
+    parser.add_argument("--amplitude-max", type=float, default=1.6, help="m/s²")
+    parser.add_argument("--gyro-gain", type=float, default=0.4, help="rad/s por m/s² de tremor")
+    parser.add_argument("--movement", type=float, default=0.15, help="m/s² de movimento voluntário")
+    parser.add_argument("--noise", type=float, default=0.03, help="desvio do ruído (m/s²)")
+    parser.add_argument("--reset", action="store_true", help="Apaga leituras/features/episódios/rollups antes")
+    parser.add_argument("--keep-indexes", action="store_true",
+                        help="Mantém os índices durante a carga (mais lento)")
+    parser.add_argument("--rollups", action="store_true", help="Calcula os rollups do intervalo no fim")
+    generate(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
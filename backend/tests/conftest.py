@@ -0,0 +1,39 @@
+# tests/conftest.py
+"""
+Testes com pytest (a partir de backend/: python -m pytest tests).
+
+app.db cria o engine na importação, então o banco temporário é configurado
+aqui, antes de qualquer import de app.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+_DB_DIR = tempfile.mkdtemp(prefix="aura-tests-")
+os.environ["AURA_DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'aura.db')}"
+os.environ.setdefault("AURA_LOG_LEVEL", "WARNING")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def engine():
+    """Engine do banco de testes com o mesmo esquema do startup da aplicação."""
+    from app.db import engine, ensure_columns, ensure_indexes
+    from app.models import Base
+    Base.metadata.create_all(bind=engine)
+    ensure_columns()
+    ensure_indexes()
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    from app.db import SessionLocal
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
@@ -0,0 +1,36 @@
+# tests/test_bulk_export.py
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.models import SensorFeature
+
+pytest.importorskip("pyarrow")
+
+
+def test_db_batches_go_through_engine_events(db, engine):
+    from app.services.bulk_export_service import iter_record_batches
+
+    start = datetime(2026, 3, 1)
+    db.add_all(
+        SensorFeature(reading_id=i, device_id="dev-bulk", timestamp=start + timedelta(seconds=i),
+                      intensity=float(i))
+        for i in range(10)
+    )
+    db.commit()
+
+    seen = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        batches = list(iter_record_batches("features", start, start + timedelta(minutes=1), "dev-bulk"))
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+
+    assert sum(batch.num_rows for batch in batches) == 10
+    assert any("FROM sensor_features" in statement for statement in seen)
+    assert batches[0].column("intensity").to_pylist()[:3] == [0.0, 1.0, 2.0]
@@ -0,0 +1,29 @@
+# tests/test_downsampling.py
+import numpy as np
+
+from app.services.downsampling import downsample_records, minmax_indices
+
+
+def test_minmax_all_nan_keeps_bucket_edges():
+    idx = minmax_indices(np.full(100, np.nan), 10)
+    assert list(idx) == [0, 19, 20, 39, 40, 59, 60, 79, 80, 99]
+
+
+def test_minmax_partly_nan_keeps_extrema_and_gap_edges():
+    y = np.arange(100, dtype=np.float64)
+    y[20:40] = np.nan  # segundo bucket sem dados
+    y[45] = 500.0      # pico dentro do terceiro bucket
+
+    idx = minmax_indices(y, 10)
+
+    assert len(idx) <= 10
+    assert {20, 39} <= set(idx)      # bordas do trecho vazio
+    assert {0, 19, 40, 45} <= set(idx)  # mínimos e máximos dos buckets com dados
+    assert 99 in idx
+
+
+def test_downsample_records_with_only_nulls_is_not_empty():
+    records = [{"timestamp": float(i), "intensity": None} for i in range(100)]
+    out = downsample_records(records, 10, "intensity", mode="minmax")
+    assert 0 < len(out) <= 10
+    assert out[0]["timestamp"] == 0.0 and out[-1]["timestamp"] == 99.0
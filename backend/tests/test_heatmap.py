@@ -0,0 +1,59 @@
+# tests/test_heatmap.py
+import asyncio
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from app.models import SensorFeature, SensorReading
+from app.routes import heatmap_routes
+from app.services import cpu_executor
+from app.services.heatmap_service import compute_amplitude_timeline
+
+
+def test_buckets_start_at_first_feature_and_skip_nulls():
+    start = datetime(2025, 2, 1)
+    offsets = np.array([0, 30, 59, 61, 200], dtype=np.int64) * 1_000_000
+    intensities = np.array([1.0, np.nan, 3.0, 5.0, 2.0])
+    amplitudes = np.array([0.5, 0.7, np.nan, np.nan, 1.0])
+
+    timeline = compute_amplitude_timeline(start, offsets, intensities, amplitudes, bucket_minutes=1)
+
+    assert [p["timestamp"] for p in timeline] == [
+        "2025-02-01T00:00:00", "2025-02-01T00:01:01", "2025-02-01T00:03:20",
+    ]
+    assert [p["samples"] for p in timeline] == [2, 1, 1]
+    assert timeline[0]["avg_intensity"] == 2.0
+    assert timeline[0]["avg_amplitude"] == 0.6
+    assert timeline[1]["avg_amplitude"] == 0
+
+
+def test_timeline_route_runs_on_cpu_executor(db, monkeypatch):
+    day = datetime(2025, 2, 2)
+    for i in range(30):
+        ts = day + timedelta(seconds=20 * i)
+        reading = SensorReading(device_id="dev-timeline", timestamp=ts, acc_x=0.0, acc_y=0.0,
+                                acc_z=1.0, gyro_x=0.0, gyro_y=0.0, gyro_z=0.0)
+        db.add(reading)
+        db.flush()
+        db.add(SensorFeature(reading_id=reading.id, device_id="dev-timeline", timestamp=ts,
+                             intensity=float(i), acc_amplitude=1.0))
+    db.commit()
+
+    tasks = []
+    real_run_cpu = cpu_executor.run_cpu
+
+    async def run_cpu(task, fn, *args):
+        tasks.append(task)
+        return await real_run_cpu(task, fn, *args)
+
+    monkeypatch.setattr(cpu_executor, "CPU_WORKERS", 0)
+    monkeypatch.setattr(heatmap_routes, "run_cpu", run_cpu)
+
+    result = asyncio.run(heatmap_routes.route_amplitude_timeline(
+        for_date=day.date().isoformat(), bucket_minutes=5, max_points=None, mode="lttb"
+    ))
+
+    assert tasks == ["timeline"]
+    assert result["date"] == date(2025, 2, 2).isoformat()
+    assert [p["samples"] for p in result["timeline"]] == [15, 15]
+    assert result["timeline"][1]["max_intensity"] == 29.0
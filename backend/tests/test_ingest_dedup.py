@@ -0,0 +1,45 @@
+# tests/test_ingest_dedup.py
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app.models import UNKNOWN_BOOT, SensorReading
+from app.services.ingest_dedup import _load_sequence, last_readings_query
+
+
+def _explain(db, query) -> str:
+    compiled = query.statement.compile(db.get_bind(), compile_kwargs={"literal_binds": True})
+    rows = db.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+def test_last_readings_query_uses_device_timestamp_index(db):
+    start = datetime(2026, 1, 1)
+    db.add_all(
+        SensorReading(device_id=f"dev-{i % 3}", timestamp=start + timedelta(milliseconds=40 * i),
+                      ts_ms=40 * i, boot=0)
+        for i in range(3000)
+    )
+    db.commit()
+    db.execute(text("ANALYZE"))
+
+    plan = _explain(db, last_readings_query(db, "dev-1"))
+    assert "ix_sensor_readings_device_timestamp" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_load_sequence_skips_rows_without_live_boot(db):
+    start = datetime(2026, 2, 1)
+    db.add_all([
+        SensorReading(device_id="dev-seq", timestamp=start, ts_ms=5000, boot=2),
+        # Mais recentes, mas sem boot da ingestão ao vivo
+        SensorReading(device_id="dev-seq", timestamp=start + timedelta(seconds=1), ts_ms=9000,
+                      boot=UNKNOWN_BOOT),
+        SensorReading(device_id="dev-seq", timestamp=start + timedelta(seconds=2), ts_ms=9500),
+    ])
+    db.commit()
+
+    sequence = _load_sequence(db, "dev-seq", 5040)
+    assert sequence.boot == 2
+    assert not sequence.accept(5000)  # já gravada
+    assert sequence.accept(5040)
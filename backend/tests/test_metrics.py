@@ -0,0 +1,29 @@
+# tests/test_metrics.py
+import pytest
+
+from app.metrics import Counter, Gauge, Histogram, render_prometheus
+
+parser = pytest.importorskip("prometheus_client.parser")
+
+
+def test_exposition_parses_with_prometheus_client():
+    import app.main  # noqa: F401  (registra as métricas de todas as rotas e serviços)
+
+    counter = Counter("aura_test_events", "Eventos de teste", ["kind"])
+    counter.labels(kind="a").inc(3)
+    Gauge("aura_test_level", "Nível de teste").set(1.5)
+    Histogram("aura_test_seconds", "Duração de teste", buckets=(0.1, 1.0)).observe(0.5)
+
+    families = {f.name: f for f in parser.text_string_to_metric_families(render_prometheus())}
+
+    assert not [name for name, f in families.items() if f.type == "unknown"]
+    events = families["aura_test_events"]
+    assert events.type == "counter"
+    assert [(s.name, s.labels, s.value) for s in events.samples] == [
+        ("aura_test_events_total", {"kind": "a"}, 3.0)
+    ]
+    assert families["aura_test_level"].samples[0].value == 1.5
+    assert families["aura_test_seconds"].type == "histogram"
+    # Contadores do app também saem como família "counter" com amostras _total
+    received = families["aura_mqtt_messages_received"]
+    assert received.type == "counter" and received.samples[0].name.endswith("_total")
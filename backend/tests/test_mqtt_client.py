@@ -0,0 +1,53 @@
+# tests/test_mqtt_client.py
+import json
+
+import pytest
+
+import app.mqtt_client as mqtt_client
+from app.services.ingest_sources import IngestSource
+
+OWNED, FOREIGN = "dev-mine", "dev-other"
+READING = {"acc_x": 0.1, "acc_y": 0.2, "acc_z": 9.8, "gyro_x": 0.0, "gyro_y": 0.0, "gyro_z": 0.0,
+           "ts_ms": 1000}
+
+
+@pytest.fixture
+def captured(monkeypatch):
+    messages = []
+    monkeypatch.setattr(mqtt_client, "owns_device", lambda device_id: device_id != FOREIGN)
+    monkeypatch.setattr(mqtt_client, "capture_message", lambda topic, raw, t: messages.append(topic))
+    monkeypatch.setattr(mqtt_client, "accept_reading", lambda payload, device_id: True)
+    monkeypatch.setattr(mqtt_client, "buffer_reading", lambda *args: None)
+    return messages
+
+
+def _handle(topic, payload):
+    raw = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    mqtt_client.handle_message(topic, raw, 0.0)
+
+
+def test_capture_skips_messages_of_other_instances(captured):
+    base = mqtt_client.MQTT_TOPIC
+    _handle(f"{base}/{FOREIGN}", READING)
+    _handle(base, {**READING, "device_id": FOREIGN})
+    assert captured == []
+
+    _handle(f"{base}/{OWNED}", READING)
+    _handle(base, {**READING, "device_id": OWNED})
+    assert captured == [f"{base}/{OWNED}", base]
+
+
+def test_capture_keeps_invalid_payloads_of_this_instance(captured):
+    base = mqtt_client.MQTT_TOPIC
+    _handle(f"{base}/{OWNED}", b"{truncado")
+    _handle(base, b"{truncado")  # sem dispositivo: dono do padrão (esta instância)
+    assert captured == [f"{base}/{OWNED}", base]
+
+
+def test_ingest_source_requires_start_and_stop():
+    class StartOnly(IngestSource):
+        def start(self, handle):
+            pass
+
+    with pytest.raises(TypeError):
+        StartOnly()
@@ -0,0 +1,39 @@
+# tests/test_overload_controller.py
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import overload_controller
+from app.services.overload_controller import BACKLOG_HIGH, OverloadController
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(overload_controller, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def _run(clock, backlogs, busy=0.95):
+    """Uma avaliação por segundo com a thread `busy` ocupada e a fila em cada valor."""
+    current = [0.0]
+    controller = OverloadController(lambda: current[0])
+    levels = []
+    for backlog in backlogs:
+        current[0] = backlog
+        clock[0] += 1.0
+        controller.observe(busy)
+        levels.append(controller.level)
+    return levels
+
+
+def test_busy_but_steady_queue_keeps_full_fidelity(clock):
+    # Thread quase toda ocupada, fila estável em 10% (abaixo do limiar alto)
+    levels = _run(clock, [0.10] * 30)
+    assert set(levels) == {0}
+
+
+def test_busy_and_growing_queue_degrades(clock):
+    levels = _run(clock, [0.05 + 0.02 * i for i in range(6)])
+    assert levels[-1] > 0
+    assert max(0.05 + 0.02 * i for i in range(6)) < BACKLOG_HIGH  # só o crescimento degradou
@@ -0,0 +1,45 @@
+# tests/test_query_service.py
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import literal, select
+from sqlalchemy.dialects import postgresql
+
+from app.models import FeatureRollup
+from app.services.query_service import get_series
+from app.services.retention_service import _rollup_tier, floor_int
+
+
+@pytest.mark.parametrize("value, expected", [(2.7, 2), (2.0, 2), (0.0, 0), (-0.5, -1), (-2.0, -2)])
+def test_floor_int_floors_on_sqlite(db, value, expected):
+    assert db.execute(select(floor_int(literal(value)))).scalar() == expected
+
+
+def test_floor_int_uses_floor_on_postgres():
+    sql = str(select(floor_int(FeatureRollup.samples / 2.5)).compile(dialect=postgresql.dialect()))
+    assert "CAST(FLOOR(" in sql
+
+
+def test_long_range_series_reads_hourly_rollups(db):
+    start = datetime(2025, 1, 1)
+    db.add_all(
+        FeatureRollup(device_id="dev-long", resolution_seconds=60,
+                      bucket_start=start + timedelta(minutes=m), samples=1500,
+                      avg_intensity=float(m // 60), max_intensity=float(m // 60),
+                      episode_candidates=0)
+        for m in range(180)
+    )
+    db.commit()
+    _rollup_tier(db, 3600, 60, now=start + timedelta(hours=4), max_batches=10)
+
+    hourly = (db.query(FeatureRollup)
+              .filter_by(device_id="dev-long", resolution_seconds=3600)
+              .order_by(FeatureRollup.bucket_start).all())
+    assert [r.samples for r in hourly] == [90000] * 3
+    assert [r.avg_intensity for r in hourly] == [0.0, 1.0, 2.0]
+
+    result = get_series(db, "dev-long", start, start + timedelta(days=364), ["intensity"], points=500)
+    assert result["plan"]["tier"] == "rollup_3600s"
+    assert sum(p["samples"] for p in result["data"]) == 270000
+    assert result["data"][0]["intensity"] == pytest.approx(1.0)
+    assert result["data"][0]["intensity_max"] == 2.0
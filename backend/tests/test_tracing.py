@@ -0,0 +1,66 @@
+# tests/test_tracing.py
+import asyncio
+import os
+import tempfile
+import time
+from collections import OrderedDict, deque
+
+import pytest
+
+from app.services import live_feed, tracing_service
+from app.services.tracing_service import attach_reading, mark_broadcast, now_ms
+
+
+@pytest.fixture(autouse=True)
+def fresh_traces(monkeypatch):
+    monkeypatch.setattr(tracing_service, "_pending", OrderedDict())
+    monkeypatch.setattr(tracing_service, "_completed", deque(maxlen=tracing_service.TRACE_MAX_COMPLETED))
+    monkeypatch.setattr(tracing_service, "_broadcast_upto", 0)
+
+
+def _pending_trace(reading_id: int):
+    trace = {"device_id": "dev-trace", "ts_ms": None, "reading_id": None,
+             "stages": {"received": now_ms()}}
+    attach_reading(trace, reading_id)
+    return trace
+
+
+def test_broadcast_marks_every_pending_trace_up_to_the_sent_id():
+    traces = [_pending_trace(rid) for rid in (10, 20, 30)]
+
+    mark_broadcast(25)
+
+    assert "broadcast" in traces[0]["stages"] and "broadcast" in traces[1]["stages"]
+    assert "broadcast" not in traces[2]["stages"]
+    assert list(tracing_service._pending) == [30]
+    assert [t["reading_id"] for t in tracing_service._completed] == [10, 20]
+
+
+def test_broadcast_from_api_worker_reaches_ingest_traces(monkeypatch):
+    path = os.path.join(tempfile.mkdtemp(prefix="aura-live-"), "live.sock")
+    live_feed.start_live_publisher(path)
+    monkeypatch.setattr(live_feed, "_reported_id", 0)
+    trace = _pending_trace(42)
+
+    async def worker():
+        live_feed.start_live_subscriber(path)
+        try:
+            for _ in range(100):
+                if live_feed._feed_writer is not None:
+                    break
+                await asyncio.sleep(0.01)
+            live_feed.report_broadcast(42)
+            await asyncio.sleep(0.05)  # o transporte escreve no socket
+        finally:
+            live_feed.stop_live_subscriber()
+
+    try:
+        asyncio.run(worker())
+        deadline = time.monotonic() + 2.0
+        while "broadcast" not in trace["stages"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        live_feed.stop_live_publisher()
+
+    assert "broadcast" in trace["stages"]
+    assert not tracing_service._pending
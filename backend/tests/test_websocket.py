@@ -0,0 +1,72 @@
+# tests/test_websocket.py
+import asyncio
+import logging
+
+import pytest
+
+import app.main as main
+
+MESSAGE = {"type": "sensor_reading", "id": 1, "device_id": "dev-ws", "timestamp": "2026-01-01T00:00:00"}
+
+
+class FakeWebSocket:
+    """Cliente que fecha a conexão quando `closed` é sinalizado."""
+
+    def __init__(self, send_error=None):
+        self.closed = asyncio.Event()
+        self.sent = []
+        self.send_error = send_error
+
+    async def accept(self):
+        pass
+
+    async def receive(self):
+        await self.closed.wait()
+        return {"type": "websocket.disconnect", "code": 1000}
+
+    async def send_json(self, message):
+        if self.send_error is not None:
+            self.closed.set()
+            raise self.send_error
+        self.sent.append(message)
+
+
+@pytest.fixture
+def live_message(monkeypatch):
+    monkeypatch.setattr(main, "_live_from_feed", True)
+    monkeypatch.setattr(main, "get_shm_reader", lambda: None)
+    monkeypatch.setattr(main, "report_broadcast", lambda reading_id: None)
+
+
+def _warnings(caplog):
+    return [r for r in caplog.records if r.levelno >= logging.WARNING]
+
+
+def test_send_after_close_is_a_normal_disconnect(live_message, monkeypatch, caplog):
+    monkeypatch.setattr(main, "latest_message", lambda: MESSAGE)
+    websocket = FakeWebSocket(send_error=RuntimeError(main._SEND_AFTER_CLOSE))
+
+    with caplog.at_level(logging.DEBUG, logger="app.main"):
+        asyncio.run(main.websocket_endpoint(websocket))
+
+    assert not _warnings(caplog)
+
+
+def test_disconnect_during_poll_skips_send(live_message, monkeypatch, caplog):
+    websocket = FakeWebSocket()
+
+    def latest():
+        websocket.closed.set()  # cliente sai enquanto a leitura é buscada
+        return MESSAGE
+
+    monkeypatch.setattr(main, "latest_message", latest)
+
+    async def run():
+        task = asyncio.ensure_future(main.websocket_endpoint(websocket))
+        await asyncio.wait_for(task, timeout=2.0)
+
+    with caplog.at_level(logging.DEBUG, logger="app.main"):
+        asyncio.run(run())
+
+    assert websocket.sent == []
+    assert not _warnings(caplog)